@@ -17,8 +17,10 @@ System plugin.
 """
 
 import os
+import shutil
 
 from gofer.decorators import pam, remote
+from gofer.rmi.bulk import Blob
 from gofer.rmi.shell import Shell as _Shell
 from gofer.agent.rmi import Context
 from gofer.pam import authenticate
@@ -167,7 +169,7 @@ class Script:
     def __init__(self, content):
         """
         :param content: The script content.
-        :type content: str
+        :type content: str|Blob
         """
         self.content = content
 
@@ -191,11 +193,14 @@ class Script:
         shell = _Shell()
         context = Context.current()
         path = os.path.join('/tmp', context.sn)
-        fp = open(path, 'w+')
-        try:
-            fp.write(self.content)
-        finally:
-            fp.close()
+        if isinstance(self.content, Blob):
+            shutil.copyfile(self.content.path, path)
+        else:
+            fp = open(path, 'w+')
+            try:
+                fp.write(self.content)
+            finally:
+                fp.close()
         try:
             os.chmod(path, 0755)
             cmd = [path]
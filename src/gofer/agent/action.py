@@ -69,21 +69,45 @@ class Action:
         method = t.__name__
         return '%s.%s()' % (cls, method)
 
+    def seconds(self):
+        """
+        Get the run interval in seconds.
+        :return: The interval (seconds).
+        :rtype: float
+        """
+        return self.interval.total_seconds()
+
+    def remaining(self):
+        """
+        Get the time until the next run is due based on when it last ran.
+        :return: The remaining time (seconds).  0 when due.
+        :rtype: float
+        """
+        _next = self.last + self.interval
+        return max((_next - dt.utcnow()).total_seconds(), 0)
+
     @released
-    def __call__(self):
+    def perform(self):
         """
-        Invoke the action.
+        Invoke the action (unconditionally).
         """
         try:
-            _next = self.last + self.interval
-            now = dt.utcnow()
-            if _next < now:
-                self.last = now
-                log.debug('perform "%s"', self.name())
-                self.target()
+            self.last = dt.utcnow()
+            log.debug('perform "%s"', self.name())
+            self.target()
         except Exception, e:
             log.exception(e)
 
+    @released
+    def __call__(self):
+        """
+        Invoke the action when due.
+        """
+        _next = self.last + self.interval
+        now = dt.utcnow()
+        if _next < now:
+            self.perform()
+
     def __unicode__(self):
         return self.name()
 
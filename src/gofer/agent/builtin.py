@@ -16,6 +16,7 @@
 from gofer.agent.decorator import Actions
 from gofer.agent.reporting import loaded
 from gofer.decorators import options
+from gofer.metrics import Metrics
 from gofer.rmi.tracker import Tracker
 from gofer.rmi.criteria import Builder
 from gofer.rmi.dispatcher import Dispatcher
@@ -100,6 +101,15 @@ class Admin:
         """
         return loaded(self.container, Actions())
 
+    @remote
+    def metrics(self):
+        """
+        Get agent metrics.
+        :return: A dict of: {name: value}.
+        :rtype: dict
+        """
+        return Metrics().snapshot()
+
     @property
     def __name__(self):
         return self.__class__.__name__
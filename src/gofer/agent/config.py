@@ -33,6 +33,14 @@ from gofer.config import REQUIRED, OPTIONAL, ANY, BOOL, NUMBER, FLOAT
 # [pam]
 #   service
 #      The default PAM service for authentication.  Default:passwd
+#   cache_ttl
+#      The time (seconds) verified credentials are cached.  Default: 0 (disabled)
+#   cache_size
+#      The maximum number of cached credentials.  Default: 100
+#
+# [actions]
+#   jitter
+#      The maximum random delay (seconds) added to the first action run.  Default: 0
 #
 
 AGENT_SCHEMA = (
@@ -49,6 +57,13 @@ AGENT_SCHEMA = (
     ('pam', REQUIRED,
         (
             ('service', OPTIONAL, ANY),
+            ('cache_ttl', OPTIONAL, FLOAT),
+            ('cache_size', OPTIONAL, NUMBER),
+        )
+    ),
+    ('actions', OPTIONAL,
+        (
+            ('jitter', OPTIONAL, FLOAT),
         )
     ),
 )
@@ -64,6 +79,9 @@ AGENT_SCHEMA = (
 #      The (optional) fully qualified module to be loaded from the PYTHON path.
 #   threads
 #      The (optional) number of threads for the RMI dispatcher.
+#   process
+#      The (optional) flag indicates RMI is dispatched in a pool of worker processes.
+#      The number of processes is specified by *threads*.
 #   accept
 #      Accept forwarding from.  A comma (,) separated list of plugin names (,=none|*=all).
 #   forward
@@ -83,6 +101,12 @@ AGENT_SCHEMA = (
 #      The (optional) flag indicates SSL host validation should be performed.
 #   authenticator
 #      The (optional) fully qualified Authenticator to be loaded from the PYTHON path.
+#   compression
+#      The (optional) name of the compressor used to compress replies (zlib|lz4).
+#   compression_threshold
+#      The (optional) size (bytes) above which replies are compressed.  Default: 4096.
+#   decompression_limit
+#      The (optional) maximum size (bytes) of decompressed requests.  Default: 104857600.
 #
 # [model]
 #
@@ -106,6 +130,7 @@ PLUGIN_SCHEMA = (
             ('plugin', OPTIONAL, ANY),
             ('threads', OPTIONAL, NUMBER),
             ('latency', OPTIONAL, FLOAT),
+            ('process', OPTIONAL, BOOL),
             ('accept', OPTIONAL, ANY),
             ('forward', OPTIONAL, ANY),
         )
@@ -120,6 +145,9 @@ PLUGIN_SCHEMA = (
             ('host_validation', OPTIONAL, BOOL),
             ('authenticator', OPTIONAL, ANY),
             ('heartbeat', OPTIONAL, NUMBER),
+            ('compression', OPTIONAL, ANY),
+            ('compression_threshold', OPTIONAL, NUMBER),
+            ('decompression_limit', OPTIONAL, NUMBER),
         )
     ),
     ('model', OPTIONAL,
@@ -141,7 +169,12 @@ AGENT_DEFAULTS = {
     'logging': {
     },
     'pam': {
-        'service': 'passwd'
+        'service': 'passwd',
+        'cache_ttl': '0',
+        'cache_size': '100'
+    },
+    'actions': {
+        'jitter': '0'
     }
 }
 
@@ -151,6 +184,7 @@ PLUGIN_DEFAULTS = {
         'enabled': '0',
         'threads': '1',
         'latency': '0',
+        'process': '0',
         'accept': ',',
         'forward': ','
     },
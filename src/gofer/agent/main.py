@@ -17,7 +17,10 @@ import sys
 import os
 import logging
 
-from time import sleep
+from time import time, sleep
+from random import uniform
+from functools import partial
+from threading import RLock
 from getopt import getopt, GetoptError
 
 from gofer.agent.logutil import LogHandler
@@ -26,42 +29,202 @@ LogHandler.install()
 
 from gofer import NAME
 from gofer import pam
-from gofer.common import Thread, released, utf8
+from gofer.common import Thread, synchronized, utf8
 from gofer.config import get_bool
 from gofer.agent.plugin import Plugin, PluginLoader
+from gofer.agent.timer import TimerQueue
 from gofer.agent.manager import Manager
 from gofer.agent.lock import Lock, LockFailed
 from gofer.agent.config import AgentConfig
+from gofer.rmi.tracker import Tracker
+from gofer.rmi.scope import Pooled
+from gofer.rmi.bulk import Spool
 
 log = logging.getLogger(__name__)
 
 
-class ActionThread(Thread):
+class ActionScheduler(Thread):
     """
-    Run actions independently of main thread.
+    Schedule recurring actions independently of main thread.
+    Actions are kept in the (heap based) agent timer by next run time
+    and submitted to the plugin thread pool only when due.  An action is
+    rescheduled after each run completes so that runs of the same action
+    never overlap.  Each run is scheduled an interval after the previous
+    (nominal) due time so the period does not drift.  Plugins are searched
+    for new actions every REFRESH seconds.
+    :ivar jitter: The maximum random delay (seconds) added to the first run.
+    :type jitter: float
+    :ivar scheduled: The set of scheduled actions.
+    :type scheduled: set
     """
-    
-    def __init__(self):
+
+    # seconds between searching for new actions.
+    REFRESH = 10
+
+    # seconds before a due action (not accepted by a backlogged pool) is submitted again.
+    RETRY = 1
+
+    def __init__(self, jitter=0):
+        """
+        :param jitter: The maximum random delay (seconds) added to the first run.
+            Used to spread load caused by agents running the same actions.
+        :type jitter: float
+        """
         Thread.__init__(self, name='Actions')
+        self.jitter = jitter
+        self.scheduled = set()
+        self.__mutex = RLock()
         self.setDaemon(True)
 
-    @released
     def run(self):
         """
-        Run actions.
+        Search for and schedule new actions.
         """
         while not Thread.aborted():
-            for plugin in Plugin.all():
-                for action in plugin.actions:
-                    plugin.pool.run(action)
-            sleep(10)
+            self.refresh()
+            sleep(self.REFRESH)
+
+    @synchronized
+    def refresh(self):
+        """
+        Schedule actions not already scheduled.
+        The first run of each action is scheduled based on when it last
+        ran.  The (random) jitter is added to the first run.
+        """
+        for plugin in Plugin.all():
+            for action in plugin.actions:
+                if action in self.scheduled:
+                    continue
+                self.scheduled.add(action)
+                log.debug('scheduled: %s', action)
+                due = time() + action.remaining()
+                if self.jitter:
+                    due += uniform(0, self.jitter)
+                self.schedule(plugin, action, due)
+
+    def schedule(self, plugin, action, due):
+        """
+        Schedule the next run of an action.
+        :param plugin: The plugin providing the action.
+        :type plugin: Plugin
+        :param action: The action to schedule.
+        :type action: gofer.agent.action.Action
+        :param due: When the run is due (seconds since the epoch).
+        :type due: float
+        """
+        timer = TimerQueue()
+        timer.add(due, partial(self.submit, plugin, action, due))
+
+    def submit(self, plugin, action, due):
+        """
+        The action is due.  Submit to the plugin thread pool.
+        Called on the (shared) timer thread so it must not block.  When the
+        plugin thread pool is backlogged, the action is submitted again
+        after the RETRY delay.  Actions of plugins that have been unloaded
+        are dropped.  Actions that cannot be submitted are dropped and
+        scheduled again by refresh().
+        :param plugin: The plugin providing the action.
+        :type plugin: Plugin
+        :param action: The due action.
+        :type action: gofer.agent.action.Action
+        :param due: When the run was due (seconds since the epoch).
+        :type due: float
+        """
+        if plugin not in Plugin.all() or action not in plugin.actions:
+            self.drop(action)
+            return
+        try:
+            submitted = plugin.pool.offer(self.perform, plugin, action, due)
+        except Exception:
+            log.exception(action)
+            self.drop(action)
+            return
+        if not submitted:
+            log.debug('pool backlogged (retry): %s', action)
+            timer = TimerQueue()
+            timer.add(time() + self.RETRY, partial(self.submit, plugin, action, due))
+
+    @synchronized
+    def drop(self, action):
+        """
+        Drop a scheduled action.
+        :param action: The action to drop.
+        :type action: gofer.agent.action.Action
+        """
+        self.scheduled.discard(action)
+        log.debug('dropped: %s', action)
+
+    def perform(self, plugin, action, due):
+        """
+        Run the action and schedule the next run.
+        The next run is due an interval after this run was due.  When
+        the run took longer than the interval, the next run is due now.
+        :param plugin: The plugin providing the action.
+        :type plugin: Plugin
+        :param action: The due action.
+        :type action: gofer.agent.action.Action
+        :param due: When the run was due (seconds since the epoch).
+        :type due: float
+        """
+        try:
+            action.perform()
+        finally:
+            due = max(due + action.seconds(), time())
+            self.schedule(plugin, action, due)
+
+
+class TrackerSweeper(object):
+    """
+    Periodically sweep the request tracker using the agent timer.
+    Removes requests tracked longer than the tracker TTL that are no
+    longer pending (journaled) by any plugin.  Normally, requests are
+    removed when the transaction is committed or discarded.
+    The bulk data spool is also swept.  Blobs (and request directories)
+    older than the spool TTL are deleted unless the request is tracked.
+    """
+
+    # seconds between sweeps.
+    INTERVAL = 600
+
+    def start(self):
+        """
+        Schedule the first sweep.
+        """
+        timer = TimerQueue()
+        timer.add(time() + self.INTERVAL, self)
+
+    @staticmethod
+    def pending():
+        """
+        Get the serial numbers of requests pending in all plugins.
+        :return: The pending serial numbers.
+        :rtype: set
+        """
+        pending = set()
+        for plugin in Plugin.all():
+            pending.update(plugin.scheduler.pending.journal.keys())
+        return pending
+
+    def __call__(self):
+        try:
+            tracker = Tracker()
+            swept = tracker.sweep(pending=self.pending())
+            if swept:
+                log.info('tracker swept: %s', swept)
+            swept = Spool().sweep(keep=tracker)
+            if swept:
+                log.info('spool swept: %s', swept)
+        finally:
+            self.start()
 
 
 class Agent:
     """
     Gofer (main) agent.
-    Starts (2) threads.  A thread to run actions and
+    Starts (2) threads.  A thread to schedule actions and
     another to monitor/update plugin sessions on the bus.
+    Also starts the timer used for delayed RMI dispatching,
+    running actions and evicting pooled instances.
     """
 
     WAIT = None
@@ -69,12 +232,16 @@ class Agent:
     def __init__(self):
         cfg = AgentConfig()
         pam.SERVICE = cfg.pam.service
+        pam.cache = pam.Cache(float(cfg.pam.cache_ttl or 0), int(cfg.pam.cache_size or 0))
 
     def start(self, block=True):
         """
         Start the agent.
         """
         cfg = AgentConfig()
+        timer = TimerQueue()
+        timer.start()
+        Pooled.scheduler = timer
         for plugin in Plugin.all():
             plugin.start()
         if get_bool(cfg.management.enabled):
@@ -82,8 +249,10 @@ class Agent:
             port = int(cfg.management.port)
             manager = Manager(host, port)
             manager.start()
-        actions = ActionThread()
+        actions = ActionScheduler(float(cfg.actions.jitter or 0))
         actions.start()
+        sweeper = TrackerSweeper()
+        sweeper.start()
         log.info('agent started.')
         if block:
             actions.join(self.WAIT)
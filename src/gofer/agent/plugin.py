@@ -28,7 +28,8 @@ from gofer import Singleton, synchronized, NAME
 from gofer.agent.config import PLUGIN_SCHEMA, PLUGIN_DEFAULTS
 from gofer.agent.decorator import Actions
 from gofer.agent.decorator import Delegate
-from gofer.agent.rmi import Scheduler, Task
+from gofer.agent.process import ProcessPool
+from gofer.agent.rmi import Scheduler, Task, TimedCall
 from gofer.agent.whiteboard import Whiteboard
 from gofer.common import nvl, mkdir
 from gofer.common import released
@@ -56,6 +57,16 @@ def attach(fn):
 class Container(object):
     """
     Plugin container.
+    :ivar plugins: Loaded plugins by name and path.
+    :type plugins: dict
+    :ivar unique: Copy-on-write list of unique plugins.
+        Replaced when plugins are added or deleted.
+    :type unique: list
+    :ivar routes: The (forwarding) routing index.
+        Maps (plugin, classname) to the plugin to which requests
+        are forwarded.  Built on demand and discarded when plugins
+        are added or deleted.
+    :type routes: dict
     """
 
     __metaclass__ = Singleton
@@ -63,6 +74,8 @@ class Container(object):
     def __init__(self):
         self.__mutex = RLock()
         self.plugins = {}
+        self.unique = []
+        self.routes = None
 
     @synchronized
     def add(self, plugin, *names):
@@ -78,6 +91,7 @@ class Container(object):
         for name in names:
             self.plugins[name] = plugin
         self.plugins[plugin.path] = plugin
+        self.changed()
         return plugin
 
     @synchronized
@@ -90,8 +104,25 @@ class Container(object):
         for k, v in self.plugins.items():
             if v == plugin:
                 del self.plugins[k]
+        self.changed()
         return plugin
 
+    @synchronized
+    def changed(self):
+        """
+        The plugins have changed.
+        The unique list is replaced and the routing index is discarded.
+        """
+        unique = []
+        found = set()
+        for p in self.plugins.values():
+            if id(p) in found:
+                continue
+            found.add(id(p))
+            unique.append(p)
+        self.unique = unique
+        self.routes = None
+
     @synchronized
     def find(self, name):
         """
@@ -103,19 +134,66 @@ class Container(object):
         """
         return self.plugins.get(name)
 
-    @synchronized
     def all(self):
         """
         Get a unique list of loaded plugins.
+        Read without acquiring the mutex.
         :return: A list of plugins
         :rtype: list
         """
-        unique = []
-        for p in self.plugins.values():
-            if p in unique:
-                continue
-            unique.append(p)
-        return unique
+        return list(self.unique)
+
+    @synchronized
+    def invalidate(self):
+        """
+        Discard the routing index.
+        Must be called when the classes provided by a plugin are changed.
+        """
+        self.routes = None
+
+    @synchronized
+    def route(self, plugin, classname):
+        """
+        Find the plugin to which requests for a class
+        are forwarded by the specified plugin.
+        :param plugin: The plugin that received the request.
+        :type plugin: Plugin
+        :param classname: The requested class name.
+        :type classname: str
+        :return: The plugin when found.
+        :rtype: Plugin
+        """
+        if self.routes is None:
+            self.routes = self.index()
+        return self.routes.get((plugin, classname))
+
+    def index(self):
+        """
+        Build the routing index.
+        Requests for a class are forwarded to the first plugin that
+        provides the class when forwarding is approved by the *forward*
+        property of the forwarding plugin and the *accept* property of
+        the target plugin.
+        :return: The index: {(plugin, classname): plugin}
+        :rtype: dict
+        """
+        routes = {}
+        plugins = self.all()
+        for source in plugins:
+            forward = source.forward
+            for target in plugins:
+                if target is source:
+                    continue
+                if not ('*' in forward or target.name in forward):
+                    # (forwarding) not approved
+                    continue
+                accept = target.accept
+                if not ('*' in accept or source.name in accept):
+                    # (accept) not approved
+                    continue
+                for classname in target.dispatcher.catalog:
+                    routes.setdefault((source, classname), target)
+        return routes
 
     @synchronized
     def load(self, path):
@@ -273,6 +351,18 @@ class Plugin(object):
     def enabled(self):
         return get_bool(self.cfg.main.enabled)
 
+    @property
+    def compression(self):
+        return self.cfg.messaging.compression
+
+    @property
+    def compression_threshold(self):
+        return get_integer(self.cfg.messaging.compression_threshold)
+
+    @property
+    def decompression_limit(self):
+        return get_integer(self.cfg.messaging.decompression_limit)
+
     @property
     def connector(self):
         return Connector(self.url)
@@ -294,6 +384,10 @@ class Plugin(object):
         _list = [p.strip() for p in _list.split(',')]
         return set(_list)
 
+    @property
+    def process(self):
+        return get_bool(self.cfg.main.process)
+
     @property
     def is_started(self):
         return self.scheduler.isAlive()
@@ -306,12 +400,19 @@ class Plugin(object):
     def start(self):
         """
         Start the plugin.
+        - start worker processes
         - attach
         - start scheduler
         """
         if self.is_started:
             # already started
             return
+        if self.process:
+            self.dispatcher.caching = False
+            self.dispatcher.cache.invalidate()
+            pool = ProcessPool(self.dispatcher, int(self.cfg.main.threads or 1))
+            pool.start()
+            self.dispatcher.processes = pool
         self.attach()
         self.scheduler.start()
 
@@ -321,6 +422,7 @@ class Plugin(object):
         Shutdown the plugin.
         - detach
         - shutdown the thread pool.
+        - shutdown the worker processes.
         - shutdown the scheduler.
         :param teardown: Teardown the broker model.
         :type teardown: bool
@@ -332,6 +434,10 @@ class Plugin(object):
             return []
         self.detach(teardown)
         pending = self.pool.shutdown()
+        if self.dispatcher.processes:
+            self.dispatcher.processes.shutdown()
+            self.dispatcher.processes = None
+            self.dispatcher.caching = True
         self.scheduler.shutdown()
         self.scheduler.join()
         return pending
@@ -363,6 +469,7 @@ class Plugin(object):
         node = Node(model.queue)
         consumer = RequestConsumer(node, self)
         consumer.authenticator = self.authenticator
+        consumer.decompression_limit = self.decompression_limit
         consumer.start()
         self.consumer = consumer
         log.info('plugin:%s, attached => %s', self.name, self.node)
@@ -398,6 +505,8 @@ class Plugin(object):
     def dispatch(self, request):
         """
         Dispatch (invoke) the specified RMI request.
+        Requests with an execution timeout are dispatched
+        in a helper thread bounded by the timeout.
         :param request: An RMI request
         :type request: gofer.Document
         :return: The RMI returned.
@@ -405,28 +514,28 @@ class Plugin(object):
         dispatcher = self.dispatcher
         call = Document(request.request)
         if not self.provides(call.classname):
-            for plugin in Plugin.all():
-                if plugin == self:
-                    continue
-                if not plugin.provides(call.classname):
-                    # not provided
-                    continue
-                valid = set()
-                valid.add('*')
-                valid.add(plugin.name)
-                if not valid.intersection(self.forward):
-                    # (forwarding) not approved
-                    continue
-                valid = set()
-                valid.add('*')
-                valid.add(self.name)
-                if not valid.intersection(plugin.accept):
-                    # (accept) not approved
-                    continue
+            plugin = Plugin.container.route(self, call.classname)
+            if plugin is not None:
                 dispatcher = plugin.dispatcher
-                break
+        timeout = dispatcher.timeout(request)
+        if timeout and not dispatcher.processes:
+            call = TimedCall(dispatcher, request)
+            return call(timeout)
         return dispatcher.dispatch(request)
 
+    def invalidate(self, classname=None, method=None):
+        """
+        Invalidate cached results of methods decorated
+        using @remote(cache_ttl=).  Eg: after installing packages.
+        :param classname: The (optional) class name.
+            All results are invalidated when not specified.
+        :type classname: str
+        :param method: The (optional) method name.
+            All results for the class are invalidated when not specified.
+        :type method: str
+        """
+        self.dispatcher.cache.invalidate(classname, method)
+
     @synchronized
     def load(self):
         """
@@ -685,6 +794,7 @@ class PluginLoader:
                 fn.gofer.plugin = plugin
 
             plugin.dispatcher += Remote.collated()
+            Plugin.container.invalidate()
             plugin.actions = Actions.collated()
             plugin.delegate = Delegate()
             plugin.load()
@@ -0,0 +1,400 @@
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Jeff Ortel <jortel@redhat.com>
+#
+
+"""
+Process pool classes.
+Provides RMI dispatching in a pool of (forked) worker processes
+for CPU bound plugins.  Each worker inherits the loaded plugin and
+receives request documents over a pipe.  The call context (progress
+reporting and cancellation) is proxied back to the agent.
+"""
+
+from time import time, sleep
+from logging import getLogger
+from multiprocessing import Process, Pipe
+from Queue import Queue
+
+from gofer.common import utf8
+from gofer.messaging import Document
+from gofer.metrics import Metrics
+from gofer.rmi.dispatcher import Request, Return, Streamed, ExecutionTimeout
+from gofer.agent.rmi import Context
+
+
+log = getLogger(__name__)
+
+
+# --- protocol ---------------------------------------------------------------
+
+REQUEST = 'request'
+RESULT = 'result'
+PROGRESS = 'progress'
+CANCELLED = 'cancelled'
+
+
+# --- exceptions -------------------------------------------------------------
+
+
+class WorkerTerminated(Exception):
+    """
+    The worker process terminated while processing a request.
+    """
+
+    def __init__(self, name):
+        Exception.__init__(self, '%s, terminated' % name)
+
+
+# --- child ------------------------------------------------------------------
+
+
+class Progress(object):
+    """
+    Progress reporting proxy used in the worker process.
+    :ivar conn: The pipe connection to the agent.
+    :type conn: multiprocessing.Connection
+    :ivar total: The total work units.
+    :type total: int
+    :ivar completed: The completed work units.
+    :type completed: int
+    :ivar details: The reported details.
+    :type details: object
+    """
+
+    def __init__(self, conn):
+        """
+        :param conn: The pipe connection to the agent.
+        :type conn: multiprocessing.Connection
+        """
+        self.conn = conn
+        self.total = 0
+        self.completed = 0
+        self.details = {}
+
+    def report(self):
+        """
+        Send the progress report to the agent.
+        """
+        report = dict(
+            total=self.total,
+            completed=self.completed,
+            details=self.details)
+        self.conn.send((PROGRESS, report))
+
+
+class Cancelled(object):
+    """
+    Cancellation check proxy used in the worker process.
+    Callback registration is not supported.
+    :ivar conn: The pipe connection to the agent.
+    :type conn: multiprocessing.Connection
+    """
+
+    # seconds between cancellation checks by wait().
+    POLL = 0.5
+
+    def __init__(self, conn):
+        """
+        :param conn: The pipe connection to the agent.
+        :type conn: multiprocessing.Connection
+        """
+        self.conn = conn
+
+    def wait(self, timeout=None):
+        """
+        Wait for the request to be cancelled.
+        The agent is polled every POLL seconds.
+        :param timeout: The (optional) timeout (seconds).
+        :type timeout: float
+        :return: True if cancelled.
+        :rtype: bool
+        """
+        if timeout is not None:
+            deadline = time() + timeout
+        while not self():
+            if timeout is None:
+                delay = self.POLL
+            else:
+                delay = min(deadline - time(), self.POLL)
+            if delay <= 0:
+                return False
+            sleep(delay)
+        return True
+
+    def __call__(self):
+        self.conn.send((CANCELLED, None))
+        return self.conn.recv()
+
+
+def main(conn, dispatcher):
+    """
+    The worker process main loop.
+    Read requests, dispatch and send the result.
+    Terminated when (None) is read or the pipe is closed.
+    :param conn: The pipe connection to the agent.
+    :type conn: multiprocessing.Connection
+    :param dispatcher: The plugin RMI dispatcher.
+    :type dispatcher: gofer.rmi.dispatcher.Dispatcher
+    """
+    dispatcher.processes = None
+    dispatcher.caching = False
+    context = Context.current()
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            # termination requested
+            break
+        code, body = message
+        request = Document()
+        request.load(body)
+        context.sn = request.sn
+        context.progress = Progress(conn)
+        context.cancelled = Cancelled(conn)
+        try:
+            result = dispatcher.dispatch(request)
+            if isinstance(result, Streamed):
+                # not streamed from worker processes.
+                result = result.collect()
+        finally:
+            context.sn = None
+            context.progress = None
+            context.cancelled = None
+        conn.send((RESULT, result.dump(sort=False)))
+
+
+# --- agent ------------------------------------------------------------------
+
+
+class Worker(object):
+    """
+    A worker process.
+    :ivar dispatcher: The plugin RMI dispatcher.
+    :type dispatcher: gofer.rmi.dispatcher.Dispatcher
+    :ivar process: The child process.
+    :type process: Process
+    :ivar conn: The pipe connection to the child.
+    :type conn: multiprocessing.Connection
+    """
+
+    # seconds to wait for the process to terminate.
+    JOIN = 10
+
+    def __init__(self, worker_id, dispatcher):
+        """
+        :param worker_id: The worker id in the pool.
+        :type worker_id: int
+        :param dispatcher: The plugin RMI dispatcher.
+        :type dispatcher: gofer.rmi.dispatcher.Dispatcher
+        """
+        self.name = 'process-%d' % worker_id
+        self.dispatcher = dispatcher
+        self.process = None
+        self.conn = None
+
+    def start(self):
+        """
+        Start (fork) the child process.
+        """
+        conn, child = Pipe()
+        self.process = Process(name=self.name, target=main, args=(child, self.dispatcher))
+        self.process.daemon = True
+        self.process.start()
+        child.close()
+        self.conn = conn
+        log.info('%s, started: pid=%d', self.name, self.process.pid)
+
+    def shutdown(self):
+        """
+        Shutdown the child process.
+        Terminated when not exited within JOIN seconds.
+        """
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.process.join(self.JOIN)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+        log.info('%s, stopped', self.name)
+
+    def restart(self):
+        """
+        Restart the child process.
+        """
+        self.shutdown()
+        self.start()
+
+    def recycle(self):
+        """
+        Terminate (without waiting) and restart the child process.
+        """
+        self.process.terminate()
+        self.process.join()
+        self.conn.close()
+        log.info('%s, terminated', self.name)
+        self.start()
+
+    def dispatch(self, request, timeout=None):
+        """
+        Dispatch the request to the child process.
+        Progress reports and cancellation checks sent by the
+        child are processed using the current call context.
+        :param request: An RMI request.
+        :type request: gofer.messaging.Document
+        :param timeout: The (optional) execution timeout (seconds).
+        :type timeout: float
+        :return: The RMI returned.
+        :rtype: Return
+        :raise WorkerTerminated: when the child terminated.
+        :raise ExecutionTimeout: when not completed within the timeout.
+        """
+        context = Context.current()
+        if timeout:
+            deadline = time() + timeout
+        try:
+            self.conn.send((REQUEST, request.dump(sort=False)))
+            while True:
+                if timeout:
+                    remaining = max(deadline - time(), 0)
+                    if not self.conn.poll(remaining):
+                        call = Request(request.request or {})
+                        raise ExecutionTimeout(call.classname, call.method, timeout)
+                code, body = self.conn.recv()
+                if code == RESULT:
+                    result = Return()
+                    return result.load(body, frozen=True)
+                if code == PROGRESS:
+                    self.progress(context, body)
+                    continue
+                if code == CANCELLED:
+                    self.conn.send(self.cancelled(context))
+                    continue
+        except (EOFError, IOError):
+            raise WorkerTerminated(self.name)
+
+    @staticmethod
+    def progress(context, report):
+        """
+        Forward a progress report sent by the child.
+        :param context: The call context.
+        :param report: The reported progress.
+        :type report: dict
+        """
+        progress = context.progress
+        if progress is None:
+            return
+        progress.total = report['total']
+        progress.completed = report['completed']
+        progress.details = report['details']
+        progress.report()
+
+    @staticmethod
+    def cancelled(context):
+        """
+        Get whether the request has been cancelled.
+        :param context: The call context.
+        :return: True if cancelled.
+        :rtype: bool
+        """
+        cancelled = context.cancelled
+        if cancelled is None:
+            return False
+        return bool(cancelled())
+
+    def __unicode__(self):
+        return self.name
+
+    def __str__(self):
+        return utf8(self)
+
+
+class ProcessPool(object):
+    """
+    A pool of worker processes.
+    :ivar dispatcher: The plugin RMI dispatcher.
+    :type dispatcher: gofer.rmi.dispatcher.Dispatcher
+    :ivar capacity: The number of worker processes.
+    :type capacity: int
+    :ivar workers: List of: Worker.
+    :type workers: list
+    :ivar idle: Queue of idle workers.
+    :type idle: Queue
+    """
+
+    def __init__(self, dispatcher, capacity=1):
+        """
+        :param dispatcher: The plugin RMI dispatcher.
+        :type dispatcher: gofer.rmi.dispatcher.Dispatcher
+        :param capacity: The number of worker processes.
+        :type capacity: int
+        """
+        self.dispatcher = dispatcher
+        self.capacity = capacity
+        self.workers = []
+        self.idle = Queue()
+
+    def start(self):
+        """
+        Start the worker processes.
+        """
+        for n in range(self.capacity):
+            worker = Worker(n, self.dispatcher)
+            worker.start()
+            self.workers.append(worker)
+            self.idle.put(worker)
+
+    def dispatch(self, request, timeout=None):
+        """
+        Dispatch the request to the next idle worker.
+        Blocks until a worker is available.  Workers that
+        terminate are restarted.  Workers that do not complete
+        the request within the timeout are recycled.
+        :param request: An RMI request.
+        :type request: gofer.messaging.Document
+        :param timeout: The (optional) execution timeout (seconds).
+        :type timeout: float
+        :return: The RMI returned.
+        :rtype: Return
+        """
+        worker = self.idle.get()
+        try:
+            return worker.dispatch(request, timeout)
+        except WorkerTerminated:
+            log.error('%s, terminated: restarting', worker)
+            worker.restart()
+            raise
+        except ExecutionTimeout:
+            log.error('%s, timeout: recycling', worker)
+            Metrics().counter('rmi.timeout').inc()
+            worker.recycle()
+            raise
+        finally:
+            self.idle.put(worker)
+
+    def shutdown(self):
+        """
+        Shutdown the worker processes.
+        """
+        for worker in self.workers:
+            worker.shutdown()
+        self.workers = []
+        self.idle = Queue()
+
+    def __len__(self):
+        return len(self.workers)
@@ -13,15 +13,24 @@
 # Jeff Ortel <jortel@redhat.com>
 #
 
-from time import time, sleep
+from time import time
 from logging import getLogger
+from functools import partial
+from threading import Event, RLock
+from Queue import Queue
 
-from gofer.common import Thread, Local, released
-from gofer.rmi.tracker import Tracker
+from gofer.common import Thread, Local, Singleton, released, synchronized
+from gofer.rmi.tracker import Tracker, Credit
 from gofer.rmi.store import Pending, Empty
 from gofer.messaging import Document, Producer
-from gofer.metrics import Timer, timestamp
+from gofer.messaging.codec import Json
+from gofer.metrics import Metrics, Timer, timestamp
+from gofer.rmi import bulk
+from gofer.rmi.bulk import Spool
+from gofer.rmi.dispatcher import Request, Return, Streamed, StreamAborted, expired
+from gofer.rmi.dispatcher import ExecutionTimeout, ExecutionRefused
 from gofer.agent.builtin import Builtin
+from gofer.agent.timer import TimerQueue
 
 
 log = getLogger(__name__)
@@ -39,16 +48,22 @@ class Task:
     context = Local()
 
     @staticmethod
-    def _producer(plugin):
+    def _producer(plugin, codec=None):
         """
         Get a configured producer.
         :param plugin: A plugin.
         :type plugin: gofer.agent.plugin.Plugin
+        :param codec: The name of the codec used to encode the request.
+            Replies are encoded using the same codec.
+        :type codec: str
         :return: A producer.
         :rtype: Producer
         """
         producer = Producer(plugin.url)
         producer.authenticator = plugin.authenticator
+        producer.codec = codec or Json.name
+        producer.compression = plugin.compression
+        producer.threshold = plugin.compression_threshold
         return producer
 
     def __init__(self, transaction):
@@ -75,20 +90,23 @@ class Task:
         """
         request = self.request
         cancelled = Cancelled(request.sn)
-        latency = self.plugin.latency
-        if latency:
-            sleep(latency)
         if not self.plugin.url or cancelled():
             self.discard()
             return
+        if expired(request):
+            self.expire()
+            return
         self.context.sn = request.sn
         self.context.progress = Progress(self)
         self.context.cancelled = cancelled
-        self.producer = self._producer(self.plugin)
+        self.producer = self._producer(self.plugin, request.codec)
         self.producer.open()
         try:
             self.send_started(request)
             result = self.plugin.dispatch(request)
+            if isinstance(result, Streamed):
+                result = self.send_stream(request, result)
+            result = self.send_blob(request, result)
             self.commit()
             self.send_reply(request, result)
         finally:
@@ -96,6 +114,27 @@ class Task:
             self.context.progress = None
             self.context.cancelled = None
             self.producer.close()
+            self.discard_blobs(request)
+
+    def reply(self, result):
+        """
+        Reply using a result obtained without dispatching the
+        request on a pool thread.  Eg: a cached result.
+        :param result: The request result.
+        :type result: gofer.rmi.dispatcher.Return
+        """
+        request = self.request
+        if not self.plugin.url or Cancelled(request.sn)():
+            self.discard()
+            return
+        self.producer = self._producer(self.plugin, request.codec)
+        self.producer.open()
+        try:
+            self.commit()
+            self.send_reply(request, result)
+        finally:
+            self.producer.close()
+            self.discard_blobs(request)
 
     def commit(self):
         """
@@ -105,9 +144,36 @@ class Task:
 
     def discard(self):
         """
-        Discard the transaction.
+        Discard the transaction and the spooled blobs.
         """
         self.transaction.discard()
+        self.discard_blobs(self.request)
+
+    def expire(self):
+        """
+        The request deadline has passed.
+        Send the expired status and discard the transaction.
+        """
+        request = self.request
+        log.info('Request: %s, expired', request.sn)
+        Metrics().counter('rmi.expired').inc()
+        self.discard()
+        address = request.replyto
+        if not address or not self.plugin.url:
+            return
+        producer = self._producer(self.plugin, request.codec)
+        producer.open()
+        try:
+            producer.send(
+                address,
+                sn=request.sn,
+                data=request.data,
+                status='expired',
+                timestamp=timestamp())
+        except Exception:
+            log.exception('Send: expired, failed')
+        finally:
+            producer.close()
 
     def send_started(self, request):
         """
@@ -130,6 +196,94 @@ class Task:
         except Exception:
             log.exception('Send: started, failed')
 
+    def send_stream(self, request, streamed):
+        """
+        Send the items yielded by a generator remote method
+        as sequenced chunks.  The generator is run to completion
+        when a reply is not requested.  When the caller requests a
+        flow control *window*, at most *window* chunks are sent but
+        not acknowledged and the generator is not advanced until
+        credit is granted.  Streaming is aborted when the caller stops
+        reading or does not acknowledge chunks within STALLED seconds.
+        :param request: The received request.
+        :type request: Document
+        :param streamed: The result of a generator method.
+        :type streamed: gofer.rmi.dispatcher.Streamed
+        :return: The request result: the number of items.
+        :rtype: Return
+        """
+        sn = request.sn
+        data = request.data
+        address = request.replyto
+        total = 0
+        window = None
+        if address and request.window:
+            window = Credit().open(sn, request.window)
+        try:
+            for seq, items in enumerate(streamed.chunks()):
+                total += len(items)
+                if not address:
+                    continue
+                if window is not None and not window.wait(seq, streamed.STALLED):
+                    raise StreamAborted(sn, seq)
+                self.producer.send(
+                    address,
+                    sn=sn,
+                    data=data,
+                    status='chunk',
+                    seq=seq,
+                    items=items,
+                    timestamp=timestamp())
+            return Return.succeed(total)
+        except Exception:
+            log.exception('Send: chunk, failed')
+            return Return.exception()
+        finally:
+            if window is not None:
+                Credit().close(sn)
+            streamed.close()
+
+    def send_blob(self, request, result):
+        """
+        Send the content of a blob returned by the method.
+        Returned blobs are spooled by the dispatcher.  The content is
+        sent in chunks (and the spooled file deleted) unless the caller
+        requested that bulk data be spooled.
+        :param request: The received request.
+        :type request: Document
+        :param result: The request result.
+        :type result: Return
+        :return: The request result with the blob replaced by a reference.
+        :rtype: Return
+        """
+        if not result.succeeded() or not bulk.is_reference(result.retval):
+            return result
+        if request.bulk == bulk.SPOOLED:
+            return result
+        spool = Spool()
+        try:
+            blob = spool.resolve(result.retval, verify=False)
+            try:
+                address = request.replyto
+                if address:
+                    bulk.send(self.producer, address, [blob], sn=request.sn, data=request.data)
+                return Return.succeed(blob.reference())
+            finally:
+                blob.delete()
+        except Exception:
+            log.exception('Send: blob, failed')
+            return Return.exception()
+
+    def discard_blobs(self, request):
+        """
+        Delete the blobs spooled for the request.
+        Only the directory owned by the request is deleted.
+        :param request: The received request.
+        :type request: Document
+        """
+        spool = Spool()
+        spool.delete(request.sn)
+
     def send_reply(self, request, result):
         """
         Send the reply if requested.
@@ -164,7 +318,7 @@ class Transaction(object):
     :ivar pending: A pending queue.
     :type pending: Pending
     :ivar request: The subject of the transaction.
-    :type request: Document
+    :type request: gofer.messaging.RequestEnvelope
     """
 
     def __init__(self, plugin, pending, request):
@@ -174,7 +328,7 @@ class Transaction(object):
         :param pending: A pending queue.
         :type pending: Pending
         :param request: An RMI request.
-        :type request: Document
+        :type request: gofer.messaging.RequestEnvelope
         """
         self.plugin = plugin
         self.pending = pending
@@ -187,16 +341,20 @@ class Transaction(object):
     def commit(self):
         """
         Commit the transaction.
-        The commit is propagated to the pending queue.
+        The commit is propagated to the pending queue
+        and the request is no longer tracked.
         """
         self.pending.commit(self.request.sn)
+        Tracker().remove(self.request.sn)
         log.info('Request: %s, committed', self.id)
 
     def discard(self):
         """
         Discard the transaction.
+        The request is no longer tracked.
         """
         self.pending.commit(self.request.sn)
+        Tracker().remove(self.request.sn)
         log.info('Request: %s, discarded', self.id)
 
 
@@ -206,6 +364,9 @@ class Scheduler(Thread):
     Processes the *pending* queue.
     """
 
+    # seconds before a due task (not accepted by a backlogged pool) is submitted again.
+    RETRY = 1
+
     def __init__(self, plugin):
         """
         :param plugin: A plugin.
@@ -220,7 +381,10 @@ class Scheduler(Thread):
     def run(self):
         """
         Read the pending queue and dispatch requests
-        to the plugin thread pool.
+        to the plugin thread pool.  Expired requests (including
+        those restored from the journal) are discarded.  Delayed
+        requests wait in the timer until due.  Requests with cached
+        results are answered without using a pool thread.
         """
         while not Thread.aborted():
             try:
@@ -232,16 +396,80 @@ class Scheduler(Thread):
                 plugin = self.select_plugin(request)
                 transaction = Transaction(plugin, self.pending, request)
                 task = Task(transaction)
-                plugin.pool.run(task)
+                if expired(request):
+                    task.expire()
+                    continue
+                due = self.due(plugin, request)
+                if due:
+                    timer = TimerQueue()
+                    timer.add(due, partial(self.submit, task))
+                    continue
+                result = plugin.dispatcher.cached(request)
+                if result is not None:
+                    task.reply(result)
+                else:
+                    plugin.pool.run(task)
             except Exception:
                 self.pending.commit(request.sn)
                 log.exception(request.sn)
 
+    def submit(self, task):
+        """
+        A delayed task is due.  Called on the timer thread.
+        The plugin is found again because it may have been reloaded
+        while the task was waiting.  The task is discarded when the
+        plugin is no longer loaded or the task cannot be submitted
+        to the plugin thread pool so the request is not replayed.
+        The timer thread is shared so it must not block.  When the
+        plugin thread pool is backlogged, the task is submitted
+        again after the RETRY delay.
+        :param task: A delayed task.
+        :type task: Task
+        """
+        transaction = task.transaction
+        try:
+            plugin = self.plugin.container.find(self.plugin.name)
+            if plugin is None:
+                log.info('Request: %s, plugin: %s not loaded', transaction.id, self.plugin.name)
+                task.discard()
+                return
+            if transaction.plugin is self.builtin:
+                plugin = plugin.scheduler.builtin
+            transaction.plugin = plugin
+            if not plugin.pool.offer(task):
+                log.debug('Request: %s, pool backlogged (retry)', transaction.id)
+                timer = TimerQueue()
+                timer.add(time() + self.RETRY, partial(self.submit, task))
+        except Exception:
+            log.exception(transaction.id)
+            task.discard()
+
+    @staticmethod
+    def due(plugin, request):
+        """
+        Get when the request is due to be dispatched.
+        Based on the plugin *latency* and the *notbefore*
+        specified by the caller.
+        :param plugin: The selected plugin.
+        :type plugin: gofer.agent.plugin.Plugin
+        :param request: A request to be scheduled.
+        :rtype request: gofer.messaging.RequestEnvelope
+        :return: When due (seconds since the epoch) or
+            None when due immediately.
+        :rtype: float
+        """
+        now = time()
+        due = now + (plugin.latency or 0)
+        if request.notbefore:
+            due = max(due, request.notbefore)
+        if due > now:
+            return due
+
     def select_plugin(self, request):
         """
         Select the plugin based on the request.
         :param request: A request to be scheduled.
-        :rtype request: gofer.messaging.Document
+        :rtype request: gofer.messaging.RequestEnvelope
         :return: The appropriate plugin.
         :rtype: gofer.agent.plugin.Plugin
         """
@@ -337,8 +565,12 @@ class Cancelled:
     """
     A callable added to the Context and used
     by plugin methods to check for cancellation.
-    :ivar tracker: The cancellation tracker.
-    :type tracker: Tracker
+    Plugin methods may also block until cancelled using wait()
+    or register callbacks to be notified when cancelled.
+    :ivar sn: Serial number.
+    :type sn: str
+    :ivar signal: The cancellation signal.
+    :type signal: gofer.rmi.tracker.Signal
     """
 
     def __init__(self, sn):
@@ -347,14 +579,240 @@ class Cancelled:
         :type sn: str
         """
         self.sn = sn
-        self.tracker = Tracker()
+        self.signal = Tracker().signal(sn)
+
+    def wait(self, timeout=None):
+        """
+        Wait for the request to be cancelled.
+        :param timeout: The (optional) timeout (seconds).
+        :type timeout: float
+        :return: True if cancelled.
+        :rtype: bool
+        """
+        return self.signal.wait(timeout)
+
+    def register(self, fn):
+        """
+        Register a callback to be called (without arguments) when
+        the request is cancelled.  Called immediately when already cancelled.
+        Callbacks are called on the thread that cancelled the request and
+        are expected to return quickly.  Eg: close a socket.
+        :param fn: A callable.
+        :type fn: callable
+        """
+        self.signal.register(fn)
 
     def __call__(self):
-        return self.tracker.cancelled(self.sn)
+        return self.signal.is_set()
 
-    def __del__(self):
+
+class Helper(Thread):
+    """
+    A (reusable) helper thread used to dispatch timed calls.
+    :ivar helpers: The helper pool.
+    :type helpers: Helpers
+    :ivar queue: Calls to be dispatched.
+    :type queue: Queue
+    """
+
+    def __init__(self, helpers):
+        """
+        :param helpers: The helper pool.
+        :type helpers: Helpers
+        """
+        Thread.__init__(self, name='helper')
+        self.helpers = helpers
+        self.queue = Queue()
+        self.setDaemon(True)
+
+    def run(self):
+        """
+        Dispatch calls until no longer needed by the pool.
+        The helper is always returned to the pool (or accounted for)
+        so a failed call does not leak an abandoned helper.
+        """
+        while True:
+            call = self.queue.get()
+            try:
+                call.run()
+            except Exception:
+                log.exception(call.request.sn)
+            finally:
+                call.done.set()
+                reused = self.helpers.put(self, call)
+            if not reused:
+                break
+
+
+class Helpers(object):
+    """
+    A pool of (reusable) helper threads used to dispatch timed calls.
+    Helper threads running calls that exceeded the execution timeout
+    are abandoned by the caller.  They are reused once the call
+    has completed.
+    :ivar idle: Idle helper threads.
+    :type idle: list
+    :ivar abandoned: The number of helper threads running abandoned calls.
+    :type abandoned: int
+    Metrics:
+      - rmi.timeout.abandoned: The number of abandoned calls still running.
+    """
+
+    __metaclass__ = Singleton
+
+    # maximum idle helper threads.
+    IDLE = 10
+
+    # maximum helper threads running abandoned calls.
+    ABANDONED = 10
+
+    def __init__(self):
+        self.idle = []
+        self.abandoned = 0
+        self.__mutex = RLock()
+
+    @synchronized
+    def get(self):
+        """
+        Get a helper thread.
+        :return: A helper thread or None when too many helper
+            threads are running abandoned calls.
+        :rtype: Helper
+        """
+        if self.abandoned >= self.ABANDONED:
+            return None
+        if self.idle:
+            return self.idle.pop()
+        helper = Helper(self)
+        helper.start()
+        return helper
+
+    @synchronized
+    def put(self, helper, call):
+        """
+        Return a helper thread that has completed a call.
+        :param helper: A helper thread.
+        :type helper: Helper
+        :param call: The completed call.
+        :type call: TimedCall
+        :return: True if the helper is kept (idle).
+        :rtype: bool
+        """
+        if call.abandoned:
+            self.abandoned -= 1
+            Metrics().counter('rmi.timeout.abandoned').inc(-1)
+            log.info('Request: %s, abandoned call completed', call.request.sn)
+        if len(self.idle) < self.IDLE:
+            self.idle.append(helper)
+            return True
+        return False
+
+    @synchronized
+    def abandon(self, call):
+        """
+        Abandon a call that exceeded the execution timeout.
+        :param call: The timed out call.
+        :type call: TimedCall
+        :return: True if abandoned.  False when the call has completed.
+        :rtype: bool
+        """
+        if call.done.is_set():
+            return False
+        call.abandoned = True
+        self.abandoned += 1
+        Metrics().counter('rmi.timeout.abandoned').inc()
+        return True
+
+
+class TimedCall(object):
+    """
+    Dispatch an RMI request in a (reusable) helper thread bounded
+    by an execution timeout.  The call context of the calling thread is
+    propagated to the helper thread.  On timeout, the request is signaled
+    as cancelled (See: Cancelled) and the helper thread is abandoned so
+    the calling (pool) thread is freed.  Threads cannot be killed so the
+    method continues to run (holding instances provided by the scope)
+    until it returns or (cooperatively) stops because it was cancelled.
+    The helper thread is reused once the method returns.  Calls are
+    refused while Helpers.ABANDONED helper threads are running
+    abandoned calls.
+    :ivar dispatcher: The RMI dispatcher.
+    :type dispatcher: gofer.rmi.dispatcher.Dispatcher
+    :ivar request: An RMI request.
+    :type request: gofer.messaging.Document
+    :ivar result: The RMI returned.
+    :type result: Return
+    :ivar done: Set when the call has completed.
+    :type done: Event
+    :ivar abandoned: The call exceeded the timeout and was abandoned.
+    :type abandoned: bool
+    """
+
+    def __init__(self, dispatcher, request):
+        """
+        :param dispatcher: The RMI dispatcher.
+        :type dispatcher: gofer.rmi.dispatcher.Dispatcher
+        :param request: An RMI request.
+        :type request: gofer.messaging.Document
+        """
+        context = Context.current()
+        self.dispatcher = dispatcher
+        self.request = request
+        self.sn = getattr(context, 'sn', None)
+        self.progress = getattr(context, 'progress', None)
+        self.cancelled = getattr(context, 'cancelled', None)
+        self.result = None
+        self.done = Event()
+        self.abandoned = False
+
+    @released
+    def run(self):
+        """
+        Dispatch the request using the propagated call context.
+        Called on the helper thread.
+        """
+        context = Context.current()
+        context.sn = self.sn
+        context.progress = self.progress
+        context.cancelled = self.cancelled
+        try:
+            self.result = self.dispatcher.dispatch(self.request)
+        except Exception:
+            log.exception(self.request.sn)
+            self.result = Return.exception()
+        finally:
+            context.sn = None
+            context.progress = None
+            context.cancelled = None
+
+    def __call__(self, timeout):
+        """
+        Dispatch the request and wait for the result.
+        :param timeout: The execution timeout (seconds).
+        :type timeout: float
+        :return: The RMI returned.
+        :rtype: Return
+        """
+        helpers = Helpers()
+        helper = helpers.get()
+        if helper is None:
+            call = Request(self.request.request)
+            log.error('Request: %s, refused: too many timed out calls', self.request.sn)
+            Metrics().counter('rmi.timeout.refused').inc()
+            try:
+                raise ExecutionRefused(call.classname, call.method, helpers.abandoned)
+            except ExecutionRefused:
+                return Return.exception()
+        helper.queue.put(self)
+        self.done.wait(timeout)
+        if not helpers.abandon(self):
+            return self.result
+        if self.cancelled is not None:
+            self.cancelled.signal.set()
+        call = Request(self.request.request)
+        log.error('Request: %s, timeout: %s (seconds)', self.request.sn, timeout)
+        Metrics().counter('rmi.timeout').inc()
         try:
-            self.tracker.remove(self.sn)
-        except KeyError:
-            # already cleaned up
-            pass
+            raise ExecutionTimeout(call.classname, call.method, timeout)
+        except ExecutionTimeout:
+            return Return.exception()
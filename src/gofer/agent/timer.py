@@ -0,0 +1,112 @@
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Jeff Ortel <jortel@redhat.com>
+#
+
+"""
+Provides the agent timer.
+A single thread used to run callables at a scheduled time so that
+delayed work waits in the timer rather than on a pool thread.
+"""
+
+from heapq import heappush, heappop
+from itertools import count
+from logging import getLogger
+from threading import Condition
+from time import time
+
+from gofer.common import Thread, Singleton, conditional, utf8
+
+
+log = getLogger(__name__)
+
+
+class TimerQueue(Thread):
+    """
+    The (heap based) agent timer.
+    Scheduled callables are run on the timer thread when due and
+    must not block.  Eg: submit work to a thread pool without blocking.
+    :ivar heap: The heap of scheduled: (due, seq, fn).
+    :type heap: list
+    :ivar sequence: Used to order callables scheduled at the same time.
+    :type sequence: itertools.count
+    """
+
+    __metaclass__ = Singleton
+
+    # maximum seconds to wait when idle.
+    IDLE = 10
+
+    def __init__(self):
+        Thread.__init__(self, name='timer')
+        self.heap = []
+        self.sequence = count()
+        self.__condition = Condition()
+        self.setDaemon(True)
+
+    @conditional
+    def add(self, due, fn):
+        """
+        Schedule a callable.
+        :param due: When the callable is to be run (seconds since the epoch).
+        :type due: float
+        :param fn: A callable.
+        :type fn: callable
+        """
+        item = (due, next(self.sequence), fn)
+        heappush(self.heap, item)
+        if self.heap[0] is item:
+            self.__condition.notify()
+
+    @conditional
+    def next(self):
+        """
+        Get the next callable when due.
+        Blocks until the next callable is due or new callables are scheduled.
+        :return: The due callable or None.
+        :rtype: callable
+        """
+        if not self.heap:
+            self.__condition.wait(self.IDLE)
+            return None
+        due = self.heap[0][0]
+        delay = due - time()
+        if delay > 0:
+            self.__condition.wait(min(delay, self.IDLE))
+            return None
+        return heappop(self.heap)[-1]
+
+    @conditional
+    def abort(self):
+        """
+        Abort the timer thread.
+        """
+        Thread.abort(self)
+        self.__condition.notify()
+
+    def run(self):
+        """
+        Run callables when due.
+        """
+        while not Thread.aborted():
+            fn = self.next()
+            if fn is None:
+                continue
+            try:
+                fn()
+            except Exception:
+                log.exception(utf8(fn))
+
+    @conditional
+    def __len__(self):
+        return len(self.heap)
@@ -21,6 +21,8 @@ class Whiteboard:
     """
     Provides a dict-like object used to publish
     information to other plugins.
+    Copy-on-write: updates replace the dictionary so
+    that readers do not need to acquire the mutex.
     """
     
     __metaclass__ = Singleton
@@ -28,31 +30,30 @@ class Whiteboard:
     def __init__(self):
         self.__dict = {}
         self.__mutex = RLock()
-        
-    @synchronized
+
     def get(self, name, default=None):
         return self.__dict.get(name, default)
     
     @synchronized
     def update(self, d):
-        self.__dict.update(d)
+        _dict = dict(self.__dict)
+        _dict.update(d)
+        self.__dict = _dict
     
-    @synchronized
     def __getitem__(self, name):
         return self.__dict[name]
     
     @synchronized
     def __setitem__(self, name, value):
-        self.__dict[name] = value
+        _dict = dict(self.__dict)
+        _dict[name] = value
+        self.__dict = _dict
 
-    @synchronized
     def __repr__(self):
         return repr(self.__dict)
     
-    @synchronized
     def __unicode__(self):
         return unicode(self.__dict)
 
-    @synchronized
     def __str__(self):
         return utf8(self)
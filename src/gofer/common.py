@@ -210,6 +210,37 @@ class ThreadSingleton(type):
         return inst
 
 
+# mangled lock attribute names by: (class, name)
+_locks = {}
+
+
+def lock(inst, name):
+    """
+    Get the (private) lock attribute of an object.
+    The name mangled attribute is resolved once per class
+    by searching the class hierarchy and cached.
+    :param inst: An object.
+    :type inst: object
+    :param name: The (unmangled) attribute name.  Eg: mutex.
+    :type name: str
+    :return: The lock.
+    :raise AttributeError: when not found.
+    """
+    cls = inst.__class__
+    key = (cls, name)
+    attribute = _locks.get(key)
+    if attribute is None:
+        for c in inspect.getmro(cls):
+            mangled = '_%s__%s' % (c.__name__, name)
+            if hasattr(inst, mangled):
+                attribute = mangled
+                break
+        if attribute is None:
+            raise AttributeError(name)
+        _locks[key] = attribute
+    return getattr(inst, attribute)
+
+
 def synchronized(fn):
     """
     Decorator that provides re-entrant method invocation
@@ -219,16 +250,7 @@ def synchronized(fn):
     in it's entirety to prevent deadlock scenarios.
     """
     def sfn(*args, **kwargs):
-        inst = args[0]
-        bases = list(inspect.getmro(inst.__class__))
-        mutex = None
-        for cn in [c.__name__ for c in bases]:
-            name = '_%s__mutex' % cn
-            if hasattr(inst, name):
-                mutex = getattr(inst, name)
-                break
-        if mutex is None:
-            raise AttributeError('mutex')
+        mutex = lock(args[0], 'mutex')
         mutex.acquire()
         try:
             return fn(*args, **kwargs)
@@ -245,16 +267,7 @@ def conditional(fn):
     methods that have a method body that can be safely event latched.
     """
     def sfn(*args, **kwargs):
-        inst = args[0]
-        bases = list(inspect.getmro(inst.__class__))
-        mutex = None
-        for cn in [c.__name__ for c in bases]:
-            name = '_%s__condition' % cn
-            if hasattr(inst, name):
-                mutex = getattr(inst, name)
-                break
-        if mutex is None:
-            raise AttributeError('condition')
+        mutex = lock(args[0], 'condition')
         mutex.acquire()
         try:
             return fn(*args, **kwargs)
@@ -291,7 +304,7 @@ class Options(object):
             if isinstance(thing, dict):
                 self.__dict__.update(thing)
                 continue
-            if isinstance(thing, Options):
+            if isinstance(thing, (Options, Record)):
                 self.__dict__.update(thing.__dict__)
                 continue
             raise ValueError(thing)
@@ -331,6 +344,118 @@ class Options(object):
         return unicode(self.__dict__)
 
 
+class Record(object):
+    """
+    Provides a compact (fixed layout) dict-like object that also
+    provides (.) dot notation accessor.  Compatible with Options.
+    Properties named in __slots__ are stored without a per-instance
+    dictionary.  Other properties are stored in a dictionary created
+    when first needed.  Missing properties are None.
+    The __dict__ is a copy of the properties.  Changes to the
+    copy are not applied.
+    :ivar _extra: Properties not named in __slots__.
+    :type _extra: dict
+    """
+
+    __slots__ = ('_extra',)
+
+    @classmethod
+    def _fields(cls):
+        """
+        Get the names of properties stored in slots.
+        :return: The property names.
+        :rtype: tuple
+        """
+        fields = cls.__dict__.get('_fields_')
+        if fields is None:
+            fields = []
+            for _class in reversed(cls.__mro__):
+                for name in _class.__dict__.get('__slots__', ()):
+                    if not name.startswith('_'):
+                        fields.append(name)
+            fields = tuple(fields)
+            setattr(cls, '_fields_', fields)
+        return fields
+
+    def __init__(self, *things, **keywords):
+        object.__setattr__(self, '_extra', None)
+        for thing in things:
+            if isinstance(thing, dict):
+                self += thing
+                continue
+            if isinstance(thing, (Options, Record)):
+                self += thing.__dict__
+                continue
+            raise ValueError(thing)
+        self += keywords
+
+    @property
+    def __dict__(self):
+        d = {}
+        for name in self._fields():
+            try:
+                d[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        if self._extra:
+            d.update(self._extra)
+        return d
+
+    def __getattr__(self, name):
+        if name == '_extra':
+            return None
+        extra = self._extra
+        if extra:
+            return extra.get(name)
+
+    def __setattr__(self, name, value):
+        try:
+            object.__setattr__(self, name, value)
+        except AttributeError:
+            if self._extra is None:
+                object.__setattr__(self, '_extra', {})
+            self._extra[name] = value
+
+    def __delattr__(self, name):
+        try:
+            object.__delattr__(self, name)
+        except AttributeError:
+            extra = self._extra or {}
+            if name not in extra:
+                raise AttributeError(name)
+            del extra[name]
+
+    def __getitem__(self, name):
+        return self.__dict__[name]
+
+    def __setitem__(self, name, value):
+        setattr(self, name, value)
+
+    def __iadd__(self, thing):
+        if isinstance(thing, dict):
+            for name, value in thing.items():
+                setattr(self, name, value)
+            return self
+        if hasattr(thing, '__dict__'):
+            return self.__iadd__(thing.__dict__)
+        raise ValueError(thing)
+
+    def __len__(self):
+        return len(self.__dict__)
+
+    def __iter__(self):
+        return iter(self.__dict__)
+
+    def __repr__(self):
+        return repr(self.__dict__)
+
+    def __str__(self):
+        return utf8(self.__dict__)
+
+    def __unicode__(self):
+        return unicode(self.__dict__)
+
+
 class List(object):
 
     def __init__(self):
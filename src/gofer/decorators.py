@@ -38,16 +38,53 @@ def options(fn):
     return opt
 
 
-def remote(fx=None, secret=None):
+def remote(fx=None, secret=None, timeout=None, scope=None, coalesce=False,
+           cache_ttl=None, invalidates=None):
     """
     The *remote* decorator.
     Used to expose function/methods as RMI targets.
+    When used on a class, specifies the instance *scope*.
     :param secret: An optional shared secret.
     :type secret: str
+    :param timeout: An optional execution timeout (seconds).
+        The caller is sent a timeout error when the
+        method does not complete within the timeout.
+    :type timeout: float
+    :param coalesce: Identical concurrent requests are coalesced.
+        While a request is executing, identical requests wait
+        and receive the same result.
+    :type coalesce: bool
+    :param cache_ttl: Results are cached (by call signature) for
+        the specified time-to-live (seconds).  Intended for idempotent
+        (read-only) methods.
+    :type cache_ttl: float
+    :param invalidates: Cached results invalidated when the method
+        succeeds.  A list of: <classname> or <classname>.<method>.
+    :type invalidates: list
+    :param scope: The (class) instance scope.  One of:
+        - request: An instance is created for each request (default).
+        - pooled: Instances are reused from a bounded pool keyed
+          by constructor arguments.
+        - singleton: An instance is shared by all requests.
+    :type scope: str
     :return: The decorated function.
     """
     def inner(fn):
+        if inspect.isclass(fn):
+            opt = Options()
+            if scope:
+                opt.scope = scope
+            setattr(fn, NAME, opt)
+            return fn
         opt = options(fn)
+        if timeout:
+            opt.timeout = timeout
+        if coalesce:
+            opt.coalesce = coalesce
+        if cache_ttl:
+            opt.cache_ttl = cache_ttl
+        if invalidates:
+            opt.invalidates = list(invalidates)
         if secret:
             required = Options()
             required.secret = secret
@@ -55,7 +92,7 @@ def remote(fx=None, secret=None):
             opt.security.append(auth)
         Remote.add(fn)
         return fn
-    if inspect.isfunction(fx):
+    if inspect.isfunction(fx) or inspect.isclass(fx):
         return inner(fx)
     else:
         return inner
@@ -11,9 +11,12 @@
 
 from gofer.messaging.model import \
     Document, \
+    Envelope, \
+    RequestEnvelope, \
     ModelError, \
     DocumentError, \
-    VersionError
+    VersionError, \
+    DecodeError
 
 from gofer.messaging.auth import \
     Authenticator, \
@@ -108,7 +108,8 @@ class Reader(BaseReader):
         """
         try:
             impl = self.receiver.fetch(timeout or NO_DELAY)
-            return Message(self, impl, impl.body)
+            properties = impl.properties.get('application_headers')
+            return Message(self, impl, impl.body, properties)
         except Empty:
             pass
 
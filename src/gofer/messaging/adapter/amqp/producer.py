@@ -22,7 +22,7 @@ from gofer.messaging.adapter.amqp.reliability import reliable
 log = getLogger(__name__)
 
 
-def build_message(body, ttl, durable):
+def build_message(body, ttl, durable, headers=None):
     """
     Construct a message object.
     :param body: The message body.
@@ -30,11 +30,16 @@ def build_message(body, ttl, durable):
     :type ttl: float
     :param durable: The message is durable.
     :type durable: bool
+    :param headers: The (optional) application headers.
+    :type headers: dict
     :return: The message.
     :rtype: Message
     """
     properties = {}
 
+    if headers:
+        properties.update(application_headers=headers)
+
     if ttl:
         ms = ttl * 1000  # milliseconds
         properties.update(expiration=utf8(ms))
@@ -101,7 +106,7 @@ class Sender(BaseSender):
             pass
 
     @reliable
-    def send(self, address, content, ttl=None):
+    def send(self, address, content, ttl=None, properties=None):
         """
         Send a message.
         :param address: An AMQP address.
@@ -110,6 +115,8 @@ class Sender(BaseSender):
         :type content: buf
         :param ttl: Time to Live (seconds)
         :type ttl: float
+        :param properties: The (optional) application properties.
+        :type properties: dict
         """
         parts = address.split('/')
         if len(parts) > 1:
@@ -117,6 +124,6 @@ class Sender(BaseSender):
         else:
             exchange = ''
         key = parts[-1]
-        message = build_message(content, ttl, self.durable)
+        message = build_message(content, ttl, self.durable, properties)
         self.channel.basic_publish(message, mandatory=True, exchange=exchange, routing_key=key)
         log.debug('sent (%s)', address)
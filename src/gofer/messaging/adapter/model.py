@@ -19,10 +19,12 @@ from uuid import uuid4
 
 from gofer.common import Thread, valid_path, utf8
 from gofer.messaging.model import VERSION, Document
+from gofer.messaging.codec import Json
 from gofer.messaging.adapter.url import URL
 from gofer.messaging.adapter.factory import Adapter
-from gofer.messaging.model import ModelError, validate
+from gofer.messaging.model import ModelError, validate, envelope, decoded
 from gofer.messaging import auth as auth
+from gofer.messaging import compression
 
 
 ROUTE_ALL = '#'
@@ -463,19 +465,24 @@ class Message(Model):
     :ivar _impl: The *real* message.
     :ivar _body: The *real* message body.
     :type _body: str
+    :ivar _properties: The message (application) properties.
+    :type _properties: dict
     """
 
-    def __init__(self, reader, impl, body):
+    def __init__(self, reader, impl, body, properties=None):
         """
         :ivar reader: The reader that read the message.
         :type reader: BaseReader
         :ivar impl: The *real* message.
         :ivar body: The *real* message body.
         :type body: str
+        :ivar properties: The message (application) properties.
+        :type properties: dict
         """
         self._reader = reader
         self._impl = impl
         self._body = body
+        self._properties = properties or {}
 
     @property
     def body(self):
@@ -486,6 +493,15 @@ class Message(Model):
         """
         return self._body
 
+    @property
+    def properties(self):
+        """
+        Get the message (application) properties.
+        :return: The message properties.
+        :rtype: dict
+        """
+        return self._properties
+
     @model
     def ack(self):
         """
@@ -560,6 +576,9 @@ class Reader(BaseReader):
     An AMQP queue reader.
     :ivar authenticator: A message authenticator.
     :type authenticator: gofer.messaging.auth.Authenticator
+    :ivar decompression_limit: The (optional) maximum size (bytes) of
+        decompressed messages.  See: gofer.messaging.compression.LIMIT.
+    :type decompression_limit: int
     """
 
     def __init__(self, node, url=None):
@@ -574,6 +593,7 @@ class Reader(BaseReader):
         adapter = Adapter.find(url)
         self._impl = adapter.Reader(node, url)
         self.authenticator = None
+        self.decompression_limit = None
 
     @model
     def is_open(self):
@@ -654,7 +674,9 @@ class Reader(BaseReader):
         message = self.get(timeout)
         if message:
             try:
-                document = auth.validate(self.authenticator, message.body)
+                body = compression.decompress(
+                    message.body, message.properties, self.decompression_limit)
+                document = auth.validate(self.authenticator, body, message.properties)
                 validate(document)
             except ModelError:
                 message.ack()
@@ -672,7 +694,7 @@ class Reader(BaseReader):
         :type sn: str
         :param timeout: The read timeout.
         :type timeout: int
-        :return: The matched document.
+        :return: The matched (decoded) document.
         :rtype: Document
         :raise: ModelError
         """
@@ -684,7 +706,7 @@ class Reader(BaseReader):
                 return
             if sn == document.sn:
                 # matched
-                return document
+                return decoded(document)
 
 
 # --- sender/producer --------------------------------------------------------
@@ -704,7 +726,7 @@ class BaseSender(Messenger):
         Messenger.__init__(self, url)
         self.durable = True
 
-    def send(self, address, content, ttl):
+    def send(self, address, content, ttl, properties=None):
         """
         Send a message with content.
         :param address: An AMQP address.
@@ -712,6 +734,8 @@ class BaseSender(Messenger):
         :param content: The message content
         :param ttl: Time to Live (seconds)
         :type ttl: float
+        :param properties: The (optional) application properties.
+        :type properties: dict
         :return: The message ID.
         :rtype: str
         """
@@ -763,7 +787,7 @@ class Sender(BaseSender):
         self._impl.close()
 
     @model
-    def send(self, address, content, ttl=None):
+    def send(self, address, content, ttl=None, properties=None):
         """
         Send a message with content.
         :param address: An AMQP address.
@@ -771,9 +795,11 @@ class Sender(BaseSender):
         :param content: The message content
         :param ttl: Time to Live (seconds)
         :type ttl: float
+        :param properties: The (optional) application properties.
+        :type properties: dict
         """
         self._impl.durable = self.durable
-        self._impl.send(address, content, ttl)
+        self._impl.send(address, content, ttl, properties)
 
 
 class Producer(Messenger):
@@ -781,6 +807,14 @@ class Producer(Messenger):
     An AMQP message producer.
     :ivar authenticator: A message authenticator.
     :type authenticator: gofer.messaging.auth.Authenticator
+    :ivar codec: The (optional) name of the codec used to encode
+        messages.  Defaults to the codec configured for the URL.
+    :type codec: str
+    :ivar compression: The (optional) name of the compressor used
+        to compress messages larger than the threshold.
+    :type compression: str
+    :ivar threshold: The size (bytes) above which messages are compressed.
+    :type threshold: int
     """
 
     def __init__(self, url=None):
@@ -792,6 +826,9 @@ class Producer(Messenger):
         adapter = Adapter.find(url)
         self._impl = adapter.Sender(url)
         self.authenticator = None
+        self.codec = None
+        self.compression = None
+        self.threshold = compression.THRESHOLD
 
     @model
     def is_open(self):
@@ -841,11 +878,26 @@ class Producer(Messenger):
         """
         sn = utf8(uuid4())
         routing = (None, address)
+        codec = self.codec or Connector.find(self.url or DEFAULT_URL).codec or Json.name
         document = Document(sn=sn, version=VERSION, routing=routing)
         document += body
-        unsigned = document.dump()
-        signed = auth.sign(self.authenticator, unsigned)
-        self._impl.send(address, signed, ttl)
+        if codec != Json.name:
+            document.codec = codec
+        # keys are sorted only for signed messages.
+        unsigned = document.dump(codec, sort=bool(self.authenticator))
+        if not self.authenticator:
+            message = unsigned
+            properties = envelope(document)
+        elif getattr(self.authenticator, 'detached', False):
+            message = unsigned
+            properties = envelope(document)
+            properties.update(auth.detach(self.authenticator, unsigned))
+        else:
+            message = auth.sign(self.authenticator, unsigned, codec)
+            properties = {}
+        message, compressed = compression.compress(message, self.compression, self.threshold)
+        properties.update(compressed)
+        self._impl.send(address, message, ttl, properties or None)
         return sn
 
 
@@ -1004,6 +1056,8 @@ class Connector(Model):
     :type heartbeat: int|None
     :ivar ssl: The SSL configuration.
     :type ssl: SSL
+    :ivar codec: The (optional) name of the codec used to encode messages.
+    :type codec: str
     """
 
     @staticmethod
@@ -1030,6 +1084,7 @@ class Connector(Model):
         self.url = URL(url or DEFAULT_URL)
         self.heartbeat = None
         self.ssl = SSL()
+        self.codec = None
 
     @property
     def domain_id(self):
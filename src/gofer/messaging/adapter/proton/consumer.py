@@ -104,7 +104,7 @@ class Reader(BaseReader):
         """
         try:
             impl = self.receiver.receive(timeout or NO_DELAY)
-            return Message(self, impl, impl.body)
+            return Message(self, impl, impl.body, impl.properties)
         except Timeout:
             pass
 
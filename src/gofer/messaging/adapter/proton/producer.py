@@ -21,7 +21,7 @@ from gofer.messaging.adapter.proton.reliability import reliable
 log = getLogger(__name__)
 
 
-def build_message(body, ttl, durable):
+def build_message(body, ttl, durable, properties=None):
     """
     Construct a message object.
     :param body: The message body.
@@ -29,13 +29,15 @@ def build_message(body, ttl, durable):
     :type ttl: float
     :param durable: The message is durable.
     :type durable: bool
+    :param properties: The (optional) application properties.
+    :type properties: dict
     :return: The message.
     :rtype: Message
     """
     if ttl:
-        return Message(body=body, durable=durable, ttl=ttl)
+        return Message(body=body, durable=durable, ttl=ttl, properties=properties)
     else:
-        return Message(body=body, durable=durable)
+        return Message(body=body, durable=durable, properties=properties)
 
 
 class Sender(BaseSender):
@@ -85,7 +87,7 @@ class Sender(BaseSender):
         """
         pass
 
-    def send(self, address, content, ttl=None):
+    def send(self, address, content, ttl=None, properties=None):
         """
         Send a message.
         :param address: An AMQP address.
@@ -94,10 +96,12 @@ class Sender(BaseSender):
         :type content: buf
         :param ttl: Time to Live (seconds)
         :type ttl: float
+        :param properties: The (optional) application properties.
+        :type properties: dict
         """
         sender = self.connection.sender(address)
         try:
-            message = build_message(content, ttl, self.durable)
+            message = build_message(content, ttl, self.durable, properties)
             sender.send(message)
             log.debug('sent (%s)', address)
         finally:
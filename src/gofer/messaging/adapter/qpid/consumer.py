@@ -114,7 +114,7 @@ class Reader(BaseReader):
         """
         try:
             impl = self.receiver.fetch(timeout or NO_DELAY)
-            return Message(self, impl, impl.content)
+            return Message(self, impl, impl.content, impl.properties)
         except Empty:
             pass
 
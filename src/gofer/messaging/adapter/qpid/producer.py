@@ -83,7 +83,7 @@ class Sender(BaseSender):
             pass
 
     @reliable
-    def send(self, address, content, ttl=None):
+    def send(self, address, content, ttl=None, properties=None):
         """
         Send a message.
         :param address: An AMQP address.
@@ -92,10 +92,16 @@ class Sender(BaseSender):
         :type content: buf
         :param ttl: Time to Live (seconds)
         :type ttl: float
+        :param properties: The (optional) application properties.
+        :type properties: dict
         """
         sender = self.session.sender(address)
         try:
-            message = Message(content=content, durable=self.durable, ttl=ttl)
+            message = Message(
+                content=content,
+                durable=self.durable,
+                ttl=ttl,
+                properties=properties)
             sender.send(message)
             log.debug('sent (%s)', address)
         finally:
@@ -14,19 +14,34 @@
 #
 """
 Message authentication plumbing.
+Messages are signed using one of:
+  - wrapped: The signed message is embedded in a signed document.
+  - detached: The signature and digest algorithm are sent as message
+    properties and the message is sent unchanged.
+Both are accepted when validating.
 """
 
-from hashlib import sha256
+from hashlib import sha256, new
 from logging import getLogger
 from base64 import b64encode, b64decode
 
 from gofer.common import utf8
-from gofer.messaging.model import Document, DocumentError
+from gofer.messaging.model import Document, LazyDocument, DocumentError, peek
 
 
 log = getLogger(__name__)
 
 
+# message property: the (encoded) signature.
+SIGNATURE = 'gofer.signature'
+# message property: the digest algorithm.
+DIGEST = 'gofer.digest'
+
+# supported digest algorithms.
+SHA256 = 'sha256'
+ALGORITHMS = (SHA256, 'sha384', 'sha512')
+
+
 class ValidationFailed(DocumentError):
     """
     Message validation failed.
@@ -53,8 +68,13 @@ class ValidationFailed(DocumentError):
 class Authenticator(object):
     """
     Document the message authenticator API.
+    :cvar detached: Signatures are sent as message properties
+        rather than wrapping the signed message.
+    :type detached: bool
     """
 
+    detached = False
+
     def sign(self, digest):
         """
         Sign the specified message.
@@ -79,7 +99,7 @@ class Authenticator(object):
         raise NotImplementedError()
 
 
-def sign(authenticator, message):
+def sign(authenticator, message, codec=None):
     """
     Sign the message using the specified validator.
     signed document:
@@ -89,8 +109,11 @@ def sign(authenticator, message):
       }
     :param authenticator: A message authenticator.
     :type authenticator: Authenticator
-    :param message: A (signed) json encoded AMQP message.
+    :param message: A (signed) encoded AMQP message.
     :rtype message: str
+    :param codec: The (optional) name of the codec used to
+        encode the signed document.  Default: json.
+    :type codec: str
     """
     if not authenticator:
         return message
@@ -100,14 +123,48 @@ def sign(authenticator, message):
         digest = h.hexdigest()
         signature = authenticator.sign(digest)
         signed = Document(message=message, signature=encode(signature))
-        message = signed.dump()
+        message = signed.dump(codec)
     except Exception, e:
         log.info(utf8(e))
         log.debug(message, exc_info=True)
     return message
 
 
-def validate(authenticator, message):
+def detach(authenticator, message, algorithm=SHA256):
+    """
+    Sign the message using the specified validator.
+    The signature is returned as message properties and
+    the message is sent unchanged.
+    properties:
+      {
+        gofer.signature: <signature>,
+        gofer.digest: <algorithm>
+      }
+    :param authenticator: A message authenticator.
+    :type authenticator: Authenticator
+    :param message: An encoded AMQP message.
+    :rtype message: str
+    :param algorithm: The digest algorithm.
+    :type algorithm: str
+    :return: The message properties.
+    :rtype: dict
+    """
+    if not authenticator:
+        return {}
+    try:
+        digest = new(algorithm, message).hexdigest()
+        signature = authenticator.sign(digest)
+        return {
+            SIGNATURE: encode(signature),
+            DIGEST: algorithm,
+        }
+    except Exception, e:
+        log.info(utf8(e))
+        log.debug(message, exc_info=True)
+        return {}
+
+
+def validate(authenticator, message, properties=None):
     """
     Validate the document using the specified validator.
     signed document:
@@ -115,20 +172,39 @@ def validate(authenticator, message):
         message: <message>,
         signature: <signature>
       }
+    The signature and digest algorithm may instead be
+    passed in the message properties.  See: detach().
+    When not authenticated and the envelope is passed in the message
+    properties, only the envelope is loaded.  The (plain) document
+    is decoded explicitly.  See: LazyDocument.
     :param authenticator: A message authenticator.
     :type authenticator: Authenticator
     :param message: A json encoded AMQP message.
     :rtype message: str
+    :param properties: The (optional) message properties.
+    :type properties: dict
     :return: The authenticated document.
     :rtype: Document
     :raises ValidationFailed: when message is not valid.
     """
-    document, original, signature = peal(message)
+    properties = properties or {}
+    if not authenticator:
+        envelope = peek(properties)
+        if envelope:
+            return LazyDocument(envelope, message)
+    if SIGNATURE in properties:
+        document = load(message)
+        original = message
+        signature = properties[SIGNATURE]
+        algorithm = properties.get(DIGEST, SHA256)
+    else:
+        document, original, signature = peal(message)
+        algorithm = SHA256
     try:
         if authenticator:
-            h = sha256()
-            h.update(original)
-            digest = h.hexdigest()
+            if algorithm not in ALGORITHMS:
+                raise ValueError('digest: %s not supported' % algorithm)
+            digest = new(algorithm, original).hexdigest()
             authenticator.validate(document, digest, decode(signature))
         return document
     except ValidationFailed, de:
@@ -0,0 +1,194 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Wire codecs.
+Documents are encoded using JSON by default.  Documents encoded
+using other codecs are prefixed with a header that names the codec:
+  \\0<name>\\0<payload>
+so that receivers select the codec used to decode.
+"""
+
+from gofer.common import json, Options, Record
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# header delimiter.
+HEADER = '\0'
+
+
+class Codec(object):
+    """
+    Document the codec API.
+    :cvar name: The codec name.
+    :type name: str
+    """
+
+    name = None
+
+    def encode(self, thing, sort=True):
+        """
+        Encode the object.
+        :param thing: An object to encode.  Eg: Document.
+        :param sort: Sort keys (when supported) so that the encoding
+            is deterministic.
+        :type sort: bool
+        :return: The encoded string.
+        :rtype: str
+        """
+        raise NotImplementedError()
+
+    def decode(self, s):
+        """
+        Decode the string.
+        :param s: An encoded string.
+        :type s: str
+        :return: The decoded object.
+        :rtype: dict
+        """
+        raise NotImplementedError()
+
+
+class Json(Codec):
+    """
+    The (default) JSON codec.
+    Options are encoded (without copying) using the default hook.
+    Records are encoded using a copy.
+    """
+
+    name = 'json'
+
+    @staticmethod
+    def default(thing):
+        if isinstance(thing, (Options, Record)):
+            return thing.__dict__
+        raise TypeError(repr(thing))
+
+    def encode(self, thing, sort=True):
+        return json.dumps(thing, default=self.default, sort_keys=sort)
+
+    def decode(self, s):
+        return json.loads(s)
+
+
+class Msgpack(Codec):
+    """
+    The (compact binary) msgpack codec.
+    Requires the (optional) msgpack package.
+    """
+
+    name = 'msgpack'
+
+    @staticmethod
+    def default(thing):
+        if isinstance(thing, (Options, Record)):
+            return thing.__dict__
+        raise TypeError(repr(thing))
+
+    def encode(self, thing, sort=True):
+        return msgpack.packb(thing, default=self.default, use_bin_type=True)
+
+    def decode(self, s):
+        return msgpack.unpackb(s, raw=False)
+
+
+# The default codec.
+DEFAULT = Json()
+
+# The registered codecs by name.
+registry = {
+    DEFAULT.name: DEFAULT,
+}
+
+
+def register(codec):
+    """
+    Register a codec.
+    :param codec: A codec to register.
+    :type codec: Codec
+    """
+    registry[codec.name] = codec
+
+
+def find(name=None):
+    """
+    Find a registered codec by name.
+    :param name: The codec name.  The default is returned when not specified.
+    :type name: str
+    :return: The codec.
+    :rtype: Codec
+    :raise ValueError: not found.
+    """
+    if not name:
+        return DEFAULT
+    try:
+        return registry[name]
+    except KeyError:
+        raise ValueError('codec "%s" not found' % name)
+
+
+def encode(thing, name=None, sort=True):
+    """
+    Encode the object using the named codec.
+    :param thing: An object to encode.  Eg: Document.
+    :param name: The codec name.  The default is used when not specified.
+    :type name: str
+    :param sort: Sort keys (when supported) so that the encoding
+        is deterministic.
+    :type sort: bool
+    :return: The encoded string.
+    :rtype: str
+    :raise ValueError: codec not found.
+    """
+    codec = find(name)
+    s = codec.encode(thing, sort)
+    if codec is DEFAULT:
+        return s
+    return ''.join((HEADER, codec.name, HEADER, s))
+
+
+def split(s):
+    """
+    Split the encoded string using the header.
+    :param s: An encoded string.
+    :type s: str
+    :return: tuple of: (codec, payload).  The default codec
+        is returned when the header is not present.
+    :rtype: tuple
+    :raise ValueError: codec not found.
+    """
+    if s[:1] == HEADER:
+        name, s = s[1:].split(HEADER, 1)
+        return find(name), s
+    else:
+        return DEFAULT, s
+
+
+def decode(s):
+    """
+    Decode the string using the codec named in the header.
+    The default codec is used when the header is not present.
+    :param s: An encoded string.
+    :type s: str
+    :return: The decoded object.
+    :rtype: dict
+    :raise ValueError: codec not found or not decoded.
+    """
+    codec, s = split(s)
+    return codec.decode(s)
+
+
+if msgpack is not None:
+    register(Msgpack())
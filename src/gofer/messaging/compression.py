@@ -0,0 +1,243 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Message compression.
+Messages larger than the threshold are compressed and the compressor
+is named in the *gofer.compression* message property so that readers
+decompress transparently.
+Metrics:
+  - messaging.compressed: The number of messages compressed.
+  - messaging.compression.input: The total bytes before compression.
+  - messaging.compression.output: The total bytes after compression.
+  - messaging.compression.usec: The total time spent compressing.
+  - messaging.decompression.usec: The total time spent decompressing.
+The compression ratio is: output / input.
+"""
+
+import zlib
+
+from time import time
+
+from gofer.common import utf8
+from gofer.metrics import Metrics
+from gofer.messaging.model import Document, DocumentError
+
+try:
+    import lz4.frame as lz4
+except ImportError:
+    lz4 = None
+
+
+# message property: the compressor name.
+PROPERTY = 'gofer.compression'
+
+# messages larger than this (bytes) are compressed.
+THRESHOLD = 4096
+
+# messages larger than this (bytes) when decompressed are rejected.
+LIMIT = 104857600
+
+
+class CompressionError(DocumentError):
+    """
+    Message decompression failed.
+    """
+
+    CODE = 'messaging.compression'
+    DESCRIPTION = 'MESSAGING: message decompression failed'
+
+    def __init__(self, details=None):
+        """
+        :param details: A detailed description.
+        :type details: str
+        """
+        DocumentError.__init__(
+            self,
+            self.CODE,
+            self.DESCRIPTION,
+            Document(),
+            details)
+
+
+class Compressor(object):
+    """
+    Document the compressor API.
+    :cvar name: The compressor name.
+    :type name: str
+    """
+
+    name = None
+
+    def compress(self, s):
+        """
+        Compress the string.
+        :param s: A string.
+        :type s: str
+        :return: The compressed string.
+        :rtype: str
+        """
+        raise NotImplementedError()
+
+    def decompress(self, s, limit):
+        """
+        Decompress the string.
+        :param s: A compressed string.
+        :type s: str
+        :param limit: The maximum size (bytes) of the decompressed string.
+        :type limit: int
+        :return: The decompressed string.
+        :rtype: str
+        :raise ValueError: larger than the limit.
+        """
+        raise NotImplementedError()
+
+
+class Zlib(Compressor):
+    """
+    The (stdlib) zlib compressor.
+    """
+
+    name = 'zlib'
+
+    def compress(self, s):
+        return zlib.compress(s)
+
+    def decompress(self, s, limit):
+        decompressor = zlib.decompressobj()
+        decompressed = decompressor.decompress(s, limit)
+        if decompressor.unconsumed_tail:
+            raise ValueError('larger than: %d bytes' % limit)
+        decompressed += decompressor.flush()
+        if len(decompressed) > limit:
+            raise ValueError('larger than: %d bytes' % limit)
+        return decompressed
+
+
+class Lz4(Compressor):
+    """
+    The (fast) lz4 compressor.
+    Requires the (optional) lz4 package.
+    """
+
+    name = 'lz4'
+
+    def compress(self, s):
+        return lz4.compress(s)
+
+    def decompress(self, s, limit):
+        decompressor = lz4.LZ4FrameDecompressor()
+        decompressed = decompressor.decompress(s, max_length=limit)
+        if decompressor.eof:
+            return decompressed
+        if decompressor.needs_input:
+            raise ValueError('truncated')
+        raise ValueError('larger than: %d bytes' % limit)
+
+
+# The registered compressors by name.
+registry = {
+    Zlib.name: Zlib(),
+}
+
+
+def register(compressor):
+    """
+    Register a compressor.
+    :param compressor: A compressor to register.
+    :type compressor: Compressor
+    """
+    registry[compressor.name] = compressor
+
+
+def find(name):
+    """
+    Find a registered compressor by name.
+    :param name: The compressor name.
+    :type name: str
+    :return: The compressor.
+    :rtype: Compressor
+    :raise ValueError: not found.
+    """
+    try:
+        return registry[name]
+    except KeyError:
+        raise ValueError('compressor "%s" not found' % name)
+
+
+def compress(s, name, threshold=None):
+    """
+    Compress the message using the named compressor when
+    larger than the threshold.  Not compressed when the compressed
+    message is not smaller.
+    :param s: An encoded message.
+    :type s: str
+    :param name: The (optional) compressor name.
+    :type name: str
+    :param threshold: The (optional) size (bytes) above which messages
+        are compressed.  Default: THRESHOLD.
+    :type threshold: int
+    :return: tuple of: (message, properties).
+    :rtype: tuple
+    :raise ValueError: compressor not found.
+    """
+    if threshold is None:
+        threshold = THRESHOLD
+    if not name or len(s) <= threshold:
+        return s, {}
+    compressor = find(name)
+    started = time()
+    compressed = compressor.compress(s)
+    usec = int((time() - started) * 1000000)
+    metrics = Metrics()
+    metrics.counter('messaging.compression.usec').inc(usec)
+    if len(compressed) >= len(s):
+        return s, {}
+    metrics.counter('messaging.compressed').inc()
+    metrics.counter('messaging.compression.input').inc(len(s))
+    metrics.counter('messaging.compression.output').inc(len(compressed))
+    return compressed, {PROPERTY: compressor.name}
+
+
+def decompress(s, properties, limit=None):
+    """
+    Decompress the message using the compressor named in the properties.
+    This is done before the message is authenticated so the size of
+    the decompressed message is limited.
+    :param s: A received message.
+    :type s: str
+    :param properties: The message properties.
+    :type properties: dict
+    :param limit: The (optional) maximum size (bytes) of the
+        decompressed message.  Default: LIMIT.
+    :type limit: int
+    :return: The decompressed message.
+    :rtype: str
+    :raise CompressionError: not decompressed.
+    """
+    if limit is None:
+        limit = LIMIT
+    name = (properties or {}).get(PROPERTY)
+    if not name:
+        return s
+    try:
+        compressor = find(name)
+        started = time()
+        s = compressor.decompress(s, limit)
+        usec = int((time() - started) * 1000000)
+        Metrics().counter('messaging.decompression.usec').inc(usec)
+        return s
+    except Exception, e:
+        raise CompressionError(utf8(e))
+
+
+if lz4 is not None:
+    register(Lz4())
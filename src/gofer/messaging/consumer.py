@@ -13,7 +13,7 @@ from time import sleep
 from logging import getLogger
 
 from gofer.common import Thread, released
-from gofer.messaging.model import DocumentError
+from gofer.messaging.model import DocumentError, decoded
 from gofer.messaging.adapter.model import Reader
 
 
@@ -23,8 +23,19 @@ log = getLogger(__name__)
 class ConsumerThread(Thread):
     """
     An AMQP (abstract) consumer.
+    Documents are decoded before dispatched unless the consumer is lazy.
+    Lazy consumers are dispatched the received document and decode
+    it explicitly.  See: gofer.messaging.model.decoded().
+    :cvar lazy: Dispatch received (not decoded) documents.
+    :type lazy: bool
+    :cvar frozen: Decoded documents keep the received encoding.
+        See: Document.freeze().
+    :type frozen: bool
     """
 
+    lazy = False
+    frozen = False
+
     def __init__(self, node, url, wait=3):
         """
         :param node: An AMQP queue.
@@ -39,6 +50,7 @@ class ConsumerThread(Thread):
         self.node = node
         self.wait = wait
         self.authenticator = None
+        self.decompression_limit = None
         self.reader = None
         self.setDaemon(True)
 
@@ -55,6 +67,7 @@ class ConsumerThread(Thread):
         """
         self.reader = Reader(self.node, self.url)
         self.reader.authenticator = self.authenticator
+        self.reader.decompression_limit = self.decompression_limit
         self.open()
         try:
             while not Thread.aborted():
@@ -95,7 +108,13 @@ class ConsumerThread(Thread):
                 # wait expired
                 return
             log.debug('{%s} read: %s', self.getName(), document)
-            self.dispatch(document)
+            try:
+                if not self.lazy:
+                    document = decoded(document, self.frozen)
+                self.dispatch(document)
+            except DocumentError:
+                message.ack()
+                raise
             message.ack()
         except DocumentError, de:
             self.rejected(de.code, de.description, de.document, de.details)
@@ -11,7 +11,8 @@
 
 from logging import getLogger
 
-from gofer.common import utf8, json, Options
+from gofer.common import json, utf8, Options, Record
+from gofer.messaging import codec
 
 
 log = getLogger(__name__)
@@ -21,6 +22,12 @@ log = getLogger(__name__)
 
 VERSION = '2.0'
 
+# document properties also sent as message properties.
+ENVELOPE = ('sn', 'version', 'routing', 'status')
+
+# the message property prefix.
+PREFIX = 'gofer.'
+
 
 # --- exceptions -------------------------------------------------------------
 
@@ -76,6 +83,26 @@ class VersionError(DocumentError):
             self.DETAILS % (expected, found))
 
 
+class DecodeError(DocumentError):
+
+    CODE = 'model.decode'
+    DESCRIPTION = 'MODEL: document cannot be decoded'
+
+    def __init__(self, document, details):
+        """
+        :param document: The invalid document.
+        :type document: Document
+        :param details: Why decoding failed.
+        :type details: str
+        """
+        DocumentError.__init__(
+            self,
+            self.CODE,
+            self.DESCRIPTION,
+            document,
+            details)
+
+
 # --- utils ------------------------------------------------------------------
 
 
@@ -92,45 +119,292 @@ def validate(document):
         raise error
 
 
+def envelope(document):
+    """
+    Get the document envelope as message properties.
+    :param document: The document to be sent.
+    :type document: Document
+    :return: The message properties.
+    :rtype: dict
+    """
+    properties = {}
+    for name in ENVELOPE:
+        value = getattr(document, name)
+        if value is None:
+            continue
+        if isinstance(value, tuple):
+            value = list(value)
+        properties[PREFIX + name] = value
+    return properties
+
+
+def peek(properties):
+    """
+    Get the document envelope from message properties.
+    The envelope is sent only with (plain) unsigned documents.
+    :param properties: The message properties.
+    :type properties: dict
+    :return: The envelope or None when not sent.
+    :rtype: dict
+    """
+    properties = properties or {}
+    if PREFIX + 'version' not in properties:
+        return None
+    envelope = {}
+    for name in ENVELOPE:
+        key = PREFIX + name
+        if key in properties:
+            envelope[name] = properties[key]
+    return envelope
+
+
 # --- model ------------------------------------------------------------------
 
 
 class Document(Options):
     """
     Extends the dict-like object that also provides
-    JSON serialization.
+    serialization using the registered codecs.  JSON by default.
+    A document may be frozen to keep the encoding for reuse by dump().
+    Changes to the document discard the kept encoding but changes
+    to nested values cannot be detected.  Only documents that will
+    not be changed are frozen.  Eg: a validated Return or a received
+    request written to the journal.
+    :ivar _encoding: The kept encoding: (codec, string).
+    :type _encoding: tuple
     """
 
-    def load(self, s):
+    __slots__ = ('_encoding',)
+
+    def load(self, s, frozen=False):
         """
-        Load using a json string.
-        :param s: A json encoded string.
+        Load using an encoded string.
+        The codec is selected using the (optional) header.
+        :param s: An encoded string.
         :type s: str
+        :param frozen: Keep the string for reuse by dump().
+            Ignored unless the document is empty.
+        :type frozen: bool
         """
-        d = json.loads(s)
+        empty = not self.__dict__
+        _codec, payload = codec.split(s)
+        d = _codec.decode(payload)
         self.__dict__.update(d)
+        if frozen and empty:
+            self._encoding = (_codec.name, s)
+        else:
+            self.changed()
+        return self
+
+    def freeze(self, name=None, sort=True):
+        """
+        Encode and keep the encoding for reuse by dump().
+        The document must not be changed afterwards.
+        :param name: The (optional) codec name.  Default: json.
+        :type name: str
+        :param sort: Sort keys so that the encoding is deterministic.
+        :type sort: bool
+        :return: An encoded string.
+        :rtype: str
+        """
+        s = self.dump(name, sort)
+        self._encoding = (codec.find(name).name, s)
+        return s
+
+    def dump(self, name=None, sort=True):
+        """
+        Dump to an encoded string.
+        The kept encoding is reused.  The (json) encoding is built around
+        the kept encoding of (frozen) documents contained in this document
+        rather than encoding them again.
+        :param name: The (optional) codec name.  Default: json.
+        :type name: str
+        :param sort: Sort keys so that the encoding is deterministic.
+        :type sort: bool
+        :return: An encoded string.
+        :rtype: str
+        """
+        name = codec.find(name).name
+        encoding = self._encoding
+        if encoding and encoding[0] == name:
+            return encoding[1]
+        if name != codec.DEFAULT.name:
+            return codec.encode(self, name, sort)
+        frozen = {}
+        for key, value in self.__dict__.items():
+            if not isinstance(value, Document):
+                continue
+            encoding = value._encoding
+            if encoding and encoding[0] == name:
+                frozen[key] = encoding[1]
+        if not frozen:
+            return codec.encode(self, name, sort)
+        items = self.__dict__.items()
+        if sort:
+            items = sorted(items)
+        members = []
+        for key, value in items:
+            encoded = frozen.get(key)
+            if encoded is None:
+                encoded = codec.encode(value, name, sort)
+            members.append('%s: %s' % (json.dumps(key), encoded))
+        return '{%s}' % ', '.join(members)
+
+    def changed(self):
+        """
+        The document has changed.
+        The kept encoding is discarded.
+        """
+        object.__setattr__(self, '_encoding', None)
+
+    def __setattr__(self, name, value):
+        Options.__setattr__(self, name, value)
+        if name != '_encoding':
+            self.changed()
+
+    def __delattr__(self, name):
+        Options.__delattr__(self, name)
+        self.changed()
+
+    def __setitem__(self, name, value):
+        Options.__setitem__(self, name, value)
+        self.changed()
+
+    def __iadd__(self, thing):
+        Options.__iadd__(self, thing)
+        self.changed()
         return self
 
-    def dump(self):
+
+class LazyDocument(Document):
+    """
+    A received document with only the envelope loaded.
+    The (encoded) body is decoded explicitly using decode() which
+    returns the (complete) Document.  Properties in the envelope but
+    missing from the body are not sent in the envelope so they are
+    None.  Other properties cannot be accessed until decoded.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, envelope, s):
+        """
+        :param envelope: The envelope.
+        :type envelope: dict
+        :param s: The encoded document.
+        :type s: str
+        :raise DecodeError: when the codec is not found.
+        """
+        self.__dict__.update(envelope)
+        try:
+            name = codec.split(s)[0].name
+        except ValueError, e:
+            raise DecodeError(self, utf8(e))
+        object.__setattr__(self, '_encoding', (name, s))
+
+    def decode(self, frozen=False):
         """
-        Dump to a json string.
-        :return: A json encoded string.
+        Decode the body.
+        :param frozen: Keep the (received) encoding for reuse by dump().
+        :type frozen: bool
+        :return: The decoded document.
+        :rtype: Document
+        :raise DecodeError: when the body cannot be decoded.
+        """
+        document = Document()
+        try:
+            return document.load(self._encoding[1], frozen)
+        except (TypeError, ValueError), e:
+            raise DecodeError(self, utf8(e))
+
+    def __getattr__(self, name):
+        if name in ENVELOPE:
+            return None
+        raise AttributeError('%s: not decoded' % name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s: not decoded' % name)
+
+    def __delattr__(self, name):
+        raise AttributeError('%s: not decoded' % name)
+
+
+def decoded(document, frozen=False):
+    """
+    Get the decoded document.
+    :param document: A received document.
+    :type document: Document
+    :param frozen: Keep the (received) encoding for reuse by dump().
+    :type frozen: bool
+    :return: The decoded document.
+    :rtype: Document
+    :raise DecodeError: when the body cannot be decoded.
+    """
+    if isinstance(document, LazyDocument):
+        return document.decode(frozen)
+    else:
+        return document
+
+
+class Envelope(Record):
+    """
+    A compact (fixed layout) document.
+    Used for documents held in quantity.  Eg: queued requests.
+    Properties common to all documents are stored without a
+    per-instance dictionary and the encoding is not kept.
+    The layout is not compatible with Document so documents are
+    converted using the constructor and document().
+    """
+
+    __slots__ = ('sn', 'version', 'routing', 'status', 'timestamp', 'data', 'codec')
+
+    def load(self, s):
+        """
+        Load using an encoded string.
+        The codec is selected using the (optional) header.
+        :param s: An encoded string.
+        :type s: str
+        """
+        _codec, payload = codec.split(s)
+        self += _codec.decode(payload)
+        return self
+
+    def dump(self, name=None, sort=True):
+        """
+        Dump to an encoded string.
+        :param name: The (optional) codec name.  Default: json.
+        :type name: str
+        :param sort: Sort keys so that the encoding is deterministic.
+        :type sort: bool
+        :return: An encoded string.
         :rtype: str
         """
-        def fn(thing):
-            if isinstance(thing, Options):
-                thing = dict(thing.__dict__)
-                for k, v in thing.items():
-                    thing[k] = fn(v)
-                return thing
-            if isinstance(thing, dict):
-                thing = dict(thing)
-                for k, v in thing.items():
-                    thing[k] = fn(v)
-                return thing
-            if isinstance(thing, (tuple, list)):
-                thing = [fn(e) for e in thing]
-                return thing
-            return thing
-        d = fn(self)
-        return json.dumps(d, sort_keys=True)
+        return codec.encode(self, name, sort)
+
+    def document(self):
+        """
+        Get the equivalent document.
+        :return: A document.
+        :rtype: Document
+        """
+        return Document(self)
+
+
+class RequestEnvelope(Envelope):
+    """
+    A compact (fixed layout) RMI request document.
+    """
+
+    __slots__ = (
+        'replyto',
+        'request',
+        'secret',
+        'pam',
+        'timeout',
+        'expiration',
+        'deadline',
+        'notbefore',
+        'bulk',
+        'window',
+        'ts',
+    )
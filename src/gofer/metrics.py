@@ -22,13 +22,18 @@ import time
 
 from math import modf
 from datetime import datetime
+from threading import RLock
 
-from gofer.common import utf8
+from gofer.common import Singleton, synchronized, utf8
+
+
+# The (UTC) timestamp format.
+TIMESTAMP = '%Y-%m-%dT%H:%M:%SZ'
 
 
 def timestamp():
     dt = datetime.utcnow()
-    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+    return dt.strftime(TIMESTAMP)
 
 
 class Timer:
@@ -68,3 +73,83 @@ class Timer:
 
     def __str__(self):
         return utf8(self)
+
+
+class Counter(object):
+    """
+    A thread-safe counter.
+    :ivar name: The counter name.
+    :type name: str
+    :ivar value: The current value.
+    :type value: int
+    """
+
+    def __init__(self, name):
+        """
+        :param name: The counter name.
+        :type name: str
+        """
+        self.name = name
+        self.value = 0
+        self.__mutex = RLock()
+
+    @synchronized
+    def inc(self, n=1):
+        """
+        Increment the counter.
+        :param n: The increment.
+        :type n: int
+        :return: The updated value.
+        :rtype: int
+        """
+        self.value += n
+        return self.value
+
+    @synchronized
+    def reset(self):
+        """
+        Reset the counter.
+        """
+        self.value = 0
+
+    def __int__(self):
+        return self.value
+
+
+class Metrics(object):
+    """
+    The (agent) metrics registry.
+    Named metrics are created on first reference.
+    :ivar counters: Counters by name.
+    :type counters: dict
+    """
+
+    __metaclass__ = Singleton
+
+    def __init__(self):
+        self.counters = {}
+        self.__mutex = RLock()
+
+    @synchronized
+    def counter(self, name):
+        """
+        Get a counter by name.
+        :param name: The counter name.
+        :type name: str
+        :return: The counter.
+        :rtype: Counter
+        """
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = Counter(name)
+            self.counters[name] = counter
+        return counter
+
+    @synchronized
+    def snapshot(self):
+        """
+        Get the current value of all metrics.
+        :return: A dict of: {name: value}.
+        :rtype: dict
+        """
+        return dict((n, c.value) for n, c in self.counters.items())
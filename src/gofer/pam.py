@@ -17,13 +17,24 @@
 PAM module for python
 """
 
-__all__ = ['authenticate']
+__all__ = ['authenticate', 'Cache']
+
+import os
+import hmac
+
+from hashlib import sha256
+from collections import OrderedDict
+from threading import RLock
+from time import time
 
 from ctypes import CDLL, POINTER, Structure, CFUNCTYPE, cast, byref, sizeof
 from ctypes import c_void_p, c_uint, c_char_p, c_char, c_int
 from ctypes.util import find_library
 from logging import getLogger
 
+from gofer.common import synchronized
+from gofer.metrics import Metrics
+
 
 libc = CDLL(find_library('c'))
 libpam = CDLL(find_library('pam'))
@@ -108,9 +119,120 @@ pam_end.restype = c_int
 pam_end.argtypes = [PamHandle, c_int]
 
 
+class Cache(object):
+    """
+    Verified credential cache.
+    Successful authentications are cached for TTL seconds so that
+    repeated requests made using the same credentials skip the PAM stack.
+    Passwords are not stored.  Entries are keyed by user, service and
+    a (salted) hash of the password.  The salt is generated for each cache.
+    The least recently used entries are discarded when full.
+    :ivar ttl: The time-to-live (seconds) of cached credentials.
+        Caching is disabled when (0).
+    :type ttl: float
+    :ivar capacity: The maximum number of cached credentials.
+    :type capacity: int
+    :ivar salt: The password hash salt.
+    :type salt: str
+    :ivar verified: Cached credentials: {key: expiration}.
+    :type verified: OrderedDict
+    """
+
+    def __init__(self, ttl=0, capacity=100):
+        """
+        :param ttl: The time-to-live (seconds) of cached credentials.
+            Caching is disabled when (0).
+        :type ttl: float
+        :param capacity: The maximum number of cached credentials.
+        :type capacity: int
+        """
+        self.ttl = ttl
+        self.capacity = capacity
+        self.salt = os.urandom(16)
+        self.verified = OrderedDict()
+        self.__mutex = RLock()
+
+    def key(self, user, password, service):
+        """
+        Get the cache key for the credentials.
+        :param user: The username.
+        :type user: str
+        :param password: The password.
+        :type password: str
+        :param service: The PAM service.
+        :type service: str
+        :return: The key.
+        :rtype: tuple
+        """
+        if isinstance(password, unicode):
+            password = password.encode('utf-8')
+        digest = hmac.new(self.salt, password, sha256).hexdigest()
+        return user, service, digest
+
+    @synchronized
+    def get(self, user, password, service):
+        """
+        Get whether the credentials have been verified.
+        :param user: The username.
+        :type user: str
+        :param password: The password.
+        :type password: str
+        :param service: The PAM service.
+        :type service: str
+        :return: True if verified (and not expired).
+        :rtype: bool
+        """
+        key = self.key(user, password, service)
+        expiration = self.verified.pop(key, 0)
+        if expiration > time():
+            self.verified[key] = expiration
+            return True
+        else:
+            return False
+
+    @synchronized
+    def add(self, user, password, service):
+        """
+        Add verified credentials.
+        :param user: The username.
+        :type user: str
+        :param password: The password.
+        :type password: str
+        :param service: The PAM service.
+        :type service: str
+        """
+        if not (self.ttl and self.capacity):
+            return
+        key = self.key(user, password, service)
+        self.verified.pop(key, None)
+        self.verified[key] = time() + self.ttl
+        while len(self.verified) > self.capacity:
+            self.verified.popitem(last=False)
+
+    @synchronized
+    def clear(self):
+        """
+        Discard all cached credentials.
+        """
+        self.verified.clear()
+
+    @synchronized
+    def __len__(self):
+        return len(self.verified)
+
+
+# verified credentials (disabled by default)
+cache = Cache()
+
+
 def authenticate(user, password, service=None):
     """
     Authenticate using PAM.
+    Verified credentials are cached when enabled.
+    Metrics:
+      - pam.cache.hit: Number of authentications satisfied by the cache.
+      - pam.cache.miss: Number of authentications performed using PAM.
+      - pam.latency: Total time (milliseconds) spent authenticating using PAM.
     :param user: The username to authenticate.
     :type user: str
     :param password: The password to authenticate.
@@ -119,11 +241,23 @@ def authenticate(user, password, service=None):
     :return: True if authentication succeeds.
     :rtype: bool
     """
+    service = service or SERVICE
+    metrics = Metrics()
+    if cache.ttl:
+        if cache.get(user, password, service):
+            metrics.counter('pam.cache.hit').inc()
+            return True
+        metrics.counter('pam.cache.miss').inc()
+    started = time()
     try:
-        return _authenticate(user, password, service or SERVICE)
+        authenticated = _authenticate(user, password, service)
     except Exception:
         log.exception('PAM authentication failed')
-        return False
+        authenticated = False
+    metrics.counter('pam.latency').inc(int((time() - started) * 1000))
+    if authenticated:
+        cache.add(user, password, service)
+    return authenticated
 
 
 def _authenticate(user, password, service):
@@ -19,8 +19,9 @@ Provides async AMQP message consumer classes.
 
 from logging import getLogger
 
-from gofer.common import utf8
+from gofer.common import utf8, Record
 from gofer.messaging import Document, Consumer
+from gofer.messaging.model import DocumentError, decoded
 from gofer.rmi.dispatcher import Reply, Return, RemoteException
 
 
@@ -36,6 +37,8 @@ class ReplyConsumer(Consumer):
     :type blacklist: set
     """
 
+    lazy = True
+
     def __init__(self, queue, url=None, authenticator=None):
         """
         :param queue: The AMQP node.
@@ -66,14 +69,17 @@ class ReplyConsumer(Consumer):
         Dispatch received request.
         The serial number of failed requests is added to the blacklist
         help prevent dispatching both failure and success replies.
+        The document is decoded unless ignored.
         :param document: The received document.
         :type document: Document
+        :raise DocumentError: when the document cannot be decoded.
         """
         try:
-            reply = Reply(document)
             if document.sn in self.blacklist:
                 # ignored
                 return
+            document = decoded(document)
+            reply = Reply(document)
             if reply.accepted():
                 reply = Accepted(document)
                 reply.notify(self.listener)
@@ -90,6 +96,15 @@ class ReplyConsumer(Consumer):
                 reply = Progress(document)
                 reply.notify(self.listener)
                 return
+            if reply.chunk():
+                reply = Chunk(document)
+                reply.notify(self.listener)
+                return
+            if reply.expired():
+                self.blacklist.add(document.sn)
+                reply = Expired(document)
+                reply.notify(self.listener)
+                return
             if reply.succeeded():
                 self.blacklist.add(document.sn)
                 reply = Succeeded(document)
@@ -100,13 +115,16 @@ class ReplyConsumer(Consumer):
                 reply = Failed(document)
                 reply.notify(self.listener)
                 return
+        except DocumentError:
+            raise
         except Exception:
             log.exception(document)
 
 
-class AsyncReply:
+class AsyncReply(Record):
     """
     Asynchronous request reply.
+    Replies are compact (fixed layout) records.
     :ivar sn: The request serial number.
     :type sn: str
     :ivar origin: Which endpoint sent the reply.
@@ -116,11 +134,14 @@ class AsyncReply:
     :ivar data: User defined (round-tripped) data.
     """
 
+    __slots__ = ('sn', 'origin', 'timestamp', 'data')
+
     def __init__(self, document):
         """
         :param document: The received document.
         :type document: Document
         """
+        Record.__init__(self)
         self.sn = document.sn
         self.origin = document.routing[0]
         self.timestamp = document.timestamp
@@ -152,6 +173,8 @@ class FinalReply(AsyncReply):
     A (final) reply.
     """
 
+    __slots__ = ()
+
     def notify(self, listener):
         if callable(listener):
             listener(self)
@@ -192,6 +215,8 @@ class Succeeded(FinalReply):
     :type retval: object
     """
 
+    __slots__ = ('retval',)
+
     def __init__(self, document):
         """
         :param document: The received document.
@@ -224,6 +249,8 @@ class Failed(FinalReply):
     :see: Failed.throw
     """
 
+    __slots__ = ('exval', 'xmodule', 'xclass', 'xstate', 'xargs')
+
     def __init__(self, document):
         """
         :param document: The received document.
@@ -260,6 +287,8 @@ class Accepted(AsyncReply):
     :see: Failed.throw
     """
 
+    __slots__ = ()
+
     def notify(self, listener):
         if callable(listener):
             listener(self)
@@ -282,6 +311,8 @@ class Rejected(AsyncReply):
     :see: Failed.throw
     """
 
+    __slots__ = ()
+
     def notify(self, listener):
         if callable(listener):
             listener(self)
@@ -304,6 +335,8 @@ class Started(AsyncReply):
     :see: Failed.throw
     """
 
+    __slots__ = ()
+
     def notify(self, listener):
         if callable(listener):
             listener(self)
@@ -320,6 +353,29 @@ class Started(AsyncReply):
         return utf8(self)
 
 
+class Expired(AsyncReply):
+    """
+    An asynchronous operation expired (discarded) by the agent.
+    """
+
+    __slots__ = ()
+
+    def notify(self, listener):
+        if callable(listener):
+            listener(self)
+        else:
+            listener.expired(self)
+
+    def __unicode__(self):
+        s = list()
+        s.append(AsyncReply.__unicode__(self))
+        s.append('expired')
+        return '\n'.join(s)
+
+    def __str__(self):
+        return utf8(self)
+
+
 class Progress(AsyncReply):
     """
     Progress reported for an asynchronous operation.
@@ -332,6 +388,8 @@ class Progress(AsyncReply):
     :see: Failed.throw
     """
 
+    __slots__ = ('total', 'completed', 'details')
+
     def __init__(self, document):
         """
         :param document: The received document.
@@ -360,6 +418,44 @@ class Progress(AsyncReply):
         return utf8(self)
 
 
+class Chunk(AsyncReply):
+    """
+    Items yielded by an asynchronous generator method.
+    The final (succeeded) reply contains the total number of items.
+    :ivar seq: The chunk sequence number.
+    :type seq: int
+    :ivar items: The yielded items.
+    :type items: list
+    """
+
+    __slots__ = ('seq', 'items')
+
+    def __init__(self, document):
+        """
+        :param document: The received document.
+        :type document: Document
+        """
+        AsyncReply.__init__(self, document)
+        self.seq = document.seq
+        self.items = document.items or []
+
+    def notify(self, listener):
+        if callable(listener):
+            listener(self)
+        else:
+            listener.chunk(self)
+
+    def __unicode__(self):
+        s = list()
+        s.append(AsyncReply.__unicode__(self))
+        s.append('   seq: %s' % unicode(self.seq))
+        s.append(' items: %s' % unicode(self.items))
+        return '\n'.join(s)
+
+    def __str__(self):
+        return utf8(self)
+
+
 class Listener:
     """
     An asynchronous operation callback listener.
@@ -412,3 +508,19 @@ class Listener:
         :type reply: Progress.
         """
         pass
+
+    def expired(self, reply):
+        """
+        Async request has expired.
+        :param reply: The request.
+        :type reply: Expired.
+        """
+        pass
+
+    def chunk(self, reply):
+        """
+        Async items yielded by a generator method.
+        :param reply: The request.
+        :type reply: Chunk.
+        """
+        pass
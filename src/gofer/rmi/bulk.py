@@ -0,0 +1,652 @@
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Jeff Ortel <jortel@redhat.com>
+#
+
+"""
+Provides out-of-band bulk data transfer.
+Large (binary) arguments and return values are passed as Blob objects.
+In the request and reply, a blob is replaced by a reference:
+  {"__blob__": {"id": <str>, "size": <int>, "digest": <str>, "path": <str>}}
+The content is either sent in chunks (status=blob messages) ahead of the
+message containing the reference or, for peers on the same host, copied
+to the shared spool directory.  Blobs passed with a request are spooled
+in a directory owned by the request (named by serial number) which is
+deleted once the request is processed.  Chunks are read from spooled
+files using memory mapping and written at the chunk offset.  The content
+is verified using the (sha256) digest when the reference is resolved.
+Chunks are received before the request is authenticated so the size
+of spooled blobs is limited.  Callers spool received blobs in a private
+(per-user) directory and the blobs are deleted once read.
+Metrics:
+  - rmi.bulk.sent: The total bytes sent in chunks.
+  - rmi.bulk.received: The total bytes received in chunks.
+"""
+
+import os
+import mmap
+import errno
+import shutil
+import hashlib
+
+from base64 import b64encode, b64decode
+from logging import getLogger
+from uuid import uuid4
+from time import time
+
+from gofer import NAME
+from gofer.common import mkdir, unlink, utf8
+from gofer.metrics import Metrics
+from gofer.messaging import codec
+
+
+log = getLogger(__name__)
+
+
+# key in references.
+MARKER = '__blob__'
+
+# bulk transfer modes.
+CHUNKED = 'chunked'
+SPOOLED = 'spool'
+
+# chunk size (bytes).
+CHUNK = 262144
+
+
+class BlobError(Exception):
+    """
+    Blob content not found or not matched by digest.
+    """
+    pass
+
+
+class Blob(object):
+    """
+    Bulk (binary) content stored in a file.
+    :ivar path: The absolute path to the file.
+    :type path: str
+    :ivar id: The blob ID.
+    :type id: str
+    :ivar transient: The file is deleted once read.  See: chunks().
+    :type transient: bool
+    """
+
+    def __init__(self, path, id=None):
+        """
+        :param path: The absolute path to the file.
+        :type path: str
+        :param id: The (optional) blob ID.
+        :type id: str
+        """
+        self.path = path
+        self.id = id or uuid4().hex
+        self.transient = False
+        self._digest = None
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path)
+
+    @property
+    def digest(self):
+        """
+        The (sha256) hex digest of the content.
+        :rtype: str
+        """
+        if self._digest is None:
+            h = hashlib.sha256()
+            for _, data in self.chunks():
+                h.update(data)
+            self._digest = h.hexdigest()
+        return self._digest
+
+    def open(self):
+        """
+        Open the content for reading.
+        The caller must close() the returned object.
+        :return: A (read-only) memory mapped file.
+        :rtype: mmap.mmap
+        :raise ValueError: when empty.
+        """
+        fp = open(self.path, 'rb')
+        try:
+            return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            fp.close()
+
+    def chunks(self, size=None):
+        """
+        Read the content in chunks.
+        Transient blobs are deleted once all of the content is read.
+        :param size: The chunk size (bytes).  Default: CHUNK.
+        :type size: int
+        :return: A generator of: (offset, data).
+        :rtype: generator
+        """
+        size = size or CHUNK
+        if self.size:
+            content = self.open()
+            try:
+                for offset in xrange(0, len(content), size):
+                    yield offset, content[offset:offset + size]
+            finally:
+                content.close()
+        if self.transient:
+            try:
+                self.delete()
+            except OSError:
+                log.exception(self.path)
+
+    def read(self):
+        """
+        Read the content.
+        :return: The content.
+        :rtype: str
+        """
+        return ''.join([data for _, data in self.chunks()])
+
+    def delete(self):
+        """
+        Delete the file.
+        """
+        unlink(self.path)
+
+    def reference(self, path=False):
+        """
+        Get a reference to be sent in place of the blob.
+        :param path: Include the path (spooled).
+        :type path: bool
+        :return: The reference.
+        :rtype: dict
+        """
+        reference = dict(id=self.id, size=self.size, digest=self.digest)
+        if path:
+            reference['path'] = self.path
+        return {MARKER: reference}
+
+    def __eq__(self, other):
+        return isinstance(other, Blob) and self.id == other.id
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __unicode__(self):
+        return u'blob: %s path: %s' % (self.id, self.path)
+
+    def __str__(self):
+        return utf8(self)
+
+
+class Spool(object):
+    """
+    A directory of spooled blobs.
+    Blobs passed with a request are spooled in a sub-directory
+    owned by the request and named by serial number.
+    :ivar root: The absolute path to the directory.
+    :type root: str
+    """
+
+    ROOT = '/var/lib/%s/spool' % NAME
+
+    # the private (per-user) directory used by callers.
+    USER = '~/.%s/spool' % NAME
+
+    # seconds a spooled blob (or request directory) is kept.
+    TTL = 86400
+
+    # the maximum size (bytes) of a blob received in chunks.
+    MAXIMUM = 1073741824
+
+    # the maximum total size (bytes) of spooled blobs.
+    QUOTA = 10737418240
+
+    def __init__(self, root=None):
+        """
+        :param root: The (optional) absolute path to the directory.
+        :type root: str
+        """
+        self.root = root or Spool.ROOT
+
+    @staticmethod
+    def user():
+        """
+        Get the private (per-user) spool.
+        :return: The spool.
+        :rtype: Spool
+        """
+        return Spool(os.path.expanduser(Spool.USER))
+
+    @staticmethod
+    def valid(name):
+        """
+        Validate a blob ID or serial number used as a file name.
+        :param name: A blob ID or serial number.
+        :type name: str
+        :raise BlobError: not valid.
+        """
+        if not name or os.path.basename(name) != name or name.startswith('.'):
+            raise BlobError('blob: "%s" not valid' % name)
+
+    def directory(self, sn=None):
+        """
+        Get the path to the directory owned by a request.
+        :param sn: The (optional) request serial number.
+        :type sn: str
+        :return: The absolute path.  The root when no serial number.
+        :rtype: str
+        :raise BlobError: invalid serial number.
+        """
+        if sn is None:
+            return self.root
+        self.valid(sn)
+        return os.path.join(self.root, sn)
+
+    def path(self, id, sn=None):
+        """
+        Get the path to a spooled blob.
+        :param id: The blob ID.
+        :type id: str
+        :param sn: The (optional) serial number of the owning request.
+        :type sn: str
+        :return: The absolute path.
+        :rtype: str
+        :raise BlobError: invalid ID.
+        """
+        self.valid(id)
+        return os.path.join(self.directory(sn), id)
+
+    def contains(self, blob, sn=None):
+        """
+        Get whether the blob is spooled in this directory.
+        :param blob: A blob.
+        :type blob: Blob
+        :param sn: The (optional) serial number of the owning request.
+        :type sn: str
+        :rtype: bool
+        """
+        root = os.path.realpath(self.directory(sn))
+        return os.path.dirname(os.path.realpath(blob.path)) == root
+
+    def store(self, content):
+        """
+        Spool the content.
+        :param content: The content.
+        :type content: str
+        :return: The spooled blob.
+        :rtype: Blob
+        """
+        blob = Blob(None)
+        blob.path = self.path(blob.id)
+        mkdir(self.root)
+        fp = open(blob.path, 'wb')
+        try:
+            fp.write(content)
+        finally:
+            fp.close()
+        return blob
+
+    def add(self, blob, sn=None):
+        """
+        Copy (link when possible) a blob into the spool.
+        :param blob: A blob.
+        :type blob: Blob
+        :param sn: The (optional) serial number of the owning request.
+        :type sn: str
+        :return: The spooled blob.
+        :rtype: Blob
+        """
+        if self.contains(blob, sn):
+            return blob
+        path = self.path(blob.id, sn)
+        mkdir(self.directory(sn))
+        try:
+            os.link(blob.path, path)
+        except OSError:
+            shutil.copyfile(blob.path, path)
+        return Blob(path, blob.id)
+
+    def usage(self):
+        """
+        Get the total size (bytes) of spooled blobs.
+        :return: The total size.
+        :rtype: int
+        """
+        total = 0
+        for path, _, names in os.walk(self.root):
+            for name in names:
+                try:
+                    total += os.path.getsize(os.path.join(path, name))
+                except OSError:
+                    pass
+        return total
+
+    def write(self, chunk, sn=None):
+        """
+        Write a received chunk to the spooled file
+        in the directory owned by the request.
+        The blob size is limited to MAXIMUM and the total
+        size of spooled blobs is limited to QUOTA.
+        :param chunk: A received chunk.
+        :type chunk: dict
+        :param sn: The (optional) serial number of the owning request.
+        :type sn: str
+        :raise BlobError: not valid or too large.
+        """
+        path = self.path(chunk['id'], sn)
+        size = int(chunk['size'])
+        offset = int(chunk['offset'])
+        data = decode(chunk)
+        if offset < 0 or offset + len(data) > size:
+            raise BlobError('blob: %s, chunk not valid' % chunk['id'])
+        if size > self.MAXIMUM:
+            raise BlobError('blob: %s, larger than: %d bytes' % (chunk['id'], self.MAXIMUM))
+        try:
+            spooled = os.path.getsize(path)
+        except OSError:
+            spooled = 0
+        if spooled != size and self.usage() - spooled + size > self.QUOTA:
+            raise BlobError('blob: %s, spool quota: %d bytes exceeded' % (chunk['id'], self.QUOTA))
+        mkdir(self.directory(sn))
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0600)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = 0
+            while written < len(data):
+                written += os.write(fd, data[written:])
+        finally:
+            os.close(fd)
+        Metrics().counter('rmi.bulk.received').inc(len(data))
+
+    def resolve(self, reference, verify=True, sn=None):
+        """
+        Resolve a reference to a spooled blob.
+        :param reference: A blob reference.
+        :type reference: dict
+        :param verify: Verify the content using the digest.
+        :type verify: bool
+        :param sn: The (optional) serial number of the owning request.
+        :type sn: str
+        :return: The (verified) blob.
+        :rtype: Blob
+        :raise BlobError: not found or digest not matched.
+        """
+        reference = reference[MARKER]
+        id = reference['id']
+        blob = Blob(self.path(id, sn), id)
+        path = reference.get('path')
+        if path:
+            # spooled by the peer.
+            blob.path = path
+            if not (self.contains(blob, sn) or self.contains(blob)):
+                raise BlobError('blob: %s, path: %s not spooled' % (id, path))
+        if not os.path.isfile(blob.path):
+            raise BlobError('blob: %s, not found' % id)
+        if not verify:
+            blob._digest = reference['digest']
+            return blob
+        if blob.size != reference['size'] or blob.digest != reference['digest']:
+            raise BlobError('blob: %s, digest not matched' % id)
+        return blob
+
+    def delete(self, sn):
+        """
+        Delete the directory (and blobs) owned by a request.
+        :param sn: The serial number of the owning request.
+        :type sn: str
+        """
+        try:
+            shutil.rmtree(self.directory(sn))
+        except OSError, e:
+            if e.errno != errno.ENOENT:
+                log.exception(sn)
+        except Exception:
+            log.exception(sn)
+
+    def sweep(self, ttl=None, keep=()):
+        """
+        Delete blobs and request directories not modified within the TTL.
+        Removes the blobs of requests that were rejected, expired,
+        cancelled or never received.
+        :param ttl: The TTL (seconds).  Default: TTL.
+        :type ttl: float
+        :param keep: Serial numbers of requests (still pending)
+            with directories that are kept.
+        :type keep: collection
+        :return: The names of deleted files and directories.
+        :rtype: list
+        """
+        swept = []
+        oldest = time() - (ttl or self.TTL)
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return swept
+        for name in names:
+            if name in keep:
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) >= oldest:
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    unlink(path)
+                swept.append(name)
+            except OSError:
+                log.exception(path)
+        return swept
+
+
+def spooled(thing):
+    """
+    Spool a returned blob.
+    The blob is passed to the agent by reference.
+    :param thing: A returned value.
+    :return: A reference (including the path) when the value
+        is a blob.  Else, the value.
+    """
+    if isinstance(thing, Blob):
+        return Spool().add(thing).reference(path=True)
+    else:
+        return thing
+
+
+def is_reference(thing):
+    """
+    Get whether the object is a blob reference.
+    :param thing: Any object.
+    :return: True if a reference.
+    :rtype: bool
+    """
+    return isinstance(thing, dict) and len(thing) == 1 and MARKER in thing
+
+
+def encode(blob, offset, data, name=None):
+    """
+    Build a chunk to be sent.
+    The data is base64 encoded unless the codec supports binary.
+    :param blob: The blob being sent.
+    :type blob: Blob
+    :param offset: The offset of the data.
+    :type offset: int
+    :param data: The chunk data.
+    :type data: str
+    :param name: The codec name.
+    :type name: str
+    :return: The chunk.
+    :rtype: dict
+    """
+    chunk = dict(id=blob.id, size=blob.size, offset=offset)
+    if codec.find(name) is codec.DEFAULT:
+        chunk['data'] = b64encode(data)
+        chunk['encoding'] = 'base64'
+    else:
+        chunk['data'] = data
+    return chunk
+
+
+def decode(chunk):
+    """
+    Get the data in a received chunk.
+    :param chunk: A received chunk.
+    :type chunk: dict
+    :return: The chunk data.
+    :rtype: str
+    """
+    data = chunk.get('data') or ''
+    if chunk.get('encoding') == 'base64':
+        return b64decode(data)
+    else:
+        return data
+
+
+def send(producer, address, blobs, ttl=None, **body):
+    """
+    Send the content of blobs in chunks.
+    :param producer: An open producer.
+    :type producer: gofer.messaging.Producer
+    :param address: The destination address.
+    :type address: str
+    :param blobs: The blobs to send.
+    :type blobs: list
+    :param ttl: Time to Live (seconds)
+    :type ttl: float
+    :param body: Additional message body.
+    """
+    for blob in blobs:
+        sent = 0
+        for offset, data in blob.chunks():
+            chunk = encode(blob, offset, data, producer.codec)
+            producer.send(address, ttl, status='blob', blob=chunk, **body)
+            sent += len(data)
+        if not sent:
+            chunk = encode(blob, 0, '', producer.codec)
+            producer.send(address, ttl, status='blob', blob=chunk, **body)
+        Metrics().counter('rmi.bulk.sent').inc(sent)
+
+
+def arguments(request):
+    """
+    Get the arguments passed in a request.
+    :param request: An RMI request.
+    :type request: gofer.rmi.dispatcher.Request
+    :return: The list of arguments.
+    :rtype: list
+    """
+    args = list(request.args or [])
+    args.extend((request.kws or {}).values())
+    if request.cntr:
+        args.extend(request.cntr[0])
+        args.extend(request.cntr[1].values())
+    return args
+
+
+def _collections(request):
+    """
+    Get the (mutable) argument collections in a request.
+    :param request: An RMI request.
+    :type request: gofer.rmi.dispatcher.Request
+    :return: A list of: (list|dict).
+    :rtype: list
+    """
+    request.args = list(request.args or [])
+    request.kws = dict(request.kws or {})
+    collections = [request.args, request.kws]
+    if request.cntr:
+        request.cntr = [list(request.cntr[0]), dict(request.cntr[1])]
+        collections.extend(request.cntr)
+    return collections
+
+
+def replace(request, fn):
+    """
+    Replace the arguments in a request.
+    :param request: An RMI request.
+    :type request: gofer.rmi.dispatcher.Request
+    :param fn: Called with each argument.  Returns the replacement.
+    :type fn: callable
+    """
+    for collection in _collections(request):
+        if isinstance(collection, dict):
+            keys = collection.keys()
+        else:
+            keys = range(len(collection))
+        for key in keys:
+            collection[key] = fn(collection[key])
+
+
+def outbound(request, spool=None, sn=None):
+    """
+    Replace the blobs passed as arguments with references.
+    :param request: An RMI request.
+    :type request: gofer.rmi.dispatcher.Request
+    :param spool: The (optional) shared spool.  When specified, the
+        blobs are spooled and the references include the path.
+    :type spool: Spool
+    :param sn: The request serial number.  Blobs are spooled
+        in the directory owned by the request.
+    :type sn: str
+    :return: The blobs to be sent in chunks.
+    :rtype: list
+    """
+    blobs = []
+    if not [a for a in arguments(request) if isinstance(a, Blob)]:
+        return blobs
+
+    def fn(thing):
+        if not isinstance(thing, Blob):
+            return thing
+        # the ID identifies each transfer.
+        thing = Blob(thing.path)
+        if spool is not None:
+            return spool.add(thing, sn).reference(path=True)
+        blobs.append(thing)
+        return thing.reference()
+
+    replace(request, fn)
+    return blobs
+
+
+def inbound(request, spool, sn=None):
+    """
+    Replace the references passed as arguments with (verified) blobs.
+    :param request: An RMI request.
+    :type request: gofer.rmi.dispatcher.Request
+    :param spool: The spool.
+    :type spool: Spool
+    :param sn: The request serial number.
+    :type sn: str
+    :raise BlobError: not found or digest not matched.
+    """
+    def fn(thing):
+        if is_reference(thing):
+            return spool.resolve(thing, sn=sn)
+        else:
+            return thing
+    if references(request):
+        replace(request, fn)
+
+
+def references(request):
+    """
+    Get the references passed as arguments.
+    :param request: An RMI request.
+    :type request: gofer.rmi.dispatcher.Request
+    :return: The list of references.
+    :rtype: list
+    """
+    return [a for a in arguments(request) if is_reference(a)]
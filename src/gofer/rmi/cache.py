@@ -0,0 +1,166 @@
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Jeff Ortel <jortel@redhat.com>
+#
+
+"""
+Provides the RMI result cache.
+Results of methods decorated using @remote(cache_ttl=) are cached
+(by call signature) for the TTL.
+"""
+
+from collections import OrderedDict
+from threading import RLock
+from time import time
+
+from gofer.common import synchronized
+
+
+class Entry(object):
+    """
+    A cached result.
+    :ivar name: The method name: (classname, method).
+    :type name: tuple
+    :ivar result: The cached result.
+    :type result: gofer.rmi.dispatcher.Return
+    :ivar expiration: When the entry expires (seconds since epoch).
+    :type expiration: float
+    :ivar size: The (serialized) size of the result in bytes.
+    :type size: int
+    """
+
+    def __init__(self, name, result, expiration, size):
+        """
+        :param name: The method name: (classname, method).
+        :type name: tuple
+        :param result: The cached result.
+        :type result: gofer.rmi.dispatcher.Return
+        :param expiration: When the entry expires (seconds since epoch).
+        :type expiration: float
+        :param size: The (serialized) size of the result in bytes.
+        :type size: int
+        """
+        self.name = name
+        self.result = result
+        self.expiration = expiration
+        self.size = size
+
+
+class Cache(object):
+    """
+    A bounded LRU result cache.
+    The least recently used entries are discarded when the number of
+    entries exceeds the capacity or the total (serialized) size of
+    the cached results exceeds the memory limit.
+    :ivar capacity: The maximum number of entries.
+    :type capacity: int
+    :ivar memory: The maximum total size (bytes) of cached results.
+    :type memory: int
+    :ivar entries: Cached entries by key.
+    :type entries: OrderedDict
+    :ivar used: The total size (bytes) of cached results.
+    :type used: int
+    """
+
+    # maximum number of entries.
+    CAPACITY = 1000
+    # maximum total size (bytes) of cached results.
+    MEMORY = 10 * 1024 * 1024
+
+    def __init__(self, capacity=CAPACITY, memory=MEMORY):
+        """
+        :param capacity: The maximum number of entries.
+        :type capacity: int
+        :param memory: The maximum total size (bytes) of cached results.
+        :type memory: int
+        """
+        self.capacity = capacity
+        self.memory = memory
+        self.entries = OrderedDict()
+        self.used = 0
+        self.__mutex = RLock()
+
+    @synchronized
+    def get(self, key):
+        """
+        Get a cached result.
+        :param key: The call signature key.
+        :type key: str
+        :return: The cached result or None when not cached (or expired).
+        :rtype: gofer.rmi.dispatcher.Return
+        """
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        if entry.expiration <= time():
+            self.used -= entry.size
+            return None
+        self.entries[key] = entry
+        return entry.result
+
+    @synchronized
+    def add(self, key, name, result, ttl):
+        """
+        Add a result.
+        Not added when larger than the memory limit.
+        :param key: The call signature key.
+        :type key: str
+        :param name: The method name: (classname, method).
+        :type name: tuple
+        :param result: The result.
+        :type result: gofer.rmi.dispatcher.Return
+        :param ttl: The time-to-live (seconds).
+        :type ttl: float
+        """
+        size = len(result.dump())
+        if size > self.memory:
+            return
+        self.discard(key)
+        self.entries[key] = Entry(name, result, time() + ttl, size)
+        self.used += size
+        while len(self.entries) > self.capacity or self.used > self.memory:
+            _, entry = self.entries.popitem(last=False)
+            self.used -= entry.size
+
+    @synchronized
+    def discard(self, key):
+        """
+        Discard an entry.
+        :param key: The call signature key.
+        :type key: str
+        """
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.used -= entry.size
+
+    @synchronized
+    def invalidate(self, classname=None, method=None):
+        """
+        Invalidate cached results.
+        :param classname: The (optional) class name.
+            All results are invalidated when not specified.
+        :type classname: str
+        :param method: The (optional) method name.
+            All results for the class are invalidated when not specified.
+        :type method: str
+        """
+        for key, entry in self.entries.items():
+            if classname and entry.name[0] != classname:
+                continue
+            if method and entry.name[1] != method:
+                continue
+            self.discard(key)
+
+    @synchronized
+    def __len__(self):
+        return len(self.entries)
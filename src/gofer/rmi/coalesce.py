@@ -0,0 +1,131 @@
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Jeff Ortel <jortel@redhat.com>
+#
+
+"""
+Provides (single-flight) coalescing of identical concurrent requests.
+While a request is executing, identical requests wait for
+the in-flight execution and receive the same result.
+"""
+
+import json
+
+from hashlib import sha256
+from threading import RLock, Event
+
+from gofer.common import Options, synchronized
+from gofer.metrics import Metrics
+
+
+def key(document):
+    """
+    Get the key used to identify identical requests.
+    Requests are identical when the class, method, arguments, constructor
+    arguments and credentials are the same.
+    :param document: A request document.
+    :type document: gofer.messaging.Document
+    :return: The key.
+    :rtype: str
+    """
+    request = Options(document.request or {})
+    identity = [
+        request.classname,
+        request.method,
+        request.args,
+        request.kws,
+        request.cntr,
+        document.secret,
+        document.pam,
+    ]
+    return sha256(json.dumps(identity, sort_keys=True)).hexdigest()
+
+
+class Flight(object):
+    """
+    An in-flight execution.
+    :ivar event: Set when the execution has completed.
+    :type event: Event
+    :ivar result: The execution result.
+    """
+
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+
+
+class Group(object):
+    """
+    A group of in-flight executions.
+    :ivar flights: In-flight executions by key.
+    :type flights: dict
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.__mutex = RLock()
+
+    def __call__(self, key, fn):
+        """
+        Execute the function unless an execution with the
+        same key is in-flight.  When in-flight, wait for the
+        in-flight execution to complete and return the same result.
+        :param key: The execution key.
+        :type key: str
+        :param fn: The function to execute.
+        :type fn: callable
+        :return: The result.
+        """
+        flight, leader = self.join(key)
+        if leader:
+            try:
+                flight.result = fn()
+            finally:
+                self.leave(key)
+                flight.event.set()
+        else:
+            Metrics().counter('rmi.coalesced').inc()
+            flight.event.wait()
+        return flight.result
+
+    @synchronized
+    def join(self, key):
+        """
+        Join an in-flight execution.
+        :param key: The execution key.
+        :type key: str
+        :return: tuple of: (flight, leader).  The *leader* is True
+            when there is no execution in-flight and the caller
+            must execute.
+        :rtype: tuple
+        """
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = Flight()
+            self.flights[key] = flight
+            return flight, True
+        else:
+            return flight, False
+
+    @synchronized
+    def leave(self, key):
+        """
+        The in-flight execution has completed.
+        :param key: The execution key.
+        :type key: str
+        """
+        self.flights.pop(key, None)
+
+    @synchronized
+    def __len__(self):
+        return len(self.flights)
@@ -16,7 +16,11 @@
 from logging import getLogger
 
 from gofer.messaging import Consumer, Producer, Document
-from gofer.metrics import timestamp
+from gofer.metrics import Metrics, timestamp
+from gofer.rmi import dedup
+from gofer.rmi.bulk import Spool
+from gofer.rmi.dispatcher import Request, expired
+from gofer.rmi.tracker import Credit
 
 log = getLogger(__name__)
 
@@ -26,8 +30,12 @@ class RequestConsumer(Consumer):
     Request consumer.
     Reads messages from AMQP, sends the accepted status then writes
     to local pending queue to be consumed by the scheduler.
+    Requests are not changed before written to the journal so the
+    received encoding is kept.
     """
 
+    frozen = True
+
     def __init__(self, node, plugin):
         """
         :param node: An AMQP node.
@@ -62,7 +70,7 @@ class RequestConsumer(Consumer):
         Send a status update.
         :param request: The received (json) request.
         :type request: Document
-        :param status: The status to send ('accepted'|'rejected')
+        :param status: The status to send ('accepted'|'rejected'|'expired'|'missing')
         :type status: str
         """
         address = request.replyto
@@ -89,8 +97,41 @@ class RequestConsumer(Consumer):
         """
         Dispatch received request.
         Update the request: inject the inbound_url.
+        Expired requests are discarded.
+        Bulk data (chunks) sent ahead of requests are spooled.
+        Credit granted by callers reading streamed replies is applied.
+        Requests referencing values not stored are not accepted and
+        the caller is sent the digests of the missing values.
         :param request: The received request.
         :type request: Document
         """
+        if request.status == 'blob':
+            self.spool(request)
+            return
+        if request.status == 'credit':
+            Credit().grant(request.sn, request.seq, request.closed)
+            return
+        if expired(request):
+            log.info('Request: %s, expired', request.sn)
+            Metrics().counter('rmi.expired').inc()
+            self.send(request, 'expired')
+            Spool().delete(request.sn)
+            return
+        missing = dedup.missing(Request(request.request or {}), dedup.Store())
+        if missing:
+            self.send(request, 'missing', digests=missing)
+            return
         self.send(request, 'accepted')
         self.scheduler.add(request)
+
+    def spool(self, document):
+        """
+        Spool received bulk data.
+        :param document: The received chunk.
+        :type document: Document
+        """
+        try:
+            spool = Spool()
+            spool.write(document.blob, document.sn)
+        except Exception:
+            log.exception('Request: %s, blob not spooled', document.sn)
@@ -53,6 +53,30 @@ class Container(object):
       - data
           (object) User defined data that is round tripped.
           Used for asynchronous reply correlation and cancel criteria.
+      - codec
+          (str) The name of the codec used to encode requests.
+          Agents reply using the codec used to encode the request.
+          Default: the codec configured for the URL (json).
+      - compression
+          (str) The name of the compressor used to compress requests
+          larger than the threshold (zlib|lz4).  Default: not compressed.
+      - compression_threshold
+          (int) The size (bytes) above which requests are compressed.
+          Default: 4096.
+      - bulk
+          (str) How the content of Blob arguments and return values is
+          transferred (chunked|spool).  The *spool* mode is used only when
+          the agent is on the same host.  Default: chunked.
+      - spool
+          (str) The path to the spool directory used for bulk data.
+          Default: /var/lib/gofer/spool.
+      - dedup
+          (bool) Arguments of synchronous requests larger than the threshold
+          are sent as a (content) digest.  The agent asks for values
+          it has not stored.  Default: False.
+      - dedup_threshold
+          (int) The size (bytes) above which arguments are deduplicated.
+          Default: 65536.
 
     :ivar __id: The peer ID.
     :type __id: str
@@ -35,12 +35,35 @@ class Criteria(object):
         """
         raise NotImplementedError()
 
+    def plan(self, index):
+        """
+        Plan the query using the (tracker) index.
+        :param index: A tracker index.
+        :type index: gofer.rmi.tracker.Index
+        :return: The set of candidate serial numbers or
+            None when the index cannot be used.
+        :rtype: set
+        """
+        return None
+
     def __call__(self, locator):
         return self.match(locator)
 
 
 class Match(Criteria):
 
+    def plan(self, index):
+        if not isinstance(self.criteria, dict) or not self.criteria:
+            return set()
+        planned = None
+        for k, v in self.criteria.items():
+            candidates = index.match(k, v)
+            if planned is None:
+                planned = candidates
+            else:
+                planned &= candidates
+        return planned
+
     def match(self, locator):
         if not self._valid(locator):
             return False
@@ -63,6 +86,9 @@ class Match(Criteria):
 
 class Equal(Criteria):
 
+    def plan(self, index):
+        return index.equal(self.criteria)
+
     def match(self, locator):
         return locator == self.criteria
 
@@ -87,12 +113,29 @@ class Less(Criteria):
 
 class In(Criteria):
 
+    def plan(self, index):
+        if isinstance(self.criteria, dict):
+            return index.equal_any(self.criteria.keys())
+        if isinstance(self.criteria, (list, tuple, set, frozenset)):
+            return index.equal_any(self.criteria)
+        return None
+
     def match(self, locator):
         return locator in self.criteria
 
 
 class And(Criteria):
 
+    def plan(self, index):
+        left, right = self.criteria
+        left = left.plan(index)
+        right = right.plan(index)
+        if left is None:
+            return right
+        if right is None:
+            return left
+        return left & right
+
     def match(self, locator):
         left, right = self.criteria
         return left.match(locator) and right.match(locator)
@@ -100,6 +143,16 @@ class And(Criteria):
 
 class Or(Criteria):
 
+    def plan(self, index):
+        left, right = self.criteria
+        left = left.plan(index)
+        if left is None:
+            return None
+        right = right.plan(index)
+        if right is None:
+            return None
+        return left | right
+
     def match(self, locator):
         left, right = self.criteria
         return left.match(locator) or right.match(locator)
@@ -119,6 +172,10 @@ class Builder:
       {'and':({'gt':1},{'lt':10})}
       {'or':({'eq':10},{'in':[1,2]})}
       {'or':({'eq':10},{'or':({'eq':1},{'eq':2})}
+    The built criteria plan queries using the tracker index.  The
+    match, eq and in operators (and combinations using and/or) are
+    planned using the index.  The neq, gt and lt operators require
+    a scan of all tracked requests.
     """
 
     METHODS = {
@@ -0,0 +1,346 @@
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Jeff Ortel <jortel@redhat.com>
+#
+
+"""
+Provides content-addressed argument deduplication.
+Large arguments are replaced (by the caller) with a reference:
+  {"__cas__": {"digest": <sha256>}}
+The digest is calculated using the (sorted) json encoding of the value.
+The agent keeps recently received values in a bounded (on-disk) store.
+When a referenced value is not stored, the agent replies with
+status=missing and the digests.  The caller then sends the request
+again with the values included in the references:
+  {"__cas__": {"digest": <sha256>, "value": <value>}}
+Metrics:
+  - rmi.dedup.hit: The number of referenced values found.
+  - rmi.dedup.miss: The number of referenced values not found.
+"""
+
+import os
+import string
+import hashlib
+
+from collections import OrderedDict
+from logging import getLogger
+from threading import RLock
+
+from gofer import NAME, Singleton
+from gofer.common import mkdir, unlink, synchronized
+from gofer.metrics import Metrics
+from gofer.messaging import codec
+from gofer.rmi.bulk import arguments, replace
+
+
+log = getLogger(__name__)
+
+
+# key in references.
+MARKER = '__cas__'
+
+# arguments larger than this (bytes) are deduplicated.
+THRESHOLD = 65536
+
+
+class Missing(Exception):
+    """
+    Referenced values are not stored by the agent.
+    :ivar digests: The digests of the missing values.
+    :type digests: list
+    """
+
+    def __init__(self, digests):
+        """
+        :param digests: The digests of the missing values.
+        :type digests: list
+        """
+        Exception.__init__(self, 'values: %s not stored' % digests)
+        self.digests = digests
+
+
+def encode(value):
+    """
+    Encode the value used to calculate the digest.
+    :param value: A value.
+    :return: The (sorted) json encoding or None when not encoded.
+    :rtype: str
+    """
+    try:
+        return codec.DEFAULT.encode(value, sort=True)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+
+
+def digest(encoded):
+    """
+    Calculate the digest of an encoded value.
+    :param encoded: An encoded value.
+    :type encoded: str
+    :return: The (sha256) hex digest.
+    :rtype: str
+    """
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class Store(object):
+    """
+    A bounded LRU (on-disk) content-addressed store.
+    Each value is stored (json encoded) in a file named by digest.
+    The least recently used values are deleted when the total size
+    of stored values exceeds the capacity.
+    :ivar root: The absolute path to the directory.
+    :type root: str
+    :ivar capacity: The maximum total size (bytes) of stored values.
+    :type capacity: int
+    :ivar entries: The size of stored values by digest.
+    :type entries: OrderedDict
+    :ivar used: The total size (bytes) of stored values.
+    :type used: int
+    """
+
+    __metaclass__ = Singleton
+
+    ROOT = '/var/lib/%s/cas' % NAME
+
+    # maximum total size (bytes) of stored values.
+    CAPACITY = 100 * 1024 * 1024
+
+    def __init__(self, root=None, capacity=None):
+        """
+        :param root: The (optional) absolute path to the directory.
+        :type root: str
+        :param capacity: The maximum total size (bytes) of stored values.
+        :type capacity: int
+        """
+        self.root = root or Store.ROOT
+        self.capacity = capacity or Store.CAPACITY
+        self.entries = None
+        self.used = 0
+        self.__mutex = RLock()
+
+    def path(self, digest):
+        """
+        Get the path to a stored value.
+        :param digest: The value digest.
+        :type digest: str
+        :return: The absolute path.
+        :rtype: str
+        :raise ValueError: not a valid digest.
+        """
+        if not digest or not set(digest) <= set(string.hexdigits):
+            raise ValueError('digest: "%s" not valid' % digest)
+        return os.path.join(self.root, digest)
+
+    def _load(self):
+        """
+        Load the entries (oldest first) stored in the directory.
+        """
+        if self.entries is not None:
+            return
+        mkdir(self.root)
+        stored = []
+        for name in os.listdir(self.root):
+            if not set(name) <= set(string.hexdigits):
+                continue
+            path = os.path.join(self.root, name)
+            stat = os.stat(path)
+            stored.append((stat.st_mtime, name, stat.st_size))
+        self.entries = OrderedDict()
+        for _, name, size in sorted(stored):
+            self.entries[name] = size
+            self.used += size
+
+    @synchronized
+    def contains(self, digest):
+        """
+        Get whether the value is stored.
+        :param digest: The value digest.
+        :type digest: str
+        :rtype: bool
+        """
+        self._load()
+        return digest in self.entries
+
+    @synchronized
+    def get(self, digest):
+        """
+        Get a stored value.
+        :param digest: The value digest.
+        :type digest: str
+        :return: The value.
+        :raise Missing: not stored.
+        """
+        self._load()
+        size = self.entries.pop(digest, None)
+        if size is None:
+            raise Missing([digest])
+        path = self.path(digest)
+        try:
+            with open(path) as fp:
+                encoded = fp.read()
+            os.utime(path, None)
+        except IOError:
+            self.used -= size
+            raise Missing([digest])
+        self.entries[digest] = size
+        return codec.DEFAULT.decode(encoded)
+
+    @synchronized
+    def put(self, value):
+        """
+        Store a value.
+        Not stored when larger than the capacity.
+        :param value: A value.
+        :return: The value digest.
+        :rtype: str
+        """
+        self._load()
+        encoded = encode(value)
+        _digest = digest(encoded)
+        size = len(encoded)
+        if _digest in self.entries:
+            self.entries[_digest] = self.entries.pop(_digest)
+            return _digest
+        if size > self.capacity:
+            return _digest
+        path = self.path(_digest)
+        tmp = '.'.join((path, 'tmp'))
+        with open(tmp, 'w') as fp:
+            fp.write(encoded)
+        os.rename(tmp, path)
+        self.entries[_digest] = size
+        self.used += size
+        while self.used > self.capacity:
+            name, size = self.entries.popitem(last=False)
+            self.used -= size
+            unlink(os.path.join(self.root, name))
+        return _digest
+
+    def __len__(self):
+        self._load()
+        return len(self.entries)
+
+
+def is_reference(thing):
+    """
+    Get whether the object is a value reference.
+    :param thing: Any object.
+    :return: True if a reference.
+    :rtype: bool
+    """
+    return isinstance(thing, dict) and len(thing) == 1 and MARKER in thing
+
+
+def outbound(request, threshold=None):
+    """
+    Replace the arguments larger than the threshold with references.
+    :param request: An RMI request.
+    :type request: gofer.rmi.dispatcher.Request
+    :param threshold: The (optional) size (bytes) above which
+        arguments are replaced.  Default: THRESHOLD.
+    :type threshold: int
+    :return: The replaced values by digest.
+    :rtype: dict
+    """
+    if threshold is None:
+        threshold = THRESHOLD
+    values = {}
+
+    def fn(thing):
+        encoded = encode(thing)
+        if encoded is None or len(encoded) <= threshold:
+            return thing
+        _digest = digest(encoded)
+        values[_digest] = thing
+        return {MARKER: dict(digest=_digest)}
+
+    replace(request, fn)
+    return values
+
+
+def inline(request, values, digests):
+    """
+    Include the missing values in the references.
+    :param request: An RMI request.
+    :type request: gofer.rmi.dispatcher.Request
+    :param values: The replaced values by digest.
+    :type values: dict
+    :param digests: The digests of the missing values.
+    :type digests: list
+    """
+    for reference in references(request):
+        reference = reference[MARKER]
+        _digest = reference['digest']
+        if _digest in digests:
+            reference['value'] = values[_digest]
+
+
+def missing(request, store):
+    """
+    Store the values included in references and get the digests of
+    referenced values that are not stored.
+    :param request: An RMI request.
+    :type request: gofer.rmi.dispatcher.Request
+    :param store: The store.
+    :type store: Store
+    :return: The digests of missing values.
+    :rtype: list
+    """
+    digests = []
+    metrics = Metrics()
+    for reference in references(request):
+        reference = reference[MARKER]
+        _digest = reference.get('digest')
+        if 'value' in reference:
+            if store.put(reference['value']) != _digest:
+                log.warn('value: %s, digest not matched', _digest)
+            continue
+        if store.contains(_digest):
+            metrics.counter('rmi.dedup.hit').inc()
+        else:
+            metrics.counter('rmi.dedup.miss').inc()
+            digests.append(_digest)
+    return digests
+
+
+def inbound(request, store):
+    """
+    Replace the references passed as arguments with the values.
+    :param request: An RMI request.
+    :type request: gofer.rmi.dispatcher.Request
+    :param store: The store.
+    :type store: Store
+    :raise Missing: value not stored.
+    """
+    def fn(thing):
+        if not is_reference(thing):
+            return thing
+        reference = thing[MARKER]
+        if 'value' in reference:
+            return reference['value']
+        else:
+            return store.get(reference['digest'])
+    if references(request):
+        replace(request, fn)
+
+
+def references(request):
+    """
+    Get the references passed as arguments.
+    :param request: An RMI request.
+    :type request: gofer.rmi.dispatcher.Request
+    :return: The list of references.
+    :rtype: list
+    """
+    return [a for a in arguments(request) if is_reference(a)]
@@ -21,10 +21,18 @@ import sys
 import inspect
 import traceback as tb
 
+from calendar import timegm
+from functools import partial
+from time import time, strptime
+
 from gofer import NAME
 from gofer.common import Options, utf8
 from gofer.messaging import Document
 from gofer.pam import authenticate as pam_authenticate
+from gofer.rmi.scope import Scope
+from gofer.rmi import bulk, coalesce, dedup
+from gofer.rmi.cache import Cache
+from gofer.metrics import Metrics, TIMESTAMP
 
 from logging import getLogger
 
@@ -152,6 +160,43 @@ class SecretNotMatched(NotAuthorized):
         NotAuthorized.__init__(self, message)
         
         
+class ExecutionTimeout(DispatchError):
+    """
+    The method did not complete within the execution timeout.
+    """
+
+    def __init__(self, classname, method, timeout):
+        message = '%s.%s(), timeout: %s (seconds)' % (classname, method, timeout)
+        DispatchError.__init__(self, message)
+
+
+class ExecutionRefused(DispatchError):
+    """
+    The method was not called because too many calls that
+    exceeded the execution timeout are still running.
+    """
+
+    def __init__(self, classname, method, running):
+        message = '%s.%s(), refused: %d timed out calls still running' % (classname, method, running)
+        DispatchError.__init__(self, message)
+
+
+class StreamAborted(Exception):
+    """
+    Streaming aborted because the caller stopped reading or
+    did not acknowledge received chunks.
+    """
+
+    def __init__(self, sn, seq):
+        """
+        :param sn: The request serial number.
+        :type sn: str
+        :param seq: The sequence number of the chunk not sent.
+        :type seq: int
+        """
+        Exception.__init__(self, 'stream: %s aborted at chunk: %s' % (sn, seq))
+
+
 class RemoteException(Exception):
     """
     The re-raised (propagated) exception base class.
@@ -241,6 +286,22 @@ class Reply(Document):
         :rtype: bool
         """
         return self.status == 'progress'
+
+    def expired(self):
+        """
+        Test whether the reply indicates status (expired).
+        :return: True when indicates expired.
+        :rtype: bool
+        """
+        return self.status == 'expired'
+
+    def chunk(self):
+        """
+        Test whether the reply indicates status (chunk).
+        :return: True when indicates a chunk of streamed items.
+        :rtype: bool
+        """
+        return self.status == 'chunk'
     
 
 class Return(Document):
@@ -258,7 +319,7 @@ class Return(Document):
         :rtype: Return
         """
         inst = Return(retval=x)
-        inst.dump()  # validate
+        inst.freeze(sort=False)  # validate
         return inst
 
     @classmethod
@@ -313,10 +374,99 @@ class Return(Document):
                       xclass=xclass.__name__,
                       xstate=state,
                       xargs=args)
-        inst.dump()  # validate
+        inst.freeze(sort=False)  # validate
         return inst
 
 
+class Streamed(object):
+    """
+    The result of a generator remote method.
+    The yielded items are sent by the agent as sequenced chunks.
+    The first chunk contains one item so that the caller gets the
+    first item quickly.  Chunks double in size up to CHUNK items and
+    are sent when LATENCY seconds have passed since the previous chunk.
+    At least one (possibly empty) chunk is generated.
+    :ivar generator: The generator returned by the method.
+    :type generator: generator
+    :ivar release: An (optional) callable called when closed.
+        Eg: release the instance used by a bound method.
+    :type release: callable
+    """
+
+    # maximum items in each chunk.
+    CHUNK = 100
+    # maximum seconds items are held before sent.
+    LATENCY = 1.0
+    # seconds the agent waits for the caller to acknowledge chunks.
+    STALLED = 300
+
+    def __init__(self, generator):
+        """
+        :param generator: The generator returned by the method.
+        :type generator: generator
+        """
+        self.generator = generator
+        self.release = None
+
+    def succeeded(self):
+        """
+        Test whether the return indicates success.
+        Exceptions raised by the generator are reported
+        when the chunks are generated.
+        :return: True
+        :rtype: bool
+        """
+        return True
+
+    def chunks(self):
+        """
+        Generate chunks of yielded items.
+        :return: A generator of: list.
+        :rtype: generator
+        """
+        size = 1
+        sent = False
+        chunk = []
+        started = time()
+        for item in self.generator:
+            chunk.append(item)
+            if len(chunk) >= size or time() - started >= self.LATENCY:
+                yield chunk
+                sent = True
+                size = min(size * 2, self.CHUNK)
+                chunk = []
+                started = time()
+        if chunk or not sent:
+            yield chunk
+
+    def collect(self):
+        """
+        Collect all of the yielded items.
+        Used when items cannot be streamed.
+        :return: The return document.
+        :rtype: Return
+        """
+        try:
+            return Return.succeed(list(self.generator))
+        except Exception:
+            log.exception(utf8(self.generator))
+            return Return.exception()
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Close the generator and release resources.
+        """
+        try:
+            self.generator.close()
+        finally:
+            release = self.release
+            self.release = None
+            if release is not None:
+                release()
+
+
 class Request(Document):
     """
     An RMI request document.
@@ -324,6 +474,47 @@ class Request(Document):
     pass
 
 
+def deadline(document, received):
+    """
+    Get the deadline for the request.
+    The (relative) expiration is counted from when the request was
+    sent (timestamp) so the time spent queued in the broker is included.
+    When the timestamp is missing, invalid or later than when the request
+    was received (clock skew), it is counted from when it was received.
+    :param document: A request document.
+    :type document: Document
+    :param received: When the request was received (seconds since the epoch).
+    :type received: float
+    :return: The deadline (seconds since the epoch) or None.
+    :rtype: float
+    """
+    if document.deadline or not document.expiration:
+        return document.deadline
+    sent = received
+    if document.timestamp:
+        try:
+            sent = min(timegm(strptime(document.timestamp, TIMESTAMP)), received)
+        except (TypeError, ValueError):
+            log.debug('%s: timestamp (%s) not valid', document.sn, document.timestamp)
+    return sent + document.expiration
+
+
+def expired(document):
+    """
+    Get whether the deadline for the request has passed.
+    :param document: A request document.
+    :type document: Document
+    :return: True if expired.
+    :rtype: bool
+    """
+    now = time()
+    _deadline = deadline(document, now)
+    if _deadline:
+        return _deadline < now
+    else:
+        return False
+
+
 class RMI(object):
     """
     The RMI object performs the invocation.
@@ -452,7 +643,9 @@ class RMI(object):
         try:
             self.permitted()
             retval = self.method(*self.args, **self.kwargs)
-            return Return.succeed(retval)
+            if inspect.isgenerator(retval):
+                return Streamed(retval)
+            return Return.succeed(bulk.spooled(retval))
         except Exception:
             log.exception(utf8(self.method))
             return Return.exception()
@@ -467,6 +660,122 @@ class RMI(object):
         return utf8(self)
 
 
+class Target(object):
+    """
+    A (precompiled) dispatch table entry.
+    Holds the resolved function, security and metadata for
+    a remote method so that requests are dispatched without
+    resolving the method on each call.
+    :ivar name: The qualified method name: <classname>.<method>.
+    :type name: str
+    :ivar inst: The cataloged class or module.
+    :type inst: (class|module)
+    :ivar fn: The resolved function (or method).
+    :type fn: (function|method)
+    :ivar bound: The function must be passed an instance of
+        the class as the first argument.
+    :type bound: bool
+    :ivar fninfo: The *gofer* metadata embedded in the function.
+    :type fninfo: Options
+    :ivar security: The security model.
+    :type security: Security
+    :ivar scope: The instance scope used for bound methods.
+    :type scope: gofer.rmi.scope.Scope
+    :ivar streamed: The function is a generator and the
+        yielded items are streamed.
+    :type streamed: bool
+    """
+
+    def __init__(self, name, inst, member, fninfo, scope=None):
+        """
+        :param name: The qualified method name: <classname>.<method>.
+        :type name: str
+        :param inst: The cataloged class or module.
+        :type inst: (class|module)
+        :param member: The method or function.
+        :type member: (function|method)
+        :param fninfo: The *gofer* metadata embedded in the function.
+        :type fninfo: Options
+        :param scope: The instance scope used for bound methods.
+        :type scope: gofer.rmi.scope.Scope
+        """
+        self.name = name
+        self.inst = inst
+        self.isclass = inspect.isclass(inst)
+        self.bound = inspect.ismethod(member) and member.im_self is None
+        if self.bound:
+            self.fn = member.im_func
+        else:
+            self.fn = member
+        self.streamed = inspect.isgeneratorfunction(self.fn)
+        self.fninfo = fninfo
+        self.security = Security(self, fninfo)
+        self.scope = scope or Scope(inst)
+
+    def __call__(self, request, auth):
+        """
+        Invoke the method.
+        :param request: The request document.
+        :type request: Request
+        :param auth: Authentication properties.
+        :type auth: Options
+        :return: The invocation result.
+        :rtype: Return|Streamed
+        """
+        try:
+            self.security.apply(auth)
+        except Exception:
+            log.exception(self.name)
+            return Return.exception()
+        args = list(request.args or [])
+        kwargs = request.kws or {}
+        if not self.bound:
+            return self.invoke(args, kwargs)
+        cargs, ckwargs = RMI.constructor(request)
+        try:
+            inst = self.scope.get(cargs, ckwargs)
+        except Exception:
+            log.exception(self.name)
+            return Return.exception()
+        streamed = False
+        try:
+            args.insert(0, inst)
+            result = self.invoke(args, kwargs)
+            streamed = isinstance(result, Streamed)
+            if streamed:
+                # released when the generator is closed.
+                result.release = partial(self.scope.release, inst, cargs, ckwargs)
+            return result
+        finally:
+            if not streamed:
+                self.scope.release(inst, cargs, ckwargs)
+
+    def invoke(self, args, kwargs):
+        """
+        Invoke the function.
+        :param args: The arguments.
+        :type args: list
+        :param kwargs: The keyword arguments.
+        :type kwargs: dict
+        :return: The invocation result.
+        :rtype: Return
+        """
+        try:
+            retval = self.fn(*args, **kwargs)
+            if inspect.isgenerator(retval):
+                return Streamed(retval)
+            return Return.succeed(bulk.spooled(retval))
+        except Exception:
+            log.exception(self.name)
+            return Return.exception()
+
+    def __unicode__(self):
+        return self.name
+
+    def __str__(self):
+        return utf8(self)
+
+
 # --- Security classes -------------------------------------------------------
 
 
@@ -583,6 +892,16 @@ class Dispatcher:
     The remote invocation dispatcher.
     :ivar catalog: The (catalog) of target classes.
     :type catalog: dict
+    :ivar table: The (precompiled) dispatch table built using the catalog.
+        Keyed by: (classname, method).
+    :type table: dict
+    :ivar processes: An (optional) pool of worker processes
+        in which requests are dispatched.
+    :type processes: gofer.agent.process.ProcessPool
+    :ivar caching: Results are cached.  Disabled when requests are
+        dispatched in worker processes because results would be cached
+        in the agent but invalidated in the worker processes.
+    :type caching: bool
     """
 
     @staticmethod
@@ -592,6 +911,22 @@ class Dispatcher:
             secret=document.secret,
             pam=document.pam,)
 
+    @staticmethod
+    def masked(document):
+        """
+        Get a copy of the request with the credentials masked.
+        Used for logging.
+        :param document: A request document.
+        :type document: Document
+        :return: The masked copy.
+        :rtype: Document
+        """
+        masked = Document(document)
+        for name in ('secret', 'pam'):
+            if getattr(masked, name):
+                setattr(masked, name, '********')
+        return masked
+
     @staticmethod
     def log(document):
         request = Options(document.request)
@@ -608,6 +943,45 @@ class Dispatcher:
         :type classes: list
         """
         self.catalog = dict([(c.__name__, c) for c in classes or []])
+        self.table = {}
+        self.scopes = {}
+        self.coalesced = coalesce.Group()
+        self.cache = Cache()
+        self.processes = None
+        self.caching = True
+        self.compile()
+
+    def compile(self):
+        """
+        Build the dispatch table using the catalog.
+        Must be called when the catalog is changed.
+        Instance scopes are kept for classes still cataloged and
+        the instances held by scopes no longer used are discarded.
+        Cached results are invalidated.
+        """
+        table = {}
+        scopes = {}
+        for classname, inst in self.catalog.items():
+            scope = None
+            if inspect.isclass(inst):
+                scope = self.scopes.get(inst)
+                if scope is None:
+                    scope = Scope.create(inst)
+                scopes[inst] = scope
+            for name, member in inspect.getmembers(inst):
+                fninfo = RMI.fninfo(member)
+                if fninfo is None:
+                    continue
+                if not inspect.isfunction(RMI.fn(member)):
+                    continue
+                target = Target('.'.join((classname, name)), inst, member, fninfo, scope)
+                table[(classname, name)] = target
+        for inst, scope in self.scopes.items():
+            if inst not in scopes:
+                scope.clear()
+        self.table = table
+        self.scopes = scopes
+        self.cache.invalidate()
 
     def provides(self, name):
         """
@@ -619,7 +993,90 @@ class Dispatcher:
         """
         return name in self.catalog
 
+    def timeout(self, document):
+        """
+        Get the execution timeout for the requested RMI.
+        The smaller of the timeout requested by the caller and
+        the timeout specified using the @remote decorator is used.
+        :param document: A request document.
+        :type document: Document
+        :return: The timeout (seconds) or None.
+        :rtype: float
+        """
+        timeout = []
+        if document.timeout:
+            timeout.append(document.timeout)
+        request = Request(document.request or {})
+        target = self.table.get((request.classname, request.method))
+        if target and target.fninfo.timeout:
+            timeout.append(target.fninfo.timeout)
+        if timeout:
+            return min(timeout)
+
+    def cached(self, document):
+        """
+        Get the cached result for the requested RMI.
+        Only methods decorated using @remote(cache_ttl=) are cached
+        and only when caching is enabled.
+        Metrics:
+          - rmi.cache.hit: Number of requests answered using the cache.
+        :param document: A request document.
+        :type document: Document
+        :return: The cached result or None.
+        :rtype: Return
+        """
+        if not self.caching:
+            return None
+        request = Request(document.request or {})
+        target = self.table.get((request.classname, request.method))
+        if not (target and target.fninfo.cache_ttl):
+            return None
+        result = self.cache.get(coalesce.key(document))
+        if result is not None:
+            Metrics().counter('rmi.cache.hit').inc()
+        return result
+
     def dispatch(self, document):
+        """
+        Dispatch the requested RMI.
+        Results of methods decorated using @remote(cache_ttl=) are
+        cached.  Identical requests for methods decorated using
+        @remote(coalesce=True) are coalesced.  Cached results are
+        invalidated as specified using @remote(invalidates=).
+        Generator methods are neither cached nor coalesced.
+        Nothing is cached when caching is disabled.
+        Metrics:
+          - rmi.cache.miss: Number of (cacheable) requests not cached.
+        :param document: A request document.
+        :type document: Document
+        :return: The result.
+        :rtype: any
+        """
+        request = Request(document.request or {})
+        target = self.table.get((request.classname, request.method))
+        if not target or target.streamed:
+            return self._dispatch(document)
+        fninfo = target.fninfo
+        cache_ttl = fninfo.cache_ttl if self.caching else None
+        if cache_ttl:
+            result = self.cached(document)
+            if result is not None:
+                return result
+            Metrics().counter('rmi.cache.miss').inc()
+        if fninfo.coalesce:
+            result = self.coalesced(coalesce.key(document), partial(self._dispatch, document))
+        else:
+            result = self._dispatch(document)
+        if not result.succeeded() or isinstance(result, Streamed):
+            return result
+        if cache_ttl:
+            name = (request.classname, request.method)
+            self.cache.add(coalesce.key(document), name, result, cache_ttl)
+        for name in fninfo.invalidates or []:
+            self.cache.invalidate(*name.split('.', 1))
+        return result
+
+    def _dispatch(self, document):
         """
         Dispatch the requested RMI.
         :param document: A request document.
@@ -628,24 +1085,35 @@ class Dispatcher:
         :rtype: any
         """
         try:
+            if self.processes:
+                timeout = self.timeout(document)
+                return self.processes.dispatch(document, timeout)
             self.log(document)
             auth = self.auth(document)
             request = Request(document.request)
+            dedup.inbound(request, dedup.Store())
+            bulk.inbound(request, bulk.Spool(), document.sn)
             log.debug('request: %s', request)
+            target = self.table.get((request.classname, request.method))
+            if target:
+                return target(request, auth)
+            # not in the table: raises the appropriate error
             method = RMI(request, auth, self.catalog)
             log.debug('method: %s', method)
             return method()
         except Exception:
-            log.exception(utf8(document))
+            log.exception(utf8(self.masked(document)))
             return Return.exception()
 
     def __iadd__(self, other):
         if isinstance(other, Dispatcher):
             self.catalog.update(other.catalog)
+            self.compile()
             return self
         if isinstance(other, list):
             other = dict([(c.__name__, c) for c in other])
             self.catalog.update(other)
+            self.compile()
             return self
         return self
 
@@ -654,6 +1122,7 @@ class Dispatcher:
 
     def __setitem__(self, key, value):
         self.catalog[key] = value
+        self.compile()
 
     def __iter__(self):
         _list = []
@@ -17,14 +17,23 @@
 Contains request delivery policies.
 """
 
+from time import time
+from calendar import timegm
+from collections import deque
+from datetime import datetime
 from logging import getLogger
 from uuid import uuid4
 
+from functools import partial
+
 from gofer.common import Thread, Options, nvl, utf8, released
 from gofer.messaging import Document, DocumentError
 from gofer.messaging import Producer, Reader, Queue, Exchange
+from gofer.rmi import bulk, dedup
+from gofer.rmi.bulk import Spool
+from gofer.rmi.dedup import Missing
 from gofer.rmi.dispatcher import Return, RemoteException
-from gofer.metrics import Timer
+from gofer.metrics import Timer, timestamp
 
 
 log = getLogger(__name__)
@@ -114,6 +123,23 @@ class RequestTimeout(Exception):
         return self.args[1]
 
 
+class StreamError(Exception):
+    """
+    Streamed chunks missing or received out of sequence.
+    """
+
+    def __init__(self, sn, seq, expected):
+        """
+        :param sn: The request serial number.
+        :type sn: str
+        :param seq: The sequence number of the received chunk.
+        :type seq: int
+        :param expected: The expected sequence number.
+        :type expected: int
+        """
+        Exception.__init__(self, 'stream: %s, chunk: %s expected: %s' % (sn, seq, expected))
+
+
 class Policy(object):
     """
     The method invocation policy.
@@ -145,6 +171,28 @@ class Policy(object):
         else:
             return None
 
+    @property
+    def deadline(self):
+        if self.options.deadline:
+            return Timeout.seconds(self.options.deadline)
+        else:
+            return None
+
+    @property
+    def timeout(self):
+        if self.options.timeout:
+            return Timeout.seconds(self.options.timeout)
+        else:
+            return None
+
+    @property
+    def notbefore(self):
+        notbefore = self.options.notbefore
+        if isinstance(notbefore, datetime):
+            return timegm(notbefore.utctimetuple())
+        else:
+            return notbefore
+
     @property
     def wait(self):
         return Timeout.seconds(nvl(self.options.wait, 90))
@@ -184,6 +232,38 @@ class Policy(object):
     def exchange(self):
         return self.options.exchange
 
+    @property
+    def codec(self):
+        return self.options.codec
+
+    @property
+    def compression(self):
+        return self.options.compression
+
+    @property
+    def bulk(self):
+        return self.options.bulk
+
+    @property
+    def dedup(self):
+        return self.options.dedup
+
+    @property
+    def dedup_threshold(self):
+        return self.options.dedup_threshold
+
+    @property
+    def spool(self):
+        if self.options.spool:
+            return Spool(self.options.spool)
+        if self.bulk == bulk.SPOOLED:
+            return Spool()
+        return Spool.user()
+
+    @property
+    def compression_threshold(self):
+        return self.options.compression_threshold
+
     def get_reply(self, sn, reader):
         """
         Get the reply matched by serial number.
@@ -191,8 +271,10 @@ class Policy(object):
         :type sn: str
         :param reader: A reader.
         :type reader: gofer.messaging.consumer.Reader
-        :return: The matched reply document.
-        :rtype: Document
+        :return: The returned value or a Stream of the items
+            yielded by a generator remote method.
+        :rtype: object
+        :raise Missing: when referenced values are not stored by the agent.
         """
         timer = Timer()
         timeout = float(self.wait)
@@ -218,6 +300,10 @@ class Policy(object):
                     document.document,
                     document.details)
 
+            # expired
+            if document.status == 'expired':
+                raise RequestTimeout(sn, self.wait)
+
             # accepted | started
             if document.status in ('accepted', 'started'):
                 continue
@@ -227,12 +313,26 @@ class Policy(object):
                 self.on_progress(document)
                 continue
 
+            # values referenced but not stored by the agent
+            if document.status == 'missing':
+                raise Missing(document.digests)
+
+            # bulk data
+            if document.status == 'blob':
+                self.spool.write(document.blob)
+                continue
+
+            # streamed
+            if document.status == 'chunk':
+                return Stream(self, sn, reader, document)
+
             # reply
             return self.on_reply(document)
         
     def on_reply(self, document):
         """
         Handle the reply.
+        Returned blobs are transient (deleted once read).
         :param document: The reply document.
         :type document: Document
         :return: The matched reply document.
@@ -240,6 +340,10 @@ class Policy(object):
         """
         reply = Return(document.result)
         if reply.succeeded():
+            if bulk.is_reference(reply.retval):
+                blob = self.spool.resolve(reply.retval)
+                blob.transient = True
+                return blob
             return reply.retval
         else:
             raise RemoteException.instance(reply)
@@ -311,20 +415,56 @@ class Trigger:
     def sn(self):
         return self._sn
 
-    def _send(self, reply=None, queue=None):
+    def _expiration(self, queue):
         """
-        Send the request using the specified policy
+        Get the (relative) expiration for the request.
+        The agent converts this to a deadline using the timestamp so the
+        time the request is queued in the broker is included.
+        Synchronous requests expire when the caller stops waiting.
+        Otherwise, requests expire based on the (optional) deadline.
+        :param queue: The reply queue for synchronous calls.
+        :type queue: Queue
+        :return: The expiration (seconds) or None.
+        :rtype: int
+        """
+        if queue is not None:
+            return self._policy.wait
+        else:
+            return self._policy.deadline
+
+    def _window(self, queue):
+        """
+        Get the flow control window for streamed replies.
+        Only synchronous callers acknowledge received chunks.
+        :param queue: The reply queue for synchronous calls.
+        :type queue: Queue
+        :return: The number of chunks sent without acknowledgement
+            or None when not flow controlled.
+        :rtype: int
+        """
+        if queue is not None:
+            return Stream.WINDOW
+
+    def _produce(self, reply, queue, blobs=()):
+        """
+        Send the request (and bulk data) using the specified policy
         object and generated serial number.
         :param reply: The AMQP reply address.
         :type reply: str
         :param queue: The reply queue for synchronous calls.
         :type queue: Queue
+        :param blobs: Blobs to be sent in chunks.
+        :type blobs: list
         """
         producer = Producer(self._policy.url)
         producer.authenticator = self._policy.authenticator
+        producer.codec = self._policy.codec
+        producer.compression = self._policy.compression
+        producer.threshold = self._policy.compression_threshold
         producer.open()
 
         try:
+            bulk.send(producer, self._policy.address, blobs, self._policy.ttl, sn=self.sn)
             producer.send(
                 self._policy.address,
                 self._policy.ttl,
@@ -334,12 +474,40 @@ class Trigger:
                 request=self._request,
                 secret=self._policy.secret,
                 pam=self._policy.pam,
+                timeout=self._policy.timeout,
+                expiration=self._expiration(queue),
+                timestamp=timestamp(),
+                notbefore=self._policy.notbefore,
+                window=self._window(queue),
+                bulk=self._policy.bulk,
                 data=self._policy.data)
         finally:
             producer.close()
 
         log.debug('sent (%s): %s', self._policy.address, self._request)
 
+    def _send(self, reply=None, queue=None):
+        """
+        Send the request using the specified policy
+        object and generated serial number.
+        Large arguments are deduplicated for synchronous calls.  When
+        the agent reports that values are missing, the request is sent
+        again with the missing values.
+        :param reply: The AMQP reply address.
+        :type reply: str
+        :param queue: The reply queue for synchronous calls.
+        :type queue: Queue
+        """
+        spool = None
+        if self._policy.bulk == bulk.SPOOLED:
+            spool = self._policy.spool
+        blobs = bulk.outbound(self._request, spool, self.sn)
+        values = {}
+        if self._policy.dedup and queue is not None:
+            values = dedup.outbound(self._request, self._policy.dedup_threshold)
+
+        self._produce(reply, queue, blobs)
+
         if queue is None:
             # no reply expected
             return self._sn
@@ -348,11 +516,22 @@ class Trigger:
         reader.authenticator = self._policy.authenticator
         reader.open()
 
+        streamed = False
         try:
             policy = self._policy
-            return policy.get_reply(self.sn, reader)
+            try:
+                result = policy.get_reply(self.sn, reader)
+            except Missing, missing:
+                dedup.inline(self._request, values, missing.digests)
+                self._produce(reply, queue)
+                result = policy.get_reply(self.sn, reader)
+            streamed = isinstance(result, Stream)
+            if streamed:
+                result.closing.append(reader.close)
+            return result
         finally:
-            reader.close()
+            if not streamed:
+                reader.close()
 
     def __call__(self):
         """
@@ -380,14 +559,172 @@ class Trigger:
             exchange.bind(queue, self._policy.url)
             reply = '/'.join((self._policy.exchange, queue.name))
 
+        streamed = False
         try:
-            return self._send(reply=reply, queue=queue)
+            result = self._send(reply=reply, queue=queue)
+            streamed = isinstance(result, Stream)
+            if streamed:
+                result.closing.append(partial(self._delete, queue))
+            return result
         finally:
-            queue.purge(self._policy.url)
-            queue.delete(self._policy.url)
+            if not streamed:
+                self._delete(queue)
+
+    def _delete(self, queue):
+        """
+        Purge and delete the reply queue.
+        :param queue: The reply queue for synchronous calls.
+        :type queue: Queue
+        """
+        queue.purge(self._policy.url)
+        queue.delete(self._policy.url)
 
     def __unicode__(self):
         return self._sn
 
     def __str__(self):
         return utf8(self)
+
+
+class Stream(object):
+    """
+    An iterator of the items yielded by a generator remote method.
+    Items are yielded as the chunks sent by the agent are received.
+    The reader and reply queue are closed when all of the items have
+    been read.  Streams not read to the end must be closed.
+    Flow control: the agent sends at most WINDOW chunks that have not
+    been acknowledged.  Received chunks are acknowledged (credit is
+    granted) every WINDOW/2 chunks and the agent is told when the stream
+    is closed before finished.  Missing chunks raise StreamError.
+    :ivar policy: The policy object.
+    :type policy: Policy
+    :ivar sn: The request serial number.
+    :type sn: str
+    :ivar reader: The reply reader.
+    :type reader: gofer.messaging.consumer.Reader
+    :ivar items: Received items not yet yielded.
+    :type items: deque
+    :ivar seq: The sequence number of the next chunk.
+    :type seq: int
+    :ivar finished: The final reply has been received.
+    :type finished: bool
+    :ivar closing: Callables called when closed.
+    :type closing: list
+    :ivar producer: Used to grant credit (opened when needed).
+    :type producer: Producer
+    """
+
+    # chunks sent without acknowledgement.
+    WINDOW = 10
+
+    def __init__(self, policy, sn, reader, chunk):
+        """
+        :param policy: The policy object.
+        :type policy: Policy
+        :param sn: The request serial number.
+        :type sn: str
+        :param reader: The reply reader.
+        :type reader: gofer.messaging.consumer.Reader
+        :param chunk: The first chunk received.
+        :type chunk: Document
+        """
+        self.policy = policy
+        self.sn = sn
+        self.reader = reader
+        self.items = deque()
+        self.seq = 0
+        self.finished = False
+        self.closing = []
+        self.producer = None
+        self.push(chunk)
+
+    def push(self, chunk):
+        """
+        Push items in a received chunk.
+        :param chunk: A received chunk.
+        :type chunk: Document
+        """
+        if chunk.seq != self.seq:
+            raise StreamError(self.sn, chunk.seq, self.seq)
+        self.seq = chunk.seq + 1
+        self.items.extend(chunk.items or [])
+        if self.seq % max(1, self.WINDOW / 2) == 0:
+            self.credit(seq=chunk.seq)
+
+    def credit(self, **body):
+        """
+        Grant credit to the agent.
+        Failures are logged.
+        :keyword body: document body.
+        """
+        try:
+            if self.producer is None:
+                self.producer = Producer(self.policy.url)
+                self.producer.authenticator = self.policy.authenticator
+                self.producer.codec = self.policy.codec
+                self.producer.open()
+            self.producer.send(
+                self.policy.address,
+                self.policy.wait,
+                sn=self.sn,
+                status='credit',
+                **body)
+        except Exception:
+            log.exception(self.sn)
+
+    def read(self):
+        """
+        Read the next reply.
+        :raise RequestTimeout: when not received.
+        :raise Exception: returned by the peer.
+        """
+        timeout = self.policy.wait
+        document = self.reader.search(self.sn, int(timeout))
+        if not document:
+            raise RequestTimeout(self.sn, timeout)
+        if document.status == 'chunk':
+            self.push(document)
+            return
+        if document.status == 'progress':
+            self.policy.on_progress(document)
+            return
+        if document.status:
+            return
+        self.finished = True
+        self.policy.on_reply(document)
+
+    def close(self):
+        """
+        Close the reader and delete the reply queue.
+        The agent is told to stop streaming when not finished.
+        """
+        if not self.finished and self.closing:
+            self.credit(seq=self.seq - 1, closed=True)
+        if self.producer is not None:
+            try:
+                self.producer.close()
+            except Exception:
+                log.exception(self.sn)
+            self.producer = None
+        closing = self.closing
+        self.closing = []
+        for fn in closing:
+            try:
+                fn()
+            except Exception:
+                log.exception(self.sn)
+
+    def next(self):
+        while not self.items:
+            if self.finished:
+                self.close()
+                raise StopIteration()
+            try:
+                self.read()
+            except Exception:
+                self.close()
+                raise
+        return self.items.popleft()
+
+    def __iter__(self):
+        return self
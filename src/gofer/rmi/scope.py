@@ -0,0 +1,435 @@
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Jeff Ortel <jortel@redhat.com>
+#
+
+"""
+Provides remote class instance scopes.
+The scope defines the lifecycle of instances of remote classes:
+  - request: A new instance is created for each request (default).
+  - pooled: Instances are reused from a bounded pool keyed by
+    constructor arguments.  An instance is used by one request at a time.
+  - singleton: A single instance (per constructor arguments) is shared
+    by all requests.
+Constructor arguments are supplied by callers so the number of keys
+is bounded.  The least recently used keys are evicted.
+"""
+
+import json
+
+from collections import OrderedDict
+from logging import getLogger
+from threading import RLock
+from time import time
+
+from gofer import NAME
+from gofer.common import synchronized
+
+
+log = getLogger(__name__)
+
+
+REQUEST = 'request'
+POOLED = 'pooled'
+SINGLETON = 'singleton'
+
+
+def key(args, keywords):
+    """
+    Get a (hashable) key for constructor arguments.
+    :param args: The constructor arguments.
+    :type args: list
+    :param keywords: The constructor keyword arguments.
+    :type keywords: dict
+    :return: The key.
+    :rtype: str
+    """
+    return json.dumps([args, keywords], sort_keys=True)
+
+
+def close(inst):
+    """
+    Close an instance that is no longer used.
+    Instances are closed only when they define close().
+    :param inst: An instance.
+    :type inst: object
+    """
+    fn = getattr(inst, 'close', None)
+    if not callable(fn):
+        return
+    try:
+        fn()
+    except Exception:
+        log.exception(repr(inst))
+
+
+class Scope(object):
+    """
+    The request scope.
+    A new instance is created for each request.
+    :ivar cls: A remote class.
+    :type cls: class
+    """
+
+    @staticmethod
+    def create(cls):
+        """
+        Create the scope specified by the @remote decorator on the class.
+        :param cls: A remote class.
+        :type cls: class
+        :return: The scope.
+        :rtype: Scope
+        :raise ValueError: on scope not valid.
+        """
+        options = getattr(cls, NAME, None)
+        scope = REQUEST
+        if options is not None and options.scope:
+            scope = options.scope
+        if scope == REQUEST:
+            return Scope(cls)
+        if scope == POOLED:
+            return Pooled(cls)
+        if scope == SINGLETON:
+            return Singleton(cls)
+        raise ValueError('scope "%s" not valid' % scope)
+
+    def __init__(self, cls):
+        """
+        :param cls: A remote class.
+        :type cls: class
+        """
+        self.cls = cls
+
+    def get(self, args, keywords):
+        """
+        Get an instance.
+        :param args: The constructor arguments.
+        :type args: list
+        :param keywords: The constructor keyword arguments.
+        :type keywords: dict
+        :return: An instance.
+        """
+        return self.cls(*args, **keywords)
+
+    def release(self, inst, args, keywords):
+        """
+        Release an instance obtained using get().
+        :param inst: An instance.
+        :param args: The constructor arguments.
+        :type args: list
+        :param keywords: The constructor keyword arguments.
+        :type keywords: dict
+        """
+        pass
+
+    def clear(self):
+        """
+        Close and discard all instances.
+        """
+        pass
+
+
+class Pooled(Scope):
+    """
+    The pooled scope.
+    Idle instances are reused from a bounded pool keyed by
+    constructor arguments.  Instances idle longer than IDLE seconds
+    are evicted and closed.  When the pool has more than KEYS keys,
+    the idle instances of the least recently used key are evicted
+    and closed.  Evicted instances are closed after the pool
+    is unlocked.
+    :cvar scheduler: Used to schedule eviction (set by the agent).
+        Provides add(due, fn).  Idle instances are evicted only
+        when the pool is used when not set.
+    :type scheduler: gofer.agent.timer.TimerQueue
+    :ivar pool: Idle instances by key (LRU): {key: [(inst, released),]}.
+    :type pool: OrderedDict
+    :ivar scheduled: Eviction is scheduled.
+    :type scheduled: bool
+    """
+
+    # maximum idle instances for each key.
+    CAPACITY = 10
+    # maximum keys.
+    KEYS = 100
+    # seconds an instance may be idle before evicted.
+    IDLE = 300
+
+    scheduler = None
+
+    def __init__(self, cls):
+        """
+        :param cls: A remote class.
+        :type cls: class
+        """
+        super(Pooled, self).__init__(cls)
+        self.pool = OrderedDict()
+        self.scheduled = False
+        self.__mutex = RLock()
+
+    def get(self, args, keywords):
+        """
+        Get an idle instance from the pool.
+        Created when none are idle.
+        :param args: The constructor arguments.
+        :type args: list
+        :param keywords: The constructor keyword arguments.
+        :type keywords: dict
+        :return: An instance.
+        """
+        for evicted in self.evict():
+            close(evicted)
+        inst = self.pop(key(args, keywords))
+        if inst is None:
+            inst = self.cls(*args, **keywords)
+        return inst
+
+    def release(self, inst, args, keywords):
+        """
+        Return an instance to the pool.
+        Closed when the pool is full.
+        :param inst: An instance.
+        :param args: The constructor arguments.
+        :type args: list
+        :param keywords: The constructor keyword arguments.
+        :type keywords: dict
+        """
+        pushed, evicted = self.push(key(args, keywords), inst)
+        if not pushed:
+            evicted.append(inst)
+        for discarded in evicted:
+            close(discarded)
+
+    def sweep(self):
+        """
+        Scheduled eviction.
+        Scheduled again while instances are idle.
+        """
+        for evicted in self.evict():
+            close(evicted)
+        self.reschedule()
+
+    def clear(self):
+        """
+        Close and discard all instances.
+        """
+        for inst in self.drain():
+            close(inst)
+
+    @synchronized
+    def pop(self, k):
+        """
+        Pop the most recently released idle instance.
+        :param k: The key.
+        :type k: str
+        :return: The instance or None.
+        """
+        idle = self.pool.pop(k, None)
+        if not idle:
+            return None
+        inst = idle.pop()[0]
+        if idle:
+            self.pool[k] = idle
+        return inst
+
+    @synchronized
+    def push(self, k, inst):
+        """
+        Push an idle instance.
+        The idle instances of the least recently used
+        keys are evicted when the pool has more than KEYS keys.
+        :param k: The key.
+        :type k: str
+        :param inst: An instance.
+        :return: A tuple of: (pushed, evicted instances).
+        :rtype: tuple
+        """
+        evicted = []
+        idle = self.pool.pop(k, [])
+        self.pool[k] = idle
+        pushed = len(idle) < self.CAPACITY
+        if pushed:
+            idle.append((inst, time()))
+        while len(self.pool) > self.KEYS:
+            _, discarded = self.pool.popitem(last=False)
+            evicted.extend(i for i, released in discarded)
+        self.schedule()
+        return pushed, evicted
+
+    @synchronized
+    def schedule(self):
+        """
+        Schedule eviction using the scheduler.
+        """
+        if self.scheduled or self.scheduler is None:
+            return
+        self.scheduler.add(time() + self.IDLE, self.sweep)
+        self.scheduled = True
+
+    @synchronized
+    def reschedule(self):
+        """
+        Schedule eviction again while instances are idle.
+        """
+        self.scheduled = False
+        if self.pool:
+            self.schedule()
+
+    @synchronized
+    def evict(self):
+        """
+        Evict instances idle longer than IDLE seconds.
+        :return: The evicted instances.
+        :rtype: list
+        """
+        evicted = []
+        oldest = time() - self.IDLE
+        for k, idle in self.pool.items():
+            evicted.extend(i for i, released in idle if released < oldest)
+            idle[:] = [(i, released) for i, released in idle if released >= oldest]
+            if not idle:
+                del self.pool[k]
+        return evicted
+
+    @synchronized
+    def drain(self):
+        """
+        Discard all instances.
+        :return: The discarded instances.
+        :rtype: list
+        """
+        drained = []
+        for idle in self.pool.values():
+            drained.extend(i for i, released in idle)
+        self.pool = OrderedDict()
+        return drained
+
+
+class Singleton(Scope):
+    """
+    The singleton scope.
+    A single instance (for each set of constructor arguments)
+    is shared by all requests.  When there are more than KEYS
+    instances, the least recently used instance is discarded.
+    Discarded instances are closed once no longer used and
+    after the scope is unlocked.
+    :ivar instances: Instances by key (LRU).
+    :type instances: OrderedDict
+    :ivar used: The number of requests using each instance by id.
+    :type used: dict
+    """
+
+    # maximum keys.
+    KEYS = 100
+
+    def __init__(self, cls):
+        """
+        :param cls: A remote class.
+        :type cls: class
+        """
+        super(Singleton, self).__init__(cls)
+        self.instances = OrderedDict()
+        self.used = {}
+        self.__mutex = RLock()
+
+    def get(self, args, keywords):
+        """
+        Get the shared instance.
+        :param args: The constructor arguments.
+        :type args: list
+        :param keywords: The constructor keyword arguments.
+        :type keywords: dict
+        :return: An instance.
+        """
+        inst, discarded = self.acquire(args, keywords)
+        for unused in discarded:
+            close(unused)
+        return inst
+
+    def release(self, inst, args, keywords):
+        """
+        Release the shared instance.
+        Discarded instances are closed when no longer used.
+        :param inst: An instance.
+        :param args: The constructor arguments.
+        :type args: list
+        :param keywords: The constructor keyword arguments.
+        :type keywords: dict
+        """
+        if self.unused(inst, args, keywords):
+            close(inst)
+
+    def clear(self):
+        """
+        Close and discard all instances.
+        """
+        for inst in self.drain():
+            close(inst)
+
+    @synchronized
+    def acquire(self, args, keywords):
+        """
+        Acquire the shared instance.
+        Created as needed.
+        :param args: The constructor arguments.
+        :type args: list
+        :param keywords: The constructor keyword arguments.
+        :type keywords: dict
+        :return: A tuple of: (instance, discarded instances not used).
+        :rtype: tuple
+        """
+        discarded = []
+        k = key(args, keywords)
+        inst = self.instances.pop(k, None)
+        if inst is None:
+            inst = self.cls(*args, **keywords)
+        self.instances[k] = inst
+        self.used[id(inst)] = self.used.get(id(inst), 0) + 1
+        while len(self.instances) > self.KEYS:
+            _, lru = self.instances.popitem(last=False)
+            if id(lru) not in self.used:
+                discarded.append(lru)
+        return inst, discarded
+
+    @synchronized
+    def unused(self, inst, args, keywords):
+        """
+        Release the shared instance.
+        :param inst: An instance.
+        :param args: The constructor arguments.
+        :type args: list
+        :param keywords: The constructor keyword arguments.
+        :type keywords: dict
+        :return: True when discarded and no longer used.
+        :rtype: bool
+        """
+        if id(inst) not in self.used:
+            # cleared
+            return False
+        used = self.used.pop(id(inst)) - 1
+        if used > 0:
+            self.used[id(inst)] = used
+            return False
+        return self.instances.get(key(args, keywords)) is not inst
+
+    @synchronized
+    def drain(self):
+        """
+        Discard all instances.
+        :return: The discarded instances.
+        :rtype: list
+        """
+        drained = self.instances.values()
+        self.instances = OrderedDict()
+        self.used = {}
+        return drained
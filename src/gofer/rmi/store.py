@@ -25,8 +25,9 @@ from Queue import Queue, Empty
 
 from gofer import NAME, Thread
 from gofer.common import mkdir, rmdir, unlink
-from gofer.messaging import Document
+from gofer.messaging import Document, RequestEnvelope
 from gofer.rmi.tracker import Tracker
+from gofer.rmi.dispatcher import deadline
 
 
 log = getLogger(__name__)
@@ -43,6 +44,7 @@ class Pending(object):
     def _write(request, path):
         """
         Write a request to the journal.
+        The encoding of the received (frozen) request is reused.
         :param request: An AMQP request.
         :type request: Document
         :param path: The destination path.
@@ -118,7 +120,7 @@ class Pending(object):
             if not request:
                 # read failed
                 continue
-            self._put(request, path)
+            self._put(request, path, os.path.getmtime(path))
         self.is_open = True
 
     def put(self, request):
@@ -134,14 +136,14 @@ class Pending(object):
         fn = self.sequential.next()
         path = os.path.join(Pending.PENDING, self.stream, fn)
         Pending._write(request, path)
-        self._put(request, path)
+        self._put(request, path, time())
 
     def get(self):
         """
         Get the next pending request to be dispatched.
         Blocks until a request is available.
         :return: The next pending request.
-        :rtype: Document
+        :rtype: RequestEnvelope
         :raise Empty: on thread aborted.
         """
         while not Thread.aborted():
@@ -190,15 +192,23 @@ class Pending(object):
             except Empty:
                 break
 
-    def _put(self, request, jnl_path):
+    def _put(self, request, jnl_path, received):
         """
         Enqueue the request.
+        The request is queued using a (compact) envelope.
+        The (relative) expiration is converted to a deadline.
+        See: gofer.rmi.dispatcher.deadline().
         :param request: An AMQP request.
         :type request: Document
         :param jnl_path: Path to the associated journal file.
         :type jnl_path: str
+        :param received: When the request was received (seconds since the epoch).
+        :type received: float
         """
+        request = RequestEnvelope(request)
         request.ts = time()
+        if request.expiration:
+            request.deadline = deadline(request, received)
         tracker = Tracker()
         tracker.add(request.sn, request.data)
         self.journal[request.sn] = jnl_path
@@ -14,18 +14,415 @@ Request tracker classes.
 """
 import os
 
-from threading import RLock
+from logging import getLogger
+from threading import RLock, Event, Condition
+from time import time
 
 from gofer import Singleton, synchronized, NAME
-from gofer.common import mkdir
+from gofer.common import mkdir, rmdir, unlink
+
+
+log = getLogger(__name__)
+
+
+def hashable(thing):
+    """
+    Get whether a thing is hashable.
+    :param thing: Any object.
+    :return: True if hashable.
+    :rtype: bool
+    """
+    try:
+        hash(thing)
+        return True
+    except TypeError:
+        return False
+
+
+class Index(object):
+    """
+    Secondary indexes on tracked request locators.
+    Used to plan criteria based queries.  The planned (candidate) serial
+    numbers are a superset of the matched requests and must be verified
+    using the criteria.
+    :ivar values: Serial numbers by (hashable) locator.
+    :type values: dict
+    :ivar keys: Serial numbers by top-level key and (hashable) value
+        of dictionary locators: {key: {value: set}}.
+    :type keys: dict
+    :ivar present: Serial numbers by top-level key of dictionary locators.
+    :type present: dict
+    :ivar unhashable: Serial numbers by top-level key of dictionary
+        locators for which the value is not hashable.
+    :type unhashable: dict
+    :ivar dicts: Serial numbers of dictionary locators.
+    :type dicts: set
+    :ivar other: Serial numbers of other (not hashable) locators.
+    :type other: set
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.keys = {}
+        self.present = {}
+        self.unhashable = {}
+        self.dicts = set()
+        self.other = set()
+
+    def add(self, sn, locator):
+        """
+        Index a request.
+        :param sn: An RMI serial number.
+        :type sn: str
+        :param locator: The request locator.
+        :type locator: object
+        """
+        if isinstance(locator, dict):
+            self.dicts.add(sn)
+            for k, v in locator.items():
+                self.present.setdefault(k, set()).add(sn)
+                if hashable(v):
+                    self.keys.setdefault(k, {}).setdefault(v, set()).add(sn)
+                else:
+                    self.unhashable.setdefault(k, set()).add(sn)
+            return
+        if hashable(locator):
+            self.values.setdefault(locator, set()).add(sn)
+        else:
+            self.other.add(sn)
+
+    def remove(self, sn, locator):
+        """
+        Remove an indexed request.
+        :param sn: An RMI serial number.
+        :type sn: str
+        :param locator: The request locator.
+        :type locator: object
+        """
+        if isinstance(locator, dict):
+            self.dicts.discard(sn)
+            for k, v in locator.items():
+                self.discard(self.present, k, sn)
+                if hashable(v):
+                    values = self.keys.get(k, {})
+                    self.discard(values, v, sn)
+                    if not values:
+                        self.keys.pop(k, None)
+                else:
+                    self.discard(self.unhashable, k, sn)
+            return
+        if hashable(locator):
+            self.discard(self.values, locator, sn)
+        else:
+            self.other.discard(sn)
+
+    @staticmethod
+    def discard(index, key, sn):
+        """
+        Discard a serial number in an index entry.
+        The entry is deleted when empty.
+        :param index: An index.
+        :type index: dict
+        :param key: The entry key.
+        :param sn: An RMI serial number.
+        :type sn: str
+        """
+        entry = index.get(key)
+        if entry is None:
+            return
+        entry.discard(sn)
+        if not entry:
+            del index[key]
+
+    def match(self, key, value):
+        """
+        Get candidates for which the locator is a dictionary and
+        the value of the key is equal to *value* or not specified.
+        :param key: A top-level key.
+        :param value: The value.
+        :return: The set of serial numbers.
+        :rtype: set
+        """
+        if not hashable(value):
+            return set(self.dicts)
+        candidates = self.dicts - self.present.get(key, set())
+        candidates |= self.keys.get(key, {}).get(value, set())
+        candidates |= self.unhashable.get(key, set())
+        return candidates
+
+    def equal(self, value):
+        """
+        Get candidates for which the locator is equal to the value.
+        :param value: The value.
+        :return: The set of serial numbers or None
+            when the index cannot be used.
+        :rtype: set
+        """
+        if isinstance(value, dict):
+            if not value:
+                return None
+            planned = None
+            for k, v in value.items():
+                if hashable(v):
+                    candidates = self.keys.get(k, {}).get(v, set())
+                    candidates = candidates | self.unhashable.get(k, set())
+                else:
+                    candidates = set(self.present.get(k, set()))
+                if planned is None:
+                    planned = candidates
+                else:
+                    planned &= candidates
+            return planned
+        if hashable(value):
+            return self.values.get(value, set()) | self.other
+        return None
+
+    def equal_any(self, values):
+        """
+        Get candidates for which the locator is equal to any of the values.
+        :param values: A collection of values.
+        :return: The set of serial numbers or None
+            when the index cannot be used.
+        :rtype: set
+        """
+        planned = set()
+        for value in values:
+            candidates = self.equal(value)
+            if candidates is None:
+                return None
+            planned |= candidates
+        return planned
+
+
+class Signal(object):
+    """
+    A per-request cancellation signal.
+    Set by the tracker when the request is cancelled.
+    :ivar event: Set when cancelled.
+    :type event: Event
+    :ivar callbacks: Called when cancelled.
+    :type callbacks: list
+    """
+
+    def __init__(self):
+        self.event = Event()
+        self.callbacks = []
+        self.__mutex = RLock()
+
+    def set(self):
+        """
+        Set the signal and notify registered callbacks.
+        """
+        for fn in self.__set():
+            try:
+                fn()
+            except Exception:
+                log.exception(repr(fn))
+
+    @synchronized
+    def __set(self):
+        """
+        Set the event.
+        :return: The callbacks to be notified.
+        :rtype: list
+        """
+        self.event.set()
+        callbacks = self.callbacks
+        self.callbacks = []
+        return callbacks
+
+    def register(self, fn):
+        """
+        Register a callback.
+        Called immediately when already set.
+        :param fn: A callable.
+        :type fn: callable
+        """
+        if not self.__register(fn):
+            fn()
+
+    @synchronized
+    def __register(self, fn):
+        """
+        Add a callback when not set.
+        :param fn: A callable.
+        :type fn: callable
+        :return: True if added.
+        :rtype: bool
+        """
+        if self.event.is_set():
+            return False
+        self.callbacks.append(fn)
+        return True
+
+    def is_set(self):
+        """
+        Get whether the signal is set.
+        :return: True if set.
+        :rtype: bool
+        """
+        return self.event.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the signal to be set.
+        :param timeout: The (optional) timeout (seconds).
+        :type timeout: float
+        :return: True if set.
+        :rtype: bool
+        """
+        return self.event.wait(timeout)
+
+
+class Window(object):
+    """
+    Flow control for the chunks of a streamed request.
+    At most *size* chunks are sent but not acknowledged by the caller.
+    :ivar size: The number of chunks sent without acknowledgement.
+    :type size: int
+    :ivar acked: The sequence number of the last acknowledged chunk.
+    :type acked: int
+    :ivar closed: The caller stopped reading the stream.
+    :type closed: bool
+    """
+
+    def __init__(self, size):
+        """
+        :param size: The number of chunks sent without acknowledgement.
+        :type size: int
+        """
+        self.size = max(1, size)
+        self.acked = -1
+        self.closed = False
+        self.condition = Condition()
+
+    def ack(self, seq):
+        """
+        Chunks have been received by the caller.
+        :param seq: The sequence number of the last chunk received.
+        :type seq: int
+        """
+        with self.condition:
+            self.acked = max(self.acked, seq)
+            self.condition.notify_all()
+
+    def close(self):
+        """
+        The caller stopped reading the stream.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def wait(self, seq, timeout):
+        """
+        Wait until the chunk may be sent.
+        :param seq: The sequence number of the chunk.
+        :type seq: int
+        :param timeout: The timeout (seconds).
+        :type timeout: float
+        :return: True if the chunk may be sent.  False when the
+            caller stopped reading or has not acknowledged chunks
+            within the timeout.
+        :rtype: bool
+        """
+        deadline = time() + timeout
+        with self.condition:
+            while not self.closed and seq - self.acked > self.size:
+                remaining = deadline - time()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+            return not self.closed
+
+
+class Credit(object):
+    """
+    Flow control windows for streamed requests by serial number.
+    Credit is granted when the caller acknowledges received chunks.
+    :ivar __windows: Windows by serial number.
+    :type __windows: dict
+    """
+
+    __metaclass__ = Singleton
+
+    def __init__(self):
+        self.__windows = {}
+        self.__mutex = RLock()
+
+    @synchronized
+    def open(self, sn, size):
+        """
+        Open the window for a streamed request.
+        :param sn: An RMI serial number.
+        :type sn: str
+        :param size: The number of chunks sent without acknowledgement.
+        :type size: int
+        :return: The window.
+        :rtype: Window
+        """
+        window = Window(size)
+        self.__windows[sn] = window
+        return window
+
+    @synchronized
+    def close(self, sn):
+        """
+        Close the window for a streamed request.
+        :param sn: An RMI serial number.
+        :type sn: str
+        """
+        self.__windows.pop(sn, None)
+
+    @synchronized
+    def find(self, sn):
+        """
+        Find the window for a streamed request.
+        :param sn: An RMI serial number.
+        :type sn: str
+        :return: The window or None.
+        :rtype: Window
+        """
+        return self.__windows.get(sn)
+
+    def grant(self, sn, seq, closed=False):
+        """
+        Grant credit for a streamed request.
+        :param sn: An RMI serial number.
+        :type sn: str
+        :param seq: The sequence number of the last chunk received.
+        :type seq: int
+        :param closed: The caller stopped reading the stream.
+        :type closed: bool
+        """
+        window = self.find(sn)
+        if window is None:
+            return
+        if closed:
+            window.close()
+        else:
+            window.ack(seq)
+
+    @synchronized
+    def __len__(self):
+        return len(self.__windows)
 
 
 class Tracker:
     """
     Request tracker used to track information about
-    active RMI requests.
+    active RMI requests.  Requests are removed when the
+    transaction is committed or discarded.  Requests tracked
+    longer than TTL seconds that are no longer pending are
+    removed by sweep().
     :ivar __all: All known requests by serial number.
     :type __all: dict
+    :ivar __added: When requests were added by serial number.
+    :type __added: dict
+    :ivar __signals: Cancellation signals by serial number.
+    :type __signals: dict
+    :ivar __index: Secondary indexes on request locators.
+    :type __index: Index
     :ivar __cancelled: Cancelled requests.
     :type __cancelled: Canceled
     :ivar __mutex: The object mutex.
@@ -34,8 +431,14 @@ class Tracker:
 
     __metaclass__ = Singleton
 
+    # seconds a request (no longer pending) may be tracked.
+    TTL = 86400
+
     def __init__(self):
         self.__all = dict()
+        self.__added = dict()
+        self.__signals = dict()
+        self.__index = Index()
         self.__cancelled = Canceled()
         self.__mutex = RLock()
 
@@ -49,36 +452,88 @@ class Tracker:
             on RMI requests.
         :type locator: object
         """
+        if sn in self.__all:
+            self.__index.remove(sn, self.__all[sn])
         self.__all[sn] = locator
+        self.__added[sn] = time()
+        self.__index.add(sn, locator)
 
-    @synchronized
     def find(self, criteria):
         """
         Find serial numbers matching user defined (any) data.
+        The candidates are selected using the index when possible.
+        Candidates are matched without holding the tracker lock.
         :param criteria: The object used to match RMI requests.
         :type criteria: gofer.rmi.criteria.Criteria
         :return: The list of matching serial numbers.
         :rtype: list
         """
         matched = []
-        for sn, locator in self.__all.items():
+        for sn, locator in self.select(criteria):
             if criteria.match(locator):
                 matched.append(sn)
         return matched
 
     @synchronized
+    def select(self, criteria):
+        """
+        Select candidate requests for the criteria.
+        :param criteria: The object used to match RMI requests.
+        :type criteria: gofer.rmi.criteria.Criteria
+        :return: List of: (sn, locator).
+        :rtype: list
+        """
+        planned = criteria.plan(self.__index)
+        if planned is None:
+            return self.__all.items()
+        return [(sn, self.__all[sn]) for sn in planned if sn in self.__all]
+
+    @synchronized
+    def signal(self, sn):
+        """
+        Get the cancellation signal for an RMI request.
+        :param sn: An RMI serial number.
+        :type sn: str
+        :return: The signal.
+        :rtype: Signal
+        """
+        signal = self.__signals.get(sn)
+        if signal is None:
+            signal = Signal()
+            if sn in self.__cancelled:
+                signal.event.set()
+            if sn in self.__all:
+                self.__signals[sn] = signal
+        return signal
+
     def cancel(self, sn):
         """
         Notify the tracker that an RMI request has been cancelled.
+        The cancellation signal for the request is set.
         :param sn: An RMI serial number.
         :type sn: str
         :return: The cancelled serial number (if not already cancelled).
         :rtype: str
         """
+        cancelled, signal = self.__cancel(sn)
+        if signal is not None:
+            signal.set()
+        return cancelled
+
+    @synchronized
+    def __cancel(self, sn):
+        """
+        Add the serial number to the cancelled collection.
+        :param sn: An RMI serial number.
+        :type sn: str
+        :return: tuple of: (sn, signal).  The sn is None when already cancelled.
+        :rtype: tuple
+        """
         if sn in self.__all:
             if sn not in self.__cancelled:
                 self.__cancelled.add(sn)
-                return sn
+                return sn, self.__signals.get(sn)
+            return None, None
         else:
             raise Exception('serial number (%s), not-found' % sn)
 
@@ -100,22 +555,141 @@ class Tracker:
         :param sn: An RMI serial number.
         :type sn: str
         """
-        self.__all.pop(sn, 0)
+        if sn in self.__all:
+            self.__index.remove(sn, self.__all.pop(sn))
+            del self.__added[sn]
+        self.__signals.pop(sn, None)
         self.__cancelled.delete(sn)
 
+    @synchronized
+    def sweep(self, ttl=None, pending=()):
+        """
+        Remove requests tracked longer than the TTL and
+        canceled serial numbers for requests no longer tracked.
+        Pending requests are not removed regardless of how long
+        they have been tracked.  Eg: delayed by notbefore.
+        :param ttl: The TTL (seconds).  Default: TTL.
+        :type ttl: float
+        :param pending: The serial numbers of pending requests.
+        :type pending: collection
+        :return: The removed serial numbers.
+        :rtype: list
+        """
+        oldest = time() - (ttl or self.TTL)
+        swept = [sn for sn, added in self.__added.items() if added < oldest and sn not in pending]
+        for sn in swept:
+            self.remove(sn)
+        for sn in self.__cancelled:
+            if sn not in self.__all:
+                self.__cancelled.delete(sn)
+        return swept
+
+    @synchronized
+    def __contains__(self, sn):
+        return sn in self.__all
+
+    @synchronized
+    def __len__(self):
+        return len(self.__all)
+
 
 class Canceled(object):
     """
     Persistent collection of canceled requests by serial number.
+    Stored in a single (append only) journal file.  Each line records
+    an added (+sn) or deleted (-sn) serial number.  The journal is
+    compacted when loaded and when the number of records exceeds
+    twice the size of the collection (and COMPACT).  Serial numbers
+    stored (one file each) in the legacy directory are migrated.
     :ivar collection: The set canceled requests (serial number).
     :type collection: set
+    :ivar records: The number of records in the journal.
+    :type records: int
     """
 
     PATH = '/var/lib/%s/messaging/canceled' % NAME
+    JOURNAL = '/var/lib/%s/messaging/canceled.jnl' % NAME
+
+    # minimum records before the journal is compacted.
+    COMPACT = 1000
 
     def __init__(self):
-        mkdir(Canceled.PATH)
-        self.collection = set(os.listdir(Canceled.PATH))
+        mkdir(os.path.dirname(Canceled.JOURNAL))
+        self.collection = set()
+        self.records = 0
+        self.fp = None
+        self.load()
+        self.migrate()
+        self.compact()
+
+    def load(self):
+        """
+        Load the collection by replaying the journal.
+        """
+        try:
+            fp = open(Canceled.JOURNAL)
+        except IOError:
+            return
+        try:
+            for line in fp:
+                line = line.strip()
+                if line.startswith('+'):
+                    self.collection.add(line[1:])
+                    continue
+                if line.startswith('-'):
+                    self.collection.discard(line[1:])
+                    continue
+        finally:
+            fp.close()
+
+    def migrate(self):
+        """
+        Migrate serial numbers stored in the legacy directory.
+        """
+        if not os.path.isdir(Canceled.PATH):
+            return
+        for sn in os.listdir(Canceled.PATH):
+            self.collection.add(sn)
+            unlink(os.path.join(Canceled.PATH, sn))
+        rmdir(Canceled.PATH)
+        log.info('%s, migrated', Canceled.PATH)
+
+    def compact(self):
+        """
+        Rewrite the journal using the current collection.
+        """
+        self.close()
+        path = Canceled.JOURNAL + '.tmp'
+        fp = open(path, 'w')
+        try:
+            for sn in self.collection:
+                fp.write('+%s\n' % sn)
+        finally:
+            fp.close()
+        os.rename(path, Canceled.JOURNAL)
+        self.records = len(self.collection)
+
+    def write(self, record):
+        """
+        Append a record to the journal.
+        :param record: A journal record.
+        :type record: str
+        """
+        if self.fp is None:
+            self.fp = open(Canceled.JOURNAL, 'a')
+        self.fp.write(record + '\n')
+        self.fp.flush()
+        self.records += 1
+        if self.records > max(Canceled.COMPACT, len(self.collection) * 2):
+            self.compact()
+
+    def close(self):
+        """
+        Close the journal.
+        """
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
 
     def add(self, sn):
         """
@@ -123,12 +697,10 @@ class Canceled(object):
         :param sn: A canceled request serial number.
         :rtype: str
         """
+        if sn in self.collection:
+            return
         self.collection.add(sn)
-        fp = open(os.path.join(Canceled.PATH, sn), 'w+')
-        try:
-            fp.write(sn)
-        finally:
-            fp.close()
+        self.write('+%s' % sn)
 
     def delete(self, sn):
         """
@@ -136,14 +708,16 @@ class Canceled(object):
         :param sn: A canceled request serial number.
         :rtype: str
         """
-        try:
-            self.collection.remove(sn)
-        except KeyError:
-            pass
-        try:
-            os.unlink(os.path.join(Canceled.PATH, sn))
-        except OSError:
-            pass
+        if sn not in self.collection:
+            return
+        self.collection.remove(sn)
+        self.write('-%s' % sn)
 
     def __contains__(self, sn):
         return sn in self.collection
+
+    def __iter__(self):
+        return iter(list(self.collection))
+
+    def __len__(self):
+        return len(self.collection)
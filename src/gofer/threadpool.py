@@ -18,7 +18,7 @@ Thread Pool classes.
 """
 
 from uuid import uuid4
-from Queue import Queue, Empty
+from Queue import Queue, Empty, Full
 from logging import getLogger
 
 from gofer.common import Thread, released, utf8
@@ -66,14 +66,20 @@ class Worker(Thread):
             except Exception:
                 log.exception(utf8(call))
 
-    def put(self, call):
+    def put(self, call, block=True):
         """
         Enqueue a call.
         :param call: A call to queue.
         :type call: Call
+        :param block: Block while the backlog is full.
+        :type block: bool
+        :raise Full: when not blocking and the backlog is full.
         """
-        self.queue.put(call)
-        self.queue.put(1)  # busy
+        self.queue.put(call, block)
+        try:
+            self.queue.put(1, block)  # busy
+        except Full:
+            pass
 
     def drain(self):
         """
@@ -190,18 +196,42 @@ class ThreadPool:
         call = Call(call_id, fn, args, kwargs)
         return self.schedule(call)
 
-    def schedule(self, call):
+    def offer(self, fn, *args, **kwargs):
+        """
+        Schedule a call without blocking.
+        Intended for callers that must not block.  Eg: the agent timer.
+        :param fn: A function/method to execute.
+        :type fn: callable
+        :param args: The args passed to fn()
+        :type args: tuple
+        :param kwargs: The keyword args passed fn()
+        :type kwargs: dict
+        :return: True if scheduled.  False when the backlog is full.
+        :rtype: bool
+        """
+        call_id = uuid4()
+        call = Call(call_id, fn, args, kwargs)
+        try:
+            self.schedule(call, False)
+            return True
+        except Full:
+            return False
+
+    def schedule(self, call, block=True):
         """
         Schedule a call.
         :param call: A call to schedule for execution.
         :param call: Call
+        :param block: Block while the backlog is full.
+        :type block: bool
         :return: The call ID.
         :rtype: str
+        :raise Full: when not blocking and the backlog is full.
         """
         pool = [(t.backlog(), t) for t in self.threads]
         pool.sort()
         backlog, worker = pool[0]
-        worker.put(call)
+        worker.put(call, block)
 
     def shutdown(self):
         """
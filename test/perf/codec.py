@@ -0,0 +1,123 @@
+#! /usr/bin/env python
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+#
+# Jeff Ortel <jortel@redhat.com>
+#
+
+"""
+Measure the encoded size and the encode/decode time of the
+registered codecs using (realistic) reply documents.
+  - packages: A list of installed packages.
+  - inventory: A list of (libvirt) domains.
+"""
+
+import os
+import sys
+
+from optparse import OptionParser
+from uuid import uuid4
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/'))
+
+from gofer.messaging import Document
+from gofer.messaging import codec
+from gofer.metrics import Timer
+from gofer.rmi.dispatcher import Return
+
+
+def reply(retval):
+    return Document(
+        sn=str(uuid4()),
+        version='2.0',
+        routing=['agent', 'client'],
+        data={'task_id': str(uuid4())},
+        result=Return.succeed(retval),
+        timestamp='2015-06-01T12:00:00Z')
+
+
+def packages(n):
+    _list = []
+    for i in xrange(n):
+        p = dict(
+            name='package-%d' % i,
+            epoch='0',
+            version='%d.%d.%d' % (i % 7, i % 11, i % 13),
+            release='%d.el7' % (i % 5),
+            arch=('x86_64', 'noarch', 'i686')[i % 3],
+            vendor='Red Hat, Inc.',
+            size=i * 1024,
+            installed=1433160000 + i)
+        _list.append(p)
+    return reply(_list)
+
+
+def inventory(n):
+    _list = []
+    for i in xrange(n):
+        d = dict(
+            uuid=str(uuid4()),
+            name='domain-%d' % i,
+            state=('running', 'shutoff', 'paused')[i % 3],
+            memory=2097152,
+            vcpus=2,
+            disks=[
+                dict(device='vd%s' % c, path='/var/lib/libvirt/images/%d-%s.qcow2' % (i, c), size=10737418240)
+                for c in 'ab'
+            ],
+            interfaces=[
+                dict(mac='52:54:00:%02x:%02x:01' % (i / 256 % 256, i % 256), network='default')
+            ],
+            metadata=Document(owner='admin', tags=['web', 'prod'], created=1433160000 + i))
+        _list.append(d)
+    return reply(_list)
+
+
+def report(label, name, calls, size, encoding, decoding):
+    print '%s [%s]: size=%d (bytes), encode=%.3f (ms), decode=%.3f (ms)' % (
+        label,
+        name,
+        size,
+        (encoding.duration() / calls) * 1000,
+        (decoding.duration() / calls) * 1000)
+
+
+def run(label, document, calls):
+    for name in sorted(codec.registry):
+        encoding = Timer()
+        encoding.start()
+        for n in xrange(calls):
+            s = document.dump(name)
+        encoding.stop()
+        decoding = Timer()
+        decoding.start()
+        for n in xrange(calls):
+            Document().load(s)
+        decoding.stop()
+        report(label, name, calls, len(s), encoding, decoding)
+
+
+def main():
+    parser = OptionParser(description='Codec benchmark')
+    parser.add_option('-n', '--calls', default=20, type='int', help='calls per codec')
+    parser.add_option('-p', '--packages', default=2000, type='int', help='number of packages')
+    parser.add_option('-d', '--domains', default=500, type='int', help='number of domains')
+    options, _ = parser.parse_args()
+    calls = options.calls
+    if 'msgpack' not in codec.registry:
+        print 'msgpack: not installed'
+    run('packages', packages(options.packages), calls)
+    run('inventory', inventory(options.domains), calls)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#! /usr/bin/env python
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+#
+# Jeff Ortel <jortel@redhat.com>
+#
+
+"""
+Measure the overhead of the synchronized decorator and the throughput
+of (read mostly) Whiteboard and plugin Container reads by concurrent threads.
+The (legacy) decorator that resolves the mutex on each call and a
+fully locked Whiteboard are included for comparison.
+"""
+
+import os
+import sys
+import inspect
+
+from optparse import OptionParser
+from threading import Thread, RLock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/'))
+
+from gofer.common import synchronized
+from gofer.metrics import Timer
+from gofer.agent.plugin import Container
+from gofer.agent.whiteboard import Whiteboard
+
+
+def legacy(fn):
+    def sfn(*args, **kwargs):
+        inst = args[0]
+        bases = list(inspect.getmro(inst.__class__))
+        mutex = None
+        for cn in [c.__name__ for c in bases]:
+            name = '_%s__mutex' % cn
+            if hasattr(inst, name):
+                mutex = getattr(inst, name)
+                break
+        mutex.acquire()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            mutex.release()
+    return sfn
+
+
+class Base(object):
+
+    def __init__(self):
+        self.__mutex = RLock()
+
+
+class Thing(Base):
+
+    @synchronized
+    def cached(self):
+        pass
+
+    @legacy
+    def resolved(self):
+        pass
+
+
+class LockedWhiteboard(object):
+
+    def __init__(self):
+        self.__dict = {}
+        self.__mutex = RLock()
+
+    @synchronized
+    def get(self, name, default=None):
+        return self.__dict.get(name, default)
+
+    @synchronized
+    def __setitem__(self, name, value):
+        self.__dict[name] = value
+
+
+class Plugin(object):
+
+    def __init__(self, n):
+        self.name = 'plugin-%d' % n
+        self.path = '/etc/gofer/plugins/%s.conf' % self.name
+
+
+def report(label, threads, calls, timer):
+    duration = timer.duration()
+    total = threads * calls
+    print '%s: threads=%d, calls=%d, total=%s, percall=%.3f (us), %d (calls/sec)' % (
+        label,
+        threads,
+        total,
+        timer,
+        (duration / total) * 1000000,
+        total / duration)
+
+
+def run(label, fn, threads, calls):
+    def target():
+        for n in xrange(calls):
+            fn()
+    workers = [Thread(target=target) for n in range(threads)]
+    timer = Timer()
+    timer.start()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    timer.stop()
+    report(label, threads, calls, timer)
+
+
+def main():
+    parser = OptionParser(description='Lock contention benchmark')
+    parser.add_option('-n', '--calls', default=100000, type='int', help='calls per thread')
+    parser.add_option('-t', '--threads', default='1,4,16', help='comma separated thread counts')
+    options, _ = parser.parse_args()
+    calls = options.calls
+
+    thing = Thing()
+    whiteboard = Whiteboard()
+    whiteboard['key'] = 'value'
+    locked = LockedWhiteboard()
+    locked['key'] = 'value'
+    container = Container()
+    for n in range(10):
+        container.add(Plugin(n))
+
+    for threads in [int(t) for t in options.threads.split(',')]:
+        run('synchronized (cached)', thing.cached, threads, calls)
+        run('synchronized (legacy)', thing.resolved, threads, calls)
+        run('whiteboard.get (copy-on-write)', lambda: whiteboard.get('key'), threads, calls)
+        run('whiteboard.get (locked)', lambda: locked.get('key'), threads, calls)
+        run('container.all (copy-on-write)', container.all, threads, calls)
+
+
+if __name__ == '__main__':
+    main()
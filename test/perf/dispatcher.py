@@ -0,0 +1,114 @@
+#! /usr/bin/env python
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+#
+# Jeff Ortel <jortel@redhat.com>
+#
+
+"""
+Measure Dispatcher.dispatch() throughput and method resolution
+using the (precompiled) dispatch table and the (uncompiled) RMI path.
+"""
+
+import os
+import sys
+
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/'))
+
+from gofer.decorators import remote
+from gofer.messaging import Document
+from gofer.metrics import Timer
+from gofer.rmi.dispatcher import Dispatcher, Request, RMI
+
+
+class Dog(object):
+
+    @remote
+    def bark(self, words):
+        return words
+
+
+def request():
+    return Document(
+        sn='123',
+        routing=['A', 'B'],
+        request=dict(
+            classname='Dog',
+            method='bark',
+            args=['hello'],
+            kws={}))
+
+
+def report(label, calls, timer):
+    duration = timer.duration()
+    print '%s: calls=%d, total=%s, percall=%.3f (us), %d (calls/sec)' % (
+        label,
+        calls,
+        timer,
+        (duration / calls) * 1000000,
+        calls / duration)
+
+
+def dispatch(label, dispatcher, calls):
+    document = request()
+    timer = Timer()
+    timer.start()
+    for n in xrange(calls):
+        dispatcher.dispatch(document)
+    timer.stop()
+    report(label, calls, timer)
+
+
+def resolve(dispatcher, calls):
+    document = request()
+    auth = dispatcher.auth(document)
+    call = Request(document.request)
+    key = (call.classname, call.method)
+    # table
+    timer = Timer()
+    timer.start()
+    for n in xrange(calls):
+        dispatcher.table[key]
+    timer.stop()
+    report('resolve (table)', calls, timer)
+    # RMI
+    timer = Timer()
+    timer.start()
+    for n in xrange(calls):
+        RMI(call, auth, dispatcher.catalog).permitted()
+    timer.stop()
+    report('resolve (RMI)', calls, timer)
+
+
+def main():
+    parser = OptionParser(description='Dispatcher benchmark')
+    parser.add_option('-n', '--calls', default=100000, type='int', help='number of calls')
+    options, _ = parser.parse_args()
+
+    # table
+    dispatcher = Dispatcher([Dog])
+    dispatch('dispatch (table)', dispatcher, options.calls)
+
+    # no table (RMI path)
+    dispatcher = Dispatcher([Dog])
+    dispatcher.table = {}
+    dispatch('dispatch (RMI)', dispatcher, options.calls)
+
+    # method resolution only
+    dispatcher = Dispatcher([Dog])
+    resolve(dispatcher, options.calls)
+
+
+if __name__ == '__main__':
+    main()
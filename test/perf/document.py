@@ -0,0 +1,129 @@
+#! /usr/bin/env python
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+#
+# Jeff Ortel <jortel@redhat.com>
+#
+
+"""
+Measure the CPU time and peak memory used by Document.dump() for
+multi-megabyte results.  The (legacy) dump that copies the document
+before encoding is included for comparison.  Each is measured in a
+child process so the peak RSS is not shared.  Replies are measured
+with and without reusing the encoding kept by the (validated) result.
+"""
+
+import os
+import sys
+import resource
+
+from multiprocessing import Process, Pipe
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/'))
+
+from gofer.common import json, Options
+from gofer.messaging import Document
+from gofer.metrics import Timer
+from gofer.rmi.dispatcher import Return
+
+
+def legacy(document):
+    def fn(thing):
+        if isinstance(thing, Options):
+            thing = dict(thing.__dict__)
+            for k, v in thing.items():
+                thing[k] = fn(v)
+            return thing
+        if isinstance(thing, dict):
+            thing = dict(thing)
+            for k, v in thing.items():
+                thing[k] = fn(v)
+            return thing
+        if isinstance(thing, (tuple, list)):
+            thing = [fn(e) for e in thing]
+            return thing
+        return thing
+    d = fn(document)
+    return json.dumps(d, sort_keys=True)
+
+
+def reply(n):
+    _list = []
+    for i in xrange(n):
+        p = Document(
+            name='package-%d' % i,
+            version='%d.%d.%d' % (i % 7, i % 11, i % 13),
+            release='%d.el7' % (i % 5),
+            arch=('x86_64', 'noarch', 'i686')[i % 3],
+            files=['/usr/share/doc/package-%d/%s' % (i, f) for f in ('README', 'COPYING', 'NEWS')])
+        _list.append(p)
+    return Document(
+        sn='123',
+        version='2.0',
+        routing=('agent', 'client'),
+        result=Return(retval=_list))
+
+
+def envelope(result):
+    return Document(
+        sn='456',
+        version='2.0',
+        routing=('agent', 'client'),
+        result=result)
+
+
+def maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(fn, document, calls, conn):
+    before = maxrss()
+    timer = Timer()
+    timer.start()
+    for n in xrange(calls):
+        s = fn(document)
+    timer.stop()
+    conn.send((len(s), timer.duration(), maxrss() - before))
+
+
+def run(label, fn, document, calls):
+    parent, child = Pipe()
+    p = Process(target=measure, args=(fn, document, calls, child))
+    p.start()
+    size, duration, memory = parent.recv()
+    p.join()
+    print '%s: size=%d (bytes), dump=%.3f (ms), peak=+%d (KB)' % (
+        label,
+        size,
+        (duration / calls) * 1000,
+        memory)
+
+
+def main():
+    parser = OptionParser(description='Document.dump() benchmark')
+    parser.add_option('-n', '--calls', default=10, type='int', help='calls per method')
+    parser.add_option('-p', '--packages', default=20000, type='int', help='number of packages')
+    options, _ = parser.parse_args()
+    calls = options.calls
+    document = reply(options.packages)
+    run('legacy (copied)', legacy, document, calls)
+    run('dump (sorted)', lambda d: d.dump(), document, calls)
+    run('dump (unsorted)', lambda d: d.dump(sort=False), document, calls)
+    result = Return(document.result)
+    run('reply (encoded)', lambda r: envelope(Return(r)).dump(sort=False), result, calls)
+    result.freeze(sort=False)
+    run('reply (kept)', lambda r: envelope(r).dump(sort=False), result, calls)
+
+
+if __name__ == '__main__':
+    main()
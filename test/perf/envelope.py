@@ -0,0 +1,147 @@
+#! /usr/bin/env python
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+#
+# Jeff Ortel <jortel@redhat.com>
+#
+
+"""
+Measure the memory used by a backlog of (queued) requests and
+async replies.  Requests are held as received (Document with the
+kept encoding), as decoded documents and as compact envelopes.
+The (legacy) async reply with a per-instance dictionary is included
+for comparison.  Each is measured in a child process so the RSS
+is not shared.
+"""
+
+import os
+import sys
+import resource
+
+from multiprocessing import Process, Pipe
+from optparse import OptionParser
+from uuid import uuid4
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/'))
+
+from gofer.messaging import Document, RequestEnvelope
+from gofer.metrics import Timer
+from gofer.rmi.async import Progress
+
+
+class Legacy:
+
+    def __init__(self, document):
+        self.sn = document.sn
+        self.origin = document.routing[0]
+        self.timestamp = document.timestamp
+        self.data = document.data
+        self.total = document.total
+        self.completed = document.completed
+        self.details = document.details
+
+
+def request(n):
+    document = Document(
+        sn=str(uuid4()),
+        version='2.0',
+        routing=('client', 'agent'),
+        replyto='client',
+        request=dict(
+            classname='Dog',
+            method='bark',
+            args=['hello-%d' % n],
+            kws={},
+            cntr=None),
+        secret=None,
+        pam=None,
+        timeout=10,
+        expiration=None,
+        notbefore=None,
+        data=dict(task=n))
+    return document.dump()
+
+
+def progress(n):
+    document = Document(
+        sn=str(uuid4()),
+        version='2.0',
+        routing=('agent', 'client'),
+        status='progress',
+        total=100,
+        completed=n % 100,
+        details=None)
+    return document.dump()
+
+
+def received(s):
+    return Document().load(s, frozen=True)
+
+
+def decoded(s):
+    return Document().load(s)
+
+
+def compact(s):
+    return RequestEnvelope().load(s)
+
+
+def legacy(s):
+    return Legacy(Document().load(s))
+
+
+def reply(s):
+    return Progress(Document().load(s))
+
+
+def maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(fn, messages, conn):
+    before = maxrss()
+    timer = Timer()
+    timer.start()
+    backlog = [fn(s) for s in messages]
+    timer.stop()
+    conn.send((len(backlog), timer.duration(), maxrss() - before))
+
+
+def run(label, fn, generate, count):
+    messages = [generate(n) for n in xrange(count)]
+    parent, child = Pipe()
+    p = Process(target=measure, args=(fn, messages, child))
+    p.start()
+    held, duration, memory = parent.recv()
+    p.join()
+    print '%s: held=%d, load=%.3f (usec), memory=+%d (KB), %d (bytes) each' % (
+        label,
+        held,
+        (duration / held) * 1000000,
+        memory,
+        (memory * 1024) / held)
+
+
+def main():
+    parser = OptionParser(description='Envelope memory benchmark')
+    parser.add_option('-n', '--count', default=100000, type='int', help='backlog size')
+    options, _ = parser.parse_args()
+    count = options.count
+    run('request (received)', received, request, count)
+    run('request (decoded)', decoded, request, count)
+    run('request (compact)', compact, request, count)
+    run('progress (legacy)', legacy, progress, count)
+    run('progress (compact)', reply, progress, count)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,8 @@
 
 from unittest import TestCase
 
+from datetime import datetime, timedelta
+
 from mock import Mock, patch
 
 from gofer.agent.action import Action
@@ -99,6 +101,32 @@ class TestAction(TestCase):
         # validation
         self.assertFalse(target.called)
 
+    @patch('gofer.agent.action.dt')
+    @patch('gofer.agent.action.timedelta', Mock())
+    def test_perform(self, dt):
+        now = 3
+        dt.utcnow.return_value = now
+        target = Mock(side_effect=ValueError)
+        action = Action(target, seconds=10)
+        action.name = Mock(return_value='')
+
+        # test
+        action.perform()
+
+        # validation
+        target.assert_called_once_with()
+        self.assertEqual(action.last, now)
+
+    def test_seconds(self):
+        action = Action(Mock(), minutes=2)
+        self.assertEqual(action.seconds(), 120)
+
+    def test_remaining(self):
+        action = Action(Mock(), minutes=2)
+        self.assertEqual(action.remaining(), 0)
+        action.last = datetime.utcnow() - timedelta(seconds=30)
+        self.assertTrue(85 < action.remaining() <= 90)
+
     def test_unicode(self):
         action = Action(Mock(), hours=24)
         action.name = Mock(return_value='1234')
@@ -66,6 +66,11 @@ class TestAdmin(TestCase):
         loaded.assert_called_once_with(container, actions.return_value)
         self.assertEqual(report, loaded.return_value)
 
+    @patch('gofer.agent.builtin.Metrics')
+    def test_metrics(self, metrics):
+        admin = Admin(Mock())
+        self.assertEqual(admin.metrics(), metrics.return_value.snapshot.return_value)
+
     def test_call(self):
         container = Mock()
         admin = Admin(container)
@@ -11,6 +11,227 @@
 
 from unittest import TestCase
 
+from mock import patch, Mock
 
-class Test(TestCase):
-    pass
\ No newline at end of file
+from gofer.agent.main import ActionScheduler, TrackerSweeper
+
+
+class TestActionScheduler(TestCase):
+
+    def test_init(self):
+        scheduler = ActionScheduler(30)
+        self.assertEqual(scheduler.getName(), 'Actions')
+        self.assertEqual(scheduler.jitter, 30)
+        self.assertEqual(scheduler.scheduled, set())
+        self.assertTrue(scheduler.isDaemon())
+
+    @patch('gofer.common.Thread.aborted')
+    @patch('gofer.agent.main.sleep')
+    def test_run(self, sleep, aborted):
+        aborted.side_effect = [False, True]
+        scheduler = ActionScheduler()
+        scheduler.refresh = Mock()
+        scheduler.run()
+        scheduler.refresh.assert_called_once_with()
+        sleep.assert_called_once_with(ActionScheduler.REFRESH)
+
+    @patch('gofer.agent.main.time')
+    @patch('gofer.agent.main.Plugin')
+    def test_refresh(self, plugin, _time):
+        _time.return_value = 100
+        actions = [Mock(), Mock()]
+        actions[0].remaining.return_value = 0
+        actions[1].remaining.return_value = 30
+        plugins = [Mock(actions=actions[:1]), Mock(actions=actions[1:])]
+        plugin.all.return_value = plugins
+        scheduler = ActionScheduler()
+        scheduler.schedule = Mock()
+
+        # test
+        scheduler.refresh()
+        scheduler.refresh()
+
+        # validation
+        self.assertEqual(scheduler.scheduled, set(actions))
+        self.assertEqual(
+            scheduler.schedule.call_args_list,
+            [
+                ((plugins[0], actions[0], 100), {}),
+                ((plugins[1], actions[1], 130), {}),
+            ])
+
+    @patch('gofer.agent.main.uniform')
+    @patch('gofer.agent.main.time')
+    @patch('gofer.agent.main.Plugin')
+    def test_refresh_jitter(self, plugin, _time, uniform):
+        _time.return_value = 100
+        uniform.return_value = 5
+        action = Mock()
+        action.remaining.return_value = 30
+        plugins = [Mock(actions=[action])]
+        plugin.all.return_value = plugins
+        scheduler = ActionScheduler(10)
+        scheduler.schedule = Mock()
+
+        # test
+        scheduler.refresh()
+
+        # validation
+        uniform.assert_called_once_with(0, 10)
+        scheduler.schedule.assert_called_once_with(plugins[0], action, 135)
+
+    @patch('gofer.agent.main.uniform')
+    @patch('gofer.agent.main.TimerQueue')
+    def test_schedule(self, timer, uniform):
+        plugin = Mock()
+        action = Mock()
+        scheduler = ActionScheduler(10)
+        scheduler.submit = Mock()
+
+        # test
+        scheduler.schedule(plugin, action, 165)
+
+        # validation
+        self.assertFalse(uniform.called)
+        due, fn = timer.return_value.add.call_args[0]
+        self.assertEqual(due, 165)
+        fn()
+        scheduler.submit.assert_called_once_with(plugin, action, 165)
+
+    @patch('gofer.agent.main.Plugin')
+    def test_submit(self, _plugin):
+        action = Mock()
+        plugin = Mock(actions=[action])
+        _plugin.all.return_value = [plugin]
+        scheduler = ActionScheduler()
+        scheduler.perform = Mock()
+
+        # test
+        scheduler.submit(plugin, action, 100)
+
+        # validation
+        plugin.pool.offer.assert_called_once_with(scheduler.perform, plugin, action, 100)
+
+    @patch('gofer.agent.main.time', Mock(return_value=10))
+    @patch('gofer.agent.main.TimerQueue')
+    @patch('gofer.agent.main.Plugin')
+    def test_submit_backlogged(self, _plugin, timer):
+        action = Mock()
+        plugin = Mock(actions=[action])
+        plugin.pool.offer.return_value = False
+        _plugin.all.return_value = [plugin]
+        scheduler = ActionScheduler()
+        scheduler.scheduled.add(action)
+
+        # test
+        scheduler.submit(plugin, action, 100)
+
+        # validation
+        due, fn = timer.return_value.add.call_args[0]
+        self.assertEqual(due, 10 + ActionScheduler.RETRY)
+        self.assertEqual(fn.func, scheduler.submit)
+        self.assertEqual(fn.args, (plugin, action, 100))
+        self.assertEqual(scheduler.scheduled, set([action]))
+
+    @patch('gofer.agent.main.TimerQueue')
+    @patch('gofer.agent.main.Plugin')
+    def test_submit_failed(self, _plugin, timer):
+        action = Mock()
+        plugin = Mock(actions=[action])
+        plugin.pool.offer.side_effect = ValueError
+        _plugin.all.return_value = [plugin]
+        scheduler = ActionScheduler()
+        scheduler.scheduled.add(action)
+
+        # test
+        scheduler.submit(plugin, action, 100)
+
+        # validation
+        self.assertFalse(timer.called)
+        self.assertEqual(scheduler.scheduled, set())
+
+    @patch('gofer.agent.main.Plugin')
+    def test_submit_unloaded(self, _plugin):
+        action = Mock()
+        plugin = Mock(actions=[action])
+        _plugin.all.return_value = []
+        scheduler = ActionScheduler()
+        scheduler.scheduled.add(action)
+
+        # test
+        scheduler.submit(plugin, action, 100)
+
+        # validation
+        self.assertFalse(plugin.pool.offer.called)
+        self.assertEqual(scheduler.scheduled, set())
+
+    @patch('gofer.agent.main.time')
+    def test_perform(self, _time):
+        _time.return_value = 110
+        plugin = Mock()
+        action = Mock()
+        action.perform.side_effect = ValueError
+        action.seconds.return_value = 60
+        scheduler = ActionScheduler()
+        scheduler.schedule = Mock()
+
+        # test
+        self.assertRaises(ValueError, scheduler.perform, plugin, action, 100)
+
+        # validation
+        action.perform.assert_called_once_with()
+        scheduler.schedule.assert_called_once_with(plugin, action, 160)
+
+    @patch('gofer.agent.main.time')
+    def test_perform_overrun(self, _time):
+        _time.return_value = 200
+        plugin = Mock()
+        action = Mock()
+        action.seconds.return_value = 60
+        scheduler = ActionScheduler()
+        scheduler.schedule = Mock()
+
+        # test
+        scheduler.perform(plugin, action, 100)
+
+        # validation
+        scheduler.schedule.assert_called_once_with(plugin, action, 200)
+
+
+class TestTrackerSweeper(TestCase):
+
+    @patch('gofer.agent.main.time')
+    @patch('gofer.agent.main.TimerQueue')
+    def test_start(self, timer, _time):
+        _time.return_value = 1000
+        sweeper = TrackerSweeper()
+        sweeper.start()
+        timer.return_value.add.assert_called_once_with(1000 + TrackerSweeper.INTERVAL, sweeper)
+
+    @patch('gofer.agent.main.Plugin')
+    def test_pending(self, plugin):
+        plugins = [Mock(), Mock()]
+        plugins[0].scheduler.pending.journal = {'1': '/tmp/1', '2': '/tmp/2'}
+        plugins[1].scheduler.pending.journal = {'3': '/tmp/3'}
+        plugin.all.return_value = plugins
+        self.assertEqual(TrackerSweeper.pending(), set(['1', '2', '3']))
+
+    @patch('gofer.agent.main.Spool')
+    @patch('gofer.agent.main.Tracker')
+    def test_call(self, tracker, spool):
+        sweeper = TrackerSweeper()
+        sweeper.start = Mock()
+        sweeper.pending = Mock(return_value=set(['1']))
+        sweeper()
+        tracker.return_value.sweep.assert_called_once_with(pending=set(['1']))
+        spool.return_value.sweep.assert_called_once_with(keep=tracker.return_value)
+        sweeper.start.assert_called_once_with()
+
+    @patch('gofer.agent.main.Spool', Mock())
+    @patch('gofer.agent.main.Tracker')
+    def test_call_failed(self, tracker):
+        tracker.return_value.sweep.side_effect = ValueError()
+        sweeper = TrackerSweeper()
+        sweeper.start = Mock()
+        self.assertRaises(ValueError, sweeper)
+        sweeper.start.assert_called_once_with()
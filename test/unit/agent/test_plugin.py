@@ -106,10 +106,64 @@ class TestContainer(TestCase):
         self.assertEqual(p, None)
 
     def test_call(self):
+        plugins = [Mock(), Mock()]
         cnt = Container()
-        cnt.plugins = {'A': 1, 'B': 2, 'C': 2}
-        plugins = cnt.all()
-        self.assertEqual(plugins, [1, 2])
+        cnt.add(plugins[0], 'A')
+        cnt.add(plugins[1], 'B', 'C')
+        self.assertEqual(sorted(cnt.all()), sorted(plugins))
+        self.assertEqual(len(cnt.unique), 2)
+
+    def test_call_copy_on_write(self):
+        plugin = Mock()
+        cnt = Container()
+        cnt.add(plugin)
+        unique = cnt.unique
+        cnt.add(Mock())
+        cnt.delete(plugin)
+        self.assertEqual(unique, [plugin])
+        self.assertFalse(plugin in cnt.all())
+
+    def test_route(self):
+        a = Mock(forward=set(['*']), accept=set([',']))
+        a.name = 'A'
+        a.dispatcher.catalog = {'Dog': 1}
+        b = Mock(forward=set([',']), accept=set(['A', 'C']))
+        b.name = 'B'
+        b.dispatcher.catalog = {'Cat': 1}
+        c = Mock(forward=set(['B']), accept=set(['*']))
+        c.name = 'C'
+        c.dispatcher.catalog = {'Cat': 1, 'Bird': 1}
+        cnt = Container()
+        cnt.add(a)
+        cnt.add(b)
+        cnt.add(c)
+        self.assertEqual(cnt.routes, None)
+        self.assertEqual(cnt.route(a, 'Bird'), c)
+        self.assertTrue(cnt.route(a, 'Cat') in (b, c))
+        self.assertEqual(cnt.route(a, 'Dog'), None)
+        self.assertEqual(cnt.route(b, 'Dog'), None)
+        self.assertEqual(cnt.route(c, 'Dog'), None)
+        self.assertEqual(cnt.route(c, 'Cat'), b)
+        self.assertEqual(cnt.route(c, 'Fish'), None)
+        self.assertNotEqual(cnt.routes, None)
+
+    def test_route_invalidated(self):
+        a = Mock(forward=set(['*']), accept=set(['*']))
+        a.name = 'A'
+        a.dispatcher.catalog = {}
+        b = Mock(forward=set(['*']), accept=set(['*']))
+        b.name = 'B'
+        b.dispatcher.catalog = {}
+        cnt = Container()
+        cnt.add(a)
+        cnt.add(b)
+        self.assertEqual(cnt.route(a, 'Dog'), None)
+        b.dispatcher.catalog = {'Dog': 1}
+        cnt.invalidate()
+        self.assertEqual(cnt.route(a, 'Dog'), b)
+        cnt.delete(b)
+        self.assertEqual(cnt.routes, None)
+        self.assertEqual(cnt.route(a, 'Dog'), None)
 
 
 class TestPlugin(TestCase):
@@ -159,7 +213,10 @@ class TestPlugin(TestCase):
                 accept='d, e, f'),
             messaging=Mock(
                 uuid='x99',
-                url='amqp://localhost')
+                url='amqp://localhost',
+                compression='zlib',
+                compression_threshold='1024',
+                decompression_limit='2048')
         )
         plugin = Plugin(descriptor, '')
         plugin.scheduler = Mock()
@@ -173,6 +230,10 @@ class TestPlugin(TestCase):
         self.assertEqual(plugin.latency, descriptor.main.latency)
         # url
         self.assertEqual(plugin.url, descriptor.messaging.url)
+        # compression
+        self.assertEqual(plugin.compression, 'zlib')
+        self.assertEqual(plugin.compression_threshold, 1024)
+        self.assertEqual(plugin.decompression_limit, 2048)
         # enabled
         self.assertTrue(plugin.enabled)
         # connector
@@ -198,7 +259,26 @@ class TestPlugin(TestCase):
     @patch('gofer.agent.plugin.Whiteboard', Mock())
     @patch('gofer.agent.plugin.ThreadPool', Mock())
     def test_start(self, scheduler):
-        descriptor = Mock(main=Mock(threads=4))
+        descriptor = Mock(main=Mock(threads=4, process='0'))
+        scheduler.return_value.isAlive.return_value = False
+
+        # test
+        plugin = Plugin(descriptor, '')
+        plugin.attach = Mock()
+        plugin.start()
+
+        # validation
+        plugin.attach.assert_called_once_with()
+        scheduler.return_value.start.assert_called_once_with()
+        self.assertEqual(plugin.dispatcher.processes, None)
+        self.assertTrue(plugin.dispatcher.caching)
+
+    @patch('gofer.agent.plugin.ProcessPool')
+    @patch('gofer.agent.plugin.Scheduler')
+    @patch('gofer.agent.plugin.Whiteboard', Mock())
+    @patch('gofer.agent.plugin.ThreadPool', Mock())
+    def test_start_processes(self, scheduler, pool):
+        descriptor = Mock(main=Mock(threads=4, process='1'))
         scheduler.return_value.isAlive.return_value = False
 
         # test
@@ -207,8 +287,12 @@ class TestPlugin(TestCase):
         plugin.start()
 
         # validation
+        pool.assert_called_once_with(plugin.dispatcher, 4)
+        pool.return_value.start.assert_called_once_with()
         plugin.attach.assert_called_once_with()
         scheduler.return_value.start.assert_called_once_with()
+        self.assertEqual(plugin.dispatcher.processes, pool.return_value)
+        self.assertFalse(plugin.dispatcher.caching)
 
     @patch('gofer.agent.plugin.Scheduler')
     @patch('gofer.agent.plugin.Whiteboard', Mock())
@@ -244,6 +328,27 @@ class TestPlugin(TestCase):
         scheduler.return_value.join.assert_called_once_with()
         pool.return_value.shutdown.assert_called_once_with()
 
+    @patch('gofer.agent.plugin.Scheduler')
+    @patch('gofer.agent.plugin.ThreadPool')
+    @patch('gofer.agent.plugin.Whiteboard', Mock())
+    def test_shutdown_processes(self, pool, scheduler):
+        descriptor = Mock(main=Mock(threads=4))
+        scheduler.return_value.isAlive.return_value = True
+        processes = Mock()
+
+        # test
+        plugin = Plugin(descriptor, '')
+        plugin.dispatcher.processes = processes
+        plugin.dispatcher.caching = False
+        plugin.detach = Mock()
+        plugin.shutdown(False)
+
+        # validation
+        processes.shutdown.assert_called_once_with()
+        pool.return_value.shutdown.assert_called_once_with()
+        self.assertEqual(plugin.dispatcher.processes, None)
+        self.assertTrue(plugin.dispatcher.caching)
+
     @patch('gofer.agent.plugin.Scheduler')
     @patch('gofer.agent.plugin.ThreadPool')
     @patch('gofer.agent.plugin.Whiteboard', Mock())
@@ -302,7 +407,7 @@ class TestPlugin(TestCase):
     @patch('gofer.agent.plugin.Whiteboard', Mock())
     def test_attach(self, pool, model, consumer, node):
         queue = 'test'
-        descriptor = Mock(main=Mock(threads=4))
+        descriptor = Mock(main=Mock(threads=4), messaging=Mock(decompression_limit='1024'))
         pool.return_value.run.side_effect = lambda fn: fn()
         model.return_value.queue = queue
 
@@ -322,6 +427,7 @@ class TestPlugin(TestCase):
         consumer = consumer.return_value
         consumer.start.assert_called_once_with()
         self.assertEqual(consumer.authenticator, plugin.authenticator)
+        self.assertEqual(consumer.decompression_limit, 1024)
         self.assertEqual(plugin.consumer, consumer)
 
     @patch('gofer.agent.plugin.BrokerModel')
@@ -378,6 +484,20 @@ class TestPlugin(TestCase):
         self.assertFalse(model.teardown.called)
         self.assertEqual(plugin.consumer, None)
 
+    @patch('gofer.agent.plugin.ThreadPool', Mock())
+    @patch('gofer.agent.plugin.Scheduler', Mock())
+    @patch('gofer.agent.plugin.Whiteboard', Mock())
+    def test_invalidate(self):
+        descriptor = Mock(main=Mock(threads=4))
+
+        # test
+        plugin = Plugin(descriptor, '')
+        plugin.dispatcher = Mock()
+        plugin.invalidate('Dog', 'bark')
+
+        # validation
+        plugin.dispatcher.cache.invalidate.assert_called_once_with('Dog', 'bark')
+
     @patch('gofer.agent.plugin.ThreadPool', Mock())
     @patch('gofer.agent.plugin.Scheduler', Mock())
     @patch('gofer.agent.plugin.Whiteboard', Mock())
@@ -391,3 +511,65 @@ class TestPlugin(TestCase):
 
         # validation
         self.assertEqual(provides, plugin.dispatcher.provides.return_value)
+
+    @patch('gofer.agent.plugin.ThreadPool', Mock())
+    @patch('gofer.agent.plugin.Scheduler', Mock())
+    @patch('gofer.agent.plugin.Whiteboard', Mock())
+    def test_dispatch(self):
+        descriptor = Mock(main=Mock(threads=4))
+        request = Mock(request=dict(classname='Dog'))
+
+        # test
+        plugin = Plugin(descriptor, '')
+        plugin.dispatcher = Mock(processes=None)
+        plugin.dispatcher.provides.return_value = True
+        plugin.dispatcher.timeout.return_value = None
+        returned = plugin.dispatch(request)
+
+        # validation
+        plugin.dispatcher.dispatch.assert_called_once_with(request)
+        self.assertEqual(returned, plugin.dispatcher.dispatch.return_value)
+
+    @patch('gofer.agent.plugin.TimedCall')
+    @patch('gofer.agent.plugin.ThreadPool', Mock())
+    @patch('gofer.agent.plugin.Scheduler', Mock())
+    @patch('gofer.agent.plugin.Whiteboard', Mock())
+    def test_dispatch_timeout(self, call):
+        descriptor = Mock(main=Mock(threads=4))
+        request = Mock(request=dict(classname='Dog'))
+
+        # test
+        plugin = Plugin(descriptor, '')
+        plugin.dispatcher = Mock(processes=None)
+        plugin.dispatcher.provides.return_value = True
+        plugin.dispatcher.timeout.return_value = 10
+        returned = plugin.dispatch(request)
+
+        # validation
+        call.assert_called_once_with(plugin.dispatcher, request)
+        call.return_value.assert_called_once_with(10)
+        self.assertFalse(plugin.dispatcher.dispatch.called)
+        self.assertEqual(returned, call.return_value.return_value)
+
+    @patch('gofer.agent.plugin.ThreadPool', Mock())
+    @patch('gofer.agent.plugin.Scheduler', Mock())
+    @patch('gofer.agent.plugin.Whiteboard', Mock())
+    def test_dispatch_forwarded(self):
+        descriptor = Mock(main=Mock(threads=4))
+        request = Mock(request=dict(classname='Dog'))
+        target = Mock()
+        target.dispatcher.timeout.return_value = None
+
+        # test
+        plugin = Plugin(descriptor, '')
+        plugin.dispatcher = Mock(processes=None)
+        plugin.dispatcher.provides.return_value = False
+        with patch.object(Plugin, 'container') as container:
+            container.route.return_value = target
+            returned = plugin.dispatch(request)
+
+        # validation
+        container.route.assert_called_once_with(plugin, 'Dog')
+        target.dispatcher.dispatch.assert_called_once_with(request)
+        self.assertFalse(plugin.dispatcher.dispatch.called)
+        self.assertEqual(returned, target.dispatcher.dispatch.return_value)
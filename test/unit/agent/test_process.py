@@ -0,0 +1,280 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from gofer.messaging import Document
+from gofer.rmi.dispatcher import Return, ExecutionTimeout
+from gofer.agent.process import REQUEST, RESULT, PROGRESS, CANCELLED
+from gofer.agent.process import Progress, Cancelled, Worker, ProcessPool
+from gofer.agent.process import WorkerTerminated, main
+
+
+class Connection(object):
+
+    def __init__(self, *received):
+        self.received = list(received)
+        self.sent = []
+
+    def send(self, thing):
+        self.sent.append(thing)
+
+    def recv(self):
+        if self.received:
+            return self.received.pop(0)
+        raise EOFError()
+
+    def poll(self, timeout):
+        return len(self.received) > 0
+
+
+class TestProgress(TestCase):
+
+    def test_report(self):
+        conn = Connection()
+        progress = Progress(conn)
+        progress.total = 10
+        progress.completed = 4
+        progress.details = 'hello'
+        progress.report()
+        self.assertEqual(
+            conn.sent,
+            [
+                (PROGRESS, dict(total=10, completed=4, details='hello'))
+            ])
+
+
+class TestCancelled(TestCase):
+
+    def test_call(self):
+        conn = Connection(True)
+        cancelled = Cancelled(conn)
+        self.assertTrue(cancelled())
+        self.assertEqual(conn.sent, [(CANCELLED, None)])
+
+    @patch('gofer.agent.process.sleep')
+    def test_wait(self, sleep):
+        conn = Connection(False, False, True)
+        cancelled = Cancelled(conn)
+        self.assertTrue(cancelled.wait())
+        self.assertEqual(sleep.call_count, 2)
+        sleep.assert_called_with(Cancelled.POLL)
+
+    @patch('gofer.agent.process.sleep')
+    @patch('gofer.agent.process.time')
+    def test_wait_timeout(self, _time, sleep):
+        _time.side_effect = [1000, 1000, 1000.5, 1001]
+        conn = Connection(False, False, False)
+        cancelled = Cancelled(conn)
+        self.assertFalse(cancelled.wait(1))
+        self.assertEqual(sleep.call_count, 2)
+
+
+class TestMain(TestCase):
+
+    @patch('gofer.agent.process.Context')
+    def test_main(self, context):
+        request = Document(sn='123', request={})
+        conn = Connection((REQUEST, request.dump()), None)
+        dispatcher = Mock()
+        dispatcher.dispatch.return_value = Return.succeed(18)
+
+        # test
+        main(conn, dispatcher)
+
+        # validation
+        self.assertEqual(dispatcher.processes, None)
+        self.assertFalse(dispatcher.caching)
+        dispatched = dispatcher.dispatch.call_args[0][0]
+        self.assertEqual(dispatched.sn, request.sn)
+        self.assertEqual(conn.sent, [(RESULT, Return.succeed(18).dump())])
+        self.assertEqual(context.current.return_value.sn, None)
+        self.assertEqual(context.current.return_value.progress, None)
+        self.assertEqual(context.current.return_value.cancelled, None)
+
+    @patch('gofer.agent.process.Context', Mock())
+    def test_main_closed(self):
+        conn = Connection()
+        dispatcher = Mock()
+        main(conn, dispatcher)
+        self.assertFalse(dispatcher.dispatch.called)
+
+
+class TestWorker(TestCase):
+
+    def test_init(self):
+        dispatcher = Mock()
+        worker = Worker(3, dispatcher)
+        self.assertEqual(worker.name, 'process-3')
+        self.assertEqual(worker.dispatcher, dispatcher)
+        self.assertEqual(worker.process, None)
+        self.assertEqual(worker.conn, None)
+
+    @patch('gofer.agent.process.Process')
+    @patch('gofer.agent.process.Pipe')
+    def test_start(self, pipe, process):
+        conn = Mock()
+        child = Mock()
+        pipe.return_value = (conn, child)
+        dispatcher = Mock()
+        process.return_value.pid = 1234
+
+        # test
+        worker = Worker(0, dispatcher)
+        worker.start()
+
+        # validation
+        process.assert_called_once_with(
+            name=worker.name, target=main, args=(child, dispatcher))
+        process.return_value.start.assert_called_once_with()
+        child.close.assert_called_once_with()
+        self.assertTrue(process.return_value.daemon)
+        self.assertEqual(worker.conn, conn)
+
+    def test_shutdown(self):
+        worker = Worker(0, Mock())
+        worker.conn = Mock()
+        worker.process = Mock()
+        worker.process.is_alive.return_value = True
+
+        # test
+        worker.shutdown()
+
+        # validation
+        worker.conn.send.assert_called_once_with(None)
+        worker.process.join.assert_any_call(Worker.JOIN)
+        worker.process.terminate.assert_called_once_with()
+        worker.conn.close.assert_called_once_with()
+
+    def test_restart(self):
+        worker = Worker(0, Mock())
+        worker.shutdown = Mock()
+        worker.start = Mock()
+        worker.restart()
+        worker.shutdown.assert_called_once_with()
+        worker.start.assert_called_once_with()
+
+    @patch('gofer.agent.process.Context')
+    def test_dispatch(self, context):
+        request = Document(sn='123')
+        result = Return.succeed(18)
+        report = dict(total=10, completed=5, details='hello')
+        context.current.return_value.cancelled.return_value = False
+        worker = Worker(0, Mock())
+        worker.conn = Connection(
+            (PROGRESS, report),
+            (CANCELLED, None),
+            (RESULT, result.dump()))
+
+        # test
+        returned = worker.dispatch(request)
+
+        # validation
+        progress = context.current.return_value.progress
+        progress.report.assert_called_once_with()
+        self.assertEqual(progress.total, 10)
+        self.assertEqual(progress.completed, 5)
+        self.assertEqual(progress.details, 'hello')
+        self.assertEqual(worker.conn.sent, [(REQUEST, request.dump()), False])
+        self.assertTrue(isinstance(returned, Return))
+        self.assertEqual(returned.retval, 18)
+
+    @patch('gofer.agent.process.Context')
+    def test_dispatch_terminated(self, context):
+        worker = Worker(0, Mock())
+        worker.conn = Connection()
+        self.assertRaises(WorkerTerminated, worker.dispatch, Document())
+
+    @patch('gofer.agent.process.Context', Mock())
+    def test_dispatch_timeout(self):
+        request = Document(sn='123', request=dict(classname='A', method='b'))
+        worker = Worker(0, Mock())
+        worker.conn = Connection()
+        self.assertRaises(ExecutionTimeout, worker.dispatch, request, 10)
+
+    @patch('gofer.agent.process.Context', Mock())
+    def test_dispatch_within_timeout(self):
+        result = Return.succeed(18)
+        worker = Worker(0, Mock())
+        worker.conn = Connection((RESULT, result.dump()))
+        returned = worker.dispatch(Document(sn='123'), 10)
+        self.assertEqual(returned.retval, 18)
+
+    def test_recycle(self):
+        worker = Worker(0, Mock())
+        worker.start = Mock()
+        worker.process = Mock()
+        worker.conn = Mock()
+        worker.recycle()
+        worker.process.terminate.assert_called_once_with()
+        worker.process.join.assert_called_once_with()
+        worker.conn.close.assert_called_once_with()
+        worker.start.assert_called_once_with()
+
+    def test_no_context(self):
+        context = Mock(progress=None, cancelled=None)
+        Worker.progress(context, {})
+        self.assertFalse(Worker.cancelled(context))
+
+
+class TestProcessPool(TestCase):
+
+    @patch('gofer.agent.process.Worker')
+    def test_start(self, worker):
+        dispatcher = Mock()
+        pool = ProcessPool(dispatcher, 3)
+        pool.start()
+        self.assertEqual(len(pool), 3)
+        self.assertEqual(pool.idle.qsize(), 3)
+        self.assertEqual(worker.return_value.start.call_count, 3)
+        worker.assert_any_call(2, dispatcher)
+
+    def test_dispatch(self):
+        worker = Mock()
+        request = Mock()
+        pool = ProcessPool(Mock())
+        pool.idle.put(worker)
+        returned = pool.dispatch(request, 10)
+        worker.dispatch.assert_called_once_with(request, 10)
+        self.assertEqual(returned, worker.dispatch.return_value)
+        self.assertEqual(pool.idle.get(block=False), worker)
+
+    def test_dispatch_terminated(self):
+        worker = Mock()
+        worker.dispatch.side_effect = WorkerTerminated('process-0')
+        pool = ProcessPool(Mock())
+        pool.idle.put(worker)
+        self.assertRaises(WorkerTerminated, pool.dispatch, Mock())
+        worker.restart.assert_called_once_with()
+        self.assertEqual(pool.idle.get(block=False), worker)
+
+    @patch('gofer.agent.process.Metrics')
+    def test_dispatch_timeout(self, metrics):
+        worker = Mock()
+        worker.dispatch.side_effect = ExecutionTimeout('A', 'b', 10)
+        pool = ProcessPool(Mock())
+        pool.idle.put(worker)
+        self.assertRaises(ExecutionTimeout, pool.dispatch, Mock(), 10)
+        worker.recycle.assert_called_once_with()
+        metrics.return_value.counter.assert_called_once_with('rmi.timeout')
+        metrics.return_value.counter.return_value.inc.assert_called_once_with()
+        self.assertEqual(pool.idle.get(block=False), worker)
+
+    def test_shutdown(self):
+        workers = [Mock(), Mock()]
+        pool = ProcessPool(Mock())
+        pool.workers = list(workers)
+        pool.shutdown()
+        for worker in workers:
+            worker.shutdown.assert_called_once_with()
+        self.assertEqual(len(pool), 0)
@@ -11,10 +11,15 @@
 
 from unittest import TestCase
 
+from time import time, sleep
+from threading import Event, current_thread
+
 from mock import patch, Mock
 
-from gofer.agent.rmi import Scheduler, Transaction
+from gofer.common import Singleton
+from gofer.agent.rmi import Scheduler, Transaction, TimedCall, Helper, Helpers, Context, Task, Cancelled
 from gofer.messaging import Document
+from gofer.rmi.dispatcher import Return, Streamed
 
 
 class TestScheduler(TestCase):
@@ -40,8 +45,10 @@ class TestScheduler(TestCase):
     @patch('gofer.agent.rmi.Builtin')
     @patch('threading.Thread.setDaemon', Mock())
     def test_run(self, builtin, pending, task, select_plugin, tx, aborted):
-        _builtin = Mock(name='builtin')
-        plugin = Mock(name='plugin')
+        _builtin = Mock(name='builtin', latency=0)
+        _builtin.dispatcher.cached.return_value = None
+        plugin = Mock(name='plugin', latency=0)
+        plugin.dispatcher.cached.return_value = None
         task_list = [
             Mock(name='task-1'),
             Mock(name='task-2'),
@@ -108,6 +115,158 @@ class TestScheduler(TestCase):
         # validation
         pending.return_value.commit.assert_called_once_with(sn)
 
+    @patch('gofer.agent.rmi.Pending')
+    @patch('gofer.agent.rmi.Scheduler.select_plugin')
+    @patch('gofer.common.Thread.aborted')
+    @patch('gofer.agent.rmi.Task')
+    @patch('gofer.agent.rmi.Builtin', Mock())
+    @patch('threading.Thread.setDaemon', Mock())
+    def test_run_expired(self, task, aborted, select_plugin, pending):
+        plugin = Mock()
+        pending.return_value.get.return_value = Document(sn=1, deadline=1)
+        select_plugin.return_value = plugin
+        aborted.side_effect = [False, True]
+
+        # test
+        scheduler = Scheduler(plugin)
+        scheduler.run()
+
+        # validation
+        task.return_value.expire.assert_called_once_with()
+        self.assertFalse(plugin.pool.run.called)
+
+    @patch('gofer.agent.rmi.TimerQueue')
+    @patch('gofer.agent.rmi.Pending')
+    @patch('gofer.agent.rmi.Scheduler.select_plugin')
+    @patch('gofer.common.Thread.aborted')
+    @patch('gofer.agent.rmi.Task')
+    @patch('gofer.agent.rmi.Builtin', Mock())
+    @patch('threading.Thread.setDaemon', Mock())
+    def test_run_delayed(self, task, aborted, select_plugin, pending, timer):
+        plugin = Mock(latency=10)
+        plugin.container.find.return_value = plugin
+        pending.return_value.get.return_value = Document(sn=1)
+        select_plugin.return_value = plugin
+        aborted.side_effect = [False, True]
+
+        # test
+        scheduler = Scheduler(plugin)
+        scheduler.run()
+
+        # validation
+        self.assertFalse(plugin.pool.run.called)
+        due, fn = timer.return_value.add.call_args[0]
+        self.assertTrue(due > time())
+        fn()
+        plugin.pool.offer.assert_called_once_with(task.return_value)
+
+    @patch('gofer.agent.rmi.Pending', Mock())
+    @patch('gofer.agent.rmi.Builtin', Mock())
+    @patch('threading.Thread.setDaemon', Mock())
+    def test_submit_reloaded(self):
+        plugin = Mock(name='plugin')
+        reloaded = Mock(name='reloaded')
+        plugin.container.find.return_value = reloaded
+        task = Mock()
+        task.transaction.plugin = plugin
+        scheduler = Scheduler(plugin)
+        scheduler.submit(task)
+        plugin.container.find.assert_called_once_with(plugin.name)
+        self.assertEqual(task.transaction.plugin, reloaded)
+        reloaded.pool.offer.assert_called_once_with(task)
+        self.assertFalse(plugin.pool.offer.called)
+        self.assertFalse(task.discard.called)
+
+    @patch('gofer.agent.rmi.Pending', Mock())
+    @patch('gofer.agent.rmi.Builtin', Mock())
+    @patch('threading.Thread.setDaemon', Mock())
+    def test_submit_builtin(self):
+        plugin = Mock(name='plugin')
+        reloaded = Mock(name='reloaded')
+        plugin.container.find.return_value = reloaded
+        scheduler = Scheduler(plugin)
+        task = Mock()
+        task.transaction.plugin = scheduler.builtin
+        scheduler.submit(task)
+        builtin = reloaded.scheduler.builtin
+        self.assertEqual(task.transaction.plugin, builtin)
+        builtin.pool.offer.assert_called_once_with(task)
+
+    @patch('gofer.agent.rmi.Pending', Mock())
+    @patch('gofer.agent.rmi.Builtin', Mock())
+    @patch('threading.Thread.setDaemon', Mock())
+    def test_submit_not_loaded(self):
+        plugin = Mock()
+        plugin.container.find.return_value = None
+        task = Mock()
+        scheduler = Scheduler(plugin)
+        scheduler.submit(task)
+        task.discard.assert_called_once_with()
+        self.assertFalse(plugin.pool.offer.called)
+
+    @patch('gofer.agent.rmi.Pending', Mock())
+    @patch('gofer.agent.rmi.Builtin', Mock())
+    @patch('threading.Thread.setDaemon', Mock())
+    def test_submit_failed(self):
+        plugin = Mock()
+        plugin.container.find.return_value = plugin
+        plugin.pool.offer.side_effect = ValueError
+        task = Mock()
+        scheduler = Scheduler(plugin)
+        scheduler.submit(task)
+        task.discard.assert_called_once_with()
+
+    @patch('gofer.agent.rmi.time', Mock(return_value=10))
+    @patch('gofer.agent.rmi.TimerQueue')
+    @patch('gofer.agent.rmi.Pending', Mock())
+    @patch('gofer.agent.rmi.Builtin', Mock())
+    @patch('threading.Thread.setDaemon', Mock())
+    def test_submit_backlogged(self, timer):
+        plugin = Mock()
+        plugin.container.find.return_value = plugin
+        plugin.pool.offer.return_value = False
+        task = Mock()
+        scheduler = Scheduler(plugin)
+        scheduler.submit(task)
+        due, fn = timer.return_value.add.call_args[0]
+        self.assertEqual(due, 10 + Scheduler.RETRY)
+        self.assertEqual(fn.func, scheduler.submit)
+        self.assertEqual(fn.args, (task,))
+        self.assertFalse(task.discard.called)
+
+    @patch('gofer.agent.rmi.Pending')
+    @patch('gofer.agent.rmi.Scheduler.select_plugin')
+    @patch('gofer.common.Thread.aborted')
+    @patch('gofer.agent.rmi.Task')
+    @patch('gofer.agent.rmi.Builtin', Mock())
+    @patch('threading.Thread.setDaemon', Mock())
+    def test_run_cached(self, task, aborted, select_plugin, pending):
+        plugin = Mock(latency=0)
+        request = Document(sn=1)
+        pending.return_value.get.return_value = request
+        select_plugin.return_value = plugin
+        aborted.side_effect = [False, True]
+
+        # test
+        scheduler = Scheduler(plugin)
+        scheduler.run()
+
+        # validation
+        plugin.dispatcher.cached.assert_called_once_with(request)
+        task.return_value.reply.assert_called_once_with(plugin.dispatcher.cached.return_value)
+        self.assertFalse(plugin.pool.run.called)
+
+    @patch('gofer.agent.rmi.time')
+    def test_due(self, _time):
+        _time.return_value = 100.0
+        plugin = Mock(latency=0)
+        self.assertEqual(Scheduler.due(plugin, Document()), None)
+        self.assertEqual(Scheduler.due(plugin, Document(notbefore=90)), None)
+        self.assertEqual(Scheduler.due(plugin, Document(notbefore=120)), 120)
+        plugin = Mock(latency=5)
+        self.assertEqual(Scheduler.due(plugin, Document()), 105)
+        self.assertEqual(Scheduler.due(plugin, Document(notbefore=120)), 120)
+
     @patch('gofer.agent.rmi.Builtin')
     @patch('gofer.agent.rmi.Pending', Mock())
     @patch('threading.Thread.setDaemon', Mock())
@@ -152,6 +311,240 @@ class TestScheduler(TestCase):
         abort.assert_called_once_with()
 
 
+class TestTask(TestCase):
+
+    @patch('gofer.agent.rmi.Producer')
+    def test_producer(self, producer):
+        plugin = Mock()
+        p = Task._producer(plugin, 'msgpack')
+        producer.assert_called_once_with(plugin.url)
+        self.assertEqual(p, producer.return_value)
+        self.assertEqual(p.authenticator, plugin.authenticator)
+        self.assertEqual(p.codec, 'msgpack')
+        self.assertEqual(p.compression, plugin.compression)
+        self.assertEqual(p.threshold, plugin.compression_threshold)
+        # replies to json encoded requests are encoded using json
+        p = Task._producer(plugin)
+        self.assertEqual(p.codec, 'json')
+
+    @patch('gofer.agent.rmi.Cancelled')
+    def test_call_expired(self, cancelled):
+        cancelled.return_value.return_value = False
+        transaction = Mock(request=Document(sn=1, deadline=1))
+        transaction.plugin.latency = 0
+        task = Task(transaction)
+        task.expire = Mock()
+        task()
+        task.expire.assert_called_once_with()
+        self.assertFalse(transaction.plugin.dispatch.called)
+
+    @patch('gofer.agent.rmi.Metrics')
+    @patch('gofer.agent.rmi.Task._producer')
+    def test_expire(self, producer, metrics):
+        request = Document(sn=1, data=2, replyto='q', deadline=1)
+        transaction = Mock(request=request)
+        task = Task(transaction)
+        task.expire()
+        transaction.discard.assert_called_once_with()
+        producer.assert_called_once_with(transaction.plugin, None)
+        producer.return_value.open.assert_called_once_with()
+        producer.return_value.close.assert_called_once_with()
+        sent = producer.return_value.send.call_args
+        self.assertEqual(sent[0], ('q',))
+        self.assertEqual(sent[1]['sn'], 1)
+        self.assertEqual(sent[1]['data'], 2)
+        self.assertEqual(sent[1]['status'], 'expired')
+        metrics.return_value.counter.assert_called_once_with('rmi.expired')
+
+    @patch('gofer.agent.rmi.Cancelled')
+    @patch('gofer.agent.rmi.Task._producer')
+    def test_reply(self, producer, cancelled):
+        cancelled.return_value.return_value = False
+        request = Document(sn=1, data=2, replyto='q', ts=time())
+        transaction = Mock(request=request)
+        result = Mock()
+        task = Task(transaction)
+        task.reply(result)
+        transaction.commit.assert_called_once_with()
+        producer.assert_called_once_with(transaction.plugin, None)
+        producer.return_value.open.assert_called_once_with()
+        producer.return_value.close.assert_called_once_with()
+        sent = producer.return_value.send.call_args
+        self.assertEqual(sent[0], ('q',))
+        self.assertEqual(sent[1]['sn'], 1)
+        self.assertEqual(sent[1]['result'], result)
+
+    @patch('gofer.agent.rmi.Cancelled')
+    @patch('gofer.agent.rmi.Task._producer')
+    def test_reply_cancelled(self, producer, cancelled):
+        cancelled.return_value.return_value = True
+        transaction = Mock(request=Document(sn=1))
+        task = Task(transaction)
+        task.reply(Mock())
+        transaction.discard.assert_called_once_with()
+        self.assertFalse(transaction.commit.called)
+        self.assertFalse(producer.called)
+
+    def test_send_stream(self):
+        request = Document(sn=1, data=2, replyto='q')
+        streamed = Streamed(n for n in range(3))
+        streamed.release = Mock()
+        task = Task(Mock(request=request))
+        task.producer = Mock()
+        result = task.send_stream(request, streamed)
+        self.assertTrue(result.succeeded())
+        self.assertEqual(result.retval, 3)
+        sent = task.producer.send.call_args_list
+        self.assertEqual(len(sent), 2)
+        for seq, items in enumerate([[0], [1, 2]]):
+            self.assertEqual(sent[seq][0], ('q',))
+            self.assertEqual(sent[seq][1]['sn'], 1)
+            self.assertEqual(sent[seq][1]['data'], 2)
+            self.assertEqual(sent[seq][1]['status'], 'chunk')
+            self.assertEqual(sent[seq][1]['seq'], seq)
+            self.assertEqual(sent[seq][1]['items'], items)
+        self.assertEqual(streamed.release, None)
+
+    @patch('gofer.agent.rmi.Credit')
+    def test_send_stream_window(self, credit):
+        request = Document(sn=1, replyto='q', window=4)
+        task = Task(Mock(request=request))
+        task.producer = Mock()
+        result = task.send_stream(request, Streamed(n for n in range(3)))
+        self.assertEqual(result.retval, 3)
+        credit.return_value.open.assert_called_once_with(1, 4)
+        window = credit.return_value.open.return_value
+        self.assertEqual([c[0][0] for c in window.wait.call_args_list], [0, 1])
+        credit.return_value.close.assert_called_once_with(1)
+
+    @patch('gofer.agent.rmi.Credit')
+    def test_send_stream_aborted(self, credit):
+        closed = Mock()
+        def generator():
+            try:
+                for n in range(100):
+                    yield n
+            finally:
+                closed()
+        window = credit.return_value.open.return_value
+        window.wait.side_effect = [True, False]
+        request = Document(sn=1, replyto='q', window=4)
+        task = Task(Mock(request=request))
+        task.producer = Mock()
+        result = task.send_stream(request, Streamed(generator()))
+        self.assertFalse(result.succeeded())
+        self.assertEqual(result.xclass, 'StreamAborted')
+        self.assertEqual(task.producer.send.call_count, 1)
+        closed.assert_called_once_with()
+        credit.return_value.close.assert_called_once_with(1)
+
+    def test_send_stream_no_reply(self):
+        request = Document(sn=1)
+        task = Task(Mock(request=request))
+        task.producer = Mock()
+        result = task.send_stream(request, Streamed(n for n in range(3)))
+        self.assertEqual(result.retval, 3)
+        self.assertFalse(task.producer.send.called)
+
+    def test_send_stream_raised(self):
+        def generator():
+            yield 1
+            raise ValueError()
+        request = Document(sn=1, replyto='q')
+        task = Task(Mock(request=request))
+        task.producer = Mock()
+        result = task.send_stream(request, Streamed(generator()))
+        self.assertFalse(result.succeeded())
+        self.assertEqual(result.xclass, 'ValueError')
+
+    @patch('gofer.agent.rmi.Cancelled')
+    @patch('gofer.agent.rmi.Task._producer')
+    def test_call_streamed(self, producer, cancelled):
+        cancelled.return_value.return_value = False
+        request = Document(sn=1, replyto='q')
+        transaction = Mock(request=request)
+        transaction.plugin.dispatch.return_value = Streamed(n for n in [1])
+        task = Task(transaction)
+        task.send_reply = Mock()
+        task()
+        transaction.commit.assert_called_once_with()
+        statuses = [c[1]['status'] for c in producer.return_value.send.call_args_list]
+        self.assertEqual(statuses, ['started', 'chunk'])
+        result = task.send_reply.call_args[0][1]
+        self.assertEqual(result.retval, 1)
+
+    @patch('gofer.agent.rmi.bulk.send')
+    @patch('gofer.agent.rmi.Spool')
+    def test_send_blob(self, spool, send):
+        reference = {'__blob__': {'id': 1}}
+        blob = spool.return_value.resolve.return_value
+        blob.reference.return_value = {'__blob__': {'id': 2}}
+        request = Document(sn=1, data=2, replyto='q')
+        task = Task(Mock(request=request))
+        task.producer = Mock()
+        result = task.send_blob(request, Return.succeed(reference))
+        spool.return_value.resolve.assert_called_once_with(reference, verify=False)
+        send.assert_called_once_with(task.producer, 'q', [blob], sn=1, data=2)
+        blob.reference.assert_called_once_with()
+        blob.delete.assert_called_once_with()
+        self.assertEqual(result.retval, blob.reference.return_value)
+
+    @patch('gofer.agent.rmi.bulk.send')
+    @patch('gofer.agent.rmi.Spool')
+    def test_send_blob_spooled(self, spool, send):
+        returned = Return.succeed({'__blob__': {'id': 1}})
+        request = Document(sn=1, replyto='q', bulk='spool')
+        task = Task(Mock(request=request))
+        result = task.send_blob(request, returned)
+        self.assertTrue(result is returned)
+        self.assertFalse(spool.called)
+        self.assertFalse(send.called)
+
+    @patch('gofer.agent.rmi.bulk.send')
+    @patch('gofer.agent.rmi.Spool')
+    def test_send_blob_failed(self, spool, send):
+        request = Document(sn=1, replyto='q')
+        send.side_effect = ValueError
+        task = Task(Mock(request=request))
+        result = task.send_blob(request, Return.succeed({'__blob__': {}}))
+        self.assertEqual(result.xclass, 'ValueError')
+        spool.return_value.resolve.return_value.delete.assert_called_once_with()
+
+    def test_send_blob_not_blob(self):
+        request = Document(sn=1)
+        task = Task(Mock(request=request))
+        try:
+            raise ValueError()
+        except ValueError:
+            failed = Return.exception()
+        for result in (Return.succeed(1), failed):
+            self.assertTrue(task.send_blob(request, result) is result)
+
+    @patch('gofer.agent.rmi.Spool')
+    def test_discard_blobs(self, spool):
+        reference = {'__blob__': {'id': 1}}
+        request = Document(sn=1, request=dict(args=[1, reference]))
+        task = Task(Mock(request=request))
+        task.discard_blobs(request)
+        spool.return_value.delete.assert_called_once_with(request.sn)
+
+    @patch('gofer.agent.rmi.Spool')
+    def test_discard(self, spool):
+        transaction = Mock(request=Document(sn=1))
+        task = Task(transaction)
+        task.discard()
+        transaction.discard.assert_called_once_with()
+        spool.return_value.delete.assert_called_once_with(1)
+
+    @patch('gofer.agent.rmi.Task._producer')
+    def test_expire_no_reply(self, producer):
+        transaction = Mock(request=Document(sn=1, deadline=1))
+        task = Task(transaction)
+        task.expire()
+        transaction.discard.assert_called_once_with()
+        self.assertFalse(producer.called)
+
+
 class TestTransaction(TestCase):
 
     def test_init(self):
@@ -171,7 +564,8 @@ class TestTransaction(TestCase):
         tx = Transaction(plugin, pending, request)
         self.assertEqual(tx.id, sn)
 
-    def test_commit(self):
+    @patch('gofer.agent.rmi.Tracker')
+    def test_commit(self, tracker):
         sn = 1234
         plugin = Mock()
         pending = Mock()
@@ -179,8 +573,10 @@ class TestTransaction(TestCase):
         tx = Transaction(plugin, pending, request)
         tx.commit()
         pending.commit.assert_called_once_with(sn)
+        tracker.return_value.remove.assert_called_once_with(sn)
 
-    def test_discard(self):
+    @patch('gofer.agent.rmi.Tracker')
+    def test_discard(self, tracker):
         sn = 1234
         plugin = Mock()
         pending = Mock()
@@ -188,3 +584,270 @@ class TestTransaction(TestCase):
         tx = Transaction(plugin, pending, request)
         tx.discard()
         pending.commit.assert_called_once_with(sn)
+        tracker.return_value.remove.assert_called_once_with(sn)
+
+
+class TestCancelled(TestCase):
+
+    @patch('gofer.agent.rmi.Tracker')
+    def test_init(self, tracker):
+        cancelled = Cancelled('123')
+        tracker.return_value.signal.assert_called_once_with('123')
+        self.assertEqual(cancelled.sn, '123')
+        self.assertEqual(cancelled.signal, tracker.return_value.signal.return_value)
+
+    @patch('gofer.agent.rmi.Tracker')
+    def test_call(self, tracker):
+        signal = tracker.return_value.signal.return_value
+        cancelled = Cancelled('123')
+        self.assertEqual(cancelled(), signal.is_set.return_value)
+        self.assertFalse(tracker.return_value.cancelled.called)
+
+    @patch('gofer.agent.rmi.Tracker')
+    def test_wait(self, tracker):
+        signal = tracker.return_value.signal.return_value
+        cancelled = Cancelled('123')
+        self.assertEqual(cancelled.wait(10), signal.wait.return_value)
+        signal.wait.assert_called_once_with(10)
+
+    @patch('gofer.agent.rmi.Tracker')
+    def test_register(self, tracker):
+        fn = Mock()
+        signal = tracker.return_value.signal.return_value
+        cancelled = Cancelled('123')
+        cancelled.register(fn)
+        signal.register.assert_called_once_with(fn)
+
+
+class TestHelper(TestCase):
+
+    def test_run(self):
+        helpers = Mock()
+        helpers.put.side_effect = [True, False]
+        calls = [Mock(), Mock()]
+        calls[0].run.side_effect = ValueError
+        helper = Helper(helpers)
+        for call in calls:
+            helper.queue.put(call)
+        helper.run()
+        for call in calls:
+            call.run.assert_called_once_with()
+            call.done.set.assert_called_once_with()
+        self.assertEqual(
+            helpers.put.call_args_list,
+            [
+                ((helper, calls[0]), {}),
+                ((helper, calls[1]), {}),
+            ])
+
+
+class TestHelpers(TestCase):
+
+    def setUp(self):
+        Singleton._inst.clear()
+
+    def tearDown(self):
+        Singleton._inst.clear()
+
+    def test_init(self):
+        helpers = Helpers()
+        self.assertEqual(helpers.idle, [])
+        self.assertEqual(helpers.abandoned, 0)
+
+    @patch('gofer.agent.rmi.Helper')
+    def test_get(self, helper):
+        helpers = Helpers()
+        thread = helpers.get()
+        helper.assert_called_once_with(helpers)
+        thread.start.assert_called_once_with()
+        self.assertEqual(thread, helper.return_value)
+
+    @patch('gofer.agent.rmi.Helper')
+    def test_get_idle(self, helper):
+        thread = Mock()
+        helpers = Helpers()
+        helpers.idle.append(thread)
+        self.assertEqual(helpers.get(), thread)
+        self.assertEqual(helpers.idle, [])
+        self.assertFalse(helper.called)
+
+    @patch('gofer.agent.rmi.Helper')
+    def test_get_refused(self, helper):
+        helpers = Helpers()
+        helpers.abandoned = Helpers.ABANDONED
+        self.assertEqual(helpers.get(), None)
+        self.assertFalse(helper.called)
+
+    def test_put(self):
+        thread = Mock()
+        call = Mock(abandoned=False)
+        helpers = Helpers()
+        self.assertTrue(helpers.put(thread, call))
+        self.assertEqual(helpers.idle, [thread])
+
+    def test_put_discarded(self):
+        call = Mock(abandoned=False)
+        helpers = Helpers()
+        helpers.idle = [Mock() for _ in range(Helpers.IDLE)]
+        self.assertFalse(helpers.put(Mock(), call))
+        self.assertEqual(len(helpers.idle), Helpers.IDLE)
+
+    @patch('gofer.agent.rmi.Metrics')
+    def test_put_abandoned(self, metrics):
+        thread = Mock()
+        call = Mock(abandoned=True)
+        helpers = Helpers()
+        helpers.abandoned = 1
+        self.assertTrue(helpers.put(thread, call))
+        self.assertEqual(helpers.abandoned, 0)
+        self.assertEqual(helpers.idle, [thread])
+        metrics.return_value.counter.assert_called_once_with('rmi.timeout.abandoned')
+        metrics.return_value.counter.return_value.inc.assert_called_once_with(-1)
+
+    @patch('gofer.agent.rmi.Metrics')
+    def test_abandon(self, metrics):
+        call = Mock(abandoned=False)
+        call.done.is_set.return_value = False
+        helpers = Helpers()
+        self.assertTrue(helpers.abandon(call))
+        self.assertTrue(call.abandoned)
+        self.assertEqual(helpers.abandoned, 1)
+        metrics.return_value.counter.assert_called_once_with('rmi.timeout.abandoned')
+        metrics.return_value.counter.return_value.inc.assert_called_once_with()
+
+    @patch('gofer.agent.rmi.Metrics')
+    def test_abandon_completed(self, metrics):
+        call = Mock(abandoned=False)
+        call.done.is_set.return_value = True
+        helpers = Helpers()
+        self.assertFalse(helpers.abandon(call))
+        self.assertFalse(call.abandoned)
+        self.assertEqual(helpers.abandoned, 0)
+        self.assertFalse(metrics.called)
+
+
+class TestTimedCall(TestCase):
+
+    def setUp(self):
+        Singleton._inst.clear()
+        context = Context.current()
+        context.sn = '123'
+        context.progress = Mock()
+        context.cancelled = Mock()
+
+    def tearDown(self):
+        Singleton._inst.clear()
+        context = Context.current()
+        context.sn = None
+        context.progress = None
+        context.cancelled = None
+
+    def test_init(self):
+        context = Context.current()
+        dispatcher = Mock()
+        request = Document(sn='123')
+        call = TimedCall(dispatcher, request)
+        self.assertEqual(call.dispatcher, dispatcher)
+        self.assertEqual(call.request, request)
+        self.assertEqual(call.sn, context.sn)
+        self.assertEqual(call.progress, context.progress)
+        self.assertEqual(call.cancelled, context.cancelled)
+        self.assertEqual(call.result, None)
+        self.assertFalse(call.done.is_set())
+        self.assertFalse(call.abandoned)
+
+    def test_call(self):
+        propagated = []
+
+        def dispatch(request):
+            context = Context.current()
+            propagated.append((context.sn, context.progress, context.cancelled))
+            return Return.succeed(18)
+
+        context = Context.current()
+        dispatcher = Mock()
+        dispatcher.dispatch.side_effect = dispatch
+        request = Document(sn='123')
+        call = TimedCall(dispatcher, request)
+        returned = call(10)
+        self.assertEqual(returned.retval, 18)
+        self.assertEqual(propagated, [(context.sn, context.progress, context.cancelled)])
+
+    def test_call_failed(self):
+        dispatcher = Mock()
+        dispatcher.dispatch.side_effect = ValueError
+        request = Document(sn='123')
+        call = TimedCall(dispatcher, request)
+        returned = call(10)
+        self.assertTrue(returned.failed())
+        self.assertEqual(returned.xclass, 'ValueError')
+        # wait for the helper to become idle.
+        for _ in range(100):
+            if Helpers().idle:
+                break
+            sleep(0.01)
+        self.assertEqual(len(Helpers().idle), 1)
+        self.assertEqual(Helpers().abandoned, 0)
+
+    def test_reused(self):
+        threads = []
+
+        def dispatch(request):
+            threads.append(current_thread())
+            return Return.succeed(18)
+
+        dispatcher = Mock()
+        dispatcher.dispatch.side_effect = dispatch
+        request = Document(sn='123')
+        for _ in range(3):
+            call = TimedCall(dispatcher, request)
+            call(10)
+            # wait for the helper to become idle.
+            for _ in range(100):
+                if Helpers().idle:
+                    break
+                sleep(0.01)
+        self.assertEqual(len(set(threads)), 1)
+        self.assertEqual(len(Helpers().idle), 1)
+
+    @patch('gofer.agent.rmi.Metrics')
+    def test_timeout(self, metrics):
+        event = Event()
+
+        def dispatch(request):
+            event.wait(10)
+
+        context = Context.current()
+        dispatcher = Mock()
+        dispatcher.dispatch.side_effect = dispatch
+        request = Document(sn='123', request=dict(classname='A', method='b'))
+        call = TimedCall(dispatcher, request)
+        try:
+            returned = call(0.1)
+            self.assertTrue(call.abandoned)
+            self.assertEqual(Helpers().abandoned, 1)
+        finally:
+            event.set()
+        call.done.wait(10)
+        self.assertTrue(returned.failed())
+        self.assertEqual(returned.xclass, 'ExecutionTimeout')
+        context.cancelled.signal.set.assert_called_once_with()
+        counter = metrics.return_value.counter
+        self.assertEqual(
+            counter.call_args_list[:2],
+            [
+                (('rmi.timeout.abandoned',), {}),
+                (('rmi.timeout',), {}),
+            ])
+
+    @patch('gofer.agent.rmi.Metrics')
+    def test_refused(self, metrics):
+        dispatcher = Mock()
+        request = Document(sn='123', request=dict(classname='A', method='b'))
+        Helpers().abandoned = Helpers.ABANDONED
+        call = TimedCall(dispatcher, request)
+        returned = call(10)
+        self.assertTrue(returned.failed())
+        self.assertEqual(returned.xclass, 'ExecutionRefused')
+        self.assertFalse(dispatcher.dispatch.called)
+        metrics.return_value.counter.assert_called_once_with('rmi.timeout.refused')
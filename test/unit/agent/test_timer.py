@@ -0,0 +1,71 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from time import time
+from unittest import TestCase
+
+from mock import patch, Mock
+
+from gofer.agent.timer import TimerQueue
+
+
+class TestTimerQueue(TestCase):
+
+    def setUp(self):
+        self.timer = TimerQueue.__new__(TimerQueue)
+        TimerQueue.__init__(self.timer)
+
+    def test_init(self):
+        self.assertEqual(self.timer.getName(), 'timer')
+        self.assertEqual(self.timer.heap, [])
+        self.assertTrue(self.timer.isDaemon())
+
+    def test_add(self):
+        fn1 = Mock()
+        fn2 = Mock()
+        self.timer.add(20, fn1)
+        self.timer.add(10, fn2)
+        self.assertEqual(len(self.timer), 2)
+        self.assertEqual(self.timer.heap[0][-1], fn2)
+
+    def test_next(self):
+        fn1 = Mock()
+        fn2 = Mock()
+        fn3 = Mock()
+        now = time()
+        self.timer.add(now - 10, fn1)
+        self.timer.add(now - 20, fn2)
+        self.timer.add(now - 10, fn3)
+        self.assertEqual(self.timer.next(), fn2)
+        self.assertEqual(self.timer.next(), fn1)
+        self.assertEqual(self.timer.next(), fn3)
+
+    def test_next_not_due(self):
+        fn = Mock()
+        self.timer.add(time() + 0.1, fn)
+        self.assertEqual(self.timer.next(), None)
+        self.assertEqual(self.timer.next(), fn)
+
+    @patch('gofer.agent.timer.TimerQueue.IDLE', 0.1)
+    def test_next_empty(self):
+        self.assertEqual(self.timer.next(), None)
+
+    @patch('gofer.common.Thread.aborted')
+    def test_run(self, aborted):
+        fn = Mock(side_effect=ValueError)
+        aborted.side_effect = [False, False, True]
+        self.timer.next = Mock(side_effect=[None, fn])
+        self.timer.run()
+        fn.assert_called_once_with()
+
+    def test_abort(self):
+        self.timer.abort()
+        self.assertTrue(getattr(self.timer, TimerQueue.ABORT).isSet())
@@ -35,29 +35,41 @@ class TestWhiteboard(TestCase):
         self.assertEqual(mutex.acquire.call_count, 2)
         self.assertEqual(mutex.release.call_count, 2)
         self.assertEqual(wb._Whiteboard__dict, {'a': a, 'b': b})
-        # get item
+        # get item (not locked)
         self.assertEqual(wb['a'], a)
         self.assertEqual(wb['b'], b)
         self.assertRaises(KeyError, wb.__getitem__, 'c')
-        self.assertEqual(mutex.acquire.call_count, 5)
-        self.assertEqual(mutex.release.call_count, 5)
-        # get
+        self.assertEqual(mutex.acquire.call_count, 2)
+        self.assertEqual(mutex.release.call_count, 2)
+        # get (not locked)
         self.assertEqual(wb.get('a'), a)
         self.assertEqual(wb.get('b'), b)
         self.assertEqual(wb.get('c'), None)
         self.assertEqual(wb.get('d', 30), 30)
-        self.assertEqual(mutex.acquire.call_count, 9)
-        self.assertEqual(mutex.release.call_count, 9)
+        self.assertEqual(mutex.acquire.call_count, 2)
+        self.assertEqual(mutex.release.call_count, 2)
         # update
         wb.update({'e': 40, 'f': 50})
         self.assertEqual(wb._Whiteboard__dict, {'a': a, 'b': b, 'e': 40, 'f': 50})
-        self.assertEqual(mutex.acquire.call_count, 10)
-        self.assertEqual(mutex.release.call_count, 10)
+        self.assertEqual(mutex.acquire.call_count, 3)
+        self.assertEqual(mutex.release.call_count, 3)
         # repr
         self.assertEqual(repr(wb), repr(wb._Whiteboard__dict))
-        self.assertEqual(mutex.acquire.call_count, 11)
-        self.assertEqual(mutex.release.call_count, 11)
+        self.assertEqual(mutex.acquire.call_count, 3)
+        self.assertEqual(mutex.release.call_count, 3)
         # repr
         self.assertEqual(str(wb), str(wb._Whiteboard__dict))
-        self.assertEqual(mutex.acquire.call_count, 13)
-        self.assertEqual(mutex.release.call_count, 13)
\ No newline at end of file
+        self.assertEqual(mutex.acquire.call_count, 3)
+        self.assertEqual(mutex.release.call_count, 3)
+
+    def test_copy_on_write(self):
+        wb = Whiteboard()
+        wb['a'] = 1
+        snapshot = wb._Whiteboard__dict
+        expected = dict(snapshot)
+        wb['b'] = 2
+        wb.update({'c': 3})
+        self.assertEqual(snapshot, expected)
+        self.assertFalse(snapshot is wb._Whiteboard__dict)
+        self.assertEqual(wb['b'], 2)
+        self.assertEqual(wb['c'], 3)
@@ -144,7 +144,7 @@ class TestReader(TestCase):
 
     def test_get(self):
         queue = Mock(name='test-queue')
-        received = Mock(content='<body/>')
+        received = Mock(content='<body/>', properties={'application_headers': {'A': 1}})
         url = 'test-url'
 
         # test
@@ -159,6 +159,7 @@ class TestReader(TestCase):
         self.assertEqual(message._reader, reader)
         self.assertEqual(message._impl, received)
         self.assertEqual(message._body, received.body)
+        self.assertEqual(message._properties, {'A': 1})
 
     def test_ack(self):
         url = 'test-url'
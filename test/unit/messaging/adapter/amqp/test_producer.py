@@ -62,6 +62,18 @@ class TestBuildMessage(TestCase):
         message.assert_called_once_with(body, delivery_mode=2)
         self.assertEqual(m, message.return_value)
 
+    @patch('gofer.messaging.adapter.amqp.producer.Message')
+    def test_call_headers(self, message):
+        body = 'test-body'
+        headers = {'A': 1}
+
+        # test
+        m = build_message(body, 0, True, headers)
+
+        # validation
+        message.assert_called_once_with(body, delivery_mode=2, application_headers=headers)
+        self.assertEqual(m, message.return_value)
+
 
 class TestSender(TestCase):
 
@@ -159,10 +171,11 @@ class TestSender(TestCase):
         sender = Sender('')
         sender.durable = 18
         sender.channel = Mock()
-        sender.send(address, content, ttl=ttl)
+        properties = {'A': 1}
+        sender.send(address, content, ttl=ttl, properties=properties)
 
         # validation
-        build.assert_called_once_with(content, ttl, sender.durable)
+        build.assert_called_once_with(content, ttl, sender.durable, properties)
         sender.channel.basic_publish.assert_called_once_with(
             build.return_value,
             mandatory=True,
@@ -186,7 +199,7 @@ class TestSender(TestCase):
         sender.send(address, content, ttl=ttl)
 
         # validation
-        build.assert_called_once_with(content, ttl, sender.durable)
+        build.assert_called_once_with(content, ttl, sender.durable, None)
         sender.channel.basic_publish.assert_called_once_with(
             build.return_value,
             mandatory=True,
@@ -129,7 +129,7 @@ class TestReader(TestCase):
 
     def test_get(self):
         node = Mock(address='test')
-        received = Mock(body='<body/>')
+        received = Mock(body='<body/>', properties={'A': 1})
         url = 'test-url'
 
         # test
@@ -144,6 +144,7 @@ class TestReader(TestCase):
         self.assertEqual(message._reader, reader)
         self.assertEqual(message._impl, received)
         self.assertEqual(message._body, received.body)
+        self.assertEqual(message._properties, received.properties)
 
     @patch('gofer.messaging.adapter.proton.consumer.Timeout', Timeout)
     def test_get_empty(self):
@@ -28,7 +28,7 @@ class TestBuilder(TestCase):
         ttl = None
         durable = 18
         m = build_message(content, ttl, durable)
-        message.assert_called_once_with(body=content, durable=durable)
+        message.assert_called_once_with(body=content, durable=durable, properties=None)
         self.assertEqual(m, message.return_value)
 
     @patch('gofer.messaging.adapter.proton.producer.Message')
@@ -37,7 +37,15 @@ class TestBuilder(TestCase):
         ttl = 10
         durable = 18
         m = build_message(content, ttl, durable)
-        message.assert_called_once_with(body=content, durable=durable, ttl=ttl)
+        message.assert_called_once_with(body=content, durable=durable, ttl=ttl, properties=None)
+        self.assertEqual(m, message.return_value)
+
+    @patch('gofer.messaging.adapter.proton.producer.Message')
+    def test_build_properties(self, message):
+        content = Mock()
+        properties = {'A': 1}
+        m = build_message(content, None, 18, properties)
+        message.assert_called_once_with(body=content, durable=18, properties=properties)
         self.assertEqual(m, message.return_value)
 
 
@@ -131,10 +139,11 @@ class TestSender(TestCase):
         sender = Sender('')
         sender.durable = 18
         sender.connection = Mock()
-        sender.send(address, content, ttl=ttl)
+        properties = {'A': 1}
+        sender.send(address, content, ttl=ttl, properties=properties)
 
         # validation
-        builder.assert_called_once_with(content, ttl, sender.durable)
+        builder.assert_called_once_with(content, ttl, sender.durable, properties)
         sender.connection.sender.assert_called_once_with(address)
         _sender = sender.connection.sender.return_value
         _sender.send.assert_called_once_with(builder.return_value)
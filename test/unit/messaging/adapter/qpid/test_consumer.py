@@ -196,7 +196,7 @@ class TestReader(TestCase):
 
     def test_get(self):
         queue = Queue('test-queue')
-        received = Mock(content='<body/>')
+        received = Mock(content='<body/>', properties={'A': 1})
         url = 'test-url'
 
         # test
@@ -211,6 +211,7 @@ class TestReader(TestCase):
         self.assertEqual(message._reader, reader)
         self.assertEqual(message._impl, received)
         self.assertEqual(message._body, received.content)
+        self.assertEqual(message._properties, received.properties)
 
     @patch('gofer.messaging.adapter.qpid.consumer.Empty', Empty)
     def test_get_empty(self):
@@ -116,10 +116,15 @@ class TestSender(TestCase):
         sender = Sender('')
         sender.durable = 18
         sender.session = Mock()
-        sender.send(address, content, ttl=ttl)
+        properties = {'A': 1}
+        sender.send(address, content, ttl=ttl, properties=properties)
 
         # validation
-        message.assert_called_once_with(content=content, durable=sender.durable, ttl=ttl)
+        message.assert_called_once_with(
+            content=content,
+            durable=sender.durable,
+            ttl=ttl,
+            properties=properties)
         sender.session.sender.assert_called_once_with(address)
         _sender = sender.session.sender.return_value
         _sender.send.assert_called_once_with(message.return_value)
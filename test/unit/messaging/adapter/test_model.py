@@ -13,12 +13,17 @@
 # Jeff Ortel <jortel@redhat.com>
 #
 
+import zlib
+
 from unittest import TestCase
 
 from mock import patch, Mock
 
 from gofer.common import ThreadSingleton
-from gofer.messaging.model import Document, VERSION
+from gofer.messaging import codec
+from gofer.messaging.codec import Json
+from gofer.messaging.model import Document, LazyDocument, DecodeError, VERSION
+from gofer.messaging.compression import CompressionError
 from gofer.messaging.adapter.url import URL
 from gofer.messaging.adapter.model import Model, _Domain, Node
 from gofer.messaging.adapter.model import BaseExchange, Exchange, DIRECT
@@ -41,6 +46,10 @@ class Local(object):
     pass
 
 
+class TestCodec(Json):
+    name = 'test'
+
+
 class FakeConnection(object):
 
     __metaclass__ = ThreadSingleton
@@ -411,6 +420,7 @@ class TestReader(TestCase):
         _find.assert_called_with(url)
         plugin.Reader.assert_called_with(node, url)
         self.assertEqual(reader.authenticator, None)
+        self.assertEqual(reader.decompression_limit, None)
         self.assertTrue(isinstance(reader, BaseReader))
 
     @patch('gofer.messaging.adapter.model.Adapter.find')
@@ -528,7 +538,7 @@ class TestReader(TestCase):
         plugin = Mock()
         plugin.Reader.return_value = _impl
         _find.return_value = plugin
-        message = Mock(body='test-content')
+        message = Mock(body='test-content', properties={})
         document = Mock()
         auth.validate.return_value = document
 
@@ -540,11 +550,65 @@ class TestReader(TestCase):
 
         # validation
         reader.get.assert_called_once_with(10)
-        auth.validate.assert_called_once_with(reader.authenticator, message.body)
+        auth.validate.assert_called_once_with(
+            reader.authenticator, message.body, message.properties)
         validate.assert_called_once_with(document)
         self.assertEqual(_message, reader.get.return_value)
         self.assertEqual(_document, document)
 
+    @patch('gofer.messaging.adapter.model.Adapter.find')
+    def test_next_compressed(self, _find):
+        body = '{"sn": 1, "version": "%s"}' % VERSION
+        message = Mock(body=zlib.compress(body), properties={'gofer.compression': 'zlib'})
+
+        # test
+        reader = Reader(Node(''))
+        reader.get = Mock(return_value=message)
+        _message, _document = reader.next(10)
+
+        # validation
+        self.assertEqual(_message, message)
+        self.assertEqual(_document.sn, 1)
+
+    @patch('gofer.messaging.adapter.model.Adapter.find')
+    def test_next_not_decompressed(self, _find):
+        message = Mock(body='<garbage>', properties={'gofer.compression': 'zlib'})
+
+        # test
+        reader = Reader(Node(''))
+        reader.get = Mock(return_value=message)
+        self.assertRaises(CompressionError, reader.next, 10)
+
+        # validation
+        message.ack.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.model.Adapter.find')
+    def test_next_decompression_limit(self, _find):
+        body = '{"sn": 1, "version": "%s", "data": "%s"}' % (VERSION, 'A' * 1000)
+        message = Mock(body=zlib.compress(body), properties={'gofer.compression': 'zlib'})
+
+        # test
+        reader = Reader(Node(''))
+        reader.decompression_limit = 100
+        reader.get = Mock(return_value=message)
+        self.assertRaises(CompressionError, reader.next, 10)
+
+        # validation
+        message.ack.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.model.Adapter.find')
+    def test_next_codec_not_found(self, _find):
+        properties = {'gofer.version': VERSION, 'gofer.sn': '1'}
+        message = Mock(body='\x00unknown\x00<body>', properties=properties)
+
+        # test
+        reader = Reader(Node(''))
+        reader.get = Mock(return_value=message)
+        self.assertRaises(DecodeError, reader.next, 10)
+
+        # validation
+        message.ack.assert_called_once_with()
+
     @patch('gofer.messaging.adapter.model.Adapter.find')
     def test_next_not_found(self, _find):
         _impl = Mock()
@@ -571,7 +635,7 @@ class TestReader(TestCase):
         plugin = Mock()
         plugin.Reader.return_value = _impl
         _find.return_value = plugin
-        message = Mock(body='test-content')
+        message = Mock(body='test-content', properties={})
         auth.validate.side_effect = ModelError
 
         # test
@@ -582,7 +646,8 @@ class TestReader(TestCase):
 
         # validation
         reader.get.assert_called_once_with(10)
-        auth.validate.assert_called_once_with(reader.authenticator, message.body)
+        auth.validate.assert_called_once_with(
+            reader.authenticator, message.body, message.properties)
         message.ack.assert_called_once_with()
         self.assertFalse(validate.called)
 
@@ -594,7 +659,7 @@ class TestReader(TestCase):
         plugin = Mock()
         plugin.Reader.return_value = _impl
         _find.return_value = plugin
-        message = Mock(body='test-content')
+        message = Mock(body='test-content', properties={})
         document = Mock()
         auth.validate.return_value = document
         validate.side_effect = ModelError
@@ -607,7 +672,8 @@ class TestReader(TestCase):
 
         # validation
         reader.get.assert_called_once_with(10)
-        auth.validate.assert_called_once_with(reader.authenticator, message.body)
+        auth.validate.assert_called_once_with(
+            reader.authenticator, message.body, message.properties)
         message.ack.assert_called_once_with()
         validate.assert_called_once_with(document)
 
@@ -641,6 +707,19 @@ class TestReader(TestCase):
         self.assertTrue(received[1][0].ack.called)
         self.assertFalse(received[2][0].ack.called)
 
+    @patch('gofer.messaging.adapter.model.Adapter.find')
+    def test_search_decoded(self, _find):
+        _find.return_value = Mock()
+        received = [
+            (Mock(), LazyDocument(dict(sn='1'), '<garbage>')),
+            (Mock(), LazyDocument(dict(sn='2'), '{"sn": "2", "A": 1}')),
+        ]
+        reader = Reader(Node(''), TEST_URL)
+        reader.next = Mock(side_effect=received)
+        document = reader.search('2', timeout=10)
+        self.assertEqual(type(document), Document)
+        self.assertEqual(document.A, 1)
+
     @patch('gofer.messaging.adapter.model.Adapter.find')
     def test_search_not_found(self, _find):
         _impl = Mock()
@@ -785,8 +864,9 @@ class TestSender(TestCase):
         ttl = 10
         sender = Sender(url)
         sender.durable = 18
-        sender.send(address, content, ttl)
-        _impl.send.assert_called_once_with(address, content, ttl)
+        properties = {'A': 1}
+        sender.send(address, content, ttl, properties)
+        _impl.send.assert_called_once_with(address, content, ttl, properties)
         self.assertEqual(sender.durable, _impl.durable)
 
 
@@ -869,7 +949,7 @@ class TestProducer(TestCase):
 
         # test
         producer = Producer(TEST_URL)
-        producer.authenticator = Mock()
+        producer.authenticator = Mock(detached=False)
         sn = producer.send(address, ttl=ttl, **body)
 
         # validation
@@ -879,11 +959,148 @@ class TestProducer(TestCase):
             routing=(None, address)
         )
         unsigned = document.return_value
+        unsigned.__iadd__.return_value.dump.assert_called_once_with('json', sort=True)
         auth.sign.assert_called_once_with(
-            producer.authenticator, unsigned.__iadd__.return_value.dump.return_value)
-        _impl.send.assert_called_once_with(address, auth.sign.return_value, ttl)
+            producer.authenticator, unsigned.__iadd__.return_value.dump.return_value, 'json')
+        _impl.send.assert_called_once_with(address, auth.sign.return_value, ttl, None)
         self.assertEqual(sn, uuid4.return_value)
 
+    @patch('gofer.messaging.adapter.model.Adapter.find')
+    def test_send_compressed(self, _find):
+        _impl = Mock()
+        plugin = Mock()
+        plugin.Sender.return_value = _impl
+        _find.return_value = plugin
+        address = 'amq.direct/bar'
+
+        # test
+        producer = Producer(TEST_URL)
+        producer.compression = 'zlib'
+        producer.threshold = 10
+        producer.send(address, A=1)
+
+        # validation
+        sent = _impl.send.call_args[0][1]
+        properties = _impl.send.call_args[0][3]
+        self.assertEqual(properties['gofer.compression'], 'zlib')
+        self.assertEqual(Document().load(zlib.decompress(sent)).A, 1)
+
+    @patch('gofer.messaging.adapter.model.auth')
+    @patch('gofer.messaging.adapter.model.Adapter.find')
+    def test_send_detached(self, _find, auth):
+        _impl = Mock()
+        plugin = Mock()
+        plugin.Sender.return_value = _impl
+        _find.return_value = plugin
+        address = 'amq.direct/bar'
+        ttl = 234
+
+        # test
+        auth.detach.return_value = {'gofer.signature': '<signature>'}
+        producer = Producer(TEST_URL)
+        producer.authenticator = Mock(detached=True)
+        producer.send(address, ttl=ttl, A=1)
+
+        # validation
+        sent = _impl.send.call_args[0][1]
+        properties = _impl.send.call_args[0][3]
+        auth.detach.assert_called_once_with(producer.authenticator, sent)
+        _impl.send.assert_called_once_with(address, sent, ttl, properties)
+        self.assertEqual(properties['gofer.signature'], '<signature>')
+        self.assertEqual(properties['gofer.version'], VERSION)
+        self.assertFalse(auth.sign.called)
+        document = Document()
+        document.load(sent)
+        self.assertEqual(document.A, 1)
+
+    @patch('gofer.messaging.adapter.model.Document')
+    @patch('gofer.messaging.adapter.model.auth')
+    @patch('gofer.messaging.adapter.model.Adapter.find')
+    def test_send_unsigned(self, _find, auth, document):
+        _find.return_value = Mock()
+
+        # test
+        producer = Producer(TEST_URL)
+        producer.send('amq.direct/bar', A=1)
+
+        # validation
+        unsigned = document.return_value.__iadd__.return_value
+        unsigned.dump.assert_called_once_with('json', sort=False)
+
+    @patch('gofer.messaging.adapter.model.uuid4')
+    @patch('gofer.messaging.adapter.model.Adapter.find')
+    def test_send_envelope(self, _find, uuid4):
+        _impl = Mock()
+        plugin = Mock()
+        plugin.Sender.return_value = _impl
+        _find.return_value = plugin
+        uuid4.return_value = '<uuid>'
+        address = 'amq.direct/bar'
+
+        # test
+        producer = Producer(TEST_URL)
+        producer.send(address, ttl=10, status='started')
+
+        # validation
+        sent = _impl.send.call_args[0][1]
+        _impl.send.assert_called_once_with(
+            address,
+            sent,
+            10,
+            {
+                'gofer.sn': '<uuid>',
+                'gofer.version': VERSION,
+                'gofer.routing': [None, address],
+                'gofer.status': 'started',
+            })
+
+    @patch('gofer.messaging.adapter.model.auth')
+    @patch('gofer.messaging.adapter.model.Adapter.find')
+    def test_send_codec(self, _find, auth):
+        _impl = Mock()
+        plugin = Mock()
+        plugin.Sender.return_value = _impl
+        _find.return_value = plugin
+        auth.sign.side_effect = lambda a, m, c: m
+        address = 'amq.direct/bar'
+
+        # test
+        producer = Producer(TEST_URL)
+        producer.authenticator = Mock(detached=False)
+        producer.codec = 'test'
+        with patch.dict(codec.registry, test=TestCodec()):
+            producer.send(address, A=1)
+
+        # validation
+        sent = _impl.send.call_args[0][1]
+        self.assertTrue(sent.startswith('\0test\0'))
+        self.assertEqual(auth.sign.call_args[0][2], 'test')
+        document = Document()
+        with patch.dict(codec.registry, test=TestCodec()):
+            document.load(sent)
+        self.assertEqual(document.codec, 'test')
+        self.assertEqual(document.A, 1)
+
+    @patch('gofer.messaging.adapter.model.Connector.find')
+    @patch('gofer.messaging.adapter.model.auth')
+    @patch('gofer.messaging.adapter.model.Adapter.find')
+    def test_send_connector_codec(self, _find, auth, find):
+        _impl = Mock()
+        plugin = Mock()
+        plugin.Sender.return_value = _impl
+        _find.return_value = plugin
+        find.return_value.codec = 'test'
+
+        # test
+        producer = Producer(TEST_URL)
+        producer.authenticator = Mock(detached=False)
+        with patch.dict(codec.registry, test=TestCodec()):
+            producer.send('amq.direct/bar', A=1)
+
+        # validation
+        find.assert_called_once_with(TEST_URL)
+        self.assertEqual(auth.sign.call_args[0][2], 'test')
+
 
 class TestBaseConnection(TestCase):
 
@@ -1031,6 +1248,7 @@ class TestConnector(TestCase):
         self.assertEqual(b.ssl.client_key, None)
         self.assertEqual(b.ssl.client_certificate, None)
         self.assertFalse(b.ssl.host_validation)
+        self.assertEqual(b.codec, None)
 
     @patch('gofer.messaging.adapter.model.Domain.connector.add')
     def test_add(self, add):
@@ -1091,6 +1309,7 @@ class TestMessage(TestCase):
         self.assertEqual(message._reader, reader)
         self.assertEqual(message._impl, impl)
         self.assertEqual(message._body, body)
+        self.assertEqual(message._properties, {})
 
     def test_body(self):
         reader = Mock()
@@ -1099,6 +1318,13 @@ class TestMessage(TestCase):
         message = Message(reader, impl, body)
         self.assertEqual(message.body, body)
 
+    def test_properties(self):
+        reader = Mock()
+        impl = Mock()
+        properties = {'A': 1}
+        message = Message(reader, impl, 'test-body', properties)
+        self.assertEqual(message.properties, properties)
+
     def test_accept(self):
         reader = Mock()
         impl = Mock()
@@ -9,14 +9,16 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
-from hashlib import sha256
+from hashlib import sha256, sha512
 from unittest import TestCase
 
 from mock import patch, Mock
 
 from gofer.messaging import Document
+from gofer.messaging.model import LazyDocument
 from gofer.messaging.auth import ValidationFailed, Authenticator
-from gofer.messaging.auth import sign, validate
+from gofer.messaging.auth import sign, detach, validate
+from gofer.messaging.auth import SIGNATURE, DIGEST
 from gofer.messaging.auth import peal, load, encode, decode
 
 
@@ -48,6 +50,7 @@ class TestAuthenticator(TestCase):
         auth = Authenticator()
         self.assertRaises(NotImplementedError, auth.sign, digest)
         self.assertRaises(NotImplementedError, auth.validate, document, digest, signature)
+        self.assertFalse(auth.detached)
 
 
 class TestSign(TestCase):
@@ -82,6 +85,49 @@ class TestSign(TestCase):
         self.assertEqual(signed, message)
 
 
+class TestDetach(TestCase):
+
+    def test_detach(self):
+        message = '{"A":1}'
+        signature = 'KLAJDF988R'
+        authenticator = Mock()
+        authenticator.sign.return_value = signature
+
+        # functional test
+        properties = detach(authenticator, message)
+
+        # validation
+        h = sha256()
+        h.update(message)
+        authenticator.sign.assert_called_once_with(h.hexdigest())
+        self.assertEqual(
+            properties,
+            {
+                SIGNATURE: 'S0xBSkRGOTg4Ug==',
+                DIGEST: 'sha256',
+            })
+
+    def test_algorithm(self):
+        message = '{"A":1}'
+        authenticator = Mock()
+        authenticator.sign.return_value = 'KLAJDF988R'
+
+        # functional test
+        properties = detach(authenticator, message, 'sha512')
+
+        # validation
+        authenticator.sign.assert_called_once_with(sha512(message).hexdigest())
+        self.assertEqual(properties[DIGEST], 'sha512')
+
+    def test_no_authenticator(self):
+        properties = detach(None, 'howdy partner')
+        self.assertEqual(properties, {})
+
+    def test_signing_exception(self):
+        properties = detach(Authenticator(), 'howdy partner')
+        self.assertEqual(properties, {})
+
+
 class TestValidation(TestCase):
 
     @patch('gofer.messaging.auth.decode', side_effect=decode)
@@ -125,6 +171,69 @@ class TestValidation(TestCase):
             self.assertEqual(e.details, reason)
             self.assertEqual(e.document, message)
 
+    @patch('gofer.messaging.auth.decode', side_effect=decode)
+    def test_validate_detached(self, decode):
+        signature = 'S0xBSkRGOTg4Ug=='
+        message = '{"A":1}'
+        properties = {SIGNATURE: signature, DIGEST: 'sha512'}
+        authenticator = Mock()
+
+        # functional test
+        validated = validate(authenticator, message, properties)
+
+        # validation
+        decode.assert_called_once_with(signature)
+        authenticator.validate.assert_called_once_with(
+            validated, sha512(message).hexdigest(), 'KLAJDF988R')
+        self.assertEqual(1, validated['A'])
+
+    def test_validate_detached_default_algorithm(self):
+        message = '{"A":1}'
+        properties = {SIGNATURE: 'S0xBSkRGOTg4Ug=='}
+        authenticator = Mock()
+
+        # functional test
+        validated = validate(authenticator, message, properties)
+
+        # validation
+        authenticator.validate.assert_called_once_with(
+            validated, sha256(message).hexdigest(), 'KLAJDF988R')
+
+    def test_validate_detached_algorithm_not_supported(self):
+        message = '{"A":1}'
+        properties = {SIGNATURE: 'S0xBSkRGOTg4Ug==', DIGEST: 'md5'}
+        authenticator = Mock()
+
+        # functional test
+        self.assertRaises(ValidationFailed, validate, authenticator, message, properties)
+
+        # validation
+        self.assertFalse(authenticator.validate.called)
+
+    def test_validate_lazy(self):
+        message = '{"sn": 1, "version": "2.0", "A": 1}'
+        properties = {'gofer.sn': 1, 'gofer.version': '2.0'}
+
+        # functional test
+        validated = validate(None, message, properties)
+
+        # validation
+        self.assertTrue(isinstance(validated, LazyDocument))
+        self.assertEqual(validated.sn, 1)
+        self.assertEqual(validated.decode().A, 1)
+
+    def test_validate_authenticated_not_lazy(self):
+        message = '{"sn": 1, "version": "2.0", "A": 1}'
+        properties = {'gofer.sn': 2, 'gofer.version': '2.0'}
+        authenticator = Mock()
+
+        # functional test
+        validated = validate(authenticator, message, properties)
+
+        # validation
+        self.assertFalse(isinstance(validated, LazyDocument))
+        self.assertEqual(validated.sn, 1)
+
     @patch('gofer.messaging.auth.Document')
     def test_no_message(self, _document):
         validated = validate(None, None)
@@ -0,0 +1,122 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch
+
+from gofer.messaging import codec
+from gofer.messaging.codec import Codec, Json, Msgpack
+from gofer.messaging.codec import DEFAULT, HEADER
+from gofer.messaging.codec import register, find, encode, decode
+from gofer.messaging.model import Document
+
+
+class Reversed(Codec):
+
+    name = 'reversed'
+
+    def encode(self, thing, sort=True):
+        return Json().encode(thing, sort)[::-1]
+
+    def decode(self, s):
+        return Json().decode(s[::-1])
+
+
+class TestCodec(TestCase):
+
+    def test_abstract(self):
+        c = Codec()
+        self.assertRaises(NotImplementedError, c.encode, {})
+        self.assertRaises(NotImplementedError, c.decode, '')
+
+    def test_json(self):
+        c = Json()
+        document = Document(A=1, B=Document(b=(1, 2)))
+        s = c.encode(document)
+        self.assertEqual(s, '{"A": 1, "B": {"b": [1, 2]}}')
+        self.assertEqual(c.decode(s), {'A': 1, 'B': {'b': [1, 2]}})
+
+    @patch('gofer.messaging.codec.json')
+    def test_json_not_sorted(self, json):
+        c = Json()
+        document = Document(A=1)
+        s = c.encode(document, sort=False)
+        json.dumps.assert_called_once_with(document, default=c.default, sort_keys=False)
+        self.assertEqual(s, json.dumps.return_value)
+
+    def test_json_default(self):
+        document = Document(A=1)
+        self.assertTrue(Json.default(document) is document.__dict__)
+        self.assertRaises(TypeError, Json.default, object())
+
+    @patch('gofer.messaging.codec.msgpack')
+    def test_msgpack(self, msgpack):
+        c = Msgpack()
+        document = Document(A=1)
+        s = c.encode(document)
+        msgpack.packb.assert_called_once_with(document, default=c.default, use_bin_type=True)
+        self.assertEqual(s, msgpack.packb.return_value)
+        d = c.decode(s)
+        msgpack.unpackb.assert_called_once_with(s, raw=False)
+        self.assertEqual(d, msgpack.unpackb.return_value)
+
+    def test_msgpack_default(self):
+        document = Document(A=1)
+        self.assertEqual(Msgpack.default(document), {'A': 1})
+        self.assertRaises(TypeError, Msgpack.default, object())
+
+
+class TestRegistry(TestCase):
+
+    def test_default(self):
+        self.assertTrue(isinstance(DEFAULT, Json))
+        self.assertEqual(find(), DEFAULT)
+        self.assertEqual(find('json'), DEFAULT)
+
+    def test_register(self):
+        c = Reversed()
+        with patch.dict(codec.registry):
+            register(c)
+            self.assertEqual(find('reversed'), c)
+        self.assertRaises(ValueError, find, 'reversed')
+
+    def test_not_found(self):
+        self.assertRaises(ValueError, find, 'unknown')
+        self.assertRaises(ValueError, encode, {}, 'unknown')
+        self.assertRaises(ValueError, decode, HEADER + 'unknown' + HEADER)
+
+
+class TestWire(TestCase):
+
+    def test_default(self):
+        document = Document(A=1)
+        s = encode(document)
+        self.assertEqual(s, '{"A": 1}')
+        self.assertEqual(decode(s), {'A': 1})
+
+    def test_header(self):
+        document = Document(A=1)
+        with patch.dict(codec.registry, reversed=Reversed()):
+            s = encode(document, 'reversed')
+            self.assertEqual(s, '\0reversed\0}1 :"A"{')
+            self.assertEqual(decode(s), {'A': 1})
+
+    def test_document(self):
+        document = Document(A=1, B=[1, 2])
+        with patch.dict(codec.registry, reversed=Reversed()):
+            s = document.dump('reversed')
+            loaded = Document().load(s)
+        self.assertEqual(loaded.__dict__, {'A': 1, 'B': [1, 2]})
+
+    def test_not_valid(self):
+        self.assertRaises(ValueError, decode, HEADER + 'json')
+        self.assertRaises(TypeError, decode, None)
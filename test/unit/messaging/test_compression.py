@@ -0,0 +1,139 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import zlib
+
+from unittest import TestCase
+
+from mock import patch
+
+from gofer.messaging import compression
+from gofer.messaging.model import DocumentError
+from gofer.messaging.compression import Compressor, Zlib, CompressionError
+from gofer.messaging.compression import PROPERTY, THRESHOLD
+from gofer.messaging.compression import register, find, compress, decompress
+
+
+class Reversed(Compressor):
+
+    name = 'reversed'
+
+    def compress(self, s):
+        return s[::-1]
+
+    def decompress(self, s, limit):
+        return s[::-1]
+
+
+class TestCompressor(TestCase):
+
+    def test_abstract(self):
+        c = Compressor()
+        self.assertRaises(NotImplementedError, c.compress, '')
+        self.assertRaises(NotImplementedError, c.decompress, '', 10)
+
+    def test_zlib(self):
+        c = Zlib()
+        s = 'hello' * 100
+        self.assertEqual(c.name, 'zlib')
+        self.assertEqual(c.compress(s), zlib.compress(s))
+        self.assertEqual(c.decompress(c.compress(s), len(s)), s)
+        self.assertRaises(ValueError, c.decompress, c.compress(s), len(s) - 1)
+
+
+class TestRegistry(TestCase):
+
+    def test_find(self):
+        self.assertTrue(isinstance(find('zlib'), Zlib))
+        self.assertRaises(ValueError, find, 'none')
+
+    def test_register(self):
+        c = Reversed()
+        with patch.dict(compression.registry):
+            register(c)
+            self.assertEqual(find(c.name), c)
+
+
+class TestCompress(TestCase):
+
+    def test_not_configured(self):
+        s = 'A' * (THRESHOLD + 1)
+        self.assertEqual(compress(s, None), (s, {}))
+
+    def test_threshold(self):
+        s = 'A' * THRESHOLD
+        self.assertEqual(compress(s, 'zlib'), (s, {}))
+        self.assertEqual(compress(s, 'zlib', len(s)), (s, {}))
+        compressed, properties = compress(s, 'zlib', 10)
+        self.assertEqual(compressed, zlib.compress(s))
+        self.assertEqual(properties, {PROPERTY: 'zlib'})
+
+    @patch('gofer.messaging.compression.Metrics')
+    def test_compress(self, metrics):
+        s = 'A' * (THRESHOLD + 1)
+        compressed, properties = compress(s, 'zlib')
+        self.assertEqual(compressed, zlib.compress(s))
+        self.assertEqual(properties, {PROPERTY: 'zlib'})
+        counter = metrics.return_value.counter
+        names = [c[0][0] for c in counter.call_args_list]
+        self.assertEqual(
+            names,
+            [
+                'messaging.compression.usec',
+                'messaging.compressed',
+                'messaging.compression.input',
+                'messaging.compression.output',
+            ])
+        inc = counter.return_value.inc
+        self.assertEqual(inc.call_args_list[2][0], (len(s),))
+        self.assertEqual(inc.call_args_list[3][0], (len(compressed),))
+
+    def test_not_smaller(self):
+        s = zlib.compress('A' * THRESHOLD * 2)
+        self.assertEqual(compress(s, 'zlib', 0), (s, {}))
+
+    def test_not_found(self):
+        self.assertRaises(ValueError, compress, 'A' * (THRESHOLD + 1), 'none')
+
+
+class TestDecompress(TestCase):
+
+    def test_not_compressed(self):
+        self.assertEqual(decompress('hello', None), 'hello')
+        self.assertEqual(decompress('hello', {}), 'hello')
+
+    def test_decompress(self):
+        s = 'hello' * 100
+        compressed = zlib.compress(s)
+        self.assertEqual(decompress(compressed, {PROPERTY: 'zlib'}), s)
+
+    def test_limit(self):
+        s = 'A' * 1000000
+        compressed = zlib.compress(s)
+        self.assertEqual(decompress(compressed, {PROPERTY: 'zlib'}, len(s)), s)
+        self.assertRaises(CompressionError, decompress, compressed, {PROPERTY: 'zlib'}, len(s) - 1)
+        with patch('gofer.messaging.compression.LIMIT', 1000):
+            self.assertRaises(CompressionError, decompress, compressed, {PROPERTY: 'zlib'})
+
+    def test_failed(self):
+        self.assertRaises(CompressionError, decompress, 'hello', {PROPERTY: 'zlib'})
+        self.assertRaises(CompressionError, decompress, 'hello', {PROPERTY: 'none'})
+
+    def test_error(self):
+        error = CompressionError('bad')
+        self.assertTrue(isinstance(error, DocumentError))
+        self.assertEqual(error.code, CompressionError.CODE)
+        self.assertEqual(error.details, 'bad')
+
+    def test_registered(self):
+        c = Reversed()
+        with patch.dict(compression.registry, reversed=c):
+            self.assertEqual(decompress('olleh', {PROPERTY: c.name}), 'hello')
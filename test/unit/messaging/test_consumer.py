@@ -16,7 +16,8 @@ from mock import Mock, patch
 
 from gofer.messaging import Node
 from gofer.messaging.consumer import ConsumerThread, Consumer
-from gofer.messaging import DocumentError, ValidationFailed
+from gofer.messaging import DocumentError, ValidationFailed, DecodeError
+from gofer.messaging.model import LazyDocument
 
 
 class TestConsumerThread(TestCase):
@@ -45,6 +46,8 @@ class TestConsumerThread(TestCase):
         url = 'test-url'
         node = Node('test-queue')
         consumer = ConsumerThread(node, url)
+        consumer.authenticator = Mock()
+        consumer.decompression_limit = 1024
         consumer.open = Mock()
         consumer.close = Mock()
         consumer.read = Mock(side_effect=StopIteration)
@@ -57,6 +60,8 @@ class TestConsumerThread(TestCase):
 
         # validation
         reader.assert_called_once_with(node, url)
+        self.assertEqual(reader.return_value.authenticator, consumer.authenticator)
+        self.assertEqual(reader.return_value.decompression_limit, 1024)
         consumer.open.assert_called_once_with()
         consumer.read.assert_called_once_with()
         consumer.close.assert_called_once_with()
@@ -131,6 +136,54 @@ class TestConsumerThread(TestCase):
         consumer.dispatch.assert_called_once_with(document)
         message.ack.assert_called_once_with()
 
+    def test_read_decoded(self):
+        message = Mock()
+        consumer = ConsumerThread(Node('test-queue'), 'test-url')
+        consumer.reader = Mock()
+        consumer.reader.next.return_value = (message, LazyDocument(dict(sn=1), '{"sn": 1, "A": 2}'))
+        consumer.dispatch = Mock()
+        consumer.read()
+        dispatched = consumer.dispatch.call_args[0][0]
+        self.assertFalse(isinstance(dispatched, LazyDocument))
+        self.assertEqual(dispatched.A, 2)
+        self.assertEqual(dispatched._encoding, None)
+        message.ack.assert_called_once_with()
+
+    def test_read_frozen(self):
+        body = '{"sn": 1,  "A": 2}'
+        consumer = ConsumerThread(Node('test-queue'), 'test-url')
+        consumer.frozen = True
+        consumer.reader = Mock()
+        consumer.reader.next.return_value = (Mock(), LazyDocument(dict(sn=1), body))
+        consumer.dispatch = Mock()
+        consumer.read()
+        dispatched = consumer.dispatch.call_args[0][0]
+        self.assertEqual(dispatched.dump(), body)
+
+    def test_read_lazy(self):
+        document = LazyDocument(dict(sn=1), '{"sn": 1}')
+        consumer = ConsumerThread(Node('test-queue'), 'test-url')
+        consumer.lazy = True
+        consumer.reader = Mock()
+        consumer.reader.next.return_value = (Mock(), document)
+        consumer.dispatch = Mock()
+        consumer.read()
+        consumer.dispatch.assert_called_once_with(document)
+
+    def test_read_not_decoded(self):
+        message = Mock()
+        document = LazyDocument(dict(sn=1), '<garbage>')
+        consumer = ConsumerThread(Node('test-queue'), 'test-url')
+        consumer.reader = Mock()
+        consumer.reader.next.return_value = (message, document)
+        consumer.dispatch = Mock()
+        consumer.rejected = Mock()
+        consumer.read()
+        self.assertFalse(consumer.dispatch.called)
+        message.ack.assert_called_once_with()
+        self.assertEqual(consumer.rejected.call_args[0][0], DecodeError.CODE)
+        self.assertEqual(consumer.rejected.call_args[0][2], document)
+
     def test_read_nothing(self):
         url = 'test-url'
         node = Node('test-queue')
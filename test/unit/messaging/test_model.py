@@ -11,8 +11,9 @@
 
 from unittest import TestCase
 
-from gofer.messaging.model import VERSION, Document, validate
-from gofer.messaging.model import ModelError, DocumentError, VersionError
+from gofer.messaging.model import VERSION, Document, LazyDocument, validate, envelope, peek
+from gofer.messaging.model import Envelope, RequestEnvelope
+from gofer.messaging.model import ModelError, DocumentError, VersionError, DecodeError, decoded
 
 
 class TestExceptions(TestCase):
@@ -66,6 +67,33 @@ class TestValidate(TestCase):
         self.assertRaises(VersionError, validate, document)
 
 
+class TestEnvelope(TestCase):
+
+    def test_envelope(self):
+        document = Document(sn=1, version=VERSION, routing=('a', 'b'), request={})
+        properties = envelope(document)
+        self.assertEqual(
+            properties,
+            {
+                'gofer.sn': 1,
+                'gofer.version': VERSION,
+                'gofer.routing': ['a', 'b'],
+            })
+
+    def test_peek(self):
+        properties = {
+            'gofer.sn': 1,
+            'gofer.version': VERSION,
+            'gofer.status': 'started',
+            'other': 2,
+        }
+        self.assertEqual(peek(properties), dict(sn=1, version=VERSION, status='started'))
+
+    def test_peek_not_sent(self):
+        self.assertEqual(peek(None), None)
+        self.assertEqual(peek({'gofer.sn': 1}), None)
+
+
 class TestDocument(TestCase):
 
     def test_load(self):
@@ -90,3 +118,170 @@ class TestDocument(TestCase):
             s,
             '{"A": 1, "B": 2, "C": {"a": 1, "b": 2}, "D": {"x": 10, "y": 20}, '
             '"E": [1, {}, {}], "F": 10, "G": "howdy", "H": true}')
+
+    def test_load_not_kept(self):
+        s = '{"B": 1,  "A": 2}'
+        document = Document().load(s)
+        self.assertEqual(document._encoding, None)
+        self.assertEqual(document.dump(), '{"A": 2, "B": 1}')
+
+    def test_load_frozen(self):
+        s = '{"B": 1,  "A": 2}'
+        document = Document().load(s, frozen=True)
+        self.assertEqual(document._encoding, ('json', s))
+        self.assertEqual(document.dump(), s)
+        # not empty
+        document = Document(C=3).load(s, frozen=True)
+        self.assertEqual(document._encoding, None)
+        self.assertEqual(document.dump(), '{"A": 2, "B": 1, "C": 3}')
+
+    def test_nested_changed(self):
+        document = Document()
+        document.load('{"sn":1,"request":{"args":[1]}}')
+        document.request['args'].append(2)
+        self.assertEqual(document.dump(), '{"request": {"args": [1, 2]}, "sn": 1}')
+
+    def test_freeze(self):
+        document = Document(B=1, A=2)
+        s = document.freeze(sort=False)
+        self.assertEqual(document._encoding, ('json', s))
+        self.assertTrue(document.dump() is s)
+
+    def test_changed(self):
+        def kept():
+            document = Document()
+            document.load('{"A": 1}', frozen=True)
+            return document
+        document = kept()
+        document.B = 2
+        self.assertEqual(document._encoding, None)
+        self.assertEqual(document.dump(), '{"A": 1, "B": 2}')
+        document = kept()
+        document['B'] = 2
+        self.assertEqual(document._encoding, None)
+        document = kept()
+        document += {'B': 2}
+        self.assertEqual(document._encoding, None)
+        document = kept()
+        del document.A
+        self.assertEqual(document._encoding, None)
+        self.assertEqual(document.dump(), '{}')
+
+    def test_dump_inserted(self):
+        result = Document()
+        result.load('{"retval": [1, 2],  "z": 0}', frozen=True)
+        document = Document(sn=1, result=result, other=Document(x=1), text='"result"')
+        s = document.dump()
+        self.assertEqual(
+            s,
+            '{"other": {"x": 1}, "result": {"retval": [1, 2],  "z": 0}, "sn": 1, "text": "\\"result\\""}')
+        self.assertEqual(Document().load(s).text, '"result"')
+        self.assertEqual(document.__dict__['result'], result)
+        self.assertEqual(document._encoding, None)
+        s = document.dump(sort=False)
+        self.assertEqual(Document().load(s).__dict__, Document().load(document.dump()).__dict__)
+
+    def test_dump_not_sorted(self):
+        document = Document(A=1, B=Document(b=(1, 2)), C=[Document(c=1)])
+        s = document.dump(sort=False)
+        self.assertEqual(Document().load(s).__dict__, {'A': 1, 'B': {'b': [1, 2]}, 'C': [{'c': 1}]})
+
+
+class TestLazyDocument(TestCase):
+
+    BODY = '{"sn": 1, "version": "2.0", "request": {"A": 1}}'
+
+    def test_envelope(self):
+        document = LazyDocument(dict(sn=1, version=VERSION), self.BODY)
+        self.assertEqual(document.sn, 1)
+        self.assertEqual(document.version, VERSION)
+        self.assertEqual(document.status, None)
+        self.assertTrue(isinstance(document, LazyDocument))
+        self.assertEqual(document.dump(), self.BODY)
+        self.assertTrue(isinstance(document, LazyDocument))
+
+    def test_decode(self):
+        document = LazyDocument(dict(sn=1, version=VERSION), self.BODY)
+        decoded = document.decode()
+        self.assertEqual(type(decoded), Document)
+        self.assertEqual(decoded.__dict__, {'sn': 1, 'version': VERSION, 'request': {'A': 1}})
+        self.assertEqual(decoded._encoding, None)
+        self.assertTrue(isinstance(document, LazyDocument))
+        # frozen
+        decoded = document.decode(frozen=True)
+        self.assertEqual(decoded.dump(), self.BODY)
+
+    def test_not_decoded(self):
+        document = LazyDocument(dict(sn=1, version=VERSION), self.BODY)
+        self.assertRaises(AttributeError, getattr, document, 'request')
+        self.assertRaises(AttributeError, setattr, document, 'sn', 3)
+        self.assertRaises(AttributeError, delattr, document, 'sn')
+        self.assertEqual(vars(document), {'sn': 1, 'version': VERSION})
+        self.assertEqual(repr(document), repr({'sn': 1, 'version': VERSION}))
+        self.assertTrue(isinstance(document, LazyDocument))
+
+    def test_body_precedence(self):
+        document = LazyDocument(dict(sn=2, version=VERSION), self.BODY)
+        self.assertEqual(len(document), 2)
+        self.assertEqual(document.decode().sn, 1)
+
+    def test_decode_failed(self):
+        document = LazyDocument(dict(sn=1, version=VERSION), '<garbage>')
+        try:
+            document.decode()
+            self.fail('DecodeError not raised')
+        except DecodeError, de:
+            self.assertEqual(de.code, DecodeError.CODE)
+            self.assertEqual(de.document, document)
+        document = LazyDocument(dict(sn=1, version=VERSION), '[1]')
+        self.assertRaises(DecodeError, document.decode)
+
+    def test_codec_not_found(self):
+        try:
+            LazyDocument(dict(sn=1, version=VERSION), '\x00unknown\x00<body>')
+            self.fail('DecodeError not raised')
+        except DecodeError, de:
+            self.assertEqual(de.code, DecodeError.CODE)
+            self.assertEqual(de.document.sn, 1)
+
+    def test_decoded(self):
+        document = LazyDocument(dict(sn=1, version=VERSION), self.BODY)
+        self.assertEqual(decoded(document).request, {'A': 1})
+        document = Document(sn=1)
+        self.assertTrue(decoded(document) is document)
+
+
+class TestCompactEnvelope(TestCase):
+
+    BODY = '{"data": 2, "replyto": "q", "request": {"A": 1}, "sn": 1, "x": 3}'
+
+    def test_init(self):
+        document = LazyDocument(dict(sn=1), self.BODY)
+        request = RequestEnvelope(document.decode())
+        self.assertEqual(request.sn, 1)
+        self.assertEqual(request.request, {'A': 1})
+        self.assertEqual(request.x, 3)
+        self.assertEqual(request._extra, {'x': 3})
+        self.assertEqual(request.status, None)
+
+    def test_fields(self):
+        self.assertEqual(
+            RequestEnvelope._fields()[:len(Envelope._fields())],
+            Envelope._fields())
+        self.assertTrue('replyto' in RequestEnvelope._fields())
+
+    def test_load(self):
+        request = RequestEnvelope().load(self.BODY)
+        self.assertEqual(request.__dict__, Document().load(self.BODY).__dict__)
+
+    def test_dump(self):
+        request = RequestEnvelope().load(self.BODY)
+        self.assertEqual(request.dump(), self.BODY)
+        self.assertEqual(Document(request=request).dump(), '{"request": %s}' % self.BODY)
+
+    def test_document(self):
+        request = RequestEnvelope().load(self.BODY)
+        document = request.document()
+        self.assertTrue(isinstance(document, Document))
+        self.assertEqual(document.__dict__, request.__dict__)
+        self.assertEqual(document.dump(), self.BODY)
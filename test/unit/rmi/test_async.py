@@ -11,6 +11,50 @@
 
 from unittest import TestCase
 
+from mock import Mock, NonCallableMock
+
+from gofer.messaging import Document, DecodeError
+from gofer.messaging.model import LazyDocument
+from gofer.rmi.async import ReplyConsumer, Chunk, Progress
+
 
 class Test(TestCase):
-    pass
\ No newline at end of file
+
+    def test_chunk(self):
+        listener = NonCallableMock()
+        consumer = ReplyConsumer(Mock())
+        consumer.listener = listener
+        consumer.blacklist = set()
+        consumer.dispatch(Document(sn=1, routing=['a', 'b'], status='chunk', seq=2, items=[1, 2]))
+        reply = listener.chunk.call_args[0][0]
+        self.assertTrue(isinstance(reply, Chunk))
+        self.assertEqual(reply.seq, 2)
+        self.assertEqual(reply.items, [1, 2])
+        self.assertEqual(consumer.blacklist, set())
+
+    def test_compact(self):
+        document = Document(sn=1, routing=['a', 'b'], status='progress', total=10, completed=1)
+        reply = Progress(document)
+        self.assertEqual(
+            reply.__dict__,
+            dict(sn=1, origin='a', timestamp=None, data=None, total=10, completed=1, details=None))
+        self.assertEqual(reply._extra, None)
+        # user defined
+        reply.tag = 2
+        self.assertEqual(reply.tag, 2)
+        self.assertEqual(reply.other, None)
+
+    def test_lazy(self):
+        listener = NonCallableMock()
+        consumer = ReplyConsumer(Mock())
+        consumer.listener = listener
+        consumer.blacklist = set([1])
+        self.assertTrue(consumer.lazy)
+        # ignored (not decoded)
+        consumer.dispatch(LazyDocument(dict(sn=1), '<garbage>'))
+        self.assertFalse(listener.method_calls)
+        document = LazyDocument(dict(sn=2), '<garbage>')
+        self.assertRaises(DecodeError, consumer.dispatch, document)
+        document = LazyDocument(dict(sn=2), '{"sn": 2, "routing": ["a", "b"], "status": "started"}')
+        consumer.dispatch(document)
+        self.assertTrue(listener.started.called)
@@ -0,0 +1,385 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import os
+import shutil
+import hashlib
+import tempfile
+
+from time import time
+from base64 import b64encode
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from gofer.rmi import bulk
+from gofer.rmi.bulk import Blob, Spool, BlobError, MARKER
+from gofer.rmi.dispatcher import Request
+
+
+CONTENT = 'hello\0world' * 10
+
+
+class SpoolTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.spool = Spool(os.path.join(self.root, 'spool'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def file(self, content=CONTENT):
+        path = os.path.join(self.root, 'file')
+        with open(path, 'w') as fp:
+            fp.write(content)
+        return path
+
+
+class TestBlob(SpoolTest):
+
+    def test_init(self):
+        blob = Blob('/tmp/x')
+        self.assertEqual(blob.path, '/tmp/x')
+        self.assertEqual(len(blob.id), 32)
+        blob = Blob('/tmp/x', '123')
+        self.assertEqual(blob.id, '123')
+
+    def test_content(self):
+        blob = Blob(self.file())
+        self.assertEqual(blob.size, len(CONTENT))
+        self.assertEqual(blob.digest, hashlib.sha256(CONTENT).hexdigest())
+        self.assertEqual(blob.read(), CONTENT)
+        content = blob.open()
+        try:
+            self.assertEqual(content[:5], 'hello')
+        finally:
+            content.close()
+
+    def test_chunks(self):
+        blob = Blob(self.file())
+        chunks = list(blob.chunks(30))
+        self.assertEqual([c[0] for c in chunks], [0, 30, 60, 90])
+        self.assertEqual(''.join([c[1] for c in chunks]), CONTENT)
+
+    def test_transient(self):
+        blob = Blob(self.file())
+        digest = blob.digest
+        blob.transient = True
+        self.assertEqual(blob.digest, digest)
+        self.assertTrue(os.path.exists(blob.path))
+        self.assertEqual(blob.read(), CONTENT)
+        self.assertFalse(os.path.exists(blob.path))
+        # empty
+        blob = Blob(self.file(''))
+        blob.transient = True
+        self.assertEqual(blob.read(), '')
+        self.assertFalse(os.path.exists(blob.path))
+
+    def test_empty(self):
+        blob = Blob(self.file(''))
+        self.assertEqual(list(blob.chunks()), [])
+        self.assertEqual(blob.read(), '')
+        self.assertEqual(blob.digest, hashlib.sha256('').hexdigest())
+
+    def test_reference(self):
+        blob = Blob(self.file())
+        reference = blob.reference()
+        self.assertTrue(bulk.is_reference(reference))
+        self.assertEqual(
+            reference[MARKER],
+            dict(id=blob.id, size=blob.size, digest=blob.digest))
+        reference = blob.reference(path=True)
+        self.assertEqual(reference[MARKER]['path'], blob.path)
+
+    def test_delete(self):
+        blob = Blob(self.file())
+        blob.delete()
+        blob.delete()
+        self.assertFalse(os.path.exists(blob.path))
+
+    def test_eq(self):
+        self.assertEqual(Blob('a', '1'), Blob('b', '1'))
+        self.assertNotEqual(Blob('a', '1'), Blob('a', '2'))
+        self.assertNotEqual(Blob('a', '1'), '1')
+
+
+class TestSpool(SpoolTest):
+
+    def test_init(self):
+        self.assertEqual(Spool().root, Spool.ROOT)
+
+    def test_user(self):
+        self.assertEqual(Spool.user().root, os.path.expanduser(Spool.USER))
+        self.assertNotEqual(Spool.user().root, Spool.ROOT)
+
+    def test_usage(self):
+        self.assertEqual(self.spool.usage(), 0)
+        self.spool.store(CONTENT)
+        self.spool.add(Blob(self.file()), 'sn')
+        self.assertEqual(self.spool.usage(), len(CONTENT) * 2)
+
+    def test_path(self):
+        self.assertEqual(self.spool.path('123'), os.path.join(self.spool.root, '123'))
+        self.assertEqual(self.spool.path('123', 'sn'), os.path.join(self.spool.root, 'sn', '123'))
+        self.assertRaises(BlobError, self.spool.path, None)
+        self.assertRaises(BlobError, self.spool.path, '../123')
+        self.assertRaises(BlobError, self.spool.path, '..')
+        self.assertRaises(BlobError, self.spool.path, '123', '..')
+        self.assertRaises(BlobError, self.spool.path, '123', 'a/b')
+
+    def test_directory(self):
+        self.assertEqual(self.spool.directory(), self.spool.root)
+        self.assertEqual(self.spool.directory('sn'), os.path.join(self.spool.root, 'sn'))
+        self.assertRaises(BlobError, self.spool.directory, '')
+        self.assertRaises(BlobError, self.spool.directory, '.sn')
+
+    def test_store(self):
+        blob = self.spool.store(CONTENT)
+        self.assertTrue(self.spool.contains(blob))
+        self.assertEqual(blob.read(), CONTENT)
+
+    def test_add(self):
+        blob = Blob(self.file())
+        spooled = self.spool.add(blob)
+        self.assertEqual(spooled.id, blob.id)
+        self.assertTrue(self.spool.contains(spooled))
+        self.assertFalse(self.spool.contains(blob))
+        self.assertEqual(spooled.read(), CONTENT)
+        self.assertTrue(self.spool.add(spooled) is spooled)
+
+    def test_add_owned(self):
+        blob = Blob(self.file())
+        spooled = self.spool.add(blob, 'sn')
+        self.assertEqual(spooled.path, self.spool.path(blob.id, 'sn'))
+        self.assertTrue(self.spool.contains(spooled, 'sn'))
+        self.assertFalse(self.spool.contains(spooled))
+        self.assertTrue(self.spool.add(spooled, 'sn') is spooled)
+
+    @patch('os.link', Mock(side_effect=OSError))
+    def test_add_copied(self):
+        spooled = self.spool.add(Blob(self.file()))
+        self.assertEqual(spooled.read(), CONTENT)
+
+    @patch('gofer.rmi.bulk.Metrics', Mock())
+    def test_write(self):
+        blob = Blob(self.file())
+        for offset, data in reversed(list(blob.chunks(30))):
+            self.spool.write(bulk.encode(blob, offset, data), 'sn')
+        spooled = self.spool.resolve(blob.reference(), sn='sn')
+        self.assertEqual(spooled.path, self.spool.path(blob.id, 'sn'))
+        self.assertEqual(spooled.read(), CONTENT)
+        # not owned
+        self.assertRaises(BlobError, self.spool.resolve, blob.reference(), sn='other')
+
+    @patch('gofer.rmi.bulk.Metrics', Mock())
+    def test_write_empty(self):
+        blob = Blob(self.file(''))
+        self.spool.write(bulk.encode(blob, 0, ''), 'sn')
+        self.assertEqual(self.spool.resolve(blob.reference(), sn='sn').size, 0)
+
+    @patch('gofer.rmi.bulk.Metrics', Mock())
+    def test_write_limits(self):
+        chunk = dict(id='1', size=11, offset=0, data='a')
+        with patch.object(Spool, 'MAXIMUM', 10):
+            self.assertRaises(BlobError, self.spool.write, chunk, 'sn')
+        self.assertFalse(os.path.exists(self.spool.path('1', 'sn')))
+        self.spool.store('A' * 10)
+        with patch.object(Spool, 'QUOTA', 20):
+            self.assertRaises(BlobError, self.spool.write, chunk, 'sn')
+            chunk = dict(id='1', size=10, offset=0, data='a')
+            self.spool.write(chunk, 'sn')
+            # already allocated
+            chunk = dict(id='1', size=10, offset=1, data='b')
+            self.spool.write(chunk, 'sn')
+            chunk = dict(id='2', size=1, offset=0, data='c')
+            self.assertRaises(BlobError, self.spool.write, chunk, 'sn')
+
+    def test_write_invalid(self):
+        chunk = dict(id='1', size=2, offset=1, data='ab')
+        self.assertRaises(BlobError, self.spool.write, chunk, 'sn')
+        chunk = dict(id='1', size=2, offset=-1, data='a')
+        self.assertRaises(BlobError, self.spool.write, chunk, 'sn')
+        chunk = dict(id='1', size=2, offset=0, data='a')
+        self.assertRaises(BlobError, self.spool.write, chunk, '../sn')
+
+    def test_resolve(self):
+        blob = self.spool.store(CONTENT)
+        resolved = self.spool.resolve(blob.reference())
+        self.assertEqual(resolved, blob)
+        self.assertEqual(resolved.path, blob.path)
+
+    def test_resolve_path(self):
+        blob = self.spool.store(CONTENT)
+        reference = blob.reference(path=True)
+        resolved = self.spool.resolve(reference)
+        self.assertEqual(resolved.path, blob.path)
+        # not in the spool
+        reference[MARKER]['path'] = self.file()
+        self.assertRaises(BlobError, self.spool.resolve, reference)
+
+    def test_resolve_path_owned(self):
+        blob = self.spool.add(Blob(self.file()), 'sn')
+        reference = blob.reference(path=True)
+        resolved = self.spool.resolve(reference, sn='sn')
+        self.assertEqual(resolved.path, blob.path)
+        # owned by another request
+        self.assertRaises(BlobError, self.spool.resolve, reference, sn='other')
+
+    def test_resolve_not_verified(self):
+        blob = self.spool.store(CONTENT)
+        reference = blob.reference()
+        reference[MARKER]['digest'] = '0'
+        resolved = self.spool.resolve(reference, verify=False)
+        self.assertEqual(resolved.digest, '0')
+        self.assertRaises(BlobError, self.spool.resolve, reference)
+
+    def test_resolve_not_found(self):
+        blob = Blob(self.file())
+        self.assertRaises(BlobError, self.spool.resolve, blob.reference())
+
+    def test_resolve_not_matched(self):
+        blob = self.spool.store(CONTENT)
+        reference = blob.reference()
+        with open(blob.path, 'w') as fp:
+            fp.write(CONTENT.upper())
+        self.assertRaises(BlobError, self.spool.resolve, reference)
+
+    def test_delete(self):
+        owned = self.spool.add(Blob(self.file()), 'sn')
+        other = self.spool.add(Blob(self.file()), 'other')
+        blob = self.spool.store(CONTENT)
+        self.spool.delete('sn')
+        self.assertFalse(os.path.exists(owned.path))
+        self.assertFalse(os.path.exists(self.spool.directory('sn')))
+        self.assertTrue(os.path.exists(other.path))
+        self.assertTrue(os.path.exists(blob.path))
+        # not found
+        self.spool.delete('sn')
+        # not valid
+        self.spool.delete('..')
+        self.assertTrue(os.path.exists(self.spool.root))
+
+    def test_sweep(self):
+        old = self.spool.add(Blob(self.file()), 'old')
+        kept = self.spool.add(Blob(self.file()), 'kept')
+        new = self.spool.add(Blob(self.file()), 'new')
+        blob = self.spool.store(CONTENT)
+        past = time() - Spool.TTL - 10
+        for path in (self.spool.directory('old'), self.spool.directory('kept'), blob.path):
+            os.utime(path, (past, past))
+        swept = self.spool.sweep(keep=['kept'])
+        self.assertEqual(sorted(swept), sorted(['old', blob.id]))
+        self.assertFalse(os.path.exists(old.path))
+        self.assertFalse(os.path.exists(blob.path))
+        self.assertTrue(os.path.exists(kept.path))
+        self.assertTrue(os.path.exists(new.path))
+
+    def test_sweep_no_root(self):
+        spool = Spool(os.path.join(self.spool.root, 'none'))
+        self.assertEqual(spool.sweep(), [])
+
+
+class TestChunks(SpoolTest):
+
+    def test_encode(self):
+        blob = Blob(self.file())
+        chunk = bulk.encode(blob, 10, 'ab\0')
+        self.assertEqual(
+            chunk,
+            dict(id=blob.id, size=blob.size, offset=10, data=b64encode('ab\0'), encoding='base64'))
+        self.assertEqual(bulk.decode(chunk), 'ab\0')
+
+    @patch('gofer.rmi.bulk.codec.find', Mock())
+    def test_encode_binary(self):
+        blob = Blob(self.file())
+        chunk = bulk.encode(blob, 10, 'ab\0', 'msgpack')
+        self.assertEqual(chunk, dict(id=blob.id, size=blob.size, offset=10, data='ab\0'))
+        self.assertEqual(bulk.decode(chunk), 'ab\0')
+
+    @patch('gofer.rmi.bulk.CHUNK', 30)
+    @patch('gofer.rmi.bulk.Metrics')
+    def test_send(self, metrics):
+        producer = Mock(codec=None)
+        blob = Blob(self.file())
+        empty = self.spool.store('')
+        bulk.send(producer, 'q', [blob, empty], 10, sn=1)
+        sent = producer.send.call_args_list
+        self.assertEqual(len(sent), 5)
+        for call in sent:
+            self.assertEqual(call[0], ('q', 10))
+            self.assertEqual(call[1]['sn'], 1)
+            self.assertEqual(call[1]['status'], 'blob')
+        self.assertEqual([c[1]['blob']['offset'] for c in sent], [0, 30, 60, 90, 0])
+        self.assertEqual(sent[4][1]['blob']['id'], empty.id)
+        metrics.return_value.counter.assert_called_with('rmi.bulk.sent')
+
+
+class TestArguments(SpoolTest):
+
+    def test_outbound(self):
+        blob = Blob(self.file())
+        request = Request(args=(1, blob), kws=dict(a=blob), cntr=((blob,), {}))
+        blobs = bulk.outbound(request)
+        self.assertEqual(len(blobs), 3)
+        self.assertEqual(request.args[0], 1)
+        self.assertEqual(request.args[1], blobs[0].reference())
+        self.assertEqual(request.kws['a'], blobs[1].reference())
+        self.assertEqual(request.cntr[0][0], blobs[2].reference())
+        self.assertEqual(len(set([b.id for b in blobs + [blob]])), 4)
+
+    def test_outbound_spooled(self):
+        blob = Blob(self.file())
+        request = Request(args=[blob])
+        blobs = bulk.outbound(request, self.spool)
+        self.assertEqual(blobs, [])
+        reference = request.args[0][MARKER]
+        self.assertEqual(os.path.dirname(reference['path']), self.spool.root)
+
+    def test_outbound_none(self):
+        request = Request(args=(1,), kws={})
+        self.assertEqual(bulk.outbound(request), [])
+        self.assertEqual(request.args, (1,))
+
+    def test_inbound(self):
+        blob = self.spool.store(CONTENT)
+        request = Request(args=[blob.reference()], kws=dict(a=1), cntr=[[], dict(b=blob.reference())])
+        bulk.inbound(request, self.spool)
+        self.assertEqual(request.args, [blob])
+        self.assertEqual(request.kws, dict(a=1))
+        self.assertEqual(request.cntr[1], dict(b=blob))
+
+    def test_spooled(self):
+        blob = Blob(self.file())
+        with patch('gofer.rmi.bulk.Spool.ROOT', self.spool.root):
+            reference = bulk.spooled(blob)
+        spooled = self.spool.resolve(reference)
+        self.assertEqual(spooled.id, blob.id)
+        self.assertEqual(spooled.read(), CONTENT)
+        self.assertEqual(bulk.spooled(1), 1)
+
+    @patch('gofer.rmi.bulk.Metrics', Mock())
+    def test_round_trip(self):
+        producer = Mock(codec=None)
+        blob = Blob(self.file())
+        request = Request(args=[blob])
+        blobs = bulk.outbound(request)
+        bulk.send(producer, 'q', blobs)
+        for call in producer.send.call_args_list:
+            self.spool.write(call[1]['blob'], 'sn')
+        bulk.inbound(request, self.spool, 'sn')
+        self.assertEqual(request.args[0].read(), CONTENT)
+
+    def test_references(self):
+        reference = Blob(self.file()).reference()
+        request = Request(args=[1, reference], kws=dict(a={MARKER: 1, 'b': 2}))
+        self.assertEqual(bulk.references(request), [reference])
+        self.assertEqual(bulk.references(Request()), [])
@@ -0,0 +1,94 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch
+
+from gofer.rmi.cache import Cache
+from gofer.rmi.dispatcher import Return
+
+
+class TestCache(TestCase):
+
+    def test_init(self):
+        cache = Cache()
+        self.assertEqual(cache.capacity, Cache.CAPACITY)
+        self.assertEqual(cache.memory, Cache.MEMORY)
+        self.assertEqual(cache.used, 0)
+        self.assertEqual(len(cache), 0)
+
+    def test_add(self):
+        cache = Cache()
+        result = Return.succeed(1)
+        cache.add('k', ('A', 'fn'), result, 10)
+        self.assertEqual(cache.get('k'), result)
+        self.assertEqual(cache.used, len(result.dump()))
+        # replaced
+        result = Return.succeed(2)
+        cache.add('k', ('A', 'fn'), result, 10)
+        self.assertEqual(cache.get('k'), result)
+        self.assertEqual(cache.used, len(result.dump()))
+        self.assertEqual(len(cache), 1)
+
+    def test_get_not_found(self):
+        cache = Cache()
+        self.assertEqual(cache.get('k'), None)
+
+    @patch('gofer.rmi.cache.time')
+    def test_get_expired(self, _time):
+        _time.return_value = 100.0
+        cache = Cache()
+        cache.add('k', ('A', 'fn'), Return.succeed(1), 10)
+        _time.return_value = 110.0
+        self.assertEqual(cache.get('k'), None)
+        self.assertEqual(cache.used, 0)
+        self.assertEqual(len(cache), 0)
+
+    def test_capacity(self):
+        cache = Cache(capacity=2)
+        cache.add('a', ('A', 'fn'), Return.succeed(1), 10)
+        cache.add('b', ('A', 'fn'), Return.succeed(2), 10)
+        cache.get('a')
+        cache.add('c', ('A', 'fn'), Return.succeed(3), 10)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a').retval, 1)
+        self.assertEqual(cache.get('c').retval, 3)
+
+    def test_memory(self):
+        result = Return.succeed('x' * 100)
+        size = len(result.dump())
+        cache = Cache(memory=size * 2)
+        cache.add('a', ('A', 'fn'), result, 10)
+        cache.add('b', ('A', 'fn'), result, 10)
+        cache.add('c', ('A', 'fn'), result, 10)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.used, size * 2)
+        self.assertEqual(cache.get('a'), None)
+        # too large
+        cache.add('d', ('A', 'fn'), Return.succeed('x' * 1000), 10)
+        self.assertEqual(cache.get('d'), None)
+        self.assertEqual(len(cache), 2)
+
+    def test_invalidate(self):
+        cache = Cache()
+        cache.add('a', ('A', 'fn1'), Return.succeed(1), 10)
+        cache.add('b', ('A', 'fn2'), Return.succeed(2), 10)
+        cache.add('c', ('B', 'fn1'), Return.succeed(3), 10)
+        cache.invalidate('A', 'fn1')
+        self.assertEqual(sorted(cache.entries), ['b', 'c'])
+        cache.invalidate('A')
+        self.assertEqual(sorted(cache.entries), ['c'])
+        cache.add('d', ('A', 'fn1'), Return.succeed(4), 10)
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.used, 0)
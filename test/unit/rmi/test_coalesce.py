@@ -0,0 +1,99 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from threading import Thread, Event
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from gofer.messaging import Document
+from gofer.rmi.coalesce import Group, key
+
+
+def request(*args, **kwargs):
+    return Document(
+        sn='123',
+        secret=kwargs.pop('secret', None),
+        request=dict(
+            classname='Dog',
+            method='bark',
+            args=list(args),
+            kws=kwargs))
+
+
+class TestKey(TestCase):
+
+    def test_key(self):
+        self.assertEqual(key(request(1, a=2)), key(request(1, a=2)))
+        self.assertNotEqual(key(request(1, a=2)), key(request(1, a=3)))
+        self.assertNotEqual(key(request(1)), key(request(2)))
+
+    def test_key_serial_number(self):
+        document = request(1)
+        document.sn = '456'
+        self.assertEqual(key(document), key(request(1)))
+
+    def test_key_credentials(self):
+        self.assertNotEqual(key(request(1, secret='xyz')), key(request(1)))
+
+    def test_key_constructor(self):
+        document = request(1)
+        document.request['cntr'] = (['max'], {})
+        self.assertNotEqual(key(document), key(request(1)))
+
+
+class TestGroup(TestCase):
+
+    def test_call(self):
+        fn = Mock(return_value=18)
+        group = Group()
+        self.assertEqual(group('A', fn), 18)
+        self.assertEqual(group('A', fn), 18)
+        self.assertEqual(fn.call_count, 2)
+        self.assertEqual(len(group), 0)
+
+    def test_call_raised(self):
+        fn = Mock(side_effect=ValueError())
+        group = Group()
+        self.assertRaises(ValueError, group, 'A', fn)
+        self.assertEqual(len(group), 0)
+
+    @patch('gofer.rmi.coalesce.Metrics')
+    def test_coalesced(self, metrics):
+        started = Event()
+        release = Event()
+        calls = []
+        waiting = []
+        metrics.return_value.counter.return_value.inc.side_effect = lambda: waiting.append(1)
+
+        def fn():
+            calls.append(1)
+            started.set()
+            release.wait(10)
+            return len(calls)
+
+        group = Group()
+        results = []
+        leader = Thread(target=lambda: results.append(group('A', fn)))
+        leader.start()
+        started.wait(10)
+        followers = [Thread(target=lambda: results.append(group('A', fn))) for n in range(3)]
+        for t in followers:
+            t.start()
+        while len(waiting) < 3:
+            release.wait(0.01)
+        release.set()
+        for t in [leader] + followers:
+            t.join()
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, [1, 1, 1, 1])
+        metrics.return_value.counter.assert_called_with('rmi.coalesced')
+        self.assertEqual(len(group), 0)
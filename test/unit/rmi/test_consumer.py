@@ -9,8 +9,83 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+from time import time, gmtime, strftime
 from unittest import TestCase
 
+from mock import Mock, patch
 
-class Test(TestCase):
-    pass
\ No newline at end of file
+from gofer.messaging import Document
+from gofer.metrics import TIMESTAMP, timestamp
+from gofer.rmi.consumer import RequestConsumer
+
+
+class TestRequestConsumer(TestCase):
+
+    def test_frozen(self):
+        # journaled as received.
+        self.assertTrue(RequestConsumer.frozen)
+
+    @patch('gofer.rmi.consumer.Consumer.__init__', Mock(return_value=None))
+    def test_dispatch(self):
+        plugin = Mock()
+        request = Document(sn=1, expiration=10, timestamp=timestamp())
+        consumer = RequestConsumer(Mock(), plugin)
+        consumer.send = Mock()
+        consumer.dispatch(request)
+        consumer.send.assert_called_once_with(request, 'accepted')
+        plugin.scheduler.add.assert_called_once_with(request)
+
+    @patch('gofer.rmi.consumer.Spool')
+    @patch('gofer.rmi.consumer.Consumer.__init__', Mock(return_value=None))
+    def test_dispatch_blob(self, spool):
+        plugin = Mock()
+        request = Document(sn=1, status='blob', blob=dict(id=2))
+        consumer = RequestConsumer(Mock(), plugin)
+        consumer.send = Mock()
+        consumer.dispatch(request)
+        spool.return_value.write.assert_called_once_with(request.blob, request.sn)
+        self.assertFalse(consumer.send.called)
+        self.assertFalse(plugin.scheduler.add.called)
+        # not spooled
+        spool.return_value.write.side_effect = ValueError
+        consumer.dispatch(request)
+
+    @patch('gofer.rmi.consumer.Credit')
+    @patch('gofer.rmi.consumer.Consumer.__init__', Mock(return_value=None))
+    def test_dispatch_credit(self, credit):
+        plugin = Mock()
+        consumer = RequestConsumer(Mock(), plugin)
+        consumer.send = Mock()
+        consumer.dispatch(Document(sn=1, status='credit', seq=4))
+        credit.return_value.grant.assert_called_once_with(1, 4, None)
+        self.assertFalse(consumer.send.called)
+        self.assertFalse(plugin.scheduler.add.called)
+
+    @patch('gofer.rmi.consumer.dedup')
+    @patch('gofer.rmi.consumer.Consumer.__init__', Mock(return_value=None))
+    def test_dispatch_missing(self, dedup):
+        plugin = Mock()
+        dedup.missing.return_value = ['ab']
+        request = Document(sn=1, request=dict(args=[1]))
+        consumer = RequestConsumer(Mock(), plugin)
+        consumer.send = Mock()
+        consumer.dispatch(request)
+        self.assertEqual(dedup.missing.call_args[0][0].args, [1])
+        self.assertEqual(dedup.missing.call_args[0][1], dedup.Store.return_value)
+        consumer.send.assert_called_once_with(request, 'missing', digests=['ab'])
+        self.assertFalse(plugin.scheduler.add.called)
+
+    @patch('gofer.rmi.consumer.Spool')
+    @patch('gofer.rmi.consumer.Metrics', Mock())
+    @patch('gofer.rmi.consumer.Consumer.__init__', Mock(return_value=None))
+    def test_dispatch_expired(self, spool):
+        plugin = Mock()
+        # queued in the broker for an hour.
+        sent = strftime(TIMESTAMP, gmtime(time() - 3600))
+        request = Document(sn=1, expiration=90, timestamp=sent)
+        consumer = RequestConsumer(Mock(), plugin)
+        consumer.send = Mock()
+        consumer.dispatch(request)
+        consumer.send.assert_called_once_with(request, 'expired')
+        spool.return_value.delete.assert_called_once_with(request.sn)
+        self.assertFalse(plugin.scheduler.add.called)
@@ -213,3 +213,48 @@ class TestBuilder(TestCase):
         b = Builder()
         q = {'xx': 1}
         self.assertRaises(InvalidOperator, b.build, q)
+
+
+class TestPlan(TestCase):
+
+    def test_criteria(self):
+        self.assertEqual(Criteria(1).plan(Mock()), None)
+        self.assertEqual(NotEqual(1).plan(Mock()), None)
+        self.assertEqual(Greater(1).plan(Mock()), None)
+        self.assertEqual(Less(1).plan(Mock()), None)
+
+    def test_match(self):
+        index = Mock()
+        index.match.side_effect = [set([1, 2]), set([2, 3])]
+        self.assertEqual(Match({'id': 1, 'age': 2}).plan(index), set([2]))
+        self.assertEqual(Match(88).plan(index), set())
+        self.assertEqual(Match({}).plan(index), set())
+
+    def test_equal(self):
+        index = Mock()
+        self.assertEqual(Equal(1).plan(index), index.equal.return_value)
+        index.equal.assert_called_once_with(1)
+
+    def test_in(self):
+        index = Mock()
+        self.assertEqual(In([1, 2]).plan(index), index.equal_any.return_value)
+        index.equal_any.assert_called_once_with([1, 2])
+        self.assertEqual(In({1: 0}).plan(index), index.equal_any.return_value)
+        self.assertEqual(In('abc').plan(index), None)
+
+    def test_and(self):
+        planned = Mock(plan=Mock(return_value=set([1, 2])))
+        other = Mock(plan=Mock(return_value=set([2, 3])))
+        scanned = Mock(plan=Mock(return_value=None))
+        self.assertEqual(And((planned, other)).plan(Mock()), set([2]))
+        self.assertEqual(And((planned, scanned)).plan(Mock()), set([1, 2]))
+        self.assertEqual(And((scanned, other)).plan(Mock()), set([2, 3]))
+        self.assertEqual(And((scanned, scanned)).plan(Mock()), None)
+
+    def test_or(self):
+        planned = Mock(plan=Mock(return_value=set([1, 2])))
+        other = Mock(plan=Mock(return_value=set([2, 3])))
+        scanned = Mock(plan=Mock(return_value=None))
+        self.assertEqual(Or((planned, other)).plan(Mock()), set([1, 2, 3]))
+        self.assertEqual(Or((planned, scanned)).plan(Mock()), None)
+        self.assertEqual(Or((scanned, other)).plan(Mock()), None)
@@ -0,0 +1,195 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import os
+import shutil
+import hashlib
+import tempfile
+
+from unittest import TestCase
+
+from mock import patch
+
+from gofer.rmi import dedup
+from gofer.rmi.dedup import Store, Missing, MARKER, THRESHOLD
+from gofer.rmi.dispatcher import Request
+
+
+VALUE = dict(name='config', content='A' * 100)
+
+
+def reference(thing, **inline):
+    encoded = dedup.encode(thing)
+    ref = dict(digest=hashlib.sha256(encoded).hexdigest())
+    ref.update(inline)
+    return {MARKER: ref}
+
+
+class StoreTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def store(self, capacity=None):
+        # unique for each test (singleton)
+        return Store(os.path.join(self.root, 'cas'), capacity)
+
+
+class TestStore(StoreTest):
+
+    def test_init(self):
+        store = self.store()
+        self.assertEqual(store.capacity, Store.CAPACITY)
+        self.assertEqual(store.entries, None)
+        self.assertEqual(len(store), 0)
+        self.assertTrue(os.path.isdir(store.root))
+
+    def test_singleton(self):
+        self.assertTrue(self.store() is self.store())
+
+    def test_path(self):
+        store = self.store()
+        self.assertEqual(store.path('ab12'), os.path.join(store.root, 'ab12'))
+        self.assertRaises(ValueError, store.path, None)
+        self.assertRaises(ValueError, store.path, '../ab')
+
+    def test_put(self):
+        store = self.store()
+        digest = store.put(VALUE)
+        self.assertEqual(digest, reference(VALUE)[MARKER]['digest'])
+        self.assertTrue(store.contains(digest))
+        self.assertEqual(store.get(digest), VALUE)
+        self.assertEqual(store.used, len(dedup.encode(VALUE)))
+        self.assertEqual(store.put(VALUE), digest)
+        self.assertEqual(len(store), 1)
+
+    def test_get_missing(self):
+        store = self.store()
+        self.assertRaises(Missing, store.get, 'ab12')
+        digest = store.put(VALUE)
+        os.unlink(store.path(digest))
+        self.assertRaises(Missing, store.get, digest)
+        self.assertFalse(store.contains(digest))
+        self.assertEqual(store.used, 0)
+
+    def test_evict(self):
+        size = len(dedup.encode(VALUE))
+        store = self.store(size * 3)
+        first = store.put(VALUE)
+        second = store.put([VALUE])
+        store.get(first)
+        third = store.put([[VALUE]])
+        self.assertTrue(store.contains(first))
+        self.assertFalse(store.contains(second))
+        self.assertTrue(store.contains(third))
+        self.assertFalse(os.path.exists(store.path(second)))
+        self.assertTrue(store.used <= store.capacity)
+
+    def test_too_large(self):
+        store = self.store(10)
+        digest = store.put(VALUE)
+        self.assertFalse(store.contains(digest))
+
+    def test_load(self):
+        store = self.store()
+        digest = store.put(VALUE)
+        with open(os.path.join(store.root, 'x.tmp'), 'w') as fp:
+            fp.write('')
+        loaded = Store(store.root, 1000)
+        self.assertFalse(loaded is store)
+        self.assertTrue(loaded.contains(digest))
+        self.assertEqual(len(loaded), 1)
+        self.assertEqual(loaded.get(digest), VALUE)
+
+
+class TestArguments(StoreTest):
+
+    def test_encode(self):
+        self.assertEqual(dedup.encode(dict(b=1, a=2)), '{"a": 2, "b": 1}')
+        self.assertEqual(dedup.encode(object()), None)
+
+    def test_outbound(self):
+        large = 'A' * (THRESHOLD + 1)
+        request = Request(args=[1, large], kws=dict(a=large), cntr=([VALUE], {}))
+        values = dedup.outbound(request)
+        ref = reference(large)
+        self.assertEqual(values, {ref[MARKER]['digest']: large})
+        self.assertEqual(request.args, [1, ref])
+        self.assertEqual(request.kws, dict(a=ref))
+        self.assertEqual(request.cntr[0], [VALUE])
+
+    def test_outbound_threshold(self):
+        request = Request(args=[VALUE, object], kws={})
+        values = dedup.outbound(request, 10)
+        self.assertEqual(values.values(), [VALUE])
+        self.assertEqual(request.args, [reference(VALUE), object])
+
+    def test_inline(self):
+        request = Request(args=[VALUE, [VALUE]], kws={})
+        values = dedup.outbound(request, 10)
+        digest = reference(VALUE)[MARKER]['digest']
+        dedup.inline(request, values, [digest])
+        self.assertEqual(request.args[0], reference(VALUE, value=VALUE))
+        self.assertEqual(request.args[1], reference([VALUE]))
+
+    @patch('gofer.rmi.dedup.Metrics')
+    def test_missing(self, metrics):
+        store = self.store()
+        store.put(VALUE)
+        request = Request(args=[reference(VALUE), reference([VALUE])], kws={})
+        digests = dedup.missing(request, store)
+        self.assertEqual(digests, [reference([VALUE])[MARKER]['digest']])
+        names = [c[0][0] for c in metrics.return_value.counter.call_args_list]
+        self.assertEqual(names, ['rmi.dedup.hit', 'rmi.dedup.miss'])
+
+    @patch('gofer.rmi.dedup.Metrics')
+    def test_missing_inline(self, metrics):
+        store = self.store()
+        request = Request(args=[reference(VALUE, value=VALUE)], kws={})
+        self.assertEqual(dedup.missing(request, store), [])
+        self.assertTrue(store.contains(reference(VALUE)[MARKER]['digest']))
+        # not matched
+        request = Request(args=[{MARKER: dict(digest='00', value=[VALUE])}])
+        self.assertEqual(dedup.missing(request, store), [])
+        self.assertFalse(store.contains('00'))
+
+    def test_inbound(self):
+        store = self.store()
+        store.put(VALUE)
+        request = Request(args=[reference(VALUE), 1], kws=dict(a=reference(2, value=2)))
+        dedup.inbound(request, store)
+        self.assertEqual(request.args, [VALUE, 1])
+        self.assertEqual(request.kws, dict(a=2))
+        request = Request(args=[reference([VALUE])])
+        self.assertRaises(Missing, dedup.inbound, request, store)
+
+    def test_round_trip(self):
+        store = self.store()
+        request = Request(args=[VALUE], kws={})
+        values = dedup.outbound(request, 10)
+        digests = dedup.missing(request, store)
+        self.assertEqual(digests, values.keys())
+        dedup.inline(request, values, digests)
+        self.assertEqual(dedup.missing(request, store), [])
+        # next request
+        request = Request(args=[VALUE], kws={})
+        dedup.outbound(request, 10)
+        self.assertEqual(dedup.missing(request, store), [])
+        dedup.inbound(request, store)
+        self.assertEqual(request.args, [VALUE])
+
+    def test_missing_error(self):
+        error = Missing(['ab'])
+        self.assertEqual(error.digests, ['ab'])
+        self.assertEqual(error.args, ("values: ['ab'] not stored",))
@@ -9,8 +9,474 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+from time import time
 from unittest import TestCase
 
+from mock import Mock, patch
 
-class Test(TestCase):
-    pass
\ No newline at end of file
+from gofer.decorators import remote
+from gofer.messaging import Document
+from gofer.rmi.dispatcher import Dispatcher, Target, Return, Streamed, expired, deadline
+from gofer.rmi.dispatcher import NotAuthenticated
+from gofer.rmi.scope import Scope, Pooled
+from gofer.rmi import coalesce
+
+
+class Dog(object):
+
+    calls = 0
+
+    def __init__(self, name='rover'):
+        self.name = name
+
+    @remote(timeout=10)
+    def bark(self):
+        pass
+
+    @remote
+    def wag(self):
+        pass
+
+    @remote
+    def echo(self, thing, suffix=''):
+        return '%s:%s%s' % (self.name, thing, suffix)
+
+    @remote(coalesce=True)
+    def fetch(self, n):
+        return n
+
+    @remote(cache_ttl=60)
+    def count(self, n):
+        Dog.calls += 1
+        return Dog.calls + n
+
+    @remote(invalidates=['Dog.count'])
+    def reset(self):
+        Dog.calls = 0
+
+    @remote(secret='xyz')
+    def secret(self):
+        return 'secret'
+
+    @remote(coalesce=True, cache_ttl=60)
+    def walk(self, n):
+        for i in range(n):
+            yield i
+
+    @remote
+    def fail(self):
+        raise ValueError('failed')
+
+    @staticmethod
+    @remote
+    def static(n):
+        return n + 1
+
+    def hidden(self):
+        pass
+
+
+class Cat(object):
+
+    @remote
+    def meow(self):
+        return 'meow'
+
+
+@remote(scope='pooled')
+class Bird(object):
+
+    def __init__(self, name='tweety'):
+        self.name = name
+        self.closed = False
+
+    @remote
+    def sing(self):
+        return id(self)
+
+    @remote
+    def chirp(self, n):
+        for i in range(n):
+            yield id(self)
+
+    def close(self):
+        self.closed = True
+
+
+def request(classname, method, *args, **kwargs):
+    return Document(
+        sn='123',
+        routing=['A', 'B'],
+        request=dict(
+            classname=classname,
+            method=method,
+            args=args,
+            kws=kwargs))
+
+
+class TestDispatcher(TestCase):
+
+    def test_masked(self):
+        document = Document(sn=1, secret='s', pam=dict(user='u', password='p'))
+        masked = Dispatcher.masked(document)
+        self.assertEqual(masked.sn, 1)
+        self.assertEqual(masked.secret, '********')
+        self.assertEqual(masked.pam, '********')
+        self.assertEqual(document.pam, dict(user='u', password='p'))
+        self.assertEqual(Dispatcher.masked(Document(sn=1)).__dict__, dict(sn=1))
+
+    @patch('gofer.rmi.dispatcher.log')
+    def test_dispatch_not_authenticated(self, log):
+        dispatcher = Dispatcher([Dog])
+        target = dispatcher.table[('Dog', 'bark')]
+        target.security = Mock()
+        target.security.apply.side_effect = NotAuthenticated(target, 'u')
+        document = request('Dog', 'bark')
+        document.pam = dict(user='u', password='p4ssw0rd')
+        returned = dispatcher.dispatch(document)
+        self.assertEqual(returned.xclass, 'NotAuthenticated')
+        log.exception.assert_called_once_with(target.name)
+        self.assertFalse('p4ssw0rd' in repr(log.mock_calls))
+
+    def test_timeout_method(self):
+        dispatcher = Dispatcher([Dog])
+        document = Document(request=dict(classname='Dog', method='bark'))
+        self.assertEqual(dispatcher.timeout(document), 10)
+
+    def test_timeout_request(self):
+        dispatcher = Dispatcher([Dog])
+        document = Document(timeout=5, request=dict(classname='Dog', method='bark'))
+        self.assertEqual(dispatcher.timeout(document), 5)
+        document = Document(timeout=30, request=dict(classname='Dog', method='bark'))
+        self.assertEqual(dispatcher.timeout(document), 10)
+        document = Document(timeout=30, request=dict(classname='Dog', method='wag'))
+        self.assertEqual(dispatcher.timeout(document), 30)
+
+    def test_timeout_none(self):
+        dispatcher = Dispatcher([Dog])
+        document = Document(request=dict(classname='Dog', method='wag'))
+        self.assertEqual(dispatcher.timeout(document), None)
+        document = Document(request=dict(classname='Cat', method='meow'))
+        self.assertEqual(dispatcher.timeout(document), None)
+
+    def test_compile(self):
+        dispatcher = Dispatcher([Dog])
+        self.assertEqual(
+            sorted(dispatcher.table.keys()),
+            [
+                ('Dog', 'bark'),
+                ('Dog', 'count'),
+                ('Dog', 'echo'),
+                ('Dog', 'fail'),
+                ('Dog', 'fetch'),
+                ('Dog', 'reset'),
+                ('Dog', 'secret'),
+                ('Dog', 'static'),
+                ('Dog', 'wag'),
+                ('Dog', 'walk'),
+            ])
+        target = dispatcher.table[('Dog', 'echo')]
+        self.assertTrue(isinstance(target, Target))
+        self.assertEqual(target.name, 'Dog.echo')
+        self.assertEqual(target.inst, Dog)
+        self.assertEqual(target.fn, Dog.echo.im_func)
+        self.assertTrue(target.bound)
+        self.assertEqual(str(target), 'Dog.echo')
+        self.assertFalse(target.streamed)
+        target = dispatcher.table[('Dog', 'static')]
+        self.assertFalse(target.bound)
+        target = dispatcher.table[('Dog', 'walk')]
+        self.assertTrue(target.streamed)
+
+    def test_compile_on_change(self):
+        dispatcher = Dispatcher()
+        self.assertEqual(dispatcher.table, {})
+        dispatcher += [Dog]
+        self.assertTrue(('Dog', 'wag') in dispatcher.table)
+        dispatcher['Cat'] = Cat
+        self.assertTrue(('Cat', 'meow') in dispatcher.table)
+        other = Dispatcher()
+        other += dispatcher
+        self.assertEqual(sorted(other.table.keys()), sorted(dispatcher.table.keys()))
+
+    def test_compile_scope(self):
+        dispatcher = Dispatcher([Dog, Bird])
+        self.assertTrue(isinstance(dispatcher.scopes[Bird], Pooled))
+        self.assertEqual(type(dispatcher.scopes[Dog]), Scope)
+        self.assertEqual(dispatcher.table[('Bird', 'sing')].scope, dispatcher.scopes[Bird])
+
+    def test_compile_scope_kept(self):
+        dispatcher = Dispatcher([Bird])
+        scope = dispatcher.scopes[Bird]
+        dispatcher += [Dog]
+        self.assertEqual(dispatcher.scopes[Bird], scope)
+
+    def test_compile_scope_cleared(self):
+        dispatcher = Dispatcher([Bird])
+        dispatcher.dispatch(request('Bird', 'sing'))
+        inst = dispatcher.scopes[Bird].pool.values()[0][0][0]
+        dispatcher['Bird'] = Cat
+        self.assertTrue(inst.closed)
+        self.assertFalse(Bird in dispatcher.scopes)
+
+    def test_dispatch_pooled(self):
+        dispatcher = Dispatcher([Bird])
+        first = dispatcher.dispatch(request('Bird', 'sing'))
+        second = dispatcher.dispatch(request('Bird', 'sing'))
+        self.assertEqual(first.retval, second.retval)
+        document = request('Bird', 'sing')
+        document.request['cntr'] = (['polly'], {})
+        third = dispatcher.dispatch(document)
+        self.assertNotEqual(third.retval, first.retval)
+
+    def test_dispatch(self):
+        dispatcher = Dispatcher([Dog])
+        returned = dispatcher.dispatch(request('Dog', 'echo', 'hello', suffix='!'))
+        self.assertEqual(returned.retval, 'rover:hello!')
+
+    def test_dispatch_coalesced(self):
+        dispatcher = Dispatcher([Dog])
+        dispatcher.coalesced = Mock()
+        document = request('Dog', 'fetch', 1)
+        returned = dispatcher.dispatch(document)
+        key, fn = dispatcher.coalesced.call_args[0]
+        self.assertEqual(key, coalesce.key(document))
+        self.assertEqual(returned, dispatcher.coalesced.return_value)
+        self.assertEqual(fn().retval, 1)
+
+    def test_dispatch_not_coalesced(self):
+        dispatcher = Dispatcher([Dog])
+        dispatcher.coalesced = Mock()
+        returned = dispatcher.dispatch(request('Dog', 'echo', 'hello'))
+        self.assertFalse(dispatcher.coalesced.called)
+        self.assertEqual(returned.retval, 'rover:hello')
+
+    @patch('gofer.rmi.dispatcher.Metrics')
+    def test_dispatch_cached(self, metrics):
+        Dog.calls = 0
+        dispatcher = Dispatcher([Dog])
+        first = dispatcher.dispatch(request('Dog', 'count', 10))
+        second = dispatcher.dispatch(request('Dog', 'count', 10))
+        third = dispatcher.dispatch(request('Dog', 'count', 20))
+        self.assertEqual(first.retval, 11)
+        self.assertEqual(second.retval, 11)
+        self.assertEqual(third.retval, 22)
+        self.assertEqual(len(dispatcher.cache), 2)
+        self.assertEqual(
+            metrics.return_value.counter.call_args_list,
+            [
+                (('rmi.cache.miss',), {}),
+                (('rmi.cache.hit',), {}),
+                (('rmi.cache.miss',), {}),
+            ])
+        # invalidated
+        dispatcher.dispatch(request('Dog', 'reset'))
+        self.assertEqual(len(dispatcher.cache), 0)
+        fourth = dispatcher.dispatch(request('Dog', 'count', 10))
+        self.assertEqual(fourth.retval, 11)
+
+    def test_dispatch_not_cached(self):
+        dispatcher = Dispatcher([Dog])
+        dispatcher.dispatch(request('Dog', 'echo', 'hello'))
+        dispatcher.dispatch(request('Dog', 'fail'))
+        self.assertEqual(len(dispatcher.cache), 0)
+        self.assertEqual(dispatcher.cached(request('Dog', 'echo', 'hello')), None)
+        self.assertEqual(dispatcher.cached(request('Dog', 'count', 10)), None)
+
+    @patch('gofer.rmi.dispatcher.bulk')
+    def test_dispatch_blob(self, bulk):
+        def inbound(request, spool, sn):
+            request.args = ['blob']
+        bulk.inbound.side_effect = inbound
+        bulk.spooled.side_effect = lambda retval: retval
+        dispatcher = Dispatcher([Dog])
+        returned = dispatcher.dispatch(request('Dog', 'echo', 'reference'))
+        self.assertEqual(returned.retval, 'rover:blob')
+        self.assertEqual(bulk.inbound.call_args[0][1], bulk.Spool.return_value)
+
+    @patch('gofer.rmi.dispatcher.bulk.spooled')
+    def test_dispatch_blob_returned(self, spooled):
+        spooled.return_value = {'__blob__': {}}
+        dispatcher = Dispatcher([Dog])
+        returned = dispatcher.dispatch(request('Dog', 'echo', 'hello'))
+        spooled.assert_called_once_with('rover:hello')
+        self.assertEqual(returned.retval, spooled.return_value)
+
+    @patch('gofer.rmi.dispatcher.bulk.inbound', Mock(side_effect=ValueError))
+    def test_dispatch_blob_failed(self):
+        dispatcher = Dispatcher([Dog])
+        returned = dispatcher.dispatch(request('Dog', 'echo', 'reference'))
+        self.assertEqual(returned.xclass, 'ValueError')
+
+    def test_dispatch_streamed(self):
+        dispatcher = Dispatcher([Dog])
+        dispatcher.coalesced = Mock()
+        returned = dispatcher.dispatch(request('Dog', 'walk', 3))
+        self.assertTrue(isinstance(returned, Streamed))
+        self.assertEqual(list(returned.generator), [0, 1, 2])
+        self.assertFalse(dispatcher.coalesced.called)
+        self.assertEqual(len(dispatcher.cache), 0)
+
+    def test_dispatch_streamed_pooled(self):
+        dispatcher = Dispatcher([Bird])
+        scope = dispatcher.scopes[Bird]
+        returned = dispatcher.dispatch(request('Bird', 'chirp', 2))
+        self.assertEqual(scope.pool, {})
+        chunks = list(returned.chunks())
+        returned.close()
+        self.assertEqual(len(scope.pool.values()[0]), 1)
+        inst = scope.pool.values()[0][0][0]
+        self.assertEqual(chunks, [[id(inst)], [id(inst)]])
+
+    def test_dispatch_constructor(self):
+        dispatcher = Dispatcher([Dog])
+        document = request('Dog', 'echo', 'hello')
+        document.request['cntr'] = (['max'], {})
+        returned = dispatcher.dispatch(document)
+        self.assertEqual(returned.retval, 'max:hello')
+
+    def test_dispatch_static(self):
+        dispatcher = Dispatcher([Dog])
+        returned = dispatcher.dispatch(request('Dog', 'static', 1))
+        self.assertEqual(returned.retval, 2)
+
+    def test_dispatch_raised(self):
+        dispatcher = Dispatcher([Dog])
+        returned = dispatcher.dispatch(request('Dog', 'fail'))
+        self.assertEqual(returned.xclass, 'ValueError')
+
+    def test_dispatch_secret(self):
+        dispatcher = Dispatcher([Dog])
+        returned = dispatcher.dispatch(request('Dog', 'secret'))
+        self.assertEqual(returned.xclass, 'SecretRequired')
+        document = request('Dog', 'secret')
+        document.secret = 'xyz'
+        returned = dispatcher.dispatch(document)
+        self.assertEqual(returned.retval, 'secret')
+
+    def test_dispatch_not_found(self):
+        dispatcher = Dispatcher([Dog])
+        returned = dispatcher.dispatch(request('Cat', 'meow'))
+        self.assertEqual(returned.xclass, 'ClassNotFound')
+        returned = dispatcher.dispatch(request('Dog', 'sit'))
+        self.assertEqual(returned.xclass, 'MethodNotFound')
+        returned = dispatcher.dispatch(request('Dog', 'hidden'))
+        self.assertEqual(returned.xclass, 'NotPermitted')
+
+    def test_dispatch_processes(self):
+        dispatcher = Dispatcher([Dog])
+        dispatcher.processes = Mock()
+        document = Document(timeout=5, request=dict(classname='Dog', method='bark'))
+        returned = dispatcher.dispatch(document)
+        dispatcher.processes.dispatch.assert_called_once_with(document, 5)
+        self.assertEqual(returned, dispatcher.processes.dispatch.return_value)
+
+    def test_dispatch_processes_not_cached(self):
+        dispatcher = Dispatcher([Dog])
+        dispatcher.caching = False
+        dispatcher.processes = Mock()
+        dispatcher.processes.dispatch.return_value = Return.succeed(11)
+        document = request('Dog', 'count', 10)
+        first = dispatcher.dispatch(document)
+        second = dispatcher.dispatch(document)
+        self.assertEqual(first.retval, 11)
+        self.assertEqual(second.retval, 11)
+        self.assertEqual(dispatcher.processes.dispatch.call_count, 2)
+        self.assertEqual(len(dispatcher.cache), 0)
+        self.assertEqual(dispatcher.cached(document), None)
+
+
+class TestExpired(TestCase):
+
+    def test_expired(self):
+        self.assertFalse(expired(Document()))
+        self.assertFalse(expired(Document(deadline=time() + 10)))
+        self.assertTrue(expired(Document(deadline=time() - 10)))
+        self.assertFalse(expired(Document(expiration=10)))
+        self.assertTrue(expired(Document(expiration=10, timestamp='2015-01-01T00:00:00Z')))
+
+    def test_deadline(self):
+        received = 1420070460  # 2015-01-01T00:01:00Z
+        self.assertEqual(deadline(Document(), received), None)
+        self.assertEqual(deadline(Document(deadline=10), received), 10)
+        self.assertEqual(deadline(Document(deadline=10, expiration=5), received), 10)
+        # counted from when received
+        self.assertEqual(deadline(Document(expiration=5), received), received + 5)
+        self.assertEqual(deadline(Document(expiration=5, timestamp='<garbage>'), received), received + 5)
+        self.assertEqual(deadline(Document(expiration=5, timestamp=10), received), received + 5)
+        # sent in the future (skew)
+        document = Document(expiration=5, timestamp='2015-01-01T00:02:00Z')
+        self.assertEqual(deadline(document, received), received + 5)
+        # counted from when sent
+        document = Document(expiration=5, timestamp='2015-01-01T00:00:00Z')
+        self.assertEqual(deadline(document, received), received - 60 + 5)
+
+
+class TestStreamed(TestCase):
+
+    def test_chunks(self):
+        streamed = Streamed(iter(range(10)))
+        self.assertTrue(streamed.succeeded())
+        chunks = list(streamed.chunks())
+        self.assertEqual(chunks, [[0], [1, 2], [3, 4, 5, 6], [7, 8, 9]])
+
+    @patch('gofer.rmi.dispatcher.Streamed.CHUNK', 2)
+    def test_chunk_size(self):
+        streamed = Streamed(iter(range(6)))
+        chunks = list(streamed.chunks())
+        self.assertEqual(chunks, [[0], [1, 2], [3, 4], [5]])
+
+    @patch('gofer.rmi.dispatcher.Streamed.LATENCY', 0)
+    def test_latency(self):
+        streamed = Streamed(iter(range(3)))
+        chunks = list(streamed.chunks())
+        self.assertEqual(chunks, [[0], [1], [2]])
+
+    def test_empty(self):
+        streamed = Streamed(iter([]))
+        self.assertEqual(list(streamed.chunks()), [[]])
+
+    def test_collect(self):
+        def generator():
+            yield 1
+            yield 2
+        streamed = Streamed(generator())
+        streamed.release = Mock()
+        result = streamed.collect()
+        self.assertEqual(result.retval, [1, 2])
+        self.assertEqual(streamed.release, None)
+
+    def test_collect_raised(self):
+        def generator():
+            yield 1
+            raise ValueError()
+        streamed = Streamed(generator())
+        result = streamed.collect()
+        self.assertEqual(result.xclass, 'ValueError')
+
+    def test_close(self):
+        generator = Mock()
+        release = Mock()
+        streamed = Streamed(generator)
+        streamed.release = release
+        streamed.close()
+        streamed.close()
+        generator.close.assert_called_with()
+        release.assert_called_once_with()
+
+
+class TestReturn(TestCase):
+
+    def test_succeed(self):
+        result = Return.succeed([1, 2])
+        self.assertEqual(result.retval, [1, 2])
+        self.assertEqual(result._encoding, ('json', '{"retval": [1, 2]}'))
+        self.assertRaises(TypeError, Return.succeed, object())
+
+    def test_exception(self):
+        try:
+            raise ValueError('failed')
+        except ValueError:
+            result = Return.exception()
+        self.assertEqual(result.xclass, 'ValueError')
+        self.assertEqual(result._encoding[1], result.dump())
@@ -10,8 +10,27 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 
+import os
+
+from datetime import datetime
 from unittest import TestCase
-from gofer.rmi.policy import Timeout
+
+from mock import Mock, patch
+
+from gofer.common import Options
+from gofer.messaging import Document
+from gofer.rmi.dispatcher import Return
+from gofer.rmi.bulk import Spool
+from gofer.rmi.dedup import Missing
+from gofer.rmi.policy import Timeout, Policy, Stream, RequestTimeout, StreamError, Trigger
+
+
+def chunk(seq, *items):
+    return Document(sn=1, status='chunk', seq=seq, items=list(items))
+
+
+def reply(result):
+    return Document(sn=1, result=result)
 
 
 class TimeoutTests(TestCase):
@@ -91,3 +110,203 @@ class TimeoutTests(TestCase):
         self.assertRaises(ValueError, Timeout, 'x')
         self.assertRaises(ValueError, Timeout, '10x')
         self.assertRaises(ValueError, Timeout, '')
+
+
+class PolicyTests(TestCase):
+
+    def test_timeout(self):
+        policy = Policy('', '', Options(timeout='2m'))
+        self.assertEqual(policy.timeout, 120)
+        policy = Policy('', '', Options())
+        self.assertEqual(policy.timeout, None)
+
+    def test_deadline(self):
+        policy = Policy('', '', Options(deadline='1h'))
+        self.assertEqual(policy.deadline, 3600)
+        policy = Policy('', '', Options())
+        self.assertEqual(policy.deadline, None)
+
+    def test_notbefore(self):
+        policy = Policy('', '', Options(notbefore=datetime(2015, 1, 1)))
+        self.assertEqual(policy.notbefore, 1420070400)
+        policy = Policy('', '', Options(notbefore=1420070400))
+        self.assertEqual(policy.notbefore, 1420070400)
+        policy = Policy('', '', Options())
+        self.assertEqual(policy.notbefore, None)
+
+    def test_codec(self):
+        policy = Policy('', '', Options(codec='msgpack'))
+        self.assertEqual(policy.codec, 'msgpack')
+        policy = Policy('', '', Options())
+        self.assertEqual(policy.codec, None)
+
+    def test_compression(self):
+        policy = Policy('', '', Options(compression='zlib', compression_threshold=1024))
+        self.assertEqual(policy.compression, 'zlib')
+        self.assertEqual(policy.compression_threshold, 1024)
+        policy = Policy('', '', Options())
+        self.assertEqual(policy.compression, None)
+        self.assertEqual(policy.compression_threshold, None)
+
+    def test_bulk(self):
+        policy = Policy('', '', Options(bulk='spool', spool='/tmp/spool'))
+        self.assertEqual(policy.bulk, 'spool')
+        self.assertEqual(policy.spool.root, '/tmp/spool')
+        policy = Policy('', '', Options(bulk='spool'))
+        self.assertEqual(policy.spool.root, Spool.ROOT)
+        policy = Policy('', '', Options())
+        self.assertEqual(policy.bulk, None)
+        self.assertEqual(policy.spool.root, os.path.expanduser(Spool.USER))
+
+    @patch('gofer.rmi.policy.Spool')
+    def test_get_reply_blob(self, spool):
+        policy = Policy('', '', Options(wait=10))
+        reference = {'__blob__': {'id': 2}}
+        reader = Mock()
+        reader.search.side_effect = [
+            Document(sn=1, status='blob', blob=dict(id=2)),
+            reply(Return.succeed(reference)),
+        ]
+        blob = policy.get_reply(1, reader)
+        spool = spool.user.return_value
+        spool.write.assert_called_once_with(dict(id=2))
+        spool.resolve.assert_called_once_with(reference)
+        self.assertEqual(blob, spool.resolve.return_value)
+        self.assertTrue(blob.transient)
+
+    def test_dedup(self):
+        policy = Policy('', '', Options(dedup=True, dedup_threshold=10))
+        self.assertTrue(policy.dedup)
+        self.assertEqual(policy.dedup_threshold, 10)
+        policy = Policy('', '', Options())
+        self.assertEqual(policy.dedup, None)
+        self.assertEqual(policy.dedup_threshold, None)
+
+    def test_get_reply_missing(self):
+        policy = Policy('', '', Options(wait=10))
+        reader = Mock()
+        reader.search.return_value = Document(sn=1, status='missing', digests=['ab'])
+        try:
+            policy.get_reply(1, reader)
+            self.fail('Missing not raised')
+        except Missing, missing:
+            self.assertEqual(missing.digests, ['ab'])
+
+    def test_get_reply_streamed(self):
+        policy = Policy('', '', Options(wait=10))
+        reader = Mock()
+        reader.search.side_effect = [Document(sn=1, status='started'), chunk(0, 1)]
+        stream = policy.get_reply(1, reader)
+        self.assertTrue(isinstance(stream, Stream))
+        self.assertEqual(list(stream.items), [1])
+
+
+class StreamTests(TestCase):
+
+    def test_iter(self):
+        policy = Policy('', '', Options(wait=10, progress=Mock()))
+        reader = Mock()
+        reader.search.side_effect = [
+            Document(sn=1, status='progress'),
+            chunk(1, 2, 3),
+            reply(Return.succeed(3)),
+        ]
+        closed = Mock()
+        stream = Stream(policy, 1, reader, chunk(0, 1))
+        stream.closing.append(closed)
+        self.assertEqual(list(stream), [1, 2, 3])
+        self.assertTrue(stream.finished)
+        self.assertEqual(policy.progress.call_count, 1)
+        closed.assert_called_once_with()
+
+    @patch('gofer.rmi.policy.Producer', Mock())
+    def test_failed(self):
+        policy = Policy('', '', Options(wait=10))
+        reader = Mock()
+        try:
+            raise ValueError()
+        except ValueError:
+            reader.search.side_effect = [reply(Return.exception())]
+        closed = Mock()
+        stream = Stream(policy, 1, reader, chunk(0, 1))
+        stream.closing.append(closed)
+        self.assertEqual(stream.next(), 1)
+        self.assertRaises(ValueError, stream.next)
+        closed.assert_called_once_with()
+
+    def test_timeout(self):
+        policy = Policy('', '', Options(wait=10))
+        reader = Mock()
+        reader.search.return_value = None
+        stream = Stream(policy, 1, reader, chunk(0))
+        self.assertRaises(RequestTimeout, stream.next)
+        reader.search.assert_called_once_with(1, 10)
+
+    @patch('gofer.rmi.policy.Producer')
+    def test_out_of_sequence(self, producer):
+        policy = Policy('', '', Options(wait=10))
+        reader = Mock()
+        reader.search.side_effect = [chunk(2, 2)]
+        closed = Mock()
+        stream = Stream(policy, 1, reader, chunk(0, 1))
+        stream.closing.append(closed)
+        self.assertRaises(StreamError, stream.push, chunk(2, 2))
+        self.assertEqual(stream.next(), 1)
+        self.assertRaises(StreamError, stream.next)
+        closed.assert_called_once_with()
+
+    @patch('gofer.rmi.policy.Producer')
+    def test_credit(self, producer):
+        policy = Policy('', 'agent', Options(wait=10))
+        stream = Stream(policy, 1, Mock(), chunk(0, 1))
+        for seq in range(1, Stream.WINDOW):
+            stream.push(chunk(seq, seq))
+        sent = producer.return_value.send.call_args_list
+        self.assertEqual(len(sent), 2)
+        half = Stream.WINDOW / 2
+        for n, call in enumerate(sent):
+            self.assertEqual(call[0], ('agent', 10))
+            self.assertEqual(call[1], dict(sn=1, status='credit', seq=half * (n + 1) - 1))
+        producer.return_value.open.assert_called_once_with()
+
+    @patch('gofer.rmi.policy.Producer')
+    def test_close(self, producer):
+        policy = Policy('', 'agent', Options(wait=10))
+        closed = Mock(side_effect=ValueError)
+        stream = Stream(policy, 1, Mock(), chunk(0))
+        stream.closing.append(closed)
+        stream.close()
+        stream.close()
+        closed.assert_called_once_with()
+        producer.return_value.send.assert_called_once_with(
+            'agent', 10, sn=1, status='credit', seq=0, closed=True)
+        producer.return_value.close.assert_called_once_with()
+
+    @patch('gofer.rmi.policy.Producer')
+    def test_close_finished(self, producer):
+        policy = Policy('', 'agent', Options(wait=10))
+        reader = Mock()
+        reader.search.side_effect = [reply(Return.succeed(1))]
+        stream = Stream(policy, 1, reader, chunk(0, 1))
+        stream.closing.append(Mock())
+        self.assertEqual(list(stream), [1])
+        self.assertFalse(producer.called)
+
+    @patch('gofer.rmi.policy.Producer')
+    def test_credit_failed(self, producer):
+        producer.return_value.send.side_effect = ValueError
+        policy = Policy('', 'agent', Options(wait=10))
+        stream = Stream(policy, 1, Mock(), chunk(0))
+        stream.credit(seq=0)
+
+    def test_expiration(self):
+        trigger = Trigger(Policy('', '', Options(ttl=10, wait=30)), None)
+        self.assertEqual(trigger._expiration(None), None)
+        self.assertEqual(trigger._expiration(Mock()), 30)
+        trigger = Trigger(Policy('', '', Options(ttl=10, deadline='5m')), None)
+        self.assertEqual(trigger._expiration(None), 300)
+
+    def test_window(self):
+        trigger = Trigger(Policy('', '', Options()), None)
+        self.assertEqual(trigger._window(None), None)
+        self.assertEqual(trigger._window(Mock()), Stream.WINDOW)
@@ -0,0 +1,263 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from gofer import NAME, Options
+from gofer.rmi.scope import REQUEST, POOLED, SINGLETON
+from gofer.rmi.scope import Scope, Pooled, Singleton, key, close
+
+
+class Thing(object):
+
+    def __init__(self, name='A', n=0):
+        self.name = name
+        self.n = n
+        self.closed = 0
+
+    def close(self):
+        self.closed += 1
+
+
+def scoped(scope):
+    cls = type('Scoped', (Thing,), {})
+    setattr(cls, NAME, Options(scope=scope))
+    return cls
+
+
+class TestFunctions(TestCase):
+
+    def test_key(self):
+        self.assertEqual(key([1], {'b': 2, 'a': 1}), key([1], {'a': 1, 'b': 2}))
+        self.assertNotEqual(key([1], {}), key([2], {}))
+
+    def test_close(self):
+        thing = Thing()
+        close(thing)
+        self.assertEqual(thing.closed, 1)
+        close(object())
+
+    def test_close_failed(self):
+        thing = Mock()
+        thing.close.side_effect = ValueError()
+        close(thing)
+        thing.close.assert_called_once_with()
+
+
+class TestScope(TestCase):
+
+    def test_create(self):
+        self.assertEqual(type(Scope.create(Thing)), Scope)
+        self.assertEqual(type(Scope.create(scoped(REQUEST))), Scope)
+        self.assertEqual(type(Scope.create(scoped(POOLED))), Pooled)
+        self.assertEqual(type(Scope.create(scoped(SINGLETON))), Singleton)
+        self.assertRaises(ValueError, Scope.create, scoped('session'))
+
+    def test_get(self):
+        scope = Scope(Thing)
+        first = scope.get(['B'], dict(n=1))
+        self.assertEqual(first.name, 'B')
+        self.assertEqual(first.n, 1)
+        scope.release(first, ['B'], dict(n=1))
+        second = scope.get(['B'], dict(n=1))
+        self.assertNotEqual(first, second)
+        self.assertEqual(first.closed, 0)
+
+
+class TestPooled(TestCase):
+
+    def setUp(self):
+        Pooled.scheduler = Mock()
+
+    def tearDown(self):
+        Pooled.scheduler = None
+
+    def test_reused(self):
+        scope = Pooled(Thing)
+        first = scope.get([], {})
+        scope.release(first, [], {})
+        self.assertEqual(scope.get([], {}), first)
+
+    def test_in_use(self):
+        scope = Pooled(Thing)
+        first = scope.get([], {})
+        second = scope.get([], {})
+        self.assertNotEqual(first, second)
+
+    def test_keyed(self):
+        scope = Pooled(Thing)
+        first = scope.get(['A'], {})
+        scope.release(first, ['A'], {})
+        second = scope.get(['B'], {})
+        self.assertNotEqual(first, second)
+        self.assertEqual(second.name, 'B')
+
+    def test_capacity(self):
+        scope = Pooled(Thing)
+        things = [scope.get([], {}) for n in range(Pooled.CAPACITY + 1)]
+        for thing in things:
+            scope.release(thing, [], {})
+        self.assertEqual(len(scope.pool[key([], {})]), Pooled.CAPACITY)
+        self.assertEqual(things[-1].closed, 1)
+
+    @patch('gofer.rmi.scope.time')
+    def test_evict(self, _time):
+        _time.return_value = 1000
+        scope = Pooled(Thing)
+        first = scope.get([], {})
+        scope.release(first, [], {})
+        _time.return_value += Pooled.IDLE + 1
+        second = scope.get([], {})
+        self.assertNotEqual(first, second)
+        self.assertEqual(first.closed, 1)
+        self.assertEqual(scope.pool, {})
+
+    def test_keys(self):
+        scope = Pooled(Thing)
+        things = [scope.get([n], {}) for n in range(Pooled.KEYS + 1)]
+        for n, thing in enumerate(things):
+            if n == Pooled.KEYS:
+                # recently used
+                scope.release(scope.get([0], {}), [0], {})
+            scope.release(thing, [n], {})
+        self.assertEqual(len(scope.pool), Pooled.KEYS)
+        self.assertEqual(things[0].closed, 0)
+        self.assertEqual(things[1].closed, 1)
+        self.assertFalse(key([1], {}) in scope.pool)
+        self.assertEqual(scope.pool.keys()[-1], key([Pooled.KEYS], {}))
+
+    @patch('gofer.rmi.scope.time')
+    def test_schedule(self, _time):
+        _time.return_value = 1000
+        timer = Pooled.scheduler
+        scope = Pooled(Thing)
+        scope.release(scope.get([], {}), [], {})
+        scope.release(scope.get([], {}), [], {})
+        timer.add.assert_called_once_with(1000 + Pooled.IDLE, scope.sweep)
+        self.assertTrue(scope.scheduled)
+
+    @patch('gofer.rmi.scope.time')
+    def test_sweep(self, _time):
+        _time.return_value = 1000
+        timer = Pooled.scheduler
+        scope = Pooled(Thing)
+        first = scope.get([], {})
+        scope.release(first, [], {})
+        _time.return_value += Pooled.IDLE + 1
+        scope.sweep()
+        self.assertEqual(first.closed, 1)
+        self.assertEqual(scope.pool, {})
+        self.assertFalse(scope.scheduled)
+        self.assertEqual(timer.add.call_count, 1)
+
+    @patch('gofer.rmi.scope.time')
+    def test_sweep_idle(self, _time):
+        _time.return_value = 1000
+        timer = Pooled.scheduler
+        scope = Pooled(Thing)
+        first = scope.get([], {})
+        scope.release(first, [], {})
+        scope.sweep()
+        self.assertEqual(first.closed, 0)
+        self.assertTrue(scope.scheduled)
+        self.assertEqual(timer.add.call_count, 2)
+
+    @patch('gofer.rmi.scope.time')
+    def test_not_scheduled(self, _time):
+        _time.return_value = 1000
+        Pooled.scheduler = None
+        scope = Pooled(Thing)
+        first = scope.get([], {})
+        scope.release(first, [], {})
+        self.assertFalse(scope.scheduled)
+        _time.return_value += Pooled.IDLE + 1
+        scope.get([], {})
+        self.assertEqual(first.closed, 1)
+
+    @patch('gofer.rmi.scope.time')
+    def test_closed_unlocked(self, _time):
+        _time.return_value = 1000
+        scope = Pooled(Thing)
+        first = scope.get([], {})
+        first.close = Mock(side_effect=lambda: locked.append(scope._Pooled__mutex._is_owned()))
+        locked = []
+        scope.release(first, [], {})
+        _time.return_value += Pooled.IDLE + 1
+        scope.sweep()
+        first.close.assert_called_once_with()
+        self.assertEqual(locked, [False])
+
+    def test_clear(self):
+        scope = Pooled(Thing)
+        thing = scope.get([], {})
+        scope.release(thing, [], {})
+        scope.clear()
+        self.assertEqual(thing.closed, 1)
+        self.assertEqual(scope.pool, {})
+
+
+class TestSingleton(TestCase):
+
+    def test_get(self):
+        scope = Singleton(Thing)
+        first = scope.get([], {})
+        self.assertEqual(scope.get([], {}), first)
+        scope.release(first, [], {})
+        self.assertEqual(scope.get([], {}), first)
+        self.assertNotEqual(scope.get(['B'], {}), first)
+
+    def test_release(self):
+        scope = Singleton(Thing)
+        first = scope.get([], {})
+        scope.get([], {})
+        scope.release(first, [], {})
+        self.assertEqual(scope.used, {id(first): 1})
+        scope.release(first, [], {})
+        self.assertEqual(scope.used, {})
+        self.assertEqual(first.closed, 0)
+
+    def test_keys(self):
+        scope = Singleton(Thing)
+        things = []
+        for n in range(Singleton.KEYS + 1):
+            thing = scope.get([n], {})
+            things.append(thing)
+            if n:
+                scope.release(thing, [n], {})
+        self.assertEqual(len(scope.instances), Singleton.KEYS)
+        self.assertFalse(key([0], {}) in scope.instances)
+        # discarded while used
+        self.assertEqual(things[0].closed, 0)
+        scope.release(things[0], [0], {})
+        self.assertEqual(things[0].closed, 1)
+        # discarded when not used
+        scope.get(['X'], {})
+        self.assertEqual(things[1].closed, 1)
+
+    def test_closed_unlocked(self):
+        scope = Singleton(Thing)
+        first = scope.get([], {})
+        first.close = Mock(side_effect=lambda: locked.append(scope._Singleton__mutex._is_owned()))
+        locked = []
+        scope.clear()
+        first.close.assert_called_once_with()
+        self.assertEqual(locked, [False])
+
+    def test_clear(self):
+        scope = Singleton(Thing)
+        thing = scope.get([], {})
+        scope.clear()
+        self.assertEqual(thing.closed, 1)
+        self.assertEqual(scope.instances, {})
+        scope.release(thing, [], {})
+        self.assertEqual(thing.closed, 1)
@@ -12,6 +12,7 @@
 from unittest import TestCase
 from mock import patch, Mock
 
+from gofer.messaging import Document, RequestEnvelope
 from gofer.rmi.store import Pending, Sequential
 
 
@@ -26,6 +27,14 @@ class TestPendingQueue(TestCase):
         _open.return_value.write.assert_called_once_with(request.dump.return_value)
         _open.return_value.close.assert_called_once_with()
 
+    @patch('__builtin__.open')
+    def test_write_received(self, _open):
+        body = '{"sn": "123",  "B": 1, "A": 2}'
+        request = Document().load(body, frozen=True)
+        path = '/tmp/123'
+        Pending._write(request, path)
+        _open.return_value.write.assert_called_once_with(body)
+
     @patch('__builtin__.open')
     @patch('gofer.rmi.store.unlink')
     def test_read(self, unlink, _open):
@@ -74,6 +83,38 @@ class TestPendingQueue(TestCase):
         self.assertFalse(unlink.called)
         self.assertEqual(p.journal, {sn: path})
 
+    @patch('gofer.rmi.store.time', Mock(return_value=10))
+    @patch('gofer.rmi.store.Tracker')
+    @patch('gofer.rmi.store.Thread', Mock())
+    def test_put(self, tracker):
+        sn = '123'
+        path = '/tmp/123'
+        request = Document().load('{"sn": "123", "data": 1, "request": {}}')
+        p = Pending('')
+        p._put(request, path, 5)
+        queued = p.queue.get()
+        self.assertTrue(isinstance(queued, RequestEnvelope))
+        self.assertEqual(queued.__dict__, dict(sn=sn, data=1, request={}, ts=10))
+        tracker.return_value.add.assert_called_once_with(sn, 1)
+        self.assertEqual(p.journal, {sn: path})
+
+    @patch('gofer.rmi.store.time', Mock(return_value=10))
+    @patch('gofer.rmi.store.Tracker', Mock())
+    @patch('gofer.rmi.store.Thread', Mock())
+    def test_put_expiration(self):
+        path = '/tmp/123'
+        request = Document().load('{"sn": "123", "expiration": 30}')
+        p = Pending('')
+        p._put(request, path, 5)
+        queued = p.queue.get()
+        self.assertEqual(queued.expiration, 30)
+        self.assertEqual(queued.deadline, 35)
+        # counted from when sent
+        request = Document().load('{"sn": "123", "expiration": 30, "timestamp": "1970-01-01T00:00:02Z"}')
+        p._put(request, path, 5)
+        queued = p.queue.get()
+        self.assertEqual(queued.deadline, 32)
+
 
 class TestSequential(TestCase):
 
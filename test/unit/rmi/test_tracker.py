@@ -9,8 +9,379 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import os
+import shutil
+
+from tempfile import mkdtemp
+from threading import Thread
 from unittest import TestCase
 
+from mock import patch, Mock
+
+from gofer.common import Singleton
+from gofer.rmi.criteria import Builder
+from gofer.rmi.tracker import Tracker, Index, Canceled, Signal, Window, Credit, hashable
+
+
+LOCATORS = {
+    '1': {'id': 1, 'name': 'A'},
+    '2': {'id': 2, 'name': 'B'},
+    '3': {'id': 3, 'name': 'A', 'tags': ['x']},
+    '4': {'name': 'C'},
+    '5': 10,
+    '6': 'hello',
+    '7': None,
+    '8': [1, 2],
+    '9': {},
+}
+
+
+class Collection(set):
+
+    def delete(self, sn):
+        self.discard(sn)
+
+
+def build(criteria):
+    return Builder().build(criteria)
+
+
+class TestIndex(TestCase):
+
+    def index(self):
+        index = Index()
+        for sn, locator in LOCATORS.items():
+            index.add(sn, locator)
+        return index
+
+    def test_hashable(self):
+        self.assertTrue(hashable(1))
+        self.assertTrue(hashable('a'))
+        self.assertFalse(hashable([]))
+        self.assertFalse(hashable({}))
+
+    def test_add(self):
+        index = self.index()
+        self.assertEqual(index.keys['name']['A'], set(['1', '3']))
+        self.assertEqual(index.present['tags'], set(['3']))
+        self.assertEqual(index.unhashable['tags'], set(['3']))
+        self.assertEqual(index.values[10], set(['5']))
+        self.assertEqual(index.values[None], set(['7']))
+        self.assertEqual(index.dicts, set(['1', '2', '3', '4', '9']))
+        self.assertEqual(index.other, set(['8']))
+
+    def test_remove(self):
+        index = self.index()
+        for sn, locator in LOCATORS.items():
+            index.remove(sn, locator)
+        self.assertEqual(index.values, {})
+        self.assertEqual(index.keys, {})
+        self.assertEqual(index.present, {})
+        self.assertEqual(index.unhashable, {})
+        self.assertEqual(index.dicts, set())
+        self.assertEqual(index.other, set())
+
+    def test_match(self):
+        index = self.index()
+        self.assertEqual(index.match('id', 1), set(['1', '4', '9']))
+        self.assertEqual(index.match('tags', 'x'), set(['1', '2', '3', '4', '9']))
+        self.assertEqual(index.match('id', []), index.dicts)
+
+    def test_equal(self):
+        index = self.index()
+        self.assertEqual(index.equal(10), set(['5', '8']))
+        self.assertEqual(index.equal({'id': 1, 'name': 'A'}), set(['1']))
+        self.assertEqual(index.equal({'tags': ['x']}), set(['3']))
+        self.assertEqual(index.equal({}), None)
+        self.assertEqual(index.equal([1, 2]), None)
+
+    def test_equal_any(self):
+        index = self.index()
+        self.assertEqual(index.equal_any([10, 'hello']), set(['5', '6', '8']))
+        self.assertEqual(index.equal_any([10, []]), None)
+
+
+class TestTracker(TestCase):
+
+    def setUp(self):
+        Singleton._inst.clear()
+        self.canceled = patch('gofer.rmi.tracker.Canceled')
+        self.canceled.start()
+        self.tracker = Tracker()
+        for sn, locator in LOCATORS.items():
+            self.tracker.add(sn, locator)
+
+    def tearDown(self):
+        self.canceled.stop()
+        Singleton._inst.clear()
+
+    def scan(self, criteria):
+        return sorted(sn for sn, locator in LOCATORS.items() if criteria.match(locator))
+
+    def test_find(self):
+        queries = [
+            {'match': {'name': 'A'}},
+            {'match': {'id': 1, 'name': 'A'}},
+            {'match': {'tags': ['x']}},
+            {'match': {}},
+            {'eq': 10},
+            {'eq': {'id': 2, 'name': 'B'}},
+            {'eq': {}},
+            {'eq': [1, 2]},
+            {'in': [10, 'hello', None]},
+            {'neq': 10},
+            {'gt': 5},
+            {'and': ({'match': {'name': 'A'}}, {'match': {'id': 3}})},
+            {'and': ({'match': {'name': 'A'}}, {'neq': {}})},
+            {'or': ({'eq': 10}, {'match': {'name': 'B'}})},
+            {'or': ({'eq': 10}, {'lt': 5})},
+        ]
+        for query in queries:
+            criteria = build(query)
+            self.assertEqual(sorted(self.tracker.find(criteria)), self.scan(criteria), query)
+
+    def test_select(self):
+        criteria = build({'match': {'name': 'A'}})
+        selected = self.tracker.select(criteria)
+        self.assertEqual(sorted(sn for sn, l in selected), ['1', '3', '9'])
+        criteria = build({'gt': 5})
+        selected = self.tracker.select(criteria)
+        self.assertEqual(len(selected), len(LOCATORS))
+
+    def test_add_replaced(self):
+        self.tracker.add('1', {'id': 100})
+        self.assertEqual(self.tracker.find(build({'eq': {'id': 1, 'name': 'A'}})), [])
+        self.assertEqual(self.tracker.find(build({'eq': {'id': 100}})), ['1'])
+
+    def test_remove(self):
+        self.tracker.remove('1')
+        self.tracker.remove('5')
+        self.assertEqual(sorted(self.tracker.find(build({'match': {'name': 'A'}}))), ['3'])
+        self.assertEqual(self.tracker.find(build({'eq': 10})), [])
+
+    @patch('gofer.rmi.tracker.time')
+    def test_sweep(self, _time):
+        _time.return_value = 1000
+        self.tracker.add('10', {'id': 10})
+        _time.return_value = 1000 + Tracker.TTL + 1
+        self.tracker.add('11', {'id': 11})
+        swept = self.tracker.sweep()
+        self.assertEqual(swept, ['10'])
+        self.assertEqual(len(self.tracker), len(LOCATORS) + 1)
+        self.assertEqual(self.tracker.find(build({'eq': {'id': 10}})), [])
+
+    @patch('gofer.rmi.tracker.time')
+    def test_sweep_pending(self, _time):
+        _time.return_value = 1000
+        self.tracker.add('10', {'id': 10})
+        self.tracker.add('11', {'id': 11})
+        _time.return_value = 1000 + Tracker.TTL + 1
+        swept = self.tracker.sweep(pending=set(['11']))
+        self.assertEqual(swept, ['10'])
+        self.assertTrue('11' in self.tracker)
+
+    def test_contains(self):
+        self.tracker.add('10', {'id': 10})
+        self.assertTrue('10' in self.tracker)
+        self.assertFalse('11' in self.tracker)
+
+    def test_sweep_canceled(self):
+        cancelled = self.tracker._Tracker__cancelled
+        cancelled.__iter__ = Mock(return_value=iter(['1', '10']))
+        self.tracker.sweep(Tracker.TTL)
+        cancelled.delete.assert_called_once_with('10')
+
+
+class TestSignal(TestCase):
+
+    def test_set(self):
+        fn = Mock()
+        signal = Signal()
+        signal.register(fn)
+        self.assertFalse(signal.is_set())
+        self.assertFalse(fn.called)
+        signal.set()
+        self.assertTrue(signal.is_set())
+        fn.assert_called_once_with()
+        self.assertEqual(signal.callbacks, [])
+
+    def test_set_callback_failed(self):
+        fn = Mock(side_effect=ValueError())
+        fn2 = Mock()
+        signal = Signal()
+        signal.register(fn)
+        signal.register(fn2)
+        signal.set()
+        fn.assert_called_once_with()
+        fn2.assert_called_once_with()
+
+    def test_register_already_set(self):
+        fn = Mock()
+        signal = Signal()
+        signal.set()
+        signal.register(fn)
+        fn.assert_called_once_with()
+        self.assertEqual(signal.callbacks, [])
+
+    def test_wait(self):
+        signal = Signal()
+        self.assertFalse(signal.wait(0))
+        signal.set()
+        self.assertTrue(signal.wait(0))
+
+
+class TestWindow(TestCase):
+
+    def test_wait(self):
+        window = Window(2)
+        self.assertTrue(window.wait(0, 0))
+        self.assertTrue(window.wait(1, 0))
+        self.assertFalse(window.wait(2, 0))
+        window.ack(0)
+        self.assertTrue(window.wait(2, 0))
+        window.ack(-1)
+        self.assertEqual(window.acked, 0)
+
+    def test_wait_blocked(self):
+        window = Window(1)
+        timer = Thread(target=window.ack, args=(0,))
+        timer.start()
+        self.assertTrue(window.wait(1, 10))
+        timer.join()
+
+    def test_close(self):
+        window = Window(0)
+        self.assertEqual(window.size, 1)
+        window.close()
+        self.assertFalse(window.wait(0, 10))
+
+
+class TestCredit(TestCase):
+
+    def setUp(self):
+        Singleton._inst.clear()
+
+    def tearDown(self):
+        Singleton._inst.clear()
+
+    def test_grant(self):
+        credit = Credit()
+        window = credit.open('1', 2)
+        self.assertEqual(credit.find('1'), window)
+        credit.grant('1', 3)
+        self.assertEqual(window.acked, 3)
+        credit.grant('1', 3, closed=True)
+        self.assertTrue(window.closed)
+        credit.grant('2', 3)
+        credit.close('1')
+        credit.close('1')
+        self.assertEqual(len(credit), 0)
+
+
+class TestTrackerSignal(TestCase):
+
+    def setUp(self):
+        Singleton._inst.clear()
+        self.canceled = patch('gofer.rmi.tracker.Canceled', Collection)
+        self.canceled.start()
+        self.tracker = Tracker()
+        self.tracker.add('1', {})
+
+    def tearDown(self):
+        self.canceled.stop()
+        Singleton._inst.clear()
+
+    def test_signal(self):
+        signal = self.tracker.signal('1')
+        self.assertEqual(self.tracker.signal('1'), signal)
+        self.assertFalse(signal.is_set())
+
+    def test_signal_not_tracked(self):
+        signal = self.tracker.signal('2')
+        self.assertNotEqual(self.tracker.signal('2'), signal)
+
+    def test_cancel(self):
+        fn = Mock()
+        signal = self.tracker.signal('1')
+        signal.register(fn)
+        self.assertEqual(self.tracker.cancel('1'), '1')
+        self.assertTrue(signal.is_set())
+        fn.assert_called_once_with()
+        self.assertEqual(self.tracker.cancel('1'), None)
+        self.assertRaises(Exception, self.tracker.cancel, '2')
+
+    def test_signal_already_cancelled(self):
+        self.tracker.cancel('1')
+        self.assertTrue(self.tracker.signal('1').is_set())
+
+    def test_remove(self):
+        signal = self.tracker.signal('1')
+        self.tracker.remove('1')
+        self.assertNotEqual(self.tracker.signal('1'), signal)
+
+
+class TestCanceled(TestCase):
+
+    def setUp(self):
+        self.root = mkdtemp()
+        self.path = patch.object(Canceled, 'PATH', os.path.join(self.root, 'canceled'))
+        self.path.start()
+        self.journal = patch.object(Canceled, 'JOURNAL', os.path.join(self.root, 'canceled.jnl'))
+        self.journal.start()
+
+    def tearDown(self):
+        self.path.stop()
+        self.journal.stop()
+        shutil.rmtree(self.root)
+
+    def records(self):
+        with open(Canceled.JOURNAL) as fp:
+            return fp.read().split()
+
+    def test_add(self):
+        canceled = Canceled()
+        canceled.add('1')
+        canceled.add('2')
+        canceled.add('2')
+        self.assertTrue('1' in canceled)
+        self.assertEqual(len(canceled), 2)
+        self.assertEqual(self.records(), ['+1', '+2'])
+
+    def test_delete(self):
+        canceled = Canceled()
+        canceled.add('1')
+        canceled.delete('1')
+        canceled.delete('2')
+        self.assertFalse('1' in canceled)
+        self.assertEqual(self.records(), ['+1', '-1'])
+
+    def test_load(self):
+        canceled = Canceled()
+        canceled.add('1')
+        canceled.add('2')
+        canceled.delete('1')
+        canceled.close()
+        canceled = Canceled()
+        self.assertEqual(sorted(canceled), ['2'])
+        self.assertEqual(self.records(), ['+2'])
+
+    def test_migrate(self):
+        os.makedirs(Canceled.PATH)
+        for sn in ('1', '2'):
+            with open(os.path.join(Canceled.PATH, sn), 'w') as fp:
+                fp.write(sn)
+        canceled = Canceled()
+        self.assertEqual(sorted(canceled), ['1', '2'])
+        self.assertFalse(os.path.exists(Canceled.PATH))
+        self.assertEqual(sorted(self.records()), ['+1', '+2'])
 
-class Test(TestCase):
-    pass
\ No newline at end of file
+    @patch.object(Canceled, 'COMPACT', 4)
+    def test_compact(self):
+        canceled = Canceled()
+        canceled.add('1')
+        canceled.add('2')
+        canceled.delete('1')
+        canceled.delete('2')
+        canceled.add('3')
+        self.assertEqual(self.records(), ['+3'])
+        self.assertEqual(canceled.records, 1)
@@ -20,11 +20,13 @@ from unittest import TestCase
 from mock import Mock, patch
 from tempfile import mktemp
 
+import gofer.common
+
 from gofer.common import Thread as GThread
 from gofer.common import Singleton, ThreadSingleton, Options
-from gofer.common import synchronized, conditional, released
+from gofer.common import synchronized, conditional, released, lock
 from gofer.common import mkdir, rmdir, unlink, nvl, valid_path, utf8
-from gofer.common import List
+from gofer.common import List, Record
 
 
 class Thing(object):
@@ -95,6 +97,13 @@ class Thing3(object):
         return n, a
 
 
+class Thing5(Thing3):
+
+    @synchronized
+    def foo(self, n, a=0):
+        return n, a
+
+
 class Thing4(object):
 
     @released
@@ -363,6 +372,29 @@ class TestDecorators(TestCase):
         thing = Thing3(None)
         self.assertRaises(AttributeError, thing.bar, 0)
 
+    def test_synchronized_subclass(self):
+        mutex = Mock()
+        thing = Thing5(mutex=mutex)
+        ret = thing.foo(1, a=2)
+        mutex.acquire.assert_called_once_with()
+        self.assertEqual(ret, (1, 2))
+
+    @patch('gofer.common._locks', {})
+    def test_lock(self):
+        mutex = Mock()
+        thing = Thing5(mutex=mutex)
+        self.assertEqual(lock(thing, 'mutex'), mutex)
+        self.assertEqual(gofer.common._locks, {(Thing5, 'mutex'): '_Thing3__mutex'})
+        thing = Thing5(mutex=Mock())
+        with patch('gofer.common.inspect') as _inspect:
+            self.assertEqual(lock(thing, 'mutex'), thing._Thing3__mutex)
+            self.assertFalse(_inspect.getmro.called)
+
+    @patch('gofer.common._locks', {})
+    def test_lock_not_found(self):
+        self.assertRaises(AttributeError, lock, Thing4(), 'mutex')
+        self.assertEqual(gofer.common._locks, {})
+
     @patch('gofer.common.ThreadSingleton.all')
     def test_released(self, _all):
         things = {
@@ -446,6 +478,93 @@ class TestOptions(TestCase):
         options = Options(a=1, b=2)
         self.assertEqual(str(options), str(options.__dict__))
 
+    def test_record(self):
+        options = Options(Point(x=1))
+        self.assertEqual(options.__dict__, {'x': 1})
+
+
+class Point(Record):
+
+    __slots__ = ('x', 'y')
+
+
+class TestRecord(TestCase):
+
+    def test_init(self):
+        self.assertEqual(Point({'x': 1}, y=2).__dict__, {'x': 1, 'y': 2})
+        self.assertEqual(Point(Options(x=1, z=3)).__dict__, {'x': 1, 'z': 3})
+        self.assertEqual(Point(Point(x=1)).__dict__, {'x': 1})
+        self.assertRaises(ValueError, Point, 1)
+
+    def test_fields(self):
+        class Point3(Point):
+            __slots__ = ('z',)
+        self.assertEqual(Point3._fields(), ('x', 'y', 'z'))
+        self.assertEqual(Point._fields(), ('x', 'y'))
+
+    def test_slots(self):
+        point = Point(x=1, y=2)
+        self.assertEqual(point._extra, None)
+        self.assertRaises(TypeError, setattr, point, '__class__', Options)
+
+    def test_getattr(self):
+        point = Point(x=1)
+        self.assertEqual(point.x, 1)
+        self.assertEqual(point.y, None)
+        self.assertEqual(point.z, None)
+
+    def test_setattr(self):
+        point = Point()
+        point.x = 1
+        point.z = 3
+        self.assertEqual(point.x, 1)
+        self.assertEqual(point.z, 3)
+        self.assertEqual(point._extra, {'z': 3})
+
+    def test_delattr(self):
+        point = Point(x=1, z=3)
+        del point.x
+        del point.z
+        self.assertEqual(point.__dict__, {})
+        self.assertRaises(AttributeError, delattr, point, 'z')
+
+    def test_dict(self):
+        point = Point(x=1, z=3)
+        self.assertEqual(point.__dict__, {'x': 1, 'z': 3})
+        self.assertEqual(vars(point), {'x': 1, 'z': 3})
+        # copied
+        point.__dict__['y'] = 2
+        self.assertEqual(point.y, None)
+
+    def test_item(self):
+        point = Point(x=1)
+        point['z'] = 3
+        self.assertEqual(point['x'], 1)
+        self.assertEqual(point['z'], 3)
+        self.assertRaises(KeyError, point.__getitem__, 'y')
+
+    def test_iadd(self):
+        point = Point(x=1)
+        point += dict(y=2)
+        point += Options(z=3)
+        self.assertEqual(point.__dict__, {'x': 1, 'y': 2, 'z': 3})
+        try:
+            point += None
+            self.assertTrue(0, msg='ValueError expected')
+        except ValueError:
+            pass
+
+    def test_len(self):
+        self.assertEqual(len(Point(x=1, z=3)), 2)
+        self.assertEqual(sorted(Point(x=1, z=3)), ['x', 'z'])
+        self.assertTrue('x' in Point(x=1))
+
+    def test_str(self):
+        point = Point(x=1, z=3)
+        self.assertEqual(repr(point), repr(point.__dict__))
+        self.assertEqual(str(point), str(point.__dict__))
+        self.assertEqual(unicode(point), unicode(point.__dict__))
+
 
 class TestValidPath(TestCase):
 
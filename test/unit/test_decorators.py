@@ -56,6 +56,49 @@ class TestRemote(TestCase):
         self.assertEqual(str(opt), str({'security': [('secret', {'secret': 'fedex'})]}))
         _remote.add.assert_called_once_with(fn)
 
+    @patch('gofer.decorators.Remote')
+    def test_timeout(self, _remote):
+        def fn(): pass
+        remote(timeout=10)(fn)
+        opt = getattr(fn, NAME)
+        self.assertEqual(opt.timeout, 10)
+        _remote.add.assert_called_once_with(fn)
+
+    @patch('gofer.decorators.Remote')
+    def test_coalesce(self, _remote):
+        def fn(): pass
+        remote(coalesce=True)(fn)
+        opt = getattr(fn, NAME)
+        self.assertTrue(opt.coalesce)
+        _remote.add.assert_called_once_with(fn)
+
+    @patch('gofer.decorators.Remote')
+    def test_cache_ttl(self, _remote):
+        def fn(): pass
+        remote(cache_ttl=60, invalidates=('A', 'B.fn'))(fn)
+        opt = getattr(fn, NAME)
+        self.assertEqual(opt.cache_ttl, 60)
+        self.assertEqual(opt.invalidates, ['A', 'B.fn'])
+        _remote.add.assert_called_once_with(fn)
+
+    @patch('gofer.decorators.Remote')
+    def test_class(self, _remote):
+        class A(object):
+            pass
+        remote(A)
+        opt = getattr(A, NAME)
+        self.assertEqual(opt.scope, None)
+        self.assertFalse(_remote.add.called)
+
+    @patch('gofer.decorators.Remote')
+    def test_class_scope(self, _remote):
+        class A(object):
+            pass
+        remote(scope='pooled')(A)
+        opt = getattr(A, NAME)
+        self.assertEqual(opt.scope, 'pooled')
+        self.assertFalse(_remote.add.called)
+
 
 class TestPam(TestCase):
 
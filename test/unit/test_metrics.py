@@ -14,7 +14,7 @@ from datetime import datetime
 
 from mock import patch
 
-from gofer.metrics import Timer, timestamp
+from gofer.metrics import Timer, Counter, Metrics, timestamp
 
 
 class TestUtils(TestCase):
@@ -94,4 +94,43 @@ class TestTimer(TestCase):
         # minutes
         t.started = 10.0
         t.stopped = 100.0
-        self.assertEqual(str(t), '1.500 (minutes)')
\ No newline at end of file
+        self.assertEqual(str(t), '1.500 (minutes)')
+
+class TestCounter(TestCase):
+
+    def test_init(self):
+        counter = Counter('a')
+        self.assertEqual(counter.name, 'a')
+        self.assertEqual(counter.value, 0)
+
+    def test_inc(self):
+        counter = Counter('a')
+        self.assertEqual(counter.inc(), 1)
+        self.assertEqual(counter.inc(3), 4)
+        self.assertEqual(int(counter), 4)
+
+    def test_reset(self):
+        counter = Counter('a')
+        counter.inc()
+        counter.reset()
+        self.assertEqual(counter.value, 0)
+
+
+class TestMetrics(TestCase):
+
+    def test_singleton(self):
+        self.assertTrue(Metrics() is Metrics())
+
+    def test_counter(self):
+        metrics = Metrics()
+        counter = metrics.counter('test.a')
+        self.assertTrue(isinstance(counter, Counter))
+        self.assertTrue(metrics.counter('test.a') is counter)
+
+    def test_snapshot(self):
+        metrics = Metrics()
+        counter = metrics.counter('test.b')
+        counter.reset()
+        counter.inc(2)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['test.b'], 2)
@@ -11,7 +11,7 @@
 
 from unittest import TestCase
 
-from mock import patch
+from mock import patch, Mock
 
 from gofer import pam
 
@@ -77,3 +77,94 @@ class Test(TestCase):
         self.assertTrue(_authenticate.called)
         self.assertFalse(_end.called)
         self.assertFalse(valid)
+
+
+class TestCache(TestCase):
+
+    def test_init(self):
+        cache = pam.Cache(10, 20)
+        self.assertEqual(cache.ttl, 10)
+        self.assertEqual(cache.capacity, 20)
+        self.assertEqual(len(cache.salt), 16)
+        self.assertEqual(len(cache), 0)
+
+    def test_key(self):
+        cache = pam.Cache()
+        key = cache.key('user', 'password', 'login')
+        self.assertEqual(key[:2], ('user', 'login'))
+        self.assertFalse('password' in key[2])
+        self.assertEqual(cache.key('user', u'password', 'login'), key)
+        self.assertNotEqual(cache.key('user', 'other', 'login'), key)
+        self.assertNotEqual(pam.Cache().key('user', 'password', 'login'), key)
+
+    def test_add(self):
+        cache = pam.Cache(10)
+        cache.add('user', 'password', 'login')
+        self.assertTrue(cache.get('user', 'password', 'login'))
+        self.assertFalse(cache.get('user', 'wrong', 'login'))
+        self.assertFalse(cache.get('user', 'password', 'passwd'))
+        self.assertFalse(cache.get('root', 'password', 'login'))
+
+    def test_add_disabled(self):
+        cache = pam.Cache(0)
+        cache.add('user', 'password', 'login')
+        self.assertEqual(len(cache), 0)
+
+    @patch('gofer.pam.time')
+    def test_expired(self, _time):
+        _time.return_value = 1000
+        cache = pam.Cache(10)
+        cache.add('user', 'password', 'login')
+        _time.return_value = 1011
+        self.assertFalse(cache.get('user', 'password', 'login'))
+        self.assertEqual(len(cache), 0)
+
+    def test_capacity(self):
+        cache = pam.Cache(10, 2)
+        cache.add('u1', 'password', 'login')
+        cache.add('u2', 'password', 'login')
+        cache.get('u1', 'password', 'login')
+        cache.add('u3', 'password', 'login')
+        self.assertEqual(len(cache), 2)
+        self.assertTrue(cache.get('u1', 'password', 'login'))
+        self.assertFalse(cache.get('u2', 'password', 'login'))
+
+    def test_clear(self):
+        cache = pam.Cache(10)
+        cache.add('user', 'password', 'login')
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class TestCachedAuthentication(TestCase):
+
+    @patch('gofer.pam.Metrics')
+    @patch('gofer.pam.cache', pam.Cache(10))
+    @patch('gofer.pam._authenticate')
+    def test_cached(self, _authenticate, metrics):
+        _authenticate.return_value = True
+        self.assertTrue(pam.authenticate('user', 'password', 'login'))
+        self.assertTrue(pam.authenticate('user', 'password', 'login'))
+        _authenticate.assert_called_once_with('user', 'password', 'login')
+        counter = metrics.return_value.counter
+        counter.assert_any_call('pam.cache.miss')
+        counter.assert_any_call('pam.cache.hit')
+        counter.assert_any_call('pam.latency')
+
+    @patch('gofer.pam.Metrics', Mock())
+    @patch('gofer.pam.cache', pam.Cache(10))
+    @patch('gofer.pam._authenticate')
+    def test_not_cached(self, _authenticate):
+        _authenticate.return_value = False
+        self.assertFalse(pam.authenticate('user', 'password', 'login'))
+        self.assertFalse(pam.authenticate('user', 'password', 'login'))
+        self.assertEqual(_authenticate.call_count, 2)
+
+    @patch('gofer.pam.Metrics', Mock())
+    @patch('gofer.pam.cache', pam.Cache(0))
+    @patch('gofer.pam._authenticate')
+    def test_disabled(self, _authenticate):
+        _authenticate.return_value = True
+        self.assertTrue(pam.authenticate('user', 'password', 'login'))
+        self.assertTrue(pam.authenticate('user', 'password', 'login'))
+        self.assertEqual(_authenticate.call_count, 2)
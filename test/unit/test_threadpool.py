@@ -0,0 +1,47 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from Queue import Full
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from gofer.threadpool import ThreadPool, Worker
+
+
+class TestWorker(TestCase):
+
+    def test_put(self):
+        worker = Worker(0, backlog=3)
+        worker.put(1, False)
+        self.assertEqual(worker.backlog(), 2)
+        # busy marker not queued
+        worker.put(2, False)
+        self.assertEqual(worker.backlog(), 3)
+        # full
+        self.assertRaises(Full, worker.put, 3, False)
+
+
+class TestThreadPool(TestCase):
+
+    @patch('gofer.threadpool.Worker.start', Mock())
+    def test_offer(self):
+        fn = Mock()
+        pool = ThreadPool(2)
+        for worker in pool.threads:
+            worker.queue.maxsize = 2
+        self.assertTrue(pool.offer(fn, 1, a=2))
+        self.assertTrue(pool.offer(fn, 3))
+        self.assertFalse(pool.offer(fn, 4))
+        call = pool.threads[0].queue.get()
+        self.assertEqual(call.fn, fn)
+        self.assertEqual(call.args, (1,))
+        self.assertEqual(call.kwargs, dict(a=2))